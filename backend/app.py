@@ -1,19 +1,18 @@
+import gzip
+import io
 import json
 import logging
+import mimetypes
 import os
 import re
 import time
-import unicodedata
 from datetime import datetime, timedelta
 from decimal import Decimal
+from types import SimpleNamespace
 from uuid import uuid4
 
-import pymysql
-import requests
-import urllib.parse
-
 import click
-from sqlalchemy import bindparam, create_engine, func, text, or_
+from sqlalchemy import func, or_
 from flask import (
     Flask,
     abort,
@@ -28,41 +27,21 @@ from flask import (
 from sqlalchemy.exc import SQLAlchemyError
 from werkzeug.security import check_password_hash, generate_password_hash
 from werkzeug.utils import secure_filename
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import (
-    Image,
-    KeepTogether,
-    Paragraph,
-    SimpleDocTemplate,
-    Spacer,
-    Table,
-    TableStyle,
-)
 
 from models import (
     AbonoCobroPersonal,
-    AbonoFactura,
     AjustesNegocio,
-    AvesGranjaCliente,
-    AvesLoteActividad,
-    AvesLoteCierre,
-    AvesLote,
-    AvesLotePlanPersonalizado,
-    AvesPlan,
     AvesUser,
     Categoria,
     Cliente,
-    CobroPersonalDetalle,
     CobroPersonal,
     ChatAudit,
     ChatMessage,
     ChatSession,
     ChatSummary,
-    DetalleFacturaContado,
-    DetallePedido,
     FacturaContado,
+    IdempotencyKey,
+    MovimientoInventario,
     Pedido,
     Producto,
     User,
@@ -70,20 +49,37 @@ from models import (
 )
 from auth_helpers import (
     admin_required,
-    current_user,
     current_user_id,
     current_user_is_admin,
     current_user_is_vendedor,
     current_user_role,
+    get_user_directory,
+    invalidate_user_directory,
     login_required,
     role_required,
 )
+from routes import parse_enabled_modules, register_blueprints
+from db_dialect import configure_sqlite
+from file_serving import FILE_SERVING_MODES, send_protected_file
+from inventory import StockInsuficiente, record_movement
+from product_images import THUMB_FORMATS, THUMB_WIDTHS, generate_variants, remove_variants, variant_path
+from request_metrics import init_request_metrics
+from static_assets import (
+    DIST_DIRNAME,
+    AssetManifest,
+    build_assets,
+    is_hashed_asset,
+    js_minifier_available,
+)
+from typeahead import TypeaheadIndex
 
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object("config.Config")
     db.init_app(app)
+    configure_sqlite(app)
+    init_request_metrics(app)
 
     # Exponer helpers de rol al sistema de plantillas Jinja
     @app.context_processor
@@ -92,6 +88,7 @@ def create_app():
             "current_user_role": current_user_role(),
             "is_admin": current_user_is_admin(),
             "is_vendedor": current_user_is_vendedor(),
+            "enabled_modules": app.config["ENABLED_MODULES"],
         }
 
     chat_db_user = os.getenv("CHAT_DB_USER")
@@ -106,30 +103,38 @@ def create_app():
     else:
         app.config["CHAT_DB_URI"] = None
 
-    with app.app_context():
-        db.create_all()
-        try:
-            aves_user = AvesUser.query.filter_by(username="Luis").first()
-            if not aves_user:
-                db.session.add(
-                    AvesUser(
-                        username="Luis",
-                        password=generate_password_hash("Luis82847"),
-                        nombre_completo="Luis",
-                        activo=True,
-                        fecha_creacion=datetime.utcnow(),
-                    )
-                )
-                db.session.commit()
-        except SQLAlchemyError:
-            db.session.rollback()
-
     app.config["CHAT_LLM_API_KEY"] = os.getenv("CHAT_LLM_API_KEY")
     app.config["CHAT_LLM_BASE_URL"] = os.getenv(
         "CHAT_LLM_BASE_URL", "https://api.openai.com/v1"
     ).strip()
     app.config["CHAT_LLM_MODEL"] = os.getenv("CHAT_LLM_MODEL", "").strip()
     app.config["CHAT_SUMMARY_ENABLED"] = False
+    app.config["USER_DIRECTORY_TTL"] = int(os.getenv("USER_DIRECTORY_TTL", "60"))
+    app.config["TYPEAHEAD_TTL"] = max(1, int(os.getenv("TYPEAHEAD_TTL", "30")))
+    app.config["TYPEAHEAD_MAX_RESULTS"] = max(1, int(os.getenv("TYPEAHEAD_MAX_RESULTS", "50")))
+    app.config["CLIENT_LIST_LIMIT"] = max(1, int(os.getenv("CLIENT_LIST_LIMIT", "200")))
+    app.config["ENABLED_MODULES"] = parse_enabled_modules(os.getenv("ENABLED_MODULES"))
+    app.config["REPORT_RESULT_MAX_ENTRIES"] = int(os.getenv("REPORT_RESULT_MAX_ENTRIES", "128"))
+    app.config["REPORT_RESULT_TTL"] = int(os.getenv("REPORT_RESULT_TTL", "900"))
+    app.config["IMPORT_BATCH_SIZE"] = max(1, int(os.getenv("IMPORT_BATCH_SIZE", "500")))
+    app.config["STATIC_IMMUTABLE_MAX_AGE"] = 365 * 24 * 3600
+    app.config["FILE_SERVING"] = os.getenv("FILE_SERVING", "flask").strip().lower()
+    if app.config["FILE_SERVING"] not in FILE_SERVING_MODES:
+        app.logger.warning("FILE_SERVING=%s no es valido; se usa flask.", app.config["FILE_SERVING"])
+        app.config["FILE_SERVING"] = "flask"
+    app.config["INVOICE_LINK_TTL_HOURS"] = max(1, int(os.getenv("INVOICE_LINK_TTL_HOURS", "168")))
+    app.config["X_ACCEL_PREFIX"] = "/" + os.getenv("X_ACCEL_PREFIX", "/_protected").strip("/")
+    app.config["OPTIMISTIC_RETRIES"] = max(1, int(os.getenv("OPTIMISTIC_RETRIES", "5")))
+    app.config["PRINT_BATCH_MAX"] = max(1, int(os.getenv("PRINT_BATCH_MAX", "500")))
+    app.config["TICKET_COLUMNS"] = min(64, max(24, int(os.getenv("TICKET_COLUMNS", "48"))))
+    app.config["BATCH_INVOICE_MAX"] = max(1, int(os.getenv("BATCH_INVOICE_MAX", "200")))
+    app.config["IDEMPOTENCY_TTL_HOURS"] = max(1, int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24")))
+    app.config["INVENTORY_ENFORCE_STOCK"] = os.getenv("INVENTORY_ENFORCE_STOCK", "0").strip().lower() not in {
+        "0",
+        "false",
+        "no",
+        "off",
+    }
 
     upload_folder = os.path.join(app.static_folder, "uploads", "productos")
     try:
@@ -137,24 +142,28 @@ def create_app():
     except PermissionError:
         app.logger.warning("No se pudo crear la carpeta de uploads.")
     app.config["PRODUCT_UPLOAD_FOLDER"] = upload_folder
-    invoice_folder = os.path.join(app.static_folder, "invoices")
+    # Facturas y recibos llevan datos del cliente: van fuera de static y solo
+    # se descargan por factura_pdf / receipt_file, que revisan la sesion.
+    invoice_folder = os.path.join(app.instance_path, "invoices")
     try:
         os.makedirs(invoice_folder, exist_ok=True)
     except PermissionError:
         app.logger.warning("No se pudo crear la carpeta de facturas.")
     app.config["INVOICE_PDF_FOLDER"] = invoice_folder
-    receipt_folder = os.path.join(app.static_folder, "receipts")
+    receipt_folder = os.path.join(app.instance_path, "receipts")
     try:
         os.makedirs(receipt_folder, exist_ok=True)
     except PermissionError:
-        app.logger.warning("No se pudo crear la carpeta de recibos en static.")
-        receipt_folder = os.path.join(app.instance_path, "receipts")
-        try:
-            os.makedirs(receipt_folder, exist_ok=True)
-        except PermissionError:
-            app.logger.warning("No se pudo crear la carpeta de recibos en instance.")
-            receipt_folder = None
+        app.logger.warning("No se pudo crear la carpeta de recibos.")
+        receipt_folder = None
     app.config["RECEIPT_PDF_FOLDER"] = receipt_folder
+    # Reportes y ordenes de entrega se comparten por enlace publico en /static/reports/.
+    report_folder = os.path.join(app.static_folder, "reports")
+    try:
+        os.makedirs(report_folder, exist_ok=True)
+    except PermissionError:
+        app.logger.warning("No se pudo crear la carpeta de reportes.")
+    app.config["REPORT_PDF_FOLDER"] = report_folder
 
     allowed_extensions = {"jpg", "jpeg", "png", "webp"}
 
@@ -170,45 +179,36 @@ def create_app():
         unique_name = f"{uuid4().hex}.{ext}"
         file_path = os.path.join(app.config["PRODUCT_UPLOAD_FOLDER"], unique_name)
         file_storage.save(file_path)
+        try:
+            generate_variants(app.config["PRODUCT_UPLOAD_FOLDER"], unique_name)
+        except ImportError:
+            app.logger.warning("Pillow no esta instalado; las fotos se muestran sin miniaturas.")
+        except (OSError, ValueError):
+            os.remove(file_path)
+            remove_variants(app.config["PRODUCT_UPLOAD_FOLDER"], unique_name)
+            raise ValueError("La imagen esta danada o no se pudo procesar.")
         return unique_name
 
-    def parse_rango_autorizado_inicio(rango_texto):
-        if not rango_texto:
-            return None
-        matches = list(re.finditer(r"\d+", rango_texto))
-        if not matches:
-            return None
-        start_match = matches[-1]
-        prefix = rango_texto[: start_match.start()]
-        start_raw = start_match.group(0)
-        try:
-            start_num = int(start_raw)
-        except ValueError:
-            return None
-        return {"prefix": prefix, "start_num": start_num, "width": len(start_raw)}
+    def product_thumb_url(filename, width, fmt):
+        return url_for("product_thumbnail", width=width, name=f"{filename}.{fmt}")
 
-    def generate_invoice_number():
-        settings = get_business_settings()
-        rango_inicio = settings.rango_autorizado_inicio or settings.rango_autorizado or ""
-        rango_info = parse_rango_autorizado_inicio(rango_inicio)
-        if not rango_info:
-            return f"F001-{datetime.utcnow():%Y%m%d%H%M%S}"
+    def product_thumb_srcset(filename, fmt):
+        return ", ".join(
+            f"{product_thumb_url(filename, width, fmt)} {width}w" for width in THUMB_WIDTHS
+        )
 
-        last_invoice = FacturaContado.query.order_by(FacturaContado.id.desc()).first()
-        next_num = rango_info["start_num"]
-        if last_invoice and last_invoice.numero_factura:
-            if last_invoice.numero_factura.startswith(rango_info["prefix"]):
-                suffix = last_invoice.numero_factura[len(rango_info["prefix"]):]
-                if suffix.isdigit():
-                    next_num = int(suffix) + 1
+    app.add_template_global(product_thumb_url)
+    app.add_template_global(product_thumb_srcset)
 
-        return f"{rango_info['prefix']}{next_num:0{rango_info['width']}d}"
+    asset_manifest = AssetManifest(app.static_folder)
 
-    def generate_order_number():
-        return f"PED-{datetime.utcnow():%Y%m%d%H%M%S}"
+    def asset_url(path):
+        hashed = asset_manifest.lookup(path)
+        if hashed:
+            return url_for("built_asset", filename=hashed)
+        return url_for("static", filename=path, v=asset_manifest.source_version(path))
 
-    def generate_personal_charge_number():
-        return f"CP-{datetime.utcnow():%Y%m%d%H%M%S}"
+    app.add_template_global(asset_url)
 
     def build_invoice_pdf_filename(numero_factura, token=None):
         safe_base = re.sub(r"[\\/\\s]+", "-", numero_factura).strip("-")
@@ -224,30 +224,6 @@ def create_app():
         safe_name = secure_filename(safe_base) or "recibo"
         return f"recibo-{safe_name}-{abono_id}.pdf"
 
-    def generate_receipt_pdf(settings, factura, cliente, usuario, monto, saldo, abono_id):
-        receipts_folder = app.config.get("RECEIPT_PDF_FOLDER")
-        if not receipts_folder:
-            app.logger.warning("Carpeta de recibos no configurada.")
-            return None
-        recibo_filename = build_receipt_pdf_filename(factura.numero_factura, abono_id)
-        pdf_path = os.path.join(receipts_folder, recibo_filename)
-        create_receipt_pdf(
-            pdf_path,
-            settings,
-            factura,
-            cliente,
-            usuario,
-            monto,
-            saldo,
-        )
-        if os.path.isfile(pdf_path):
-            return recibo_filename
-        app.logger.warning("No se genero el PDF del recibo en %s.", pdf_path)
-        return None
-
-    def cleanup_old_receipts():
-        return
-
     def _number_to_spanish_words(number):
         unidades = {
             0: "cero",
@@ -343,1147 +319,6 @@ def create_app():
         moneda = "lempira" if entero == 1 else "lempiras"
         return f"{entero_text} {moneda} con {centavos:02d}/100"
 
-    def normalize_text(text_value):
-        if not text_value:
-            return ""
-        normalized = unicodedata.normalize("NFKD", text_value)
-        normalized = "".join(ch for ch in normalized if not unicodedata.combining(ch))
-        normalized = re.sub(r"\s+", " ", normalized)
-        return normalized.strip().lower()
-
-    def get_chat_engine():
-        uri = app.config.get("CHAT_DB_URI")
-        if not uri:
-            return None
-        return create_engine(uri, pool_pre_ping=True)
-
-    def run_chat_query(sql, params):
-        statement = text(sql)
-        if "cliente_ids" in params:
-            statement = statement.bindparams(bindparam("cliente_ids", expanding=True))
-        engine = get_chat_engine()
-        if engine:
-            with engine.connect() as connection:
-                return connection.execute(statement, params).mappings().all()
-        return db.session.execute(statement, params).mappings().all()
-
-    def format_money(value):
-        if value is None:
-            return "0.00"
-        return f"{float(value):,.2f}"
-
-    def format_int(value):
-        if value is None:
-            return "0"
-        return f"{int(value):,}"
-
-    def get_personal_charge_status_message(status_code):
-        status_map = {
-            "created": ("Cobro personal creado correctamente.", False),
-            "payment_recorded": ("Pago registrado correctamente.", False),
-            "invalid_charge": ("No se encontro el cobro personal solicitado.", True),
-            "invalid_amount": ("El monto indicado no es valido para este cobro.", True),
-            "closed_charge": ("Este cobro ya no admite pagos porque no esta pendiente.", True),
-            "save_error": ("No se pudo guardar el cobro personal.", True),
-            "payment_error": ("No se pudo registrar el pago del cobro personal.", True),
-        }
-        return status_map.get(status_code, (None, False))
-
-    def build_default_personal_charge_items():
-        return [{"descripcion": "", "cantidad": "1", "precio_unitario": ""}]
-
-    def parse_personal_charge_items(form_data):
-        descriptions = form_data.getlist("detalle_descripcion")
-        quantities = form_data.getlist("detalle_cantidad")
-        unit_prices = form_data.getlist("detalle_precio_unitario")
-
-        raw_items = []
-        parsed_items = []
-        total = Decimal("0")
-        max_len = max(len(descriptions), len(quantities), len(unit_prices), 1)
-
-        for index in range(max_len):
-            descripcion = (descriptions[index] if index < len(descriptions) else "").strip()
-            cantidad_raw = (quantities[index] if index < len(quantities) else "").strip()
-            precio_raw = (unit_prices[index] if index < len(unit_prices) else "").strip()
-
-            raw_items.append(
-                {
-                    "descripcion": descripcion,
-                    "cantidad": cantidad_raw or "1",
-                    "precio_unitario": precio_raw,
-                }
-            )
-
-            if not descripcion and not cantidad_raw and not precio_raw:
-                continue
-            if not descripcion:
-                raise ValueError("Cada linea debe incluir una descripcion.")
-
-            try:
-                cantidad = Decimal(cantidad_raw or "0")
-                precio_unitario = Decimal(precio_raw or "0")
-            except Exception as exc:
-                raise ValueError("Cantidad y precio deben ser valores numericos.") from exc
-
-            if cantidad <= 0 or precio_unitario < 0:
-                raise ValueError("Cantidad debe ser mayor a cero y precio no puede ser negativo.")
-
-            subtotal = (cantidad * precio_unitario).quantize(Decimal("0.01"))
-            total += subtotal
-            parsed_items.append(
-                {
-                    "descripcion": descripcion,
-                    "cantidad": cantidad.quantize(Decimal("0.01")),
-                    "precio_unitario": precio_unitario.quantize(Decimal("0.01")),
-                    "subtotal": subtotal,
-                }
-            )
-
-        if not parsed_items:
-            raise ValueError("Agrega al menos una linea de producto o servicio.")
-
-        return raw_items or build_default_personal_charge_items(), parsed_items, total.quantize(Decimal("0.01"))
-
-    def build_personal_charges_context(form_values=None, status_code=None, error=None):
-        default_form_values = {
-            "cliente_id": "",
-            "nombre": "",
-            "concepto": "",
-            "telefono": "",
-            "fecha_vencimiento": "",
-            "total": "",
-            "observaciones": "",
-            "detalle_items": build_default_personal_charge_items(),
-        }
-        if form_values:
-            default_form_values.update(form_values)
-
-        message, is_error = get_personal_charge_status_message(status_code)
-        if error:
-            message = error
-            is_error = True
-
-        # Vendedor solo ve SUS cobros; admin/contador ven todos
-        es_vendedor_filtro = current_user_is_vendedor()
-        uid_filtro = current_user_id() if es_vendedor_filtro else None
-
-        try:
-            clientes = Cliente.query.order_by(Cliente.nombre.asc()).all()
-            pending_q = (
-                db.session.query(CobroPersonal, User)
-                .outerjoin(User, CobroPersonal.usuario_id == User.id)
-                .filter(CobroPersonal.estado == "pendiente")
-            )
-            if es_vendedor_filtro:
-                pending_q = pending_q.filter(CobroPersonal.usuario_id == uid_filtro)
-            pending_rows = pending_q.order_by(
-                CobroPersonal.fecha.desc(),
-                CobroPersonal.id.desc(),
-            ).all()
-
-            payment_q = (
-                db.session.query(AbonoCobroPersonal, CobroPersonal, User)
-                .join(CobroPersonal, AbonoCobroPersonal.cobro_id == CobroPersonal.id)
-                .outerjoin(User, AbonoCobroPersonal.usuario_id == User.id)
-            )
-            if es_vendedor_filtro:
-                payment_q = payment_q.filter(CobroPersonal.usuario_id == uid_filtro)
-            payment_rows = payment_q.order_by(AbonoCobroPersonal.fecha.desc()).all()
-
-            count_q = CobroPersonal.query.filter_by(estado="pendiente")
-            if es_vendedor_filtro:
-                count_q = count_q.filter(CobroPersonal.usuario_id == uid_filtro)
-            cobros_pendientes_count = count_q.count()
-
-            saldo_q = (
-                db.session.query(func.coalesce(func.sum(CobroPersonal.saldo), 0))
-                .filter(CobroPersonal.estado == "pendiente")
-            )
-            if es_vendedor_filtro:
-                saldo_q = saldo_q.filter(CobroPersonal.usuario_id == uid_filtro)
-            saldo_total = saldo_q.scalar() or 0
-
-            pagados_q = CobroPersonal.query.filter_by(estado="pagado")
-            if es_vendedor_filtro:
-                pagados_q = pagados_q.filter(CobroPersonal.usuario_id == uid_filtro)
-            cobros_pagados_count = pagados_q.count()
-            charges_q = (
-                db.session.query(CobroPersonal, User)
-                .outerjoin(User, CobroPersonal.usuario_id == User.id)
-            )
-            if es_vendedor_filtro:
-                charges_q = charges_q.filter(CobroPersonal.usuario_id == uid_filtro)
-            charge_rows = charges_q.order_by(
-                CobroPersonal.fecha.desc(), CobroPersonal.id.desc()
-            ).all()
-            detail_rows = CobroPersonalDetalle.query.order_by(
-                CobroPersonalDetalle.id.asc()
-            ).all()
-        except SQLAlchemyError:
-            db.session.rollback()
-            pending_rows = []
-            payment_rows = []
-            detail_rows = []
-            clientes = []
-            cobros_pendientes_count = 0
-            saldo_total = 0
-            cobros_pagados_count = 0
-            charge_rows = []
-            if not error:
-                message = "No se pudieron cargar los cobros personales."
-                is_error = True
-
-        detail_map = {}
-        for detail in detail_rows:
-            detail_map.setdefault(detail.cobro_id, []).append(detail)
-
-        pending_charges = []
-        for cobro, usuario in pending_rows:
-            usuario_nombre = (
-                usuario.nombre_completo
-                if usuario and usuario.nombre_completo
-                else (usuario.username if usuario else "N/A")
-            )
-            detail_count = len(detail_map.get(cobro.id, []))
-            pending_charges.append(
-                {
-                    "id": cobro.id,
-                    "numero_cobro": cobro.numero_cobro,
-                    "nombre": cobro.nombre,
-                    "concepto": cobro.concepto,
-                    "telefono": cobro.telefono or "-",
-                    "total": cobro.total or Decimal("0"),
-                    "saldo": cobro.saldo or Decimal("0"),
-                    "fecha_label": (
-                        cobro.fecha.strftime("%d/%m/%Y") if cobro.fecha else "-"
-                    ),
-                    "vencimiento_label": (
-                        cobro.fecha_vencimiento.strftime("%d/%m/%Y")
-                        if cobro.fecha_vencimiento
-                        else "-"
-                    ),
-                    "usuario": usuario_nombre,
-                    "observaciones": (cobro.observaciones or "").strip(),
-                    "detail_count": detail_count,
-                }
-            )
-
-        payment_history = []
-        for abono, cobro, usuario in payment_rows:
-            usuario_nombre = (
-                usuario.nombre_completo
-                if usuario and usuario.nombre_completo
-                else (usuario.username if usuario else "N/A")
-            )
-            payment_history.append(
-                {
-                    "numero_cobro": cobro.numero_cobro,
-                    "nombre": cobro.nombre,
-                    "concepto": cobro.concepto,
-                    "monto": abono.monto or Decimal("0"),
-                    "fecha_label": (
-                        abono.fecha.strftime("%d/%m/%Y %I:%M %p") if abono.fecha else "-"
-                    ),
-                    "usuario": usuario_nombre,
-                    "comentario": (abono.comentario or "").strip(),
-                }
-            )
-
-        charges = []
-        for cobro, usuario in charge_rows:
-            responsable = (
-                usuario.nombre_completo
-                if usuario and usuario.nombre_completo
-                else (usuario.username if usuario else "General")
-            )
-            charges.append(
-                {
-                    "id": cobro.id,
-                    "numero_cobro": cobro.numero_cobro,
-                    "nombre": cobro.nombre,
-                    "concepto": cobro.concepto,
-                    "fecha": cobro.fecha,
-                    "fecha_label": cobro.fecha.strftime("%d/%m/%Y") if cobro.fecha else "-",
-                    "vencimiento_label": (
-                        cobro.fecha_vencimiento.strftime("%d/%m/%Y")
-                        if cobro.fecha_vencimiento else "-"
-                    ),
-                    "total": cobro.total or Decimal("0"),
-                    "saldo": cobro.saldo or Decimal("0"),
-                    "estado": (cobro.estado or "pendiente").upper(),
-                    "responsable": responsable or "General",
-                }
-            )
-
-        return {
-            "form_values": default_form_values,
-            "personal_charge_message": message,
-            "personal_charge_message_error": is_error,
-            "clientes": clientes,
-            "pending_charges": pending_charges,
-            "charges": charges,
-            "payment_history": payment_history,
-            "cobros_pendientes_count": cobros_pendientes_count,
-            "cobros_pagados_count": cobros_pagados_count,
-            "cobros_saldo_total": saldo_total,
-        }
-
-    def sales_cte_sql():
-        return """
-            WITH ventas AS (
-                SELECT f.cliente_id AS cliente_id, d.producto_id AS producto_id, d.cantidad AS cantidad, d.subtotal AS subtotal, f.fecha AS fecha
-                FROM `inva-facturas_contado` f
-                JOIN `inva-detalle_facturas_contado` d ON d.factura_id = f.id
-                UNION ALL
-                SELECT f.cliente_id, d.producto_id, d.cantidad, d.subtotal, f.fecha
-                FROM `inva-facturas_credito` f
-                JOIN `inva-detalle_facturas_credito` d ON d.factura_id = f.id
-                UNION ALL
-                SELECT p.cliente_id, d.producto_id, d.cantidad, d.subtotal, p.fecha
-                FROM `inva-pedidos` p
-                JOIN `inva-detalle_pedidos` d ON d.pedido_id = p.id
-            )
-        """
-
-    def parse_date(value):
-        if not value:
-            return None
-        if isinstance(value, datetime):
-            return value
-        for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
-            try:
-                return datetime.strptime(str(value), fmt)
-            except ValueError:
-                continue
-        return None
-
-    def ensure_date_range(start, end, max_days=730):
-        if not start or not end:
-            return False
-        if end < start:
-            return False
-        if (end - start).days > max_days:
-            return False
-        return True
-
-    def find_clientes_by_name(name):
-        if not name:
-            return []
-        return Cliente.query.filter(Cliente.nombre.ilike(f"%{name.strip()}%")).all()
-
-    def get_mysql_connection():
-        return pymysql.connect(
-            host=app.config.get("DB_HOST"),
-            port=int(app.config.get("DB_PORT", 3306)),
-            user=app.config.get("DB_USER"),
-            password=app.config.get("DB_PASS"),
-            database=app.config.get("DB_NAME"),
-            cursorclass=pymysql.cursors.DictCursor,
-            connect_timeout=5,
-            read_timeout=10,
-            write_timeout=10,
-            charset="utf8mb4",
-        )
-
-    def fetch_clients(limit=50, q=None):
-        limit = min(int(limit or 50), 50)
-        sql = (
-            "SELECT id, nombre, ruc_dni, telefono, email "
-            "FROM `inva-clientes` "
-        )
-        params = []
-        if q:
-            sql += "WHERE nombre LIKE %s OR ruc_dni LIKE %s OR id = %s "
-            like_q = f"%{q}%"
-            params.extend([like_q, like_q, q if str(q).isdigit() else -1])
-        sql += "ORDER BY nombre ASC LIMIT %s"
-        params.append(limit)
-        with get_mysql_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(sql, params)
-                return cur.fetchall()
-
-    def fetch_products(limit=50, q=None):
-        limit = min(int(limit or 50), 50)
-        sql = (
-            "SELECT id, codigo, nombre, categoria, precio, stock, activo "
-            "FROM `inva-productos` "
-        )
-        params = []
-        if q:
-            sql += "WHERE nombre LIKE %s OR codigo LIKE %s OR id = %s "
-            like_q = f"%{q}%"
-            params.extend([like_q, like_q, q if str(q).isdigit() else -1])
-        sql += "ORDER BY nombre ASC LIMIT %s"
-        params.append(limit)
-        with get_mysql_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(sql, params)
-                return cur.fetchall()
-
-    def fetch_invoices(limit=20, date_from=None, date_to=None):
-        limit = min(int(limit or 20), 20)
-        sql = (
-            "SELECT id, numero_factura, cliente_id, fecha, total, estado "
-            "FROM `inva-facturas` "
-        )
-        params = []
-        clauses = []
-        if date_from:
-            clauses.append("fecha >= %s")
-            params.append(date_from)
-        if date_to:
-            clauses.append("fecha <= %s")
-            params.append(date_to)
-        if clauses:
-            sql += "WHERE " + " AND ".join(clauses) + " "
-        sql += "ORDER BY fecha DESC LIMIT %s"
-        params.append(limit)
-        with get_mysql_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(sql, params)
-                return cur.fetchall()
-
-    def detect_intent(text):
-        normalized = normalize_text(text)
-        if any(word in normalized for word in ["cliente", "clientes", "lista de clientes", "top clientes"]):
-            return "clientes"
-        if any(word in normalized for word in ["producto", "productos", "inventario"]):
-            return "productos"
-        if any(word in normalized for word in ["factura", "facturas", "venta", "ventas"]):
-            return "facturas"
-        return None
-
-    def extract_query(text):
-        if not text:
-            return None
-        quoted = re.search(r"\"([^\"]+)\"|'([^']+)'", text)
-        if quoted:
-            return (quoted.group(1) or quoted.group(2)).strip()
-        normalized = normalize_text(text)
-        for keyword in ["clientes", "cliente", "productos", "producto", "facturas", "factura"]:
-            if keyword in normalized:
-                parts = normalized.split(keyword, 1)
-                if len(parts) > 1:
-                    candidate = parts[1].strip(" :,-")
-                    if candidate:
-                        return candidate
-        return None
-
-    def build_db_summary(intent, rows):
-        if not rows:
-            return "No se encontraron resultados."
-        lines = []
-        if intent == "clientes":
-            lines.append("Clientes:")
-            for row in rows:
-                lines.append(
-                    f"- {row.get('id')}: {row.get('nombre')} ({row.get('ruc_dni') or 'sin doc'})"
-                )
-        elif intent == "productos":
-            lines.append("Productos:")
-            for row in rows:
-                lines.append(
-                    f"- {row.get('id')}: {row.get('nombre')} ({row.get('codigo')}) L {row.get('precio')}"
-                )
-        elif intent == "facturas":
-            lines.append("Facturas:")
-            for row in rows:
-                fecha = row.get("fecha")
-                fecha_txt = fecha.strftime("%Y-%m-%d") if fecha else "sin fecha"
-                lines.append(
-                    f"- {row.get('numero_factura')} cliente {row.get('cliente_id')} {fecha_txt} L {row.get('total')} {row.get('estado')}"
-                )
-        return "\n".join(lines[:21])
-
-    TOOL_DEFS = [
-        {
-            "type": "function",
-            "name": "top_productos",
-            "description": "Top productos vendidos en un rango de fechas.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "fecha_inicio": {"type": "string", "description": "YYYY-MM-DD"},
-                    "fecha_fin": {"type": "string", "description": "YYYY-MM-DD"},
-                    "limite": {
-                        "type": ["integer", "null"],
-                        "description": "Max 50 (opcional)",
-                    },
-                },
-                "required": ["fecha_inicio", "fecha_fin", "limite"],
-                "additionalProperties": False,
-            },
-            "strict": True,
-        },
-        {
-            "type": "function",
-            "name": "clientes_inactivos",
-            "description": "Clientes sin compras en los ultimos N dias.",
-            "parameters": {
-                "type": "object",
-                "properties": {"dias": {"type": "integer", "description": "Cantidad de dias"}},
-                "required": ["dias"],
-                "additionalProperties": False,
-            },
-            "strict": True,
-        },
-        {
-            "type": "function",
-            "name": "compras_por_cliente",
-            "description": "Totales de compras de un cliente en un rango.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "cliente_id": {"type": "integer"},
-                    "fecha_inicio": {"type": "string", "description": "YYYY-MM-DD"},
-                    "fecha_fin": {"type": "string", "description": "YYYY-MM-DD"},
-                },
-                "required": ["cliente_id", "fecha_inicio", "fecha_fin"],
-                "additionalProperties": False,
-            },
-            "strict": True,
-        },
-        {
-            "type": "function",
-            "name": "productos_por_cliente",
-            "description": "Productos comprados por un cliente en un rango.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "cliente_id": {"type": "integer"},
-                    "fecha_inicio": {"type": "string", "description": "YYYY-MM-DD"},
-                    "fecha_fin": {"type": "string", "description": "YYYY-MM-DD"},
-                    "limite": {
-                        "type": ["integer", "null"],
-                        "description": "Max 50 (opcional)",
-                    },
-                },
-                "required": ["cliente_id", "fecha_inicio", "fecha_fin", "limite"],
-                "additionalProperties": False,
-            },
-            "strict": True,
-        },
-        {
-            "type": "function",
-            "name": "productos_disminuidos",
-            "description": "Productos con disminucion de compras comparando dos anos.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "cliente_id": {"type": "integer"},
-                    "year_actual": {"type": "integer"},
-                    "year_pasado": {"type": "integer"},
-                },
-                "required": ["cliente_id", "year_actual", "year_pasado"],
-                "additionalProperties": False,
-            },
-            "strict": True,
-        },
-    ]
-
-    def extract_response_text_and_calls(response_json):
-        output_items = response_json.get("output", [])
-        tool_calls = []
-        text_chunks = []
-        for item in output_items:
-            item_type = item.get("type")
-            if item_type == "function_call":
-                tool_calls.append(
-                    {
-                        "call_id": item.get("call_id"),
-                        "name": item.get("name"),
-                        "arguments": item.get("arguments"),
-                    }
-                )
-            elif item_type == "message":
-                content = item.get("content") or []
-                for part in content:
-                    if part.get("type") == "output_text":
-                        text_chunks.append(part.get("text", ""))
-        return {"text": "\n".join([t for t in text_chunks if t]), "tool_calls": tool_calls}
-
-    def to_responses_input(messages):
-        if not messages:
-            return []
-        if isinstance(messages[0], dict) and messages[0].get("type"):
-            return messages
-        converted = []
-        for msg in messages:
-            content = msg.get("content", "")
-            role = msg.get("role", "user")
-            content_type = "output_text" if role == "assistant" else "input_text"
-            converted.append(
-                {
-                    "role": role,
-                    "content": [{"type": content_type, "text": content}],
-                }
-            )
-        return converted
-
-    def validate_responses_input(input_payload):
-        issues = []
-        for idx, item in enumerate(input_payload):
-            role = item.get("role")
-            content = item.get("content") or []
-            if not content:
-                issues.append(f"input[{idx}] role={role} content vacio")
-                continue
-            ctype = content[0].get("type")
-            if role == "assistant" and ctype != "output_text":
-                issues.append(f"input[{idx}] role=assistant type={ctype}")
-            if role in {"user", "system"} and ctype != "input_text":
-                issues.append(f"input[{idx}] role={role} type={ctype}")
-        return issues
-
-    def validate_tools(tools):
-        issues = []
-        for idx, tool in enumerate(tools):
-            if not tool.get("name"):
-                issues.append(f"tools[{idx}] missing name")
-        return issues
-
-    def call_llm(messages, tools=None, tool_choice="auto", request_id=None):
-        api_key = app.config.get("CHAT_LLM_API_KEY")
-        model = app.config.get("CHAT_LLM_MODEL")
-        if not api_key:
-            app.logger.error("Missing CHAT_LLM_API_KEY")
-            return None, "Falta CHAT_LLM_API_KEY en el entorno."
-        if not model:
-            app.logger.error("Missing CHAT_LLM_MODEL")
-            return None, "Falta CHAT_LLM_MODEL en el entorno."
-        base_url = app.config.get("CHAT_LLM_BASE_URL") or "https://api.openai.com/v1"
-        base_url = base_url.rstrip("/")
-        if base_url.endswith("/v1"):
-            url = base_url + "/responses"
-        else:
-            url = base_url + "/v1/responses"
-        input_payload = to_responses_input(messages)
-        payload = {
-            "model": model,
-            "input": input_payload,
-        }
-        if tools:
-            tool_issues = validate_tools(tools)
-            if tool_issues:
-                app.logger.error("Tools invalid: %s", "; ".join(tool_issues))
-            else:
-                payload["tools"] = tools
-                payload["tool_choice"] = tool_choice
-        data = json.dumps(payload).encode("utf-8")
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}",
-        }
-        retryable = {500, 502, 503, 504}
-        delays = [0.5, 1.5]
-        for attempt in range(1, len(delays) + 2):
-            try:
-                start_time = time.time()
-                response = requests.post(
-                    url,
-                    headers=headers,
-                    data=data,
-                    timeout=20,
-                )
-                duration_ms = int((time.time() - start_time) * 1000)
-                if response.status_code >= 200 and response.status_code < 300:
-                    return response.json(), None
-                code = response.status_code
-                body = response.text or ""
-                if code == 400:
-                    issues = validate_responses_input(input_payload)
-                    if issues:
-                        app.logger.error(
-                            "OpenAI 400 input issues: %s", "; ".join(issues)
-                        )
-                    app.logger.error(
-                        "OpenAI 400 debug request_id=%s model=%s inputs=%s roles=%s types=%s",
-                        request_id,
-                        model,
-                        len(input_payload),
-                        [item.get("role") for item in input_payload],
-                        [
-                            (item.get("content") or [{}])[0].get("type")
-                            for item in input_payload
-                        ],
-                    )
-                app.logger.error(
-                    "OpenAI error request_id=%s status=%s duration_ms=%s attempt=%s",
-                    request_id,
-                    code,
-                    duration_ms,
-                    attempt,
-                )
-                if code == 429 and "insufficient_quota" in body:
-                    return None, "No hay saldo disponible en OpenAI."
-                if code in retryable and attempt <= len(delays):
-                    time.sleep(delays[attempt - 1])
-                    continue
-                return None, f"OpenAI {code}: {body}"
-            except Exception as exc:
-                app.logger.error(
-                    "OpenAI request failed request_id=%s attempt=%s error=%s",
-                    request_id,
-                    attempt,
-                    exc,
-                )
-                if attempt <= len(delays):
-                    time.sleep(delays[attempt - 1])
-                    continue
-                return None, str(exc)
-
-    def get_or_create_chat_session(username):
-        session_id = session.get("chat_session_id")
-        chat_session = None
-        if session_id:
-            chat_session = ChatSession.query.get(session_id)
-        if not chat_session:
-            session_id = str(uuid4())
-            chat_session = ChatSession(
-                id=session_id,
-                username=username,
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow(),
-            )
-            db.session.add(chat_session)
-            db.session.commit()
-            session["chat_session_id"] = session_id
-        else:
-            chat_session.updated_at = datetime.utcnow()
-            db.session.commit()
-        return chat_session
-
-    def store_chat_message(session_id, role, content):
-        message = ChatMessage(
-            session_id=session_id,
-            role=role,
-            content=content,
-            created_at=datetime.utcnow(),
-        )
-        db.session.add(message)
-        chat_session = ChatSession.query.get(session_id)
-        if chat_session:
-            chat_session.updated_at = datetime.utcnow()
-        db.session.commit()
-
-    def get_recent_messages(session_id, limit=8):
-        return (
-            ChatMessage.query.filter_by(session_id=session_id)
-            .order_by(ChatMessage.id.desc())
-            .limit(limit)
-            .all()[::-1]
-        )
-
-    def get_chat_summary(session_id):
-        return (
-            ChatSummary.query.filter_by(session_id=session_id)
-            .order_by(ChatSummary.updated_at.desc())
-            .first()
-        )
-
-    def summarize_messages(messages):
-        if not messages:
-            return ""
-        joined = "\n".join([f"{msg.role}: {msg.content}" for msg in messages])
-        system_prompt = (
-            "Resume en 3-5 puntos lo esencial de la conversacion, en espanol y "
-            "sin detalles numericos."
-        )
-        response, err = call_llm(
-            [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": joined},
-            ]
-        )
-        if err:
-            app.logger.error("Resumen LLM fallo: %s", err)
-            return ""
-        if response:
-            summary_text = extract_response_text_and_calls(response).get("text", "")
-            return summary_text.strip() or ""
-        return ""
-
-    def maybe_update_summary(session_id):
-        if not app.config.get("CHAT_SUMMARY_ENABLED"):
-            return
-        try:
-            total_messages = ChatMessage.query.filter_by(session_id=session_id).count()
-            if total_messages < 12 or total_messages % 6 != 0:
-                return
-            messages = (
-                ChatMessage.query.filter_by(session_id=session_id)
-                .order_by(ChatMessage.id.asc())
-                .all()
-            )
-            summary_text = summarize_messages(messages[:-8])
-            if not summary_text:
-                return
-            summary = get_chat_summary(session_id)
-            if summary:
-                summary.summary = summary_text
-                summary.updated_at = datetime.utcnow()
-            else:
-                summary = ChatSummary(
-                    session_id=session_id,
-                    summary=summary_text,
-                    updated_at=datetime.utcnow(),
-                )
-                db.session.add(summary)
-            db.session.commit()
-        except Exception as exc:
-            app.logger.error("Fallo resumen, continuando sin resumen: %s", exc)
-
-    def build_system_prompt():
-        today = datetime.now().strftime("%Y-%m-%d")
-        return (
-            "Eres un asistente analitico para ventas y clientes. Responde en espanol. "
-            "Si falta informacion (fechas, cliente, periodo), pide una aclaracion antes "
-            "de ejecutar herramientas. No intentes modificar datos. "
-            "Usa los datos proporcionados en el contexto; no digas que no tienes acceso "
-            "a la base de datos. Si no hay resultados, indica que no se encontraron. "
-            "Explica el criterio de analisis en 2-4 frases y luego da el resultado. "
-            f"Fecha actual: {today}."
-        )
-
-    def reject_if_mutation_request(text_value):
-        normalized = normalize_text(text_value)
-        blocked = [
-            "insert",
-            "update",
-            "delete",
-            "drop",
-            "alter",
-            "elimina",
-            "borra",
-            "borrar",
-            "modifica",
-            "modificar",
-            "actualiza",
-            "actualizar",
-            "agrega",
-            "agregar",
-        ]
-        return any(word in normalized for word in blocked)
-
-    def execute_tool(tool_name, params, user_message):
-        start_time = time.time()
-        result = {"rows": [], "meta": {}}
-        if tool_name == "top_productos":
-            fecha_inicio = parse_date(params.get("fecha_inicio"))
-            fecha_fin = parse_date(params.get("fecha_fin"))
-            limite = min(int(params.get("limite", 10) or 10), 50)
-            if not fecha_inicio or not fecha_fin:
-                return None, "Necesito fecha de inicio y fin."
-            fecha_fin_inclusive = fecha_fin + timedelta(days=1)
-            if not ensure_date_range(fecha_inicio, fecha_fin_inclusive):
-                return None, "Rango de fechas invalido o muy amplio."
-            sql = sales_cte_sql() + """
-                SELECT p.nombre AS producto,
-                       SUM(v.cantidad) AS qty_total,
-                       SUM(v.subtotal) AS total
-                FROM ventas v
-                JOIN `inva-productos` p ON p.id = v.producto_id
-                WHERE v.fecha >= :start_date AND v.fecha < :end_date
-                GROUP BY p.id, p.nombre
-                ORDER BY qty_total DESC, total DESC
-                LIMIT :limite
-            """
-            rows = run_chat_query(
-                sql, {"start_date": fecha_inicio, "end_date": fecha_fin_inclusive, "limite": limite}
-            )
-            result["rows"] = rows
-            result["meta"] = {
-                "fecha_inicio": fecha_inicio.strftime("%Y-%m-%d"),
-                "fecha_fin": fecha_fin.strftime("%Y-%m-%d"),
-                "limite": limite,
-            }
-        elif tool_name == "clientes_inactivos":
-            dias = int(params.get("dias", 0) or 0)
-            if dias <= 0 or dias > 730:
-                return None, "Indica un numero de dias entre 1 y 730."
-            cutoff = datetime.now() - timedelta(days=dias)
-            sql = sales_cte_sql() + """
-                , ultimas AS (
-                    SELECT cliente_id, MAX(fecha) AS ultima_compra
-                    FROM ventas
-                    WHERE cliente_id IS NOT NULL
-                    GROUP BY cliente_id
-                )
-                SELECT c.id AS cliente_id, c.nombre AS cliente, u.ultima_compra AS ultima_compra
-                FROM `inva-clientes` c
-                LEFT JOIN ultimas u ON u.cliente_id = c.id
-                WHERE u.ultima_compra IS NULL OR u.ultima_compra < :cutoff
-                ORDER BY u.ultima_compra ASC
-                LIMIT 50
-            """
-            rows = run_chat_query(sql, {"cutoff": cutoff})
-            result["rows"] = rows
-            result["meta"] = {"dias": dias}
-        elif tool_name in {"compras_por_cliente", "productos_por_cliente", "productos_disminuidos"}:
-            cliente_id = params.get("cliente_id")
-            if not cliente_id:
-                posibles = find_clientes_by_name(user_message)
-                if len(posibles) == 1:
-                    cliente_id = posibles[0].id
-                else:
-                    return None, "Necesito el cliente especifico (nombre o ID)."
-            try:
-                cliente_id = int(cliente_id)
-            except (TypeError, ValueError):
-                return None, "El cliente_id no es valido."
-
-            if tool_name == "compras_por_cliente":
-                fecha_inicio = parse_date(params.get("fecha_inicio"))
-                fecha_fin = parse_date(params.get("fecha_fin"))
-                if not fecha_inicio or not fecha_fin:
-                    return None, "Necesito fecha de inicio y fin."
-                fecha_fin_inclusive = fecha_fin + timedelta(days=1)
-                if not ensure_date_range(fecha_inicio, fecha_fin_inclusive):
-                    return None, "Rango de fechas invalido o muy amplio."
-                sql = sales_cte_sql() + """
-                    SELECT COUNT(*) AS lineas,
-                           SUM(v.cantidad) AS qty_total,
-                           SUM(v.subtotal) AS total,
-                           MAX(v.fecha) AS ultima_compra
-                    FROM ventas v
-                    WHERE v.cliente_id = :cliente_id
-                      AND v.fecha >= :start_date AND v.fecha < :end_date
-                """
-                rows = run_chat_query(
-                    sql,
-                    {"cliente_id": cliente_id, "start_date": fecha_inicio, "end_date": fecha_fin_inclusive},
-                )
-                result["rows"] = rows
-                result["meta"] = {
-                    "cliente_id": cliente_id,
-                    "fecha_inicio": fecha_inicio.strftime("%Y-%m-%d"),
-                    "fecha_fin": fecha_fin.strftime("%Y-%m-%d"),
-                }
-            elif tool_name == "productos_por_cliente":
-                fecha_inicio = parse_date(params.get("fecha_inicio"))
-                fecha_fin = parse_date(params.get("fecha_fin"))
-                limite = min(int(params.get("limite", 30) or 30), 50)
-                if not fecha_inicio or not fecha_fin:
-                    return None, "Necesito fecha de inicio y fin."
-                fecha_fin_inclusive = fecha_fin + timedelta(days=1)
-                if not ensure_date_range(fecha_inicio, fecha_fin_inclusive):
-                    return None, "Rango de fechas invalido o muy amplio."
-                sql = sales_cte_sql() + """
-                    SELECT p.nombre AS producto,
-                           SUM(v.cantidad) AS qty_total,
-                           SUM(v.subtotal) AS total
-                    FROM ventas v
-                    JOIN `inva-productos` p ON p.id = v.producto_id
-                    WHERE v.cliente_id = :cliente_id
-                      AND v.fecha >= :start_date AND v.fecha < :end_date
-                    GROUP BY p.id, p.nombre
-                    ORDER BY qty_total DESC, total DESC
-                    LIMIT :limite
-                """
-                rows = run_chat_query(
-                    sql,
-                    {
-                        "cliente_id": cliente_id,
-                        "start_date": fecha_inicio,
-                        "end_date": fecha_fin_inclusive,
-                        "limite": limite,
-                    },
-                )
-                result["rows"] = rows
-                result["meta"] = {
-                    "cliente_id": cliente_id,
-                    "fecha_inicio": fecha_inicio.strftime("%Y-%m-%d"),
-                    "fecha_fin": fecha_fin.strftime("%Y-%m-%d"),
-                    "limite": limite,
-                }
-            else:
-                year_actual = int(params.get("year_actual", 0) or 0)
-                year_pasado = int(params.get("year_pasado", 0) or 0)
-                if year_actual <= 0 or year_pasado <= 0:
-                    return None, "Necesito year_actual y year_pasado."
-                sql = sales_cte_sql() + """
-                    SELECT p.nombre AS producto,
-                           SUM(CASE WHEN YEAR(v.fecha) = :year_actual THEN v.cantidad ELSE 0 END) AS qty_actual,
-                           SUM(CASE WHEN YEAR(v.fecha) = :year_pasado THEN v.cantidad ELSE 0 END) AS qty_pasado,
-                           SUM(CASE WHEN YEAR(v.fecha) = :year_actual THEN v.subtotal ELSE 0 END) AS total_actual,
-                           SUM(CASE WHEN YEAR(v.fecha) = :year_pasado THEN v.subtotal ELSE 0 END) AS total_pasado
-                    FROM ventas v
-                    JOIN `inva-productos` p ON p.id = v.producto_id
-                    WHERE v.cliente_id = :cliente_id
-                    GROUP BY p.id, p.nombre
-                    HAVING (SUM(CASE WHEN YEAR(v.fecha) = :year_actual THEN v.cantidad ELSE 0 END)
-                            < SUM(CASE WHEN YEAR(v.fecha) = :year_pasado THEN v.cantidad ELSE 0 END))
-                        OR (SUM(CASE WHEN YEAR(v.fecha) = :year_actual THEN v.subtotal ELSE 0 END)
-                            < SUM(CASE WHEN YEAR(v.fecha) = :year_pasado THEN v.subtotal ELSE 0 END))
-                    ORDER BY (SUM(CASE WHEN YEAR(v.fecha) = :year_pasado THEN v.cantidad ELSE 0 END)
-                              - SUM(CASE WHEN YEAR(v.fecha) = :year_actual THEN v.cantidad ELSE 0 END)) DESC
-                    LIMIT 50
-                """
-                rows = run_chat_query(
-                    sql,
-                    {
-                        "cliente_id": cliente_id,
-                        "year_actual": year_actual,
-                        "year_pasado": year_pasado,
-                    },
-                )
-                result["rows"] = rows
-                result["meta"] = {
-                    "cliente_id": cliente_id,
-                    "year_actual": year_actual,
-                    "year_pasado": year_pasado,
-                }
-        else:
-            return None, "Tool no permitida."
-
-        elapsed_ms = int((time.time() - start_time) * 1000)
-        audit = ChatAudit(
-            session_id=session.get("chat_session_id"),
-            username=session.get("user"),
-            question=user_message,
-            tool_name=tool_name,
-            params_json=json.dumps(params, ensure_ascii=False),
-            elapsed_ms=elapsed_ms,
-            rows_returned=len(result["rows"]),
-            created_at=datetime.utcnow(),
-        )
-        db.session.add(audit)
-        db.session.commit()
-        return result, None
-
-    def pick_tool_fallback(message):
-        normalized = normalize_text(message)
-        if "disminuido" in normalized and "compra" in normalized:
-            return "productos_disminuidos"
-        if "producto mas vendido" in normalized or "top productos" in normalized:
-            return "top_productos"
-        if "productos" in normalized and "compra" in normalized:
-            return "productos_por_cliente"
-        if "clientes" in normalized and "inact" in normalized:
-            return "clientes_inactivos"
-        if "compras" in normalized and "cliente" in normalized:
-            return "compras_por_cliente"
-        return None
-
-    def build_llm_messages(session_id, user_message):
-        summary = get_chat_summary(session_id)
-        recent = get_recent_messages(session_id, limit=4)
-        messages = [{"role": "system", "content": build_system_prompt()}]
-        if summary and summary.summary:
-            messages.append({"role": "system", "content": f"Resumen: {summary.summary}"})
-        for msg in recent:
-            messages.append({"role": msg.role, "content": msg.content})
-        messages.append({"role": "user", "content": user_message})
-        return messages
-
-    def format_tool_result_for_user(tool_name, result):
-        rows = result.get("rows", [])
-        meta = result.get("meta", {})
-        if tool_name == "top_productos":
-            if not rows:
-                return "No encontre ventas en ese rango."
-            lines = [
-                f"Analice ventas del {meta.get('fecha_inicio')} al {meta.get('fecha_fin')} y ordene por cantidad."
-            ]
-            for row in rows:
-                lines.append(
-                    f"- {row['producto']}: {format_int(row['qty_total'])} unidades | L {format_money(row['total'])}"
-                )
-            return "\n".join(lines)
-        if tool_name == "clientes_inactivos":
-            if not rows:
-                return "No hay clientes inactivos en ese periodo."
-            lines = [
-                f"Busque clientes sin compras en los ultimos {meta.get('dias')} dias."
-            ]
-            for row in rows:
-                fecha = row.get("ultima_compra")
-                fecha_txt = fecha.strftime("%Y-%m-%d") if fecha else "sin compras"
-                lines.append(f"- {row['cliente']}: {fecha_txt}")
-            return "\n".join(lines)
-        if tool_name == "compras_por_cliente":
-            if not rows:
-                return "No hay compras en ese periodo."
-            row = rows[0]
-            fecha = row.get("ultima_compra")
-            fecha_txt = fecha.strftime("%Y-%m-%d") if fecha else "sin compras"
-            return (
-                "Resumi las compras del cliente en el periodo solicitado.\n"
-                f"Total lineas: {format_int(row.get('lineas'))}, unidades: {format_int(row.get('qty_total'))}, "
-                f"monto: L {format_money(row.get('total'))}, ultima compra: {fecha_txt}."
-            )
-        if tool_name == "productos_por_cliente":
-            if not rows:
-                return "No hay productos comprados en ese periodo."
-            lines = [
-                "Liste productos por cantidad y monto dentro del periodo solicitado."
-            ]
-            for row in rows:
-                lines.append(
-                    f"- {row['producto']}: {format_int(row['qty_total'])} unidades | L {format_money(row['total'])}"
-                )
-            return "\n".join(lines)
-        if tool_name == "productos_disminuidos":
-            if not rows:
-                return "No hay productos con disminucion en los anos indicados."
-            lines = [
-                f"Compare {meta.get('year_pasado')} vs {meta.get('year_actual')} para el cliente."
-            ]
-            for row in rows:
-                lines.append(
-                    f"- {row['producto']}: {format_int(row['qty_pasado'])} -> {format_int(row['qty_actual'])} unidades | "
-                    f"L {format_money(row['total_pasado'])} -> L {format_money(row['total_actual'])}"
-                )
-            return "\n".join(lines)
-        return "Listo."
-    def normalize_text(text_value):
-        if not text_value:
-            return ""
-        normalized = unicodedata.normalize("NFKD", text_value)
-        normalized = "".join(ch for ch in normalized if not unicodedata.combining(ch))
-        normalized = re.sub(r"\s+", " ", normalized)
-        return normalized.strip().lower()
-
-    def find_clientes_by_name(name):
-        if not name:
-            return []
-        return Cliente.query.filter(Cliente.nombre.ilike(f"%{name.strip()}%")).all()
-
-    def run_chat_query(sql, params):
-        statement = text(sql)
-        if "cliente_ids" in params:
-            statement = statement.bindparams(bindparam("cliente_ids", expanding=True))
-        return db.session.execute(statement, params).mappings().all()
-
-    def format_money(value):
-        if value is None:
-            return "0.00"
-        return f"{float(value):,.2f}"
-
-    def format_int(value):
-        if value is None:
-            return "0"
-        return f"{int(value):,}"
-
-    def sales_cte_sql():
-        return """
-            WITH ventas AS (
-                SELECT f.cliente_id AS cliente_id, d.producto_id AS producto_id, d.cantidad AS cantidad, d.subtotal AS subtotal, f.fecha AS fecha
-                FROM `inva-facturas_contado` f
-                JOIN `inva-detalle_facturas_contado` d ON d.factura_id = f.id
-                UNION ALL
-                SELECT f.cliente_id, d.producto_id, d.cantidad, d.subtotal, f.fecha
-                FROM `inva-facturas_credito` f
-                JOIN `inva-detalle_facturas_credito` d ON d.factura_id = f.id
-                UNION ALL
-                SELECT p.cliente_id, d.producto_id, d.cantidad, d.subtotal, p.fecha
-                FROM `inva-pedidos` p
-                JOIN `inva-detalle_pedidos` d ON d.pedido_id = p.id
-            )
-        """
-
     def cleanup_old_pdfs(folder_path, max_age_seconds=86400, prefix=None):
         cutoff = time.time() - max_age_seconds
         try:
@@ -1543,8 +378,21 @@ def create_app():
         valid_ids = {int(user_id) for user_id in (user_ids or []) if user_id}
         if not valid_ids:
             return {}
-        users = User.query.filter(User.id.in_(valid_ids)).all()
-        return {user.id: get_user_display_name(user) for user in users}
+        directory = get_user_directory()
+        return {
+            user_id: directory[user_id].display_name or "General"
+            for user_id in valid_ids
+            if user_id in directory
+        }
+
+    def build_client_name_map(cliente_ids):
+        """{id: nombre} solo de los clientes pedidos (no de toda la tabla)."""
+        valid_ids = {int(cliente_id) for cliente_id in (cliente_ids or []) if cliente_id}
+        if not valid_ids:
+            return {}
+        return dict(
+            db.session.query(Cliente.id, Cliente.nombre).filter(Cliente.id.in_(valid_ids)).all()
+        )
 
     def get_active_vendedores():
         return (
@@ -1553,696 +401,45 @@ def create_app():
             .all()
         )
 
-    def create_invoice_pdf(
-        file_path,
-        settings,
-        invoice,
-        detalles,
-        tipo,
-        cliente,
-        cajero_usuario,
-        vendedor_usuario=None,
-    ):
-        styles = getSampleStyleSheet()
-        doc = SimpleDocTemplate(
-            file_path,
-            pagesize=letter,
-            leftMargin=22,
-            rightMargin=22,
-            topMargin=22,
-            bottomMargin=22,
-        )
-        story = []
-        usable_height = doc.height
-        logo_path = os.path.join(app.static_folder, "assets", "logo.jpg")
-        logo_image = None
-        if os.path.exists(logo_path):
-            logo_image = Image(logo_path, width=60, height=60)
-
-        header_center = (
-            f"<b>{settings.nombre}</b><br/>"
-            f"{settings.direccion or ''}<br/>"
-            f"RTN: {settings.rtn or '-'} &nbsp;&nbsp; TEL: {settings.telefono or '-'}<br/>"
-            f"{settings.email or ''}"
-        )
-        header_right = (
-            f"<b>FACTURA</b><br/>{invoice.numero_factura}<br/>"
-            f"FECHA: {invoice.fecha.strftime('%d/%m/%Y %I:%M %p')}"
-        )
-        header_table = Table(
-            [[logo_image or "", Paragraph(header_center, styles["Normal"]), Paragraph(header_right, styles["Normal"])]],
-            colWidths=[90, 300, 130],
-        )
-        header_table.setStyle(
-            TableStyle(
-                [
-                    ("VALIGN", (0, 0), (-1, -1), "TOP"),
-                    ("ALIGN", (2, 0), (2, 0), "RIGHT"),
-                    ("LINEBELOW", (0, 0), (-1, 0), 0.75, colors.black),
-                ]
-            )
-        )
-        story.append(header_table)
-        story.append(Spacer(1, 6))
-
-        cliente_nombre = cliente.nombre if cliente else "N/A"
-        cliente_telefono = cliente.telefono if cliente else "-"
-        cliente_line = (
-            f"<b>CLIENTE:</b> {cliente_nombre} &nbsp;&nbsp; "
-            f"<b>RTN:</b> {invoice.rtn or '-'} &nbsp;&nbsp; "
-            f"<b>TEL:</b> {cliente_telefono}"
-        )
-        cliente_paragraph = Paragraph(cliente_line, styles["Normal"])
-        story.append(cliente_paragraph)
-        story.append(Spacer(1, 4))
-
-        tipo_texto = "CONTADO" if tipo == "contado" else "CREDITO"
-        cajero = get_user_display_name(cajero_usuario)
-        vendedor = get_user_display_name(vendedor_usuario)
-        estado = invoice.estado.upper() if invoice.estado else "-"
-        meta_line = (
-            f"<b>CAJERO:</b> {cajero} &nbsp;&nbsp; "
-            f"<b>VENDEDOR:</b> {vendedor} &nbsp;&nbsp; "
-            f"<b>TERMINOS:</b> {tipo_texto} &nbsp;&nbsp; "
-            f"<b>ESTADO:</b> {estado}"
-        )
-        meta_paragraph = Paragraph(meta_line, styles["Normal"])
-        story.append(meta_paragraph)
-        story.append(Spacer(1, 6))
-
-        data = [
-            [
-                "CODIGO",
-                "DESCRIPCION",
-                "UNIDAD",
-                "CANTIDAD",
-                "PRECIO UNIT.",
-                "DESCTO",
-                "ISV %",
-                "TOTAL",
-            ]
-        ]
-        exento_total = Decimal("0")
-        gravado_total = Decimal("0")
-        for detalle in detalles:
-            producto = detalle["producto"]
-            isv_text = "15%" if detalle["isv_aplica"] else "0%"
-            if detalle["isv_aplica"]:
-                gravado_total += Decimal(str(detalle["subtotal"]))
-            else:
-                exento_total += Decimal(str(detalle["subtotal"]))
-            descuento_linea = Decimal(str(detalle.get("descuento", 0) or 0))
-            data.append(
-                [
-                    producto.codigo,
-                    producto.nombre,
-                    "UNIDAD",
-                    str(detalle["cantidad"]),
-                    f"L {detalle['precio']:.2f}",
-                    f"L {descuento_linea:.2f}",
-                    isv_text,
-                    f"L {detalle['subtotal']:.2f}",
-                ]
-            )
-        def build_product_table(rows, header_font_size, body_font_size):
-            table_instance = Table(rows, colWidths=[50, 195, 50, 50, 68, 45, 35, 45])
-            table_instance.setStyle(
-                TableStyle(
-                    [
-                        ("BOX", (0, 0), (-1, -1), 0.75, colors.black),
-                        ("LINEBELOW", (0, 0), (-1, 0), 0.6, colors.black),
-                        ("VALIGN", (0, 0), (-1, -1), "TOP"),
-                        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                        ("FONTSIZE", (0, 0), (-1, 0), header_font_size),
-                        ("FONTSIZE", (0, 1), (-1, -1), body_font_size),
-                        ("ALIGN", (2, 1), (-1, -1), "RIGHT"),
-                        ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
-                        ("LEFTPADDING", (0, 0), (-1, -1), 3),
-                        ("RIGHTPADDING", (0, 0), (-1, -1), 3),
-                        ("TOPPADDING", (0, 0), (-1, -1), 2),
-                        ("BOTTOMPADDING", (0, 0), (-1, -1), 2),
-                    ]
-                )
-            )
-            return table_instance
-
-        isv_total = gravado_total * Decimal("0.15")
-        total_final = Decimal(str(invoice.total or 0))
-        total_en_letras = amount_to_words(total_final).upper()
-        descuento_valor = Decimal(str(getattr(invoice, "descuento", 0) or 0))
-        totals_data = [
-            ["DESCUENTOS Y REBAJAS", f"L {descuento_valor:.2f}"],
-            ["SUBTOTAL", f"L {invoice.subtotal:.2f}"],
-            ["IMPORTE EXENTO", f"L {exento_total:.2f}"],
-            ["IMPORTE EXONERADO", "L 0.00"],
-            ["IMPORTE GRAVADO 15%", f"L {gravado_total:.2f}"],
-            ["ISV 15.00%", f"L {isv_total:.2f}"],
-            ["TOTAL A PAGAR", f"L {total_final:.2f}"],
-        ]
-        totals_table = Table(totals_data, colWidths=[130, 85], hAlign="RIGHT")
-        totals_table.setStyle(
-            TableStyle(
-                [
-                    ("BOX", (0, 0), (-1, -1), 0.75, colors.black),
-                    ("FONTNAME", (0, -1), (-1, -1), "Helvetica-Bold"),
-                    ("ALIGN", (1, 0), (1, -1), "RIGHT"),
-                    ("BACKGROUND", (0, -1), (-1, -1), colors.whitesmoke),
-                    ("LEFTPADDING", (0, 0), (-1, -1), 3),
-                    ("RIGHTPADDING", (0, 0), (-1, -1), 3),
-                    ("TOPPADDING", (0, 0), (-1, -1), 2),
-                    ("BOTTOMPADDING", (0, 0), (-1, -1), 2),
-                ]
-            )
-        )
+    # Facturacion, cobros, reportes, aves y chat viven en routes/; solo
+    # se importan y construyen los habilitados en ENABLED_MODULES.
+    register_blueprints(
+        app,
+        SimpleNamespace(
+            amount_to_words=amount_to_words,
+            build_invoice_pdf_filename=build_invoice_pdf_filename,
+            build_receipt_pdf_filename=build_receipt_pdf_filename,
+            build_client_name_map=build_client_name_map,
+            build_user_name_map=build_user_name_map,
+            clean_conflict_artifacts=clean_conflict_artifacts,
+            cleanup_old_pdfs=cleanup_old_pdfs,
+            get_active_vendedores=get_active_vendedores,
+            get_business_settings=get_business_settings,
+            get_user_display_name=get_user_display_name,
+        ),
+    )
 
-        notes_text = (
-            "<b>DATOS DEL ADQUIRENTE EXONERADO</b><br/>"
-            "N° ORDEN DE COMPRA EXENTA:<br/>"
-            "N° CONST. REGISTRO EXONERADO:<br/>"
-            f"N° REGISTRO SAG:<br/>TOTAL EN LETRAS: {total_en_letras}"
-        )
-        notes_paragraph = Paragraph(notes_text, styles["Normal"])
-        bottom_block = Table(
-            [[notes_paragraph, totals_table]],
-            colWidths=[doc.width - 215, 215],
-        )
-        bottom_block.setStyle(
-            TableStyle(
-                [
-                    ("VALIGN", (0, 0), (-1, -1), "TOP"),
-                    ("ALIGN", (1, 0), (1, 0), "RIGHT"),
-                ]
-            )
+    if not app.debug and not app.testing:
+        logging.basicConfig(
+            level=logging.INFO,
+            format="%(asctime)s %(levelname)s %(name)s %(message)s",
         )
 
-        # Calculate heights to stretch the product table and pin footer to the page bottom.
-        header_height = header_table.wrap(doc.width, usable_height)[1]
-        cliente_height = cliente_paragraph.wrap(doc.width, usable_height)[1]
-        meta_height = meta_paragraph.wrap(doc.width, usable_height)[1]
-        bottom_height = bottom_block.wrap(doc.width, usable_height)[1]
-
-        item_count = max(0, len(data) - 1)
-        if item_count > 18:
-            header_font_size = 7
-            body_font_size = 8
-        elif item_count > 12:
-            header_font_size = 8
-            body_font_size = 9
-        else:
-            header_font_size = 8
-            body_font_size = 9
-
-        product_table = build_product_table(data, header_font_size, body_font_size)
-        product_table.wrap(doc.width, usable_height)
-        base_table_height = product_table._height
-        row_height = product_table._rowHeights[1] if len(product_table._rowHeights) > 1 else 18
-        reserved_spacing = 6 + 4 + 6  # spacers after header, cliente y meta
-        extra_bottom_space = 142  # ~5 cm to leave room for legal/footer lines
-        target_table_height = max(
-            0,
-            usable_height
-            - (header_height + cliente_height + meta_height + bottom_height + reserved_spacing)
-            - extra_bottom_space,
-        )
-        if base_table_height < target_table_height and row_height:
-            extra_rows = int((target_table_height - base_table_height) / row_height)
-            if extra_rows > 0:
-                data.extend([["", "", "", "", "", "", "", ""]] * extra_rows)
-                product_table = build_product_table(data, header_font_size, body_font_size)
-
-        story.append(product_table)
-        story.append(Spacer(1, 4))
-        story.append(KeepTogether([bottom_block]))
-        story.append(Spacer(1, 4))
-
-        footer_blocks = []
-        if settings.mensaje:
-            footer_blocks.append(Paragraph(settings.mensaje, styles["Normal"]))
-        rango_texto = ""
-        if settings.rango_autorizado_inicio or settings.rango_autorizado_fin:
-            inicio = settings.rango_autorizado_inicio or "-"
-            fin = settings.rango_autorizado_fin or "-"
-            rango_texto = f"{inicio} - {fin}"
-        elif settings.rango_autorizado:
-            rango_texto = settings.rango_autorizado
-        if settings.cai or rango_texto or settings.fecha_limite_emision:
-            footer_text = (
-                f"CAI: {settings.cai or '-'}<br/>"
-                f"RANGO AUTORIZADO: {rango_texto or '-'}<br/>"
-                f"FECHA LIMITE DE EMISION: {settings.fecha_limite_emision or '-'}"
-            )
-            footer_blocks.append(Paragraph(footer_text, styles["Normal"]))
-        if footer_blocks:
-            story.append(KeepTogether(footer_blocks))
-        doc.build(story)
-
-    def create_personal_charge_order_pdf(file_path, settings, cobro, usuario, details=None):
-        parent_dir = os.path.dirname(file_path)
-        if parent_dir and not os.path.isdir(parent_dir):
-            os.makedirs(parent_dir, exist_ok=True)
-        styles = getSampleStyleSheet()
-        doc = SimpleDocTemplate(
-            file_path,
-            pagesize=letter,
-            leftMargin=28,
-            rightMargin=28,
-            topMargin=26,
-            bottomMargin=26,
-        )
-        story = []
-        logo_path = os.path.join(app.static_folder, "assets", "logo.jpg")
-        logo_image = None
-        if os.path.exists(logo_path):
-            logo_image = Image(logo_path, width=62, height=62)
-
-        fecha_emision = cobro.fecha.strftime("%d/%m/%Y %I:%M %p") if cobro.fecha else "-"
-        header_center = (
-            f"<b>{settings.nombre}</b><br/>"
-            f"{settings.direccion or ''}<br/>"
-            f"TEL: {settings.telefono or '-'} &nbsp;&nbsp; EMAIL: {settings.email or '-'}"
-        )
-        header_right = (
-            "<b>ORDEN DE ENTREGA</b><br/>"
-            f"FECHA: {fecha_emision}"
-        )
-        header_table = Table(
-            [[logo_image or "", Paragraph(header_center, styles["Normal"]), Paragraph(header_right, styles["Normal"])]],
-            colWidths=[82, 310, 120],
-        )
-        header_table.setStyle(
-            TableStyle(
-                [
-                    ("VALIGN", (0, 0), (-1, -1), "TOP"),
-                    ("ALIGN", (2, 0), (2, 0), "RIGHT"),
-                    ("LINEBELOW", (0, 0), (-1, 0), 0.75, colors.black),
-                    ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
-                ]
-            )
-        )
-        story.append(header_table)
-        story.append(Spacer(1, 12))
-
-        receptor_data = [
-            ["Entregado a", cobro.nombre or "-"],
-            ["Telefono", cobro.telefono or "-"],
-            [
-                "Vencimiento",
-                cobro.fecha_vencimiento.strftime("%d/%m/%Y")
-                if cobro.fecha_vencimiento
-                else "-",
-            ],
-            [
-                "Preparado por",
-                usuario.nombre_completo if usuario and usuario.nombre_completo else (usuario.username if usuario else "-"),
-            ],
-        ]
-        receptor_table = Table(receptor_data, colWidths=[120, 392])
-        receptor_table.setStyle(
-            TableStyle(
-                [
-                    ("BACKGROUND", (0, 0), (0, -1), colors.HexColor("#f3f4f6")),
-                    ("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold"),
-                    ("BOX", (0, 0), (-1, -1), 0.6, colors.HexColor("#d1d5db")),
-                    ("GRID", (0, 0), (-1, -1), 0.5, colors.HexColor("#e5e7eb")),
-                    ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-                    ("LEFTPADDING", (0, 0), (-1, -1), 8),
-                    ("RIGHTPADDING", (0, 0), (-1, -1), 8),
-                    ("TOPPADDING", (0, 0), (-1, -1), 7),
-                    ("BOTTOMPADDING", (0, 0), (-1, -1), 7),
-                ]
-            )
-        )
-        story.append(receptor_table)
-        story.append(Spacer(1, 14))
-
-        detail_rows = details or []
-        detalle_data = [["Descripcion", "Cantidad", "Precio unit.", "Subtotal"]]
-        if detail_rows:
-            for detail in detail_rows:
-                detalle_data.append(
-                    [
-                        detail.descripcion,
-                        f"{float(detail.cantidad or 0):,.2f}",
-                        f"L {float(detail.precio_unitario or 0):,.2f}",
-                        f"L {float(detail.subtotal or 0):,.2f}",
-                    ]
-                )
-        else:
-            detalle_data.append(
-                [
-                    cobro.concepto or "-",
-                    "1.00",
-                    f"L {float(cobro.total or 0):,.2f}",
-                    f"L {float(cobro.total or 0):,.2f}",
-                ]
-            )
-
-        detalle_table = Table(detalle_data, colWidths=[270, 72, 85, 85])
-        detalle_table.setStyle(
-            TableStyle(
-                [
-                    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#f3f4f6")),
-                    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                    ("BOX", (0, 0), (-1, -1), 0.75, colors.black),
-                    ("LINEBELOW", (0, 0), (-1, 0), 0.6, colors.black),
-                    ("ALIGN", (1, 1), (-1, -1), "RIGHT"),
-                    ("LEFTPADDING", (0, 0), (-1, -1), 8),
-                    ("RIGHTPADDING", (0, 0), (-1, -1), 8),
-                    ("TOPPADDING", (0, 0), (-1, -1), 8),
-                    ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
-                ]
-            )
-        )
-        story.append(detalle_table)
-        story.append(Spacer(1, 12))
-
-        total_en_letras = amount_to_words(cobro.total or 0).upper()
-        story.append(Paragraph(f"<b>Total:</b> L {float(cobro.total or 0):,.2f}", styles["Normal"]))
-        story.append(Spacer(1, 6))
-        story.append(Paragraph(f"<b>Total en letras:</b> {total_en_letras}", styles["Normal"]))
-        story.append(Spacer(1, 10))
-
-        if cobro.observaciones:
-            story.append(Paragraph("<b>Observaciones:</b>", styles["Normal"]))
-            story.append(Spacer(1, 4))
-            story.append(Paragraph(cobro.observaciones, styles["Normal"]))
-            story.append(Spacer(1, 16))
-
-        story.append(Paragraph("Documento interno de entrega. No sustituye una factura fiscal.", styles["Normal"]))
-        story.append(Spacer(1, 34))
-
-        firmas = Table(
-            [["______________________________", "______________________________"], ["Entrega Invagro", "Recibe conforme"]],
-            colWidths=[256, 256],
-        )
-        firmas.setStyle(
-            TableStyle(
-                [
-                    ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-                    ("TOPPADDING", (0, 0), (-1, -1), 10),
-                ]
-            )
-        )
-        story.append(firmas)
-
-        doc.build(story)
-
-    def create_receipt_pdf(file_path, settings, factura, cliente, usuario, monto, saldo):
-        parent_dir = os.path.dirname(file_path)
-        if parent_dir and not os.path.isdir(parent_dir):
-            os.makedirs(parent_dir, exist_ok=True)
-        styles = getSampleStyleSheet()
-        doc = SimpleDocTemplate(
-            file_path,
-            pagesize=letter,
-            leftMargin=22,
-            rightMargin=22,
-            topMargin=22,
-            bottomMargin=22,
-        )
-        story = []
-
-        header_title = Paragraph("<b>RECIBO DE COBRO</b>", styles["Title"])
-        story.append(header_title)
-        story.append(Spacer(1, 6))
-
-        negocio = settings.nombre if settings and settings.nombre else "Negocio"
-        story.append(Paragraph(f"{negocio}", styles["Normal"]))
-        if settings:
-            if settings.rtn:
-                story.append(Paragraph(f"RTN: {settings.rtn}", styles["Normal"]))
-            if settings.telefono:
-                story.append(Paragraph(f"Telefono: {settings.telefono}", styles["Normal"]))
-            if settings.email:
-                story.append(Paragraph(f"Email: {settings.email}", styles["Normal"]))
-        story.append(Spacer(1, 8))
-
-        cliente_nombre = cliente.nombre if cliente else "N/A"
-        story.append(Paragraph(f"Cliente: {cliente_nombre}", styles["Normal"]))
-        if cliente and cliente.ruc_dni:
-            story.append(Paragraph(f"Documento: {cliente.ruc_dni}", styles["Normal"]))
-        fecha_factura = factura.fecha.strftime("%d/%m/%Y") if factura.fecha else "-"
-        story.append(Paragraph(f"Factura: {factura.numero_factura}", styles["Normal"]))
-        story.append(Paragraph(f"Fecha factura: {fecha_factura}", styles["Normal"]))
-        story.append(Paragraph(f"Fecha pago: {datetime.utcnow().strftime('%d/%m/%Y %H:%M')}", styles["Normal"]))
-        if usuario:
-            nombre_usuario = usuario.nombre_completo or usuario.username
-            story.append(Paragraph(f"Cobrador: {nombre_usuario}", styles["Normal"]))
-
-        story.append(Spacer(1, 10))
-        data = [
-            ["Total factura", f"L {float(factura.total or 0):,.2f}"],
-            ["Monto pagado", f"L {float(monto):,.2f}"],
-            ["Saldo restante", f"L {float(saldo):,.2f}"],
-        ]
-        table = Table(data, colWidths=[180, 130])
-        table.setStyle(
-            TableStyle(
-                [
-                    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#f3f4f6")),
-                    ("TEXTCOLOR", (0, 0), (-1, 0), colors.HexColor("#111827")),
-                    ("GRID", (0, 0), (-1, -1), 0.5, colors.HexColor("#d1d5db")),
-                    ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
-                    ("ALIGN", (1, 0), (-1, -1), "RIGHT"),
-                ]
-            )
-        )
-        story.append(table)
-        story.append(Spacer(1, 12))
-        story.append(Paragraph("Gracias por su pago.", styles["Normal"]))
-
-        doc.build(story)
-
-    if not app.debug and not app.testing:
-        logging.basicConfig(
-            level=logging.INFO,
-            format="%(asctime)s %(levelname)s %(name)s %(message)s",
-        )
-
-    @app.get("/")
-    def landing():
-        return render_template("landing.html")
-
-    @app.get("/aves")
-    def aves_landing():
-        return redirect(url_for("login", portal="aves"))
+    @app.get("/")
+    def landing():
+        return render_template("landing.html")
 
     def normalize_portal_target(raw_value):
+        if "aves" not in app.config["ENABLED_MODULES"]:
+            return "interno"
         return "aves" if (raw_value or "").strip().lower() == "aves" else "interno"
 
-    def normalize_aves_plan_type(raw_value):
-        value = (raw_value or "").strip().lower()
-        allowed = {"vacunacion", "despique", "desparasitacion"}
-        return value if value in allowed else None
-
-    def aves_plan_type_label(plan_type):
-        labels = {
-            "vacunacion": "Vacunacion",
-            "despique": "Despique",
-            "desparasitacion": "Desparasitacion",
-        }
-        return labels.get(plan_type, "Actividad")
-
-    def aves_lote_age_weeks_label(fecha_nacimiento, reference_date=None):
-        if not fecha_nacimiento:
-            return "Edad no disponible"
-        age_days = max(((reference_date or datetime.utcnow().date()) - fecha_nacimiento).days, 0)
-        weeks = age_days // 7
-        return f"Edad: {weeks} semanas"
-
-    def build_aves_plan_groups(planes_rows):
-        required_types = ("vacunacion", "despique", "desparasitacion")
-        groups = {}
-        for plan_row in planes_rows:
-            plan_name = (plan_row.plan_nombre or "").strip()
-            if not plan_name:
-                continue
-            group = groups.setdefault(
-                plan_name,
-                {
-                    "name": plan_name,
-                    "types": set(),
-                    "activities_count": 0,
-                },
-            )
-            if plan_row.tipo:
-                group["types"].add(plan_row.tipo)
-            group["activities_count"] += 1
-
-        result = []
-        for plan_name, group in groups.items():
-            missing_types = [plan_type for plan_type in required_types if plan_type not in group["types"]]
-            result.append(
-                {
-                    "name": plan_name,
-                    "is_complete": len(missing_types) == 0,
-                    "missing_types": missing_types,
-                    "missing_labels": [aves_plan_type_label(plan_type) for plan_type in missing_types],
-                    "activities_count": group["activities_count"],
-                }
-            )
-
-        result.sort(key=lambda item: item["name"].lower())
-        return result
-
-    def build_aves_lote_activity_lookup(rows):
-        lookup = {}
-        for row in rows:
-            lookup[(row.lote_id, row.plan_id, row.fecha_programada)] = row
-        return lookup
-
-    def build_aves_lote_plan_rows(lote, standard_plan_rows, custom_plan_rows):
-        custom_rows = [row for row in custom_plan_rows if row.activo]
-        if custom_rows:
-            custom_rows.sort(
-                key=lambda item: (item.edad_dias, item.tipo, item.nombre.lower())
-            )
-            return custom_rows, "personalizado"
-        return standard_plan_rows, "base"
-
-    def build_aves_lote_schedule(lote, plan_rows, activity_lookup=None, today=None):
-        if not lote.fecha_nacimiento:
-            return []
-
-        activity_lookup = activity_lookup or {}
-        today = today or datetime.utcnow().date()
-        schedule = []
-        for plan_row in plan_rows:
-            if plan_row.edad_dias is None or plan_row.edad_dias < 0:
-                continue
-            is_custom = isinstance(plan_row, AvesLotePlanPersonalizado)
-            activity_plan_id = (-int(plan_row.id)) if is_custom else int(plan_row.id)
-            scheduled_date = lote.fecha_nacimiento + timedelta(days=int(plan_row.edad_dias))
-            activity_row = activity_lookup.get((lote.id, activity_plan_id, scheduled_date))
-            is_completed = activity_row is not None
-            days_delta = (scheduled_date - today).days
-            if days_delta < 0:
-                status = "atrasada"
-                status_label = f"Atrasada {abs(days_delta)} dias"
-            elif days_delta == 0:
-                status = "hoy"
-                status_label = "Corresponde hoy"
-            else:
-                status = "proxima"
-                status_label = f"Faltan {days_delta} dias"
-            schedule.append(
-                {
-                    "plan_id": activity_plan_id,
-                    "custom_id": plan_row.id if is_custom else None,
-                    "is_custom": is_custom,
-                    "actividad_nombre": plan_row.nombre,
-                    "tipo": plan_row.tipo,
-                    "tipo_label": aves_plan_type_label(plan_row.tipo),
-                    "tipo_class": f"aves-type-{plan_row.tipo or 'actividad'}",
-                    "descripcion": (plan_row.descripcion or "").strip()
-                    or "Sin descripcion adicional.",
-                    "dia": int(plan_row.edad_dias),
-                    "fecha_programada": scheduled_date,
-                    "fecha_programada_label": scheduled_date.strftime("%d/%m/%Y"),
-                    "is_completed": is_completed,
-                    "status": status,
-                    "status_label": status_label,
-                    "realizada_label": (
-                        activity_row.fecha_realizacion.strftime("%d/%m/%Y")
-                        if activity_row and activity_row.fecha_realizacion
-                        else None
-                    ),
-                    "fecha_realizacion": (
-                        activity_row.fecha_realizacion if activity_row else None
-                    ),
-                    "comentarios": (
-                        (activity_row.comentarios or "").strip() if activity_row else ""
-                    ),
-                }
-            )
-
-        schedule.sort(key=lambda item: (item["fecha_programada"], item["tipo_label"]))
-        return schedule
-
-    def build_aves_upcoming_activities(limit=None, days_ahead=None):
-        today = datetime.utcnow().date()
-        try:
-            lotes_aves = AvesLote.query.filter_by(activo=True).all()
-            planes_aves = AvesPlan.query.filter_by(activo=True).all()
-            completed_rows = AvesLoteActividad.query.all()
-            custom_plan_rows = AvesLotePlanPersonalizado.query.filter_by(activo=True).all()
-            closure_rows = AvesLoteCierre.query.all()
-        except SQLAlchemyError:
-            db.session.rollback()
-            return []
-
-        planes_by_name = {}
-        for plan_aves in planes_aves:
-            key = (plan_aves.plan_nombre or "").strip().lower()
-            if not key:
-                continue
-            planes_by_name.setdefault(key, []).append(plan_aves)
-
-        custom_by_lote = {}
-        for custom_row in custom_plan_rows:
-            custom_by_lote.setdefault(custom_row.lote_id, []).append(custom_row)
-
-        closure_lookup = {row.lote_id: row for row in closure_rows}
-        completed_lookup = build_aves_lote_activity_lookup(completed_rows)
-        activities = []
-        for lote_aves in lotes_aves:
-            if closure_lookup.get(lote_aves.id):
-                continue
-            if not lote_aves.fecha_nacimiento:
-                continue
-            client_plan_key = (lote_aves.plan_nombre or "").strip().lower()
-            selected_plans, _ = build_aves_lote_plan_rows(
-                lote_aves,
-                planes_by_name.get(client_plan_key, []),
-                custom_by_lote.get(lote_aves.id, []),
-            )
-            if not selected_plans:
-                continue
-            schedule = build_aves_lote_schedule(
-                lote_aves,
-                selected_plans,
-                activity_lookup=completed_lookup,
-                today=today,
-            )
-            for activity in schedule:
-                if activity["is_completed"] or activity["fecha_programada"] < today:
-                    continue
-                days_left = (activity["fecha_programada"] - today).days
-                if days_ahead is not None and days_left > days_ahead:
-                    continue
-                activities.append(
-                    {
-                        "lote_nombre": lote_aves.nombre,
-                        "cliente_nombre": lote_aves.encargado or "Cliente sin asignar",
-                        "lote_id": lote_aves.id,
-                        "plan_nombre": lote_aves.plan_nombre,
-                        "actividad_nombre": activity["actividad_nombre"],
-                        "tipo": activity["tipo"],
-                        "tipo_label": activity["tipo_label"],
-                        "dia": activity["dia"],
-                        "fecha": activity["fecha_programada"],
-                        "fecha_label": activity["fecha_programada_label"],
-                        "dias_restantes": days_left,
-                    }
-                )
-
-        activities.sort(
-            key=lambda item: (
-                item["fecha"],
-                item["tipo_label"],
-                item["cliente_nombre"].lower(),
-            )
-        )
-        if limit is None:
-            return activities
-        return activities[:limit]
-
     @app.route("/login", methods=["GET", "POST"])
     def login():
         portal_target = normalize_portal_target(request.args.get("portal"))
         if session.get("user"):
             if portal_target == "aves":
-                return redirect(url_for("aves_dashboard"))
+                return redirect(url_for("aves.aves_dashboard"))
             return redirect(url_for("dashboard"))
 
         if request.method == "POST":
@@ -2286,7 +483,7 @@ def create_app():
                 session["user_id"] = user.id
                 session["rol"] = getattr(user, "rol", "admin") or "admin"
             if portal_target == "aves":
-                return redirect(url_for("aves_dashboard"))
+                return redirect(url_for("aves.aves_dashboard"))
             return redirect(url_for("dashboard"))
 
         return render_template("login.html", portal=portal_target)
@@ -2563,3475 +760,458 @@ def create_app():
             cobros_personales_share=cobros_personales_share,
         )
 
-    @app.get("/cobros-personales/<int:cobro_id>/detalle")
-    def cobro_personal_detalle(cobro_id):
-        if not session.get("user"):
-            return redirect(url_for("login"))
-        cobro = CobroPersonal.query.get_or_404(cobro_id)
-        if current_user_is_vendedor() and cobro.usuario_id != current_user_id():
-            abort(403)
-        cliente = Cliente.query.get(cobro.cliente_id) if cobro.cliente_id else None
-        responsable = User.query.get(cobro.usuario_id) if cobro.usuario_id else None
-        detalles = (
-            CobroPersonalDetalle.query.filter_by(cobro_id=cobro.id)
-            .order_by(CobroPersonalDetalle.id.asc()).all()
-        )
-        total_detalles = sum(
-            (detalle.subtotal or Decimal("0") for detalle in detalles), Decimal("0")
-        )
-        items = []
-        unidades = Decimal("0")
-        for detalle in detalles:
-            cantidad = detalle.cantidad or Decimal("0")
-            subtotal = detalle.subtotal or Decimal("0")
-            unidades += cantidad
-            items.append(
-                {
-                    "descripcion": detalle.descripcion,
-                    "cantidad": cantidad,
-                    "precio_unitario": detalle.precio_unitario or Decimal("0"),
-                    "subtotal": subtotal,
-                    "participacion": (
-                        float(subtotal / total_detalles * 100)
-                        if total_detalles > 0 else 0
-                    ),
-                }
-            )
-        items_analisis = sorted(
-            items, key=lambda item: item["subtotal"], reverse=True
-        )[:6]
-        abonos_db = (
-            AbonoCobroPersonal.query.filter_by(cobro_id=cobro.id)
-            .order_by(AbonoCobroPersonal.fecha.asc(), AbonoCobroPersonal.id.asc()).all()
-        )
-        usuarios_map = build_user_name_map(
-            [abono.usuario_id for abono in abonos_db if abono.usuario_id]
-        )
-        abonos = [
-            {
-                "fecha": abono.fecha,
-                "monto": abono.monto or Decimal("0"),
-                "comentario": (abono.comentario or "").strip(),
-                "usuario": usuarios_map.get(abono.usuario_id, "General") or "General",
-            }
-            for abono in abonos_db
-        ]
-        total = cobro.total or Decimal("0")
-        saldo = max(Decimal("0"), cobro.saldo or Decimal("0"))
-        pagado = max(Decimal("0"), total - saldo)
-        porcentaje_pagado = float(pagado / total * 100) if total > 0 else 0
-        dias_vencido = 0
-        if cobro.fecha_vencimiento and saldo > 0:
-            dias_vencido = max(0, (datetime.utcnow().date() - cobro.fecha_vencimiento).days)
-        responsable_nombre = (
-            (responsable.nombre_completo or responsable.username)
-            if responsable else "General"
-        ) or "General"
-        return render_template(
-            "cobro_personal_detalle.html", user=session["user"], cobro=cobro,
-            cliente=cliente, responsable=responsable_nombre, items=items,
-            items_analisis=items_analisis, unidades=unidades, abonos=abonos,
-            total=total, saldo=saldo, pagado=pagado,
-            porcentaje_pagado=porcentaje_pagado, dias_vencido=dias_vencido,
-            status_code=(request.args.get("status") or "").strip().lower(),
-        )
+    @app.get("/logout")
+    def logout():
+        session.clear()
+        return redirect(url_for("login"))
 
-    @app.get("/dashboard-aves")
-    def aves_dashboard():
-        if not session.get("user"):
-            return redirect(url_for("login", portal="aves"))
+    # =========================================================
+    # GESTIÓN DE USUARIOS (solo admin)
+    # =========================================================
+    @app.get("/usuarios")
+    @admin_required
+    def usuarios():
         try:
-            aves_clientes_count = AvesGranjaCliente.query.filter_by(activo=True).count()
-            aves_lotes_count = AvesLote.query.filter_by(activo=True).count()
-            aves_planes_count = (
-                db.session.query(func.count(func.distinct(AvesPlan.plan_nombre)))
-                .filter(AvesPlan.activo.is_(True))
-                .scalar()
-                or 0
-            )
+            usuarios_list = User.query.order_by(
+                User.activo.desc(), User.rol.asc(), User.username.asc()
+            ).all()
         except SQLAlchemyError:
             db.session.rollback()
-            aves_clientes_count = 0
-            aves_lotes_count = 0
-            aves_planes_count = 0
-
-        upcoming_activities = build_aves_upcoming_activities(days_ahead=30)
-        upcoming_week_count = len(
-            [activity for activity in upcoming_activities if activity["dias_restantes"] <= 7]
-        )
-
+            usuarios_list = []
         return render_template(
-            "aves_dashboard.html",
+            "usuarios.html",
             user=session["user"],
-            aves_clientes_count=aves_clientes_count,
-            aves_lotes_count=aves_lotes_count,
-            aves_planes_count=aves_planes_count,
-            upcoming_week_count=upcoming_week_count,
-            upcoming_activities=upcoming_activities[:8],
+            usuarios=usuarios_list,
         )
 
-    @app.route("/aves/clientes", methods=["GET", "POST"])
-    def aves_clientes():
-        if not session.get("user"):
-            return redirect(url_for("login", portal="aves"))
-
+    @app.route("/usuarios/nuevo", methods=["GET", "POST"])
+    @admin_required
+    def crear_usuario():
         error = None
-        open_create_client_modal = False
-        form_values = {
-            "nombre": "",
-            "contacto": "",
-            "telefono": "",
-            "email": "",
-            "direccion": "",
-            "observaciones": "",
-        }
-
         if request.method == "POST":
-            action = (request.form.get("action") or "create_client").strip()
-            nombre = (request.form.get("nombre") or "").strip()
-            contacto = (request.form.get("contacto") or "").strip() or None
-            telefono = (request.form.get("telefono") or "").strip() or None
-            email = (request.form.get("email") or "").strip() or None
-            direccion = (request.form.get("direccion") or "").strip() or None
-            observaciones = (request.form.get("observaciones") or "").strip() or None
-            form_values = {
-                "nombre": nombre,
-                "contacto": contacto or "",
-                "telefono": telefono or "",
-                "email": email or "",
-                "direccion": direccion or "",
-                "observaciones": observaciones or "",
-            }
-            open_create_client_modal = action == "create_client"
-
-            if not nombre:
-                error = "El nombre del cliente es obligatorio."
+            username = request.form.get("username", "").strip().lower()
+            password = request.form.get("password", "")
+            password2 = request.form.get("password2", "")
+            nombre_completo = request.form.get("nombre_completo", "").strip() or None
+            email = request.form.get("email", "").strip().lower() or None
+            rol = (request.form.get("rol") or "vendedor").strip().lower()
+            activo = request.form.get("activo") == "on" or request.method == "POST"
 
-            if action == "delete_client":
-                client_id_raw = (request.form.get("client_id") or "").strip()
-                try:
-                    client_id = int(client_id_raw)
-                except ValueError:
-                    client_id = 0
+            if rol not in ("admin", "vendedor", "contador"):
+                rol = "vendedor"
 
-                if client_id <= 0:
-                    error = "Cliente invalido."
-                else:
-                    try:
-                        cliente = AvesGranjaCliente.query.filter_by(id=client_id, activo=True).first()
-                        if not cliente:
-                            error = "Cliente no encontrado."
-                        else:
-                            cliente.activo = False
-                            db.session.commit()
-                            return redirect(url_for("aves_clientes"))
-                    except SQLAlchemyError:
-                        db.session.rollback()
-                        error = "No se pudo eliminar el cliente."
-
-            elif action == "update_client" and not error:
-                client_id_raw = (request.form.get("client_id") or "").strip()
-                try:
-                    client_id = int(client_id_raw)
-                except ValueError:
-                    client_id = 0
-
-                if client_id <= 0:
-                    error = "Cliente invalido."
-
-                if not error:
-                    try:
-                        cliente = AvesGranjaCliente.query.filter_by(id=client_id, activo=True).first()
-                        if not cliente:
-                            error = "Cliente no encontrado."
-                        else:
-                            cliente.nombre = nombre
-                            cliente.contacto = contacto
-                            cliente.telefono = telefono
-                            cliente.email = email
-                            cliente.direccion = direccion
-                            cliente.observaciones = observaciones
-                            db.session.commit()
-                            return redirect(url_for("aves_clientes"))
-                    except SQLAlchemyError:
-                        db.session.rollback()
-                        error = "No se pudo actualizar el cliente."
-
-            elif not error:
+            if not username or not password:
+                error = "Usuario y contraseña son obligatorios."
+            elif len(password) < 6:
+                error = "La contraseña debe tener al menos 6 caracteres."
+            elif password != password2:
+                error = "Las contraseñas no coinciden."
+            elif User.query.filter_by(username=username).first():
+                error = "Ya existe un usuario con ese nombre."
+            else:
                 try:
-                    cliente = AvesGranjaCliente(
-                        nombre=nombre,
-                        contacto=contacto,
-                        telefono=telefono,
+                    nuevo = User(
+                        username=username,
+                        password=generate_password_hash(password),
+                        nombre_completo=nombre_completo,
                         email=email,
-                        direccion=direccion,
-                        observaciones=observaciones,
+                        rol=rol,
                         activo=True,
-                        fecha_registro=datetime.utcnow(),
+                        fecha_creacion=datetime.utcnow(),
                     )
-                    db.session.add(cliente)
+                    db.session.add(nuevo)
                     db.session.commit()
-                    return redirect(url_for("aves_clientes"))
-                except SQLAlchemyError:
+                    invalidate_user_directory()
+                    return redirect(url_for("usuarios"))
+                except SQLAlchemyError as exc:
                     db.session.rollback()
-                    error = "No se pudo guardar el cliente."
-
-        try:
-            clientes_count = AvesGranjaCliente.query.filter_by(activo=True).count()
-            clientes = (
-                AvesGranjaCliente.query.filter_by(activo=True)
-                .order_by(AvesGranjaCliente.nombre.asc(), AvesGranjaCliente.id.desc())
-                .all()
-            )
-        except SQLAlchemyError:
-            db.session.rollback()
-            clientes_count = 0
-            clientes = []
-            if not error:
-                error = "No se pudo cargar la informacion de clientes."
+                    error = f"No se pudo crear el usuario: {exc}"
 
         return render_template(
-            "aves_clientes.html",
+            "usuario_form.html",
             user=session["user"],
+            usuario=None,
             error=error,
-            clientes_count=clientes_count,
-            clientes=clientes,
-            open_create_client_modal=open_create_client_modal,
-            form_values=form_values,
+            modo="nuevo",
         )
 
-    @app.route("/aves/lotes", methods=["GET", "POST"])
-    def aves_lotes():
-        if not session.get("user"):
-            return redirect(url_for("login", portal="aves"))
-
+    @app.route("/usuarios/<int:usuario_id>/editar", methods=["GET", "POST"])
+    @admin_required
+    def editar_usuario(usuario_id):
+        usuario = User.query.get_or_404(usuario_id)
         error = None
-        open_create_lote_modal = False
-        form_values = {
-            "nombre": "",
-            "fecha_nacimiento": "",
-            "cantidad_aves": "0",
-            "observaciones": "",
-        }
-
         if request.method == "POST":
-            open_create_lote_modal = True
-            nombre = (request.form.get("nombre") or "").strip()
-            fecha_nacimiento_raw = (request.form.get("fecha_nacimiento") or "").strip()
-            cantidad_aves_raw = (request.form.get("cantidad_aves") or "").strip()
-            observaciones = (request.form.get("observaciones") or "").strip() or None
-            form_values = {
-                "nombre": nombre,
-                "fecha_nacimiento": fecha_nacimiento_raw,
-                "cantidad_aves": cantidad_aves_raw or "0",
-                "observaciones": request.form.get("observaciones") or "",
-            }
+            nombre_completo = request.form.get("nombre_completo", "").strip() or None
+            email = request.form.get("email", "").strip().lower() or None
+            rol = (request.form.get("rol") or usuario.rol or "vendedor").strip().lower()
+            activo = request.form.get("activo") == "on"
 
-            if not nombre or not fecha_nacimiento_raw:
-                error = "Lote y fecha de nacimiento son obligatorios."
-            else:
-                try:
-                    fecha_nacimiento = datetime.strptime(
-                        fecha_nacimiento_raw, "%Y-%m-%d"
-                    ).date()
-                except ValueError:
-                    error = "Fecha de nacimiento invalida."
-                    fecha_nacimiento = None
+            if rol not in ("admin", "vendedor", "contador"):
+                rol = "vendedor"
 
-            if not error:
-                try:
-                    cantidad_aves = int(cantidad_aves_raw or 0)
-                    if cantidad_aves < 0:
-                        raise ValueError
-                except ValueError:
-                    error = "La cantidad de aves debe ser un numero valido."
+            # Red de seguridad: no permitir que el último admin pierda el rol o se desactive
+            if usuario.rol == "admin" and (rol != "admin" or not activo):
+                admins_activos = User.query.filter(
+                    User.rol == "admin",
+                    User.activo == True,  # noqa: E712
+                    User.id != usuario.id,
+                ).count()
+                if admins_activos == 0:
+                    error = (
+                        "No puedes quitar el rol admin o desactivar a este usuario: "
+                        "es el último administrador activo."
+                    )
 
             if not error:
                 try:
-                    lote = AvesLote(
-                        nombre=nombre,
-                        encargado=None,
-                        telefono=None,
-                        fecha_nacimiento=fecha_nacimiento,
-                        plan_nombre=None,
-                        cantidad_aves=cantidad_aves,
-                        observaciones=observaciones,
-                        activo=True,
-                        fecha_registro=datetime.utcnow(),
-                    )
-                    db.session.add(lote)
-                    if error:
-                        raise ValueError(error)
+                    usuario.nombre_completo = nombre_completo
+                    usuario.email = email
+                    usuario.rol = rol
+                    usuario.activo = activo
                     db.session.commit()
-                    return redirect(url_for("aves_lotes"))
-                except ValueError:
-                    db.session.rollback()
+                    invalidate_user_directory()
+                    return redirect(url_for("usuarios"))
                 except SQLAlchemyError as exc:
                     db.session.rollback()
-                    error = f"No se pudo guardar el lote. {exc}"
-
-        try:
-            all_active_plan_rows = (
-                AvesPlan.query.filter_by(activo=True)
-                .order_by(AvesPlan.plan_nombre.asc(), AvesPlan.edad_dias.asc(), AvesPlan.tipo.asc())
-                .all()
-            )
-            lotes_raw = (
-                AvesLote.query.filter_by(activo=True)
-                .order_by(AvesLote.fecha_registro.desc(), AvesLote.id.desc())
-                .all()
-            )
-            completed_rows = AvesLoteActividad.query.all()
-            custom_plan_rows = AvesLotePlanPersonalizado.query.filter_by(activo=True).all()
-            closure_rows = AvesLoteCierre.query.all()
-        except SQLAlchemyError:
-            db.session.rollback()
-            all_active_plan_rows = []
-            lotes_raw = []
-            completed_rows = []
-            custom_plan_rows = []
-            closure_rows = []
-            if not error:
-                error = "No se pudo cargar la informacion de lotes."
-
-        plans_by_name = {}
-        for plan_row in all_active_plan_rows:
-            plan_key = (plan_row.plan_nombre or "").strip().lower()
-            if not plan_key:
-                continue
-            plans_by_name.setdefault(plan_key, []).append(plan_row)
-
-        custom_by_lote = {}
-        for custom_row in custom_plan_rows:
-            custom_by_lote.setdefault(custom_row.lote_id, []).append(custom_row)
-
-        closure_lookup = {row.lote_id: row for row in closure_rows}
-        completed_lookup = build_aves_lote_activity_lookup(completed_rows)
-        today = datetime.utcnow().date()
-        lotes_view = []
-        lotes_cerrados_view = []
-        for lote in lotes_raw:
-            plan_key = (lote.plan_nombre or "").strip().lower()
-            selected_plan_rows, plan_source = build_aves_lote_plan_rows(
-                lote,
-                plans_by_name.get(plan_key, []),
-                custom_by_lote.get(lote.id, []),
-            )
-            has_plan = bool(plan_key) or plan_source == "personalizado"
-            schedule = build_aves_lote_schedule(
-                lote,
-                selected_plan_rows,
-                activity_lookup=completed_lookup,
-            )
-            next_activity = next(
-                (activity for activity in schedule if not activity["is_completed"]),
-                None,
-            )
-            closure_row = closure_lookup.get(lote.id)
-            lote_item = {
-                "id": lote.id,
-                "nombre": lote.nombre,
-                "cliente_nombre": lote.encargado or "Sin cliente asignado",
-                "plan_nombre": (
-                    "Plan personalizado"
-                    if plan_source == "personalizado"
-                    else ((lote.plan_nombre or "").strip() or "Sin programa")
-                ),
-                "cantidad_aves": lote.cantidad_aves or 0,
-                "fecha_nacimiento_label": lote.fecha_nacimiento.strftime("%d/%m/%Y"),
-                "edad_semanas_label": aves_lote_age_weeks_label(
-                    lote.fecha_nacimiento,
-                    reference_date=(closure_row.fecha_cierre if closure_row else today),
-                ),
-                "next_activity": next_activity,
-                "next_activity_label": (
-                    next_activity["actividad_nombre"]
-                    if next_activity
-                    else ("Sin actividades pendientes" if has_plan else "Sin programa asignado")
-                ),
-                "next_activity_date": (
-                    next_activity["fecha_programada_label"]
-                    if next_activity
-                    else ("-" if has_plan else "Pendiente")
-                ),
-                "next_activity_status": (
-                    next_activity["status_label"]
-                    if next_activity
-                    else (
-                        "Todo el plan esta al dia"
-                        if has_plan
-                        else "Asigna un programa para generar actividades"
-                    )
-                ),
-                "plan_source": plan_source,
-                "is_closed": bool(closure_row),
-                "closed_label": (
-                    closure_row.fecha_cierre.strftime("%d/%m/%Y") if closure_row else None
-                ),
-                "closed_reason": closure_row.motivo if closure_row else None,
-            }
-            if closure_row:
-                lotes_cerrados_view.append(lote_item)
-            else:
-                lotes_view.append(lote_item)
+                    error = f"No se pudo actualizar el usuario: {exc}"
 
         return render_template(
-            "aves_lotes.html",
+            "usuario_form.html",
             user=session["user"],
+            usuario=usuario,
             error=error,
-            open_create_lote_modal=open_create_lote_modal,
-            form_values=form_values,
-            lotes=lotes_view,
-            lotes_count=len(lotes_view),
-            lotes_cerrados=lotes_cerrados_view,
-            lotes_cerrados_count=len(lotes_cerrados_view),
+            modo="editar",
         )
 
-    @app.route("/aves/lotes/<int:lote_id>", methods=["GET", "POST"])
-    def aves_lote_detalle(lote_id):
-        if not session.get("user"):
-            return redirect(url_for("login", portal="aves"))
-
-        error = None
+    @app.post("/usuarios/<int:usuario_id>/password")
+    @admin_required
+    def cambiar_password_usuario(usuario_id):
+        usuario = User.query.get_or_404(usuario_id)
+        nueva = request.form.get("password", "")
+        nueva2 = request.form.get("password2", "")
+        if not nueva or len(nueva) < 6 or nueva != nueva2:
+            return redirect(url_for("editar_usuario", usuario_id=usuario_id))
         try:
-            lote = AvesLote.query.filter_by(id=lote_id, activo=True).first()
-            clientes_options = (
-                AvesGranjaCliente.query.filter_by(activo=True)
-                .order_by(AvesGranjaCliente.nombre.asc(), AvesGranjaCliente.id.asc())
-                .all()
-            )
-            all_active_plan_rows = (
-                AvesPlan.query.filter_by(activo=True)
-                .order_by(AvesPlan.plan_nombre.asc(), AvesPlan.edad_dias.asc(), AvesPlan.tipo.asc())
-                .all()
-            )
-            completed_rows = (
-                AvesLoteActividad.query.filter_by(lote_id=lote_id)
-                .order_by(AvesLoteActividad.fecha_realizacion.desc(), AvesLoteActividad.id.desc())
-                .all()
-            )
-            custom_plan_rows = (
-                AvesLotePlanPersonalizado.query.filter_by(lote_id=lote_id, activo=True)
-                .order_by(
-                    AvesLotePlanPersonalizado.edad_dias.asc(),
-                    AvesLotePlanPersonalizado.tipo.asc(),
-                    AvesLotePlanPersonalizado.id.asc(),
-                )
-                .all()
-            )
-            closure_row = AvesLoteCierre.query.filter_by(lote_id=lote_id).first()
+            usuario.password = generate_password_hash(nueva)
+            db.session.commit()
         except SQLAlchemyError:
             db.session.rollback()
-            lote = None
-            clientes_options = []
-            all_active_plan_rows = []
-            completed_rows = []
-            custom_plan_rows = []
-            closure_row = None
-            error = "No se pudo cargar la informacion del lote."
-
-        if not lote:
-            return redirect(url_for("aves_lotes"))
-
-        plan_groups = build_aves_plan_groups(all_active_plan_rows)
-        plan_names = [group["name"] for group in plan_groups if group["is_complete"]]
-        clients_by_id = {cliente.id: cliente for cliente in clientes_options}
-        plans_by_id = {plan_row.id: plan_row for plan_row in all_active_plan_rows}
-        custom_by_id = {row.id: row for row in custom_plan_rows}
-        plans_by_name = {}
-        for plan_row in all_active_plan_rows:
-            plan_key = (plan_row.plan_nombre or "").strip().lower()
-            if not plan_key:
-                continue
-            plans_by_name.setdefault(plan_key, []).append(plan_row)
-
-        if request.method == "POST":
-            action = (request.form.get("action") or "").strip()
-            if action == "delete_lote":
-                try:
-                    AvesLoteActividad.query.filter_by(lote_id=lote.id).delete()
-                    AvesLotePlanPersonalizado.query.filter_by(lote_id=lote.id).delete()
-                    AvesLoteCierre.query.filter_by(lote_id=lote.id).delete()
-                    db.session.delete(lote)
-                    db.session.commit()
-                    return redirect(url_for("aves_lotes"))
-                except SQLAlchemyError as exc:
-                    db.session.rollback()
-                    error = f"No se pudo eliminar el lote. {exc}"
-
-            if closure_row and action in {
-                "update_lote",
-                "complete_activity",
-                "add_custom_activity",
-                "delete_custom_activity",
-            }:
-                error = "El lote ya esta cerrado. Solo puedes consultarlo."
-
-            if action == "update_lote" and not error:
-                nombre = (request.form.get("nombre") or "").strip()
-                fecha_nacimiento_raw = (request.form.get("fecha_nacimiento") or "").strip()
-                cliente_id_raw = (request.form.get("cliente_id") or "").strip()
-                plan_nombre = (request.form.get("plan_nombre") or "").strip()
-                cantidad_aves_raw = (request.form.get("cantidad_aves") or "").strip()
-                observaciones = (request.form.get("observaciones") or "").strip() or None
-
-                if not nombre or not fecha_nacimiento_raw:
-                    error = "Lote y fecha de nacimiento son obligatorios."
-                else:
-                    try:
-                        fecha_nacimiento = datetime.strptime(
-                            fecha_nacimiento_raw, "%Y-%m-%d"
-                        ).date()
-                    except ValueError:
-                        error = "Fecha de nacimiento invalida."
-                        fecha_nacimiento = None
-
-                try:
-                    cantidad_aves = int(cantidad_aves_raw or 0)
-                    if cantidad_aves < 0:
-                        raise ValueError
-                except ValueError:
-                    error = "La cantidad de aves debe ser un numero valido."
-                    cantidad_aves = 0
+        return redirect(url_for("usuarios"))
 
-                try:
-                    cliente_id = int(cliente_id_raw) if cliente_id_raw else 0
-                except ValueError:
-                    cliente_id = 0
-
-                cliente_selected = clients_by_id.get(cliente_id) if cliente_id else None
-                if not error and cliente_id and not cliente_selected:
-                    error = "Selecciona un cliente valido."
-
-                if not error and plan_nombre and plan_nombre not in plan_names:
-                    error = "Selecciona un programa valido y completo."
-
-                if not error:
-                    try:
-                        lote.nombre = nombre
-                        lote.encargado = cliente_selected.nombre if cliente_selected else None
-                        lote.telefono = cliente_selected.telefono if cliente_selected else None
-                        lote.fecha_nacimiento = fecha_nacimiento
-                        lote.plan_nombre = plan_nombre or None
-                        lote.cantidad_aves = cantidad_aves
-                        lote.observaciones = observaciones
-                        db.session.commit()
-                        return redirect(url_for("aves_lote_detalle", lote_id=lote.id))
-                    except SQLAlchemyError as exc:
-                        db.session.rollback()
-                        error = f"No se pudo guardar el lote. {exc}"
-
-            if action == "add_custom_activity" and not error:
-                custom_nombre = (request.form.get("custom_nombre") or "").strip()
-                custom_tipo = normalize_aves_plan_type(request.form.get("custom_tipo"))
-                custom_edad_dias_raw = (request.form.get("custom_edad_dias") or "").strip()
-                custom_descripcion = (request.form.get("custom_descripcion") or "").strip() or None
-
-                if not custom_nombre or not custom_tipo or not custom_edad_dias_raw:
-                    error = "Nombre, tipo y dia son obligatorios para el plan personalizado."
-                else:
-                    try:
-                        custom_edad_dias = int(custom_edad_dias_raw)
-                        if custom_edad_dias < 0:
-                            raise ValueError
-                    except ValueError:
-                        error = "El dia del plan personalizado debe ser valido."
-                        custom_edad_dias = 0
-
-                if not error:
-                    try:
-                        db.session.add(
-                            AvesLotePlanPersonalizado(
-                                lote_id=lote.id,
-                                nombre=custom_nombre,
-                                tipo=custom_tipo,
-                                edad_dias=custom_edad_dias,
-                                descripcion=custom_descripcion,
-                                activo=True,
-                                fecha_registro=datetime.utcnow(),
-                            )
-                        )
-                        db.session.commit()
-                        return redirect(url_for("aves_lote_detalle", lote_id=lote.id))
-                    except SQLAlchemyError as exc:
-                        db.session.rollback()
-                        error = f"No se pudo guardar la actividad personalizada. {exc}"
-
-            if action == "delete_custom_activity" and not error:
-                custom_id_raw = (request.form.get("custom_id") or "").strip()
-                try:
-                    custom_id = int(custom_id_raw)
-                except ValueError:
-                    custom_id = 0
-
-                custom_row = custom_by_id.get(custom_id)
-                if not custom_row:
-                    error = "No se encontro la actividad personalizada."
-                else:
-                    try:
-                        custom_row.activo = False
-                        db.session.commit()
-                        return redirect(url_for("aves_lote_detalle", lote_id=lote.id))
-                    except SQLAlchemyError as exc:
-                        db.session.rollback()
-                        error = f"No se pudo quitar la actividad personalizada. {exc}"
-
-            if action == "complete_activity" and not error:
-                plan_id_raw = (request.form.get("plan_id") or "").strip()
-                fecha_programada_raw = (request.form.get("fecha_programada") or "").strip()
-                fecha_realizacion_raw = (request.form.get("fecha_realizacion") or "").strip()
-                comentarios = (request.form.get("comentarios") or "").strip() or None
-
-                try:
-                    plan_id = int(plan_id_raw) if plan_id_raw else 0
-                except ValueError:
-                    plan_id = 0
-
-                source_row = custom_by_id.get(abs(plan_id)) if plan_id < 0 else plans_by_id.get(plan_id)
-                if not source_row:
-                    error = "No se encontro la actividad del plan."
-
-                try:
-                    fecha_programada = datetime.strptime(
-                        fecha_programada_raw, "%Y-%m-%d"
-                    ).date()
-                except ValueError:
-                    error = "La fecha programada es invalida."
-                    fecha_programada = None
-
-                if not error:
-                    try:
-                        fecha_realizacion = datetime.strptime(
-                            fecha_realizacion_raw, "%Y-%m-%d"
-                        ).date()
-                    except ValueError:
-                        error = "La fecha de realizacion es invalida."
-                        fecha_realizacion = None
-
-                if not error:
-                    try:
-                        activity_row = AvesLoteActividad.query.filter_by(
-                            lote_id=lote.id,
-                            plan_id=plan_id,
-                            fecha_programada=fecha_programada,
-                        ).first()
-                        if not activity_row:
-                            activity_row = AvesLoteActividad(
-                                lote_id=lote.id,
-                                plan_id=plan_id,
-                                actividad_nombre=source_row.nombre,
-                                tipo=source_row.tipo,
-                                edad_dias=int(source_row.edad_dias),
-                                fecha_programada=fecha_programada,
-                                fecha_realizacion=fecha_realizacion,
-                                comentarios=comentarios,
-                                fecha_registro=datetime.utcnow(),
-                            )
-                            db.session.add(activity_row)
-                        else:
-                            activity_row.fecha_realizacion = fecha_realizacion
-                            activity_row.comentarios = comentarios
-                        db.session.commit()
-                        return redirect(url_for("aves_lote_detalle", lote_id=lote.id))
-                    except SQLAlchemyError as exc:
-                        db.session.rollback()
-                        error = f"No se pudo registrar la actividad. {exc}"
-
-            if action == "close_lote":
-                fecha_cierre_raw = (request.form.get("fecha_cierre") or "").strip()
-                motivo_cierre = (request.form.get("motivo_cierre") or "").strip()
-                comentarios_cierre = (request.form.get("comentarios_cierre") or "").strip() or None
-
-                if closure_row:
-                    error = "El lote ya estaba cerrado."
-                elif not fecha_cierre_raw or not motivo_cierre:
-                    error = "Fecha y motivo de cierre son obligatorios."
-                else:
-                    try:
-                        fecha_cierre = datetime.strptime(
-                            fecha_cierre_raw, "%Y-%m-%d"
-                        ).date()
-                    except ValueError:
-                        error = "La fecha de cierre es invalida."
-                        fecha_cierre = None
-
-                if not error:
-                    try:
-                        db.session.add(
-                            AvesLoteCierre(
-                                lote_id=lote.id,
-                                fecha_cierre=fecha_cierre,
-                                motivo=motivo_cierre,
-                                comentarios=comentarios_cierre,
-                                fecha_registro=datetime.utcnow(),
-                            )
-                        )
-                        db.session.commit()
-                        return redirect(url_for("aves_lotes"))
-                    except SQLAlchemyError as exc:
-                        db.session.rollback()
-                        error = f"No se pudo cerrar el lote. {exc}"
-
-            try:
-                completed_rows = (
-                    AvesLoteActividad.query.filter_by(lote_id=lote_id)
-                    .order_by(AvesLoteActividad.fecha_realizacion.desc(), AvesLoteActividad.id.desc())
-                    .all()
-                )
-                custom_plan_rows = (
-                    AvesLotePlanPersonalizado.query.filter_by(lote_id=lote_id, activo=True)
-                    .order_by(
-                        AvesLotePlanPersonalizado.edad_dias.asc(),
-                        AvesLotePlanPersonalizado.tipo.asc(),
-                        AvesLotePlanPersonalizado.id.asc(),
-                    )
-                    .all()
-                )
-                custom_by_id = {row.id: row for row in custom_plan_rows}
-                closure_row = AvesLoteCierre.query.filter_by(lote_id=lote_id).first()
-            except SQLAlchemyError:
-                db.session.rollback()
-
-        completed_lookup = build_aves_lote_activity_lookup(completed_rows)
-        selected_plan_rows, plan_source = build_aves_lote_plan_rows(
-            lote,
-            plans_by_name.get((lote.plan_nombre or "").strip().lower(), []),
-            custom_plan_rows,
-        )
-        schedule = build_aves_lote_schedule(
-            lote,
-            selected_plan_rows,
-            activity_lookup=completed_lookup,
-        )
-        pending_activities = [activity for activity in schedule if not activity["is_completed"]]
-        completed_activities = sorted(
-            [activity for activity in schedule if activity["is_completed"]],
-            key=lambda item: (item["fecha_realizacion"], item["fecha_programada"]),
-            reverse=True,
-        )
-        next_activity = pending_activities[0] if pending_activities else None
-        has_plan = bool((lote.plan_nombre or "").strip()) or plan_source == "personalizado"
-
-        lote_view = {
-            "id": lote.id,
-            "nombre": lote.nombre,
-            "cliente_nombre": lote.encargado or "Sin cliente asignado",
-            "telefono": lote.telefono or "-",
-            "plan_nombre": (
-                "Plan personalizado"
-                if plan_source == "personalizado"
-                else ((lote.plan_nombre or "").strip() or "Sin programa asignado")
-            ),
-            "plan_source": plan_source,
-            "cantidad_aves": lote.cantidad_aves or 0,
-            "fecha_nacimiento_value": lote.fecha_nacimiento.strftime("%Y-%m-%d"),
-            "fecha_nacimiento_label": lote.fecha_nacimiento.strftime("%d/%m/%Y"),
-            "observaciones": lote.observaciones or "",
-            "next_activity_label": (
-                next_activity["actividad_nombre"]
-                if next_activity
-                else ("Sin actividades pendientes" if has_plan else "Sin programa asignado")
-            ),
-            "next_activity_date": (
-                next_activity["fecha_programada_label"]
-                if next_activity
-                else ("-" if has_plan else "Pendiente")
-            ),
-            "next_activity_status": (
-                next_activity["status_label"]
-                if next_activity
-                else (
-                    "Todo el plan esta al dia"
-                    if has_plan
-                    else "Asigna un programa para generar actividades"
-                )
-            ),
-            "is_closed": bool(closure_row),
-            "closed_label": closure_row.fecha_cierre.strftime("%d/%m/%Y") if closure_row else None,
-            "closed_reason": closure_row.motivo if closure_row else None,
-            "closed_comments": (closure_row.comentarios or "") if closure_row else "",
-        }
-
-        custom_plan_activities = [
-            {
-                "id": row.id,
-                "nombre": row.nombre,
-                "tipo": row.tipo,
-                "tipo_label": aves_plan_type_label(row.tipo),
-                "tipo_class": f"aves-type-{row.tipo or 'actividad'}",
-                "edad_dias": row.edad_dias,
-                "descripcion": (row.descripcion or "").strip() or "Sin descripcion adicional.",
-            }
-            for row in custom_plan_rows
-        ]
-
-        return render_template(
-            "aves_lote_detalle.html",
-            user=session["user"],
-            error=error,
-            lote=lote_view,
-            clientes=clientes_options,
-            planes_nombres=plan_names,
-            pending_activities=pending_activities,
-            completed_activities=completed_activities,
-            custom_plan_activities=custom_plan_activities,
-            today_value=datetime.utcnow().strftime("%Y-%m-%d"),
-        )
-
-    @app.route("/aves/programacion", methods=["GET"])
-    def aves_programacion():
-        return redirect(url_for("aves_lotes"))
-
-    @app.route("/aves/planes", methods=["GET"])
-    def aves_planes():
-        if not session.get("user"):
-            return redirect(url_for("login", portal="aves"))
-
-        error = None
-        try:
-            planes_raw = (
-                AvesPlan.query.filter_by(activo=True)
-                .order_by(
-                    AvesPlan.plan_nombre.asc(),
-                    AvesPlan.edad_dias.asc(),
-                    AvesPlan.tipo.asc(),
-                    AvesPlan.id.desc(),
-                )
-                .all()
-            )
-        except SQLAlchemyError:
-            db.session.rollback()
-            planes_raw = []
-            if not error:
-                error = "No se pudieron cargar los planes."
-
-        plan_groups = build_aves_plan_groups(planes_raw)
-        search_query = (request.args.get("q") or "").strip()
-        if search_query:
-            search_key = search_query.lower()
-            plan_groups = [
-                group for group in plan_groups if search_key in group["name"].lower()
-            ]
-
-        return render_template(
-            "aves_planes.html",
-            user=session["user"],
-            error=error,
-            plan_groups=plan_groups,
-            search_query=search_query,
-        )
-
-    @app.route("/aves/planes/nuevo", methods=["GET", "POST"])
-    def aves_plan_nuevo():
-        if not session.get("user"):
-            return redirect(url_for("login", portal="aves"))
-
-        error = None
-        form_values = {
-            "plan_nombre": "",
-            "nombre": "",
-            "tipo": "",
-            "edad_dias": "",
-            "descripcion": "",
-        }
-
-        if request.method == "POST":
-            plan_nombre = (request.form.get("plan_nombre") or "").strip()
-            nombre = (request.form.get("nombre") or "").strip()
-            tipo = normalize_aves_plan_type(request.form.get("tipo"))
-            edad_dias_raw = (request.form.get("edad_dias") or "").strip()
-            descripcion = (request.form.get("descripcion") or "").strip() or None
-
-            form_values = {
-                "plan_nombre": plan_nombre,
-                "nombre": nombre,
-                "tipo": (request.form.get("tipo") or "").strip().lower(),
-                "edad_dias": edad_dias_raw,
-                "descripcion": request.form.get("descripcion") or "",
-            }
-
-            if not plan_nombre or not nombre or not tipo or not edad_dias_raw:
-                error = "Plan, actividad, tipo y dia son obligatorios."
-            else:
-                try:
-                    edad_dias = int(edad_dias_raw)
-                    if edad_dias < 0:
-                        raise ValueError
-                except ValueError:
-                    error = "El dia de actividad debe ser un numero positivo."
-
-            if not error:
-                try:
-                    db.session.add(
-                        AvesPlan(
-                            plan_nombre=plan_nombre,
-                            nombre=nombre,
-                            tipo=tipo,
-                            edad_dias=edad_dias,
-                            descripcion=descripcion,
-                            activo=True,
-                            fecha_creacion=datetime.utcnow(),
-                        )
-                    )
-                    db.session.commit()
-                    return redirect(url_for("aves_plan_editar", plan=plan_nombre))
-                except SQLAlchemyError:
-                    db.session.rollback()
-                    error = "No se pudo guardar el plan."
-
-        return render_template(
-            "aves_plan_nuevo.html",
-            user=session["user"],
-            error=error,
-            form_values=form_values,
-        )
-
-    @app.route("/aves/planes/editar", methods=["GET", "POST"])
-    def aves_plan_editar():
-        if not session.get("user"):
-            return redirect(url_for("login", portal="aves"))
-
-        plan_nombre_original = (
-            request.args.get("plan")
-            or request.form.get("plan_original")
-            or ""
-        ).strip()
-        if not plan_nombre_original:
-            return redirect(url_for("aves_planes"))
-
-        error = None
-        open_add_activity_modal = False
-        add_activity_form = {
-            "nombre": "",
-            "tipo": "",
-            "edad_dias": "",
-            "descripcion": "",
-        }
-
-        if request.method == "POST":
-            action = (request.form.get("action") or "").strip()
-
-            if action == "rename_plan":
-                nuevo_nombre = (request.form.get("plan_nombre_nuevo") or "").strip()
-                if not nuevo_nombre:
-                    error = "El nombre del plan no puede estar vacio."
-                elif nuevo_nombre != plan_nombre_original:
-                    try:
-                        name_taken = (
-                            AvesPlan.query.filter(
-                                AvesPlan.activo.is_(True),
-                                AvesPlan.plan_nombre == nuevo_nombre,
-                            ).first()
-                        )
-                        if name_taken:
-                            error = "Ya existe un plan con ese nombre."
-                        else:
-                            AvesPlan.query.filter(
-                                AvesPlan.activo.is_(True),
-                                AvesPlan.plan_nombre == plan_nombre_original,
-                            ).update({"plan_nombre": nuevo_nombre})
-                            db.session.commit()
-                            return redirect(url_for("aves_plan_editar", plan=nuevo_nombre))
-                    except SQLAlchemyError:
-                        db.session.rollback()
-                        error = "No se pudo actualizar el nombre del plan."
-
-            elif action == "add_activity":
-                nombre = (request.form.get("nombre") or "").strip()
-                tipo = normalize_aves_plan_type(request.form.get("tipo"))
-                edad_dias_raw = (request.form.get("edad_dias") or "").strip()
-                descripcion = (request.form.get("descripcion") or "").strip() or None
-                open_add_activity_modal = True
-                add_activity_form = {
-                    "nombre": nombre,
-                    "tipo": (request.form.get("tipo") or "").strip().lower(),
-                    "edad_dias": edad_dias_raw,
-                    "descripcion": request.form.get("descripcion") or "",
-                }
-
-                if not nombre or not tipo or not edad_dias_raw:
-                    error = "Actividad, tipo y dia son obligatorios."
-                else:
-                    try:
-                        edad_dias = int(edad_dias_raw)
-                        if edad_dias < 0:
-                            raise ValueError
-                    except ValueError:
-                        error = "El dia debe ser un numero positivo."
-
-                if not error:
-                    try:
-                        db.session.add(
-                            AvesPlan(
-                                plan_nombre=plan_nombre_original,
-                                nombre=nombre,
-                                tipo=tipo,
-                                edad_dias=edad_dias,
-                                descripcion=descripcion,
-                                activo=True,
-                                fecha_creacion=datetime.utcnow(),
-                            )
-                        )
-                        db.session.commit()
-                        return redirect(
-                            url_for("aves_plan_editar", plan=plan_nombre_original)
-                        )
-                    except SQLAlchemyError:
-                        db.session.rollback()
-                        error = "No se pudo agregar la actividad."
-
-            elif action == "update_activity":
-                activity_id_raw = (request.form.get("activity_id") or "").strip()
-                nombre = (request.form.get("nombre") or "").strip()
-                tipo = normalize_aves_plan_type(request.form.get("tipo"))
-                edad_dias_raw = (request.form.get("edad_dias") or "").strip()
-                descripcion = (request.form.get("descripcion") or "").strip() or None
-
-                try:
-                    activity_id = int(activity_id_raw)
-                except ValueError:
-                    activity_id = 0
-
-                if activity_id <= 0 or not nombre or not tipo or not edad_dias_raw:
-                    error = "Completa correctamente los datos de la actividad."
-                else:
-                    try:
-                        edad_dias = int(edad_dias_raw)
-                        if edad_dias < 0:
-                            raise ValueError
-                    except ValueError:
-                        error = "El dia debe ser un numero positivo."
-
-                if not error:
-                    try:
-                        activity_row = (
-                            AvesPlan.query.filter(
-                                AvesPlan.id == activity_id,
-                                AvesPlan.activo.is_(True),
-                                AvesPlan.plan_nombre == plan_nombre_original,
-                            ).first()
-                        )
-                        if not activity_row:
-                            error = "Actividad no encontrada."
-                    except SQLAlchemyError:
-                        db.session.rollback()
-                        error = "No se pudo cargar la actividad."
-
-                if not error:
-                    try:
-                        activity_row.nombre = nombre
-                        activity_row.tipo = tipo
-                        activity_row.edad_dias = edad_dias
-                        activity_row.descripcion = descripcion
-                        db.session.commit()
-                        return redirect(
-                            url_for("aves_plan_editar", plan=plan_nombre_original)
-                        )
-                    except SQLAlchemyError:
-                        db.session.rollback()
-                        error = "No se pudo actualizar la actividad."
-
-            elif action == "delete_activity":
-                activity_id_raw = (request.form.get("activity_id") or "").strip()
-                try:
-                    activity_id = int(activity_id_raw)
-                except ValueError:
-                    activity_id = 0
-
-                if activity_id > 0:
-                    try:
-                        activity_row = (
-                            AvesPlan.query.filter(
-                                AvesPlan.id == activity_id,
-                                AvesPlan.activo.is_(True),
-                                AvesPlan.plan_nombre == plan_nombre_original,
-                            ).first()
-                        )
-                        if activity_row:
-                            activity_row.activo = False
-                            db.session.commit()
-                    except SQLAlchemyError:
-                        db.session.rollback()
-                        error = "No se pudo eliminar la actividad."
-
-                return redirect(url_for("aves_plan_editar", plan=plan_nombre_original))
-
-        try:
-            plan_rows = (
-                AvesPlan.query.filter(
-                    AvesPlan.activo.is_(True),
-                    AvesPlan.plan_nombre == plan_nombre_original,
-                )
-                .order_by(AvesPlan.edad_dias.asc(), AvesPlan.id.asc())
-                .all()
-            )
-        except SQLAlchemyError:
-            db.session.rollback()
-            plan_rows = []
-            if not error:
-                error = "No se pudo cargar el plan solicitado."
-
-        if not plan_rows:
-            return redirect(url_for("aves_planes"))
-
-        plan_status = build_aves_plan_groups(plan_rows)[0]
-        type_counts = {
-            "vacunacion": 0,
-            "despique": 0,
-            "desparasitacion": 0,
-        }
-        grouped_by_day = {}
-        for row in plan_rows:
-            dia = int(row.edad_dias)
-            if row.tipo in type_counts:
-                type_counts[row.tipo] += 1
-            day_group = grouped_by_day.setdefault(
-                dia,
-                {
-                    "dia": dia,
-                    "items": [],
-                },
-            )
-            day_group["items"].append(
-                {
-                    "id": row.id,
-                    "tipo": row.tipo,
-                    "tipo_label": aves_plan_type_label(row.tipo),
-                    "nombre": row.nombre,
-                    "descripcion": row.descripcion or "",
-                }
-            )
-
-        activity_day_groups = [grouped_by_day[dia] for dia in sorted(grouped_by_day)]
-        plan_summary = {
-            "days_count": len(activity_day_groups),
-            "first_day": activity_day_groups[0]["dia"] if activity_day_groups else None,
-            "last_day": activity_day_groups[-1]["dia"] if activity_day_groups else None,
-            "vacunacion_count": type_counts["vacunacion"],
-            "despique_count": type_counts["despique"],
-            "desparasitacion_count": type_counts["desparasitacion"],
-        }
-
-        return render_template(
-            "aves_plan_editar.html",
-            user=session["user"],
-            error=error,
-            plan_nombre=plan_nombre_original,
-            plan_status=plan_status,
-            activity_day_groups=activity_day_groups,
-            plan_summary=plan_summary,
-            open_add_activity_modal=open_add_activity_modal,
-            add_activity_form=add_activity_form,
-        )
-
-    @app.get("/logout")
-    def logout():
-        session.clear()
-        return redirect(url_for("login"))
-
-    # =========================================================
-    # GESTIÓN DE USUARIOS (solo admin)
-    # =========================================================
-    @app.get("/usuarios")
-    @admin_required
-    def usuarios():
-        try:
-            usuarios_list = User.query.order_by(
-                User.activo.desc(), User.rol.asc(), User.username.asc()
-            ).all()
-        except SQLAlchemyError:
-            db.session.rollback()
-            usuarios_list = []
-        return render_template(
-            "usuarios.html",
-            user=session["user"],
-            usuarios=usuarios_list,
-        )
-
-    @app.route("/usuarios/nuevo", methods=["GET", "POST"])
-    @admin_required
-    def crear_usuario():
-        error = None
-        if request.method == "POST":
-            username = request.form.get("username", "").strip().lower()
-            password = request.form.get("password", "")
-            password2 = request.form.get("password2", "")
-            nombre_completo = request.form.get("nombre_completo", "").strip() or None
-            email = request.form.get("email", "").strip().lower() or None
-            rol = (request.form.get("rol") or "vendedor").strip().lower()
-            activo = request.form.get("activo") == "on" or request.method == "POST"
-
-            if rol not in ("admin", "vendedor", "contador"):
-                rol = "vendedor"
-
-            if not username or not password:
-                error = "Usuario y contraseña son obligatorios."
-            elif len(password) < 6:
-                error = "La contraseña debe tener al menos 6 caracteres."
-            elif password != password2:
-                error = "Las contraseñas no coinciden."
-            elif User.query.filter_by(username=username).first():
-                error = "Ya existe un usuario con ese nombre."
-            else:
-                try:
-                    nuevo = User(
-                        username=username,
-                        password=generate_password_hash(password),
-                        nombre_completo=nombre_completo,
-                        email=email,
-                        rol=rol,
-                        activo=True,
-                        fecha_creacion=datetime.utcnow(),
-                    )
-                    db.session.add(nuevo)
-                    db.session.commit()
-                    return redirect(url_for("usuarios"))
-                except SQLAlchemyError as exc:
-                    db.session.rollback()
-                    error = f"No se pudo crear el usuario: {exc}"
-
-        return render_template(
-            "usuario_form.html",
-            user=session["user"],
-            usuario=None,
-            error=error,
-            modo="nuevo",
-        )
-
-    @app.route("/usuarios/<int:usuario_id>/editar", methods=["GET", "POST"])
-    @admin_required
-    def editar_usuario(usuario_id):
-        usuario = User.query.get_or_404(usuario_id)
-        error = None
-        if request.method == "POST":
-            nombre_completo = request.form.get("nombre_completo", "").strip() or None
-            email = request.form.get("email", "").strip().lower() or None
-            rol = (request.form.get("rol") or usuario.rol or "vendedor").strip().lower()
-            activo = request.form.get("activo") == "on"
-
-            if rol not in ("admin", "vendedor", "contador"):
-                rol = "vendedor"
-
-            # Red de seguridad: no permitir que el último admin pierda el rol o se desactive
-            if usuario.rol == "admin" and (rol != "admin" or not activo):
-                admins_activos = User.query.filter(
-                    User.rol == "admin",
-                    User.activo == True,  # noqa: E712
-                    User.id != usuario.id,
-                ).count()
-                if admins_activos == 0:
-                    error = (
-                        "No puedes quitar el rol admin o desactivar a este usuario: "
-                        "es el último administrador activo."
-                    )
-
-            if not error:
-                try:
-                    usuario.nombre_completo = nombre_completo
-                    usuario.email = email
-                    usuario.rol = rol
-                    usuario.activo = activo
-                    db.session.commit()
-                    return redirect(url_for("usuarios"))
-                except SQLAlchemyError as exc:
-                    db.session.rollback()
-                    error = f"No se pudo actualizar el usuario: {exc}"
-
-        return render_template(
-            "usuario_form.html",
-            user=session["user"],
-            usuario=usuario,
-            error=error,
-            modo="editar",
-        )
-
-    @app.post("/usuarios/<int:usuario_id>/password")
-    @admin_required
-    def cambiar_password_usuario(usuario_id):
-        usuario = User.query.get_or_404(usuario_id)
-        nueva = request.form.get("password", "")
-        nueva2 = request.form.get("password2", "")
-        if not nueva or len(nueva) < 6 or nueva != nueva2:
-            return redirect(url_for("editar_usuario", usuario_id=usuario_id))
-        try:
-            usuario.password = generate_password_hash(nueva)
-            db.session.commit()
-        except SQLAlchemyError:
-            db.session.rollback()
-        return redirect(url_for("usuarios"))
-
-    @app.post("/usuarios/<int:usuario_id>/delete")
-    @admin_required
-    def eliminar_usuario(usuario_id):
-        usuario = User.query.get_or_404(usuario_id)
-        # No permitir auto-eliminación
-        if usuario.username == session.get("user"):
-            return redirect(url_for("usuarios"))
-        # No permitir quedarse sin admin
-        if usuario.rol == "admin":
-            admins_activos = User.query.filter(
-                User.rol == "admin",
-                User.activo == True,  # noqa: E712
-                User.id != usuario.id,
-            ).count()
-            if admins_activos == 0:
-                return redirect(url_for("usuarios"))
-        try:
-            usuario.activo = False
-            db.session.commit()
-        except SQLAlchemyError:
-            db.session.rollback()
-        return redirect(url_for("usuarios"))
-
-    @app.route("/clientes", methods=["GET", "POST"])
-    def clientes():
-        if not session.get("user"):
-            return redirect(url_for("login"))
-
-        error = None
-        if request.method == "POST":
-            nombre = request.form.get("nombre", "").strip()
-            ruc_dni = request.form.get("ruc_dni", "").strip() or None
-            direccion = request.form.get("direccion", "").strip() or None
-            telefono = request.form.get("telefono", "").strip() or None
-            email = request.form.get("email", "").strip() or None
-
-            if not nombre:
-                error = "El nombre del cliente es obligatorio."
-            else:
-                try:
-                    cliente = Cliente(
-                        nombre=nombre,
-                        ruc_dni=ruc_dni,
-                        direccion=direccion,
-                        telefono=telefono,
-                        email=email,
-                    )
-                    db.session.add(cliente)
-                    db.session.commit()
-                    return redirect(url_for("clientes"))
-                except SQLAlchemyError:
-                    db.session.rollback()
-                    error = "No se pudo guardar el cliente."
-
-        clientes_list = Cliente.query.order_by(Cliente.id.desc()).all()
-        return render_template(
-            "clientes.html",
-            user=session["user"],
-            clientes=clientes_list,
-            error=error,
-        )
-
-    @app.get("/facturacion")
-    @login_required
-    def facturacion():
-        # Vendedor accede para CAPTURAR pedidos; los botones de facturar
-        # se ocultan en el template mediante role-vendedor CSS.
-        clientes_list = Cliente.query.order_by(Cliente.nombre.asc()).all()
-        clientes_map = {cliente.id: cliente.nombre for cliente in clientes_list}
-        categorias_list = Categoria.query.filter_by(activo=True).order_by(
-            Categoria.nombre.asc()
-        ).all()
-        productos_list = Producto.query.filter_by(activo=True).order_by(Producto.nombre.asc()).all()
-        pedidos_query = Pedido.query.filter(Pedido.estado.in_(("pendiente", "listo")))
-        if current_user_is_vendedor():
-            pedidos_query = pedidos_query.filter(Pedido.usuario_id == current_user_id())
-        pedidos_listos = pedidos_query.order_by(Pedido.fecha.desc()).all()
-        return render_template(
-            "facturacion.html",
-            user=session["user"],
-            clientes=clientes_list,
-            clientes_map=clientes_map,
-            categorias=categorias_list,
-            productos=productos_list,
-            pedidos_listos=pedidos_listos,
-        )
-
-    @app.get("/pedidos")
-    @login_required
-    def pedidos():
-        clientes_list = Cliente.query.order_by(Cliente.nombre.asc()).all()
-        clientes_map = {cliente.id: cliente.nombre for cliente in clientes_list}
-
-        # Vendedor solo ve SUS pedidos; admin/contador ven todos
-        base_query = Pedido.query.filter(
-            or_(Pedido.estado.is_(None), Pedido.estado != "facturado")
-        )
-        if current_user_is_vendedor():
-            base_query = base_query.filter(Pedido.usuario_id == current_user_id())
-
-        pedidos_list = base_query.order_by(Pedido.fecha.desc()).all()
-        pedidos_view = []
-        vendedores_map = build_user_name_map(
-            [pedido.usuario_id for pedido in pedidos_list if pedido.usuario_id]
-        )
-        for pedido in pedidos_list:
-            fecha_label = pedido.fecha.strftime("%d/%m/%Y") if pedido.fecha else "-"
-            estado_label = (pedido.estado or "-").replace("_", " ").upper()
-            pedidos_view.append(
-                {
-                    "id": pedido.id,
-                    "numero_pedido": pedido.numero_pedido,
-                    "cliente_id": pedido.cliente_id,
-                    "fecha_label": fecha_label,
-                    "total": pedido.total or Decimal("0"),
-                    "estado": pedido.estado or "-",
-                    "estado_label": estado_label,
-                    "vendedor": vendedores_map.get(pedido.usuario_id, "General"),
-                }
-            )
-        return render_template(
-            "pedidos.html",
-            user=session["user"],
-            pedidos=pedidos_view,
-            clientes_map=clientes_map,
-        )
-
-    @app.post("/pedidos")
-    def crear_pedido():
-        if not session.get("user"):
-            return jsonify({"error": "No autorizado."}), 401
-
-        data = request.get_json(silent=True) or {}
-        cliente_id = data.get("cliente_id") or None
-        rtn = (data.get("rtn") or "").strip() or None
-        fecha_raw = (data.get("fecha") or "").strip()
-        items = data.get("items") or []
-        pedido_id = data.get("pedido_id")
-
-        if not items:
-            return jsonify({"error": "No hay productos en el pedido."}), 400
-
-        if fecha_raw:
-            try:
-                fecha_pedido = datetime.strptime(fecha_raw, "%Y-%m-%d")
-            except ValueError:
-                return jsonify({"error": "Fecha invalida."}), 400
-        else:
-            fecha_pedido = datetime.utcnow()
-
-        producto_ids = []
-        parsed_items = []
-        for item in items:
-            try:
-                producto_id = int(item.get("producto_id"))
-                cantidad = int(item.get("cantidad"))
-                descuento = Decimal(str(item.get("descuento", 0) or 0))
-            except (TypeError, ValueError):
-                return jsonify({"error": "Producto o cantidad invalida."}), 400
-            if cantidad <= 0:
-                return jsonify({"error": "Cantidad invalida."}), 400
-            if descuento < 0:
-                return jsonify({"error": "Descuento invalido."}), 400
-            producto_ids.append(producto_id)
-            parsed_items.append((producto_id, cantidad, descuento))
-
-        productos = Producto.query.filter(Producto.id.in_(producto_ids)).all()
-        productos_map = {producto.id: producto for producto in productos}
-        if len(productos_map) != len(set(producto_ids)):
-            return jsonify({"error": "Producto no encontrado."}), 400
-
-        subtotal = Decimal("0")
-        isv = Decimal("0")
-        descuento_total = Decimal("0")
-        detalles = []
-        for producto_id, cantidad, descuento in parsed_items:
-            producto = productos_map[producto_id]
-            precio = Decimal(str(producto.precio))
-            linea_bruta = precio * Decimal(cantidad)
-            descuento_unit = min(descuento, precio)
-            descuento_aplicado = descuento_unit * Decimal(cantidad)
-            linea_neta = max(Decimal("0"), (precio - descuento_unit) * Decimal(cantidad))
-            subtotal += linea_bruta
-            descuento_total += descuento_aplicado
-            if producto.isv_aplica:
-                isv += linea_neta * Decimal("0.15")
-            detalles.append((producto, cantidad, precio, linea_neta, descuento_unit))
-
-        total = max(Decimal("0"), subtotal - descuento_total) + isv
-
-        usuario = User.query.filter_by(username=session["user"]).first()
-        usuario_id = usuario.id if usuario else None
-        numero_pedido = generate_order_number()
-
-        try:
-            pedido = Pedido(
-                numero_pedido=numero_pedido,
-                cliente_id=cliente_id,
-                usuario_id=usuario_id,
-                rtn=rtn,
-                fecha=fecha_pedido,
-                subtotal=subtotal,
-                isv=isv,
-                descuento=descuento_total,
-                total=total,
-                estado="pendiente",
-            )
-            db.session.add(pedido)
-            db.session.flush()
-            for producto, cantidad, precio, linea, descuento_unit in detalles:
-                db.session.add(
-                    DetallePedido(
-                        pedido_id=pedido.id,
-                        producto_id=producto.id,
-                        cantidad=cantidad,
-                        precio_unitario=precio,
-                        subtotal=linea,
-                        descuento=descuento_unit,
-                        isv_aplica=producto.isv_aplica,
-                    )
-                )
-            db.session.commit()
-        except SQLAlchemyError:
-            db.session.rollback()
-            return jsonify({"error": "No se pudo guardar el pedido."}), 500
-
-        return jsonify({"pedido_id": pedido.id, "numero_pedido": numero_pedido})
-
-    @app.get("/pedidos/<int:pedido_id>/data")
-    def obtener_pedido(pedido_id):
-        if not session.get("user"):
-            return jsonify({"error": "No autorizado."}), 401
-
-        pedido = Pedido.query.get_or_404(pedido_id)
-        if not _pedido_pertenece_al_usuario(pedido):
-            abort(403)
-        detalles = (
-            DetallePedido.query.filter_by(pedido_id=pedido.id)
-            .order_by(DetallePedido.id.asc())
-            .all()
-        )
-        items = [
-            {
-                "producto_id": detalle.producto_id,
-                "cantidad": int(detalle.cantidad),
-                "descuento": float(detalle.descuento or 0),
-            }
-            for detalle in detalles
-        ]
-        return jsonify(
-            {
-                "pedido_id": pedido.id,
-                "numero_pedido": pedido.numero_pedido,
-                "cliente_id": pedido.cliente_id,
-                "rtn": pedido.rtn or "",
-                "items": items,
-            }
-        )
-
-    def _pedido_pertenece_al_usuario(pedido):
-        """Vendedor solo puede actuar sobre SUS pedidos; admin/contador sobre todos."""
-        if current_user_is_vendedor():
-            return pedido.usuario_id == current_user_id()
-        return True
-
-    @app.post("/pedidos/<int:pedido_id>/listo")
-    @login_required
-    def marcar_pedido_listo(pedido_id):
-        pedido = Pedido.query.get_or_404(pedido_id)
-        if not _pedido_pertenece_al_usuario(pedido):
-            abort(403)
-        if pedido.estado not in {"facturado", "anulado"}:
-            pedido.estado = "listo"
-            try:
-                db.session.commit()
-            except SQLAlchemyError:
-                db.session.rollback()
-        return redirect(url_for("pedidos"))
-
-    @app.post("/pedidos/<int:pedido_id>/anular")
-    @login_required
-    def anular_pedido(pedido_id):
-        pedido = Pedido.query.get_or_404(pedido_id)
-        if not _pedido_pertenece_al_usuario(pedido):
-            abort(403)
-        pedido.estado = "anulado"
-        try:
-            db.session.commit()
-        except SQLAlchemyError:
-            db.session.rollback()
-        return redirect(url_for("pedidos"))
-
-    @app.post("/pedidos/<int:pedido_id>/delete")
-    @login_required
-    def eliminar_pedido(pedido_id):
-        pedido = Pedido.query.get_or_404(pedido_id)
-        if not _pedido_pertenece_al_usuario(pedido):
-            abort(403)
-        if pedido.estado == "facturado":
-            return redirect(url_for("pedidos"))
-        try:
-            db.session.delete(pedido)
-            db.session.commit()
-        except SQLAlchemyError:
-            db.session.rollback()
-        return redirect(url_for("pedidos"))
-
-    @app.route("/productos", methods=["GET", "POST"])
-    @login_required
-    def productos():
-        # Vendedor solo puede VER el catálogo, no crear productos
-        if request.method == "POST" and current_user_role() != "admin":
-            abort(403)
-
-        error = None
-        if request.method == "POST":
-            codigo = request.form.get("codigo", "").strip()
-            nombre = request.form.get("nombre", "").strip()
-            categoria = request.form.get("categoria", "").strip()
-            precio = request.form.get("precio", "").strip()
-            stock = request.form.get("stock", "").strip()
-            descripcion = request.form.get("descripcion", "").strip() or None
-            activo = request.form.get("activo") == "on"
-            isv_aplica = request.form.get("isv_aplica") == "on"
-            foto_file = request.files.get("foto")
-
-            if not codigo or not nombre or not categoria or not precio:
-                error = "Completa codigo, nombre, categoria y precio."
-            else:
-                try:
-                    foto_filename = save_product_image(foto_file)
-                    producto = Producto(
-                        codigo=codigo,
-                        nombre=nombre,
-                        categoria=categoria,
-                        precio=precio,
-                        stock=stock or 0,
-                        descripcion=descripcion,
-                        activo=activo,
-                        isv_aplica=isv_aplica,
-                        foto=foto_filename,
-                    )
-                    db.session.add(producto)
-                    db.session.commit()
-                    return redirect(url_for("productos"))
-                except ValueError as exc:
-                    error = str(exc)
-                except SQLAlchemyError:
-                    db.session.rollback()
-                    error = "No se pudo guardar el producto."
-
-        productos_list = Producto.query.filter_by(activo=True).order_by(Producto.id.desc()).all()
-        categorias_list = Categoria.query.filter_by(activo=True).order_by(
-            Categoria.nombre.asc()
-        ).all()
-        return render_template(
-            "productos.html",
-            user=session["user"],
-            productos=productos_list,
-            categorias=categorias_list,
-            error=error,
-        )
-
-    @app.get("/reportes")
-    @admin_required
-    def reportes():
-        try:
-            clientes_data = [
-                {
-                    "id": cliente.id,
-                    "nombre": cliente.nombre,
-                    "rtn": cliente.ruc_dni or "",
-                    "telefono": cliente.telefono or "",
-                }
-                for cliente in Cliente.query.order_by(Cliente.nombre.asc()).all()
-            ]
-            facturas_raw = (
-                FacturaContado.query.filter_by(estado="credito")
-                .order_by(FacturaContado.fecha.desc())
-                .all()
-            )
-            facturas_credito = []
-            for factura in facturas_raw:
-                total = Decimal(str(factura.total or 0))
-                abonado = Decimal(str(factura.pago or 0))
-                saldo = total - abonado
-                if saldo <= 0:
-                    continue
-                facturas_credito.append(
-                    {
-                        "id": factura.id,
-                        "numero_factura": factura.numero_factura,
-                        "cliente_id": factura.cliente_id,
-                        "fecha": factura.fecha.strftime("%d/%m/%Y")
-                        if factura.fecha
-                        else "-",
-                        "total": float(total),
-                        "abonado": float(abonado),
-                        "saldo": float(saldo),
-                    }
-                )
-        except SQLAlchemyError:
-            db.session.rollback()
-            clientes_data = []
-            facturas_credito = []
-
-        return render_template(
-            "reportes.html",
-            user=session["user"],
-            clientes=clientes_data,
-            facturas_credito=facturas_credito,
-        )
-
-    def parse_report_date_range(start_raw, end_raw):
-        today = datetime.utcnow()
-        if start_raw:
-            start_date = datetime.strptime(start_raw, "%Y-%m-%d")
-        else:
-            start_date = datetime(today.year, today.month, 1)
-        if end_raw:
-            end_date = datetime.strptime(end_raw, "%Y-%m-%d")
-        else:
-            end_date = today
-        if end_date < start_date:
-            raise ValueError("Rango de fechas invalido.")
-        end_exclusive = end_date + timedelta(days=1)
-        return start_date, end_exclusive
-
-    @app.post("/reportes/productos-top")
-    def reportes_productos_top():
-        if not session.get("user"):
-            return jsonify({"error": "No autorizado"}), 401
-
-        data = request.get_json(silent=True) or {}
-        start_raw = (data.get("start_date") or "").strip()
-        end_raw = (data.get("end_date") or "").strip()
-        try:
-            start_date, end_exclusive = parse_report_date_range(start_raw, end_raw)
-        except ValueError:
-            return jsonify({"error": "Rango de fechas invalido."}), 400
-
-        rows = (
-            db.session.query(
-                Producto.codigo,
-                Producto.nombre,
-                func.sum(DetalleFacturaContado.cantidad).label("cantidad"),
-                func.sum(DetalleFacturaContado.subtotal).label("total"),
-            )
-            .join(
-                DetalleFacturaContado,
-                DetalleFacturaContado.producto_id == Producto.id,
-            )
-            .join(
-                FacturaContado,
-                FacturaContado.id == DetalleFacturaContado.factura_id,
-            )
-            .filter(FacturaContado.estado != "anulada")
-            .filter(FacturaContado.fecha >= start_date)
-            .filter(FacturaContado.fecha < end_exclusive)
-            .group_by(Producto.codigo, Producto.nombre)
-            .order_by(func.sum(DetalleFacturaContado.cantidad).desc())
-            .limit(50)
-            .all()
-        )
-
-        productos = [
-            {
-                "codigo": row.codigo,
-                "nombre": row.nombre,
-                "cantidad": int(row.cantidad or 0),
-                "total": float(row.total or 0),
-            }
-            for row in rows
-        ]
-        total_vendido = sum(item["total"] for item in productos)
-        return jsonify({"productos": productos, "total": total_vendido})
-
-    @app.post("/reportes/productos-top/pdf")
-    def reportes_productos_top_pdf():
-        if not session.get("user"):
-            return jsonify({"error": "No autorizado"}), 401
-
-        data = request.get_json(silent=True) or {}
-        start_raw = (data.get("start_date") or "").strip()
-        end_raw = (data.get("end_date") or "").strip()
-        try:
-            start_date, end_exclusive = parse_report_date_range(start_raw, end_raw)
-        except ValueError:
-            return jsonify({"error": "Rango de fechas invalido."}), 400
-
-        productos = (
-            db.session.query(
-                Producto.codigo,
-                Producto.nombre,
-                func.sum(DetalleFacturaContado.cantidad).label("cantidad"),
-                func.sum(DetalleFacturaContado.subtotal).label("total"),
-            )
-            .join(
-                DetalleFacturaContado,
-                DetalleFacturaContado.producto_id == Producto.id,
-            )
-            .join(
-                FacturaContado,
-                FacturaContado.id == DetalleFacturaContado.factura_id,
-            )
-            .filter(FacturaContado.estado != "anulada")
-            .filter(FacturaContado.fecha >= start_date)
-            .filter(FacturaContado.fecha < end_exclusive)
-            .group_by(Producto.codigo, Producto.nombre)
-            .order_by(func.sum(DetalleFacturaContado.cantidad).desc())
-            .limit(50)
-            .all()
-        )
-        productos_data = [
-            {
-                "codigo": row.codigo,
-                "nombre": row.nombre,
-                "cantidad": int(row.cantidad or 0),
-                "total": float(row.total or 0),
-            }
-            for row in productos
-        ]
-        total_vendido = sum(item["total"] for item in productos_data)
-        settings = get_business_settings()
-        safe_base = f"top-productos-{datetime.utcnow():%Y%m%d%H%M%S}"
-        filename = build_invoice_pdf_filename(safe_base)
-        file_path = os.path.join(app.config["INVOICE_PDF_FOLDER"], filename)
-        cleanup_old_pdfs(app.config["INVOICE_PDF_FOLDER"], prefix="top-productos-")
-        create_top_products_pdf(
-            file_path, settings, productos_data, total_vendido, start_date, end_exclusive
-        )
-        pdf_url = url_for("static", filename=f"invoices/{filename}", _external=True)
-        return jsonify({"pdf_url": pdf_url})
-
-    @app.post("/reportes/compras-cliente")
-    def reportes_compras_cliente():
-        if not session.get("user"):
-            return jsonify({"error": "No autorizado"}), 401
-
-        data = request.get_json(silent=True) or {}
-        cliente_id = data.get("cliente_id")
-        if not cliente_id:
-            return jsonify({"error": "Cliente requerido"}), 400
-        try:
-            cliente_id = int(cliente_id)
-        except (TypeError, ValueError):
-            return jsonify({"error": "Cliente invalido"}), 400
-
-        start_raw = (data.get("start_date") or "").strip()
-        end_raw = (data.get("end_date") or "").strip()
-        try:
-            start_date, end_exclusive = parse_report_date_range(start_raw, end_raw)
-        except ValueError:
-            return jsonify({"error": "Rango de fechas invalido."}), 400
-
-        facturas = (
-            FacturaContado.query.filter_by(cliente_id=cliente_id)
-            .filter(FacturaContado.estado != "anulada")
-            .filter(FacturaContado.fecha >= start_date)
-            .filter(FacturaContado.fecha < end_exclusive)
-            .order_by(FacturaContado.fecha.desc())
-            .all()
-        )
-
-        items = [
-            {
-                "numero_factura": factura.numero_factura,
-                "fecha": factura.fecha.strftime("%d/%m/%Y") if factura.fecha else "-",
-                "total": float(factura.total or 0),
-                "estado": factura.estado or "-",
-            }
-            for factura in facturas
-        ]
-        total_compras = sum(item["total"] for item in items)
-        return jsonify({"facturas": items, "total": total_compras})
-
-    @app.post("/reportes/compras-cliente/pdf")
-    def reportes_compras_cliente_pdf():
-        if not session.get("user"):
-            return jsonify({"error": "No autorizado"}), 401
-
-        data = request.get_json(silent=True) or {}
-        cliente_id = data.get("cliente_id")
-        if not cliente_id:
-            return jsonify({"error": "Cliente requerido"}), 400
-        try:
-            cliente_id = int(cliente_id)
-        except (TypeError, ValueError):
-            return jsonify({"error": "Cliente invalido"}), 400
-
-        start_raw = (data.get("start_date") or "").strip()
-        end_raw = (data.get("end_date") or "").strip()
-        try:
-            start_date, end_exclusive = parse_report_date_range(start_raw, end_raw)
-        except ValueError:
-            return jsonify({"error": "Rango de fechas invalido."}), 400
-
-        cliente = Cliente.query.get(cliente_id)
-        if not cliente:
-            return jsonify({"error": "Cliente no encontrado"}), 404
-
-        facturas = (
-            FacturaContado.query.filter_by(cliente_id=cliente_id)
-            .filter(FacturaContado.estado != "anulada")
-            .filter(FacturaContado.fecha >= start_date)
-            .filter(FacturaContado.fecha < end_exclusive)
-            .order_by(FacturaContado.fecha.desc())
-            .all()
-        )
-        facturas_data = [
-            {
-                "numero_factura": factura.numero_factura,
-                "fecha": factura.fecha.strftime("%d/%m/%Y") if factura.fecha else "-",
-                "estado": factura.estado or "-",
-                "total": float(factura.total or 0),
-            }
-            for factura in facturas
-        ]
-        total_compras = sum(item["total"] for item in facturas_data)
-        settings = get_business_settings()
-        safe_base = f"compras-cliente-{cliente_id}-{datetime.utcnow():%Y%m%d%H%M%S}"
-        filename = build_invoice_pdf_filename(safe_base)
-        file_path = os.path.join(app.config["INVOICE_PDF_FOLDER"], filename)
-        cleanup_old_pdfs(app.config["INVOICE_PDF_FOLDER"], prefix="compras-cliente-")
-        create_client_purchases_pdf(
-            file_path,
-            settings,
-            cliente,
-            facturas_data,
-            total_compras,
-            start_date,
-            end_exclusive,
-        )
-        pdf_url = url_for("static", filename=f"invoices/{filename}", _external=True)
-        return jsonify({"pdf_url": pdf_url})
-
-    def query_productos_por_cliente(cliente_id, start_date, end_exclusive):
-        rows = (
-            db.session.query(
-                Producto.codigo,
-                Producto.nombre,
-                func.sum(DetalleFacturaContado.cantidad).label("cantidad"),
-                func.sum(DetalleFacturaContado.subtotal).label("total"),
-            )
-            .join(
-                DetalleFacturaContado,
-                DetalleFacturaContado.producto_id == Producto.id,
-            )
-            .join(
-                FacturaContado,
-                FacturaContado.id == DetalleFacturaContado.factura_id,
-            )
-            .filter(FacturaContado.estado != "anulada")
-            .filter(FacturaContado.cliente_id == cliente_id)
-            .filter(FacturaContado.fecha >= start_date)
-            .filter(FacturaContado.fecha < end_exclusive)
-            .group_by(Producto.codigo, Producto.nombre)
-            .order_by(func.sum(DetalleFacturaContado.cantidad).desc())
-            .all()
-        )
-        return [
-            {
-                "codigo": row.codigo,
-                "nombre": row.nombre,
-                "cantidad": int(row.cantidad or 0),
-                "total": float(row.total or 0),
-            }
-            for row in rows
-        ]
-
-    @app.post("/reportes/productos-cliente")
-    def reportes_productos_cliente():
-        if not session.get("user"):
-            return jsonify({"error": "No autorizado"}), 401
-
-        data = request.get_json(silent=True) or {}
-        cliente_id = data.get("cliente_id")
-        if not cliente_id:
-            return jsonify({"error": "Cliente requerido"}), 400
-        try:
-            cliente_id = int(cliente_id)
-        except (TypeError, ValueError):
-            return jsonify({"error": "Cliente invalido"}), 400
-
-        start_raw = (data.get("start_date") or "").strip()
-        end_raw = (data.get("end_date") or "").strip()
-        try:
-            start_date, end_exclusive = parse_report_date_range(start_raw, end_raw)
-        except ValueError:
-            return jsonify({"error": "Rango de fechas invalido."}), 400
-
-        productos = query_productos_por_cliente(cliente_id, start_date, end_exclusive)
-        total_compras = sum(item["total"] for item in productos)
-        return jsonify({"productos": productos, "total": total_compras})
-
-    @app.post("/reportes/productos-cliente/pdf")
-    def reportes_productos_cliente_pdf():
-        if not session.get("user"):
-            return jsonify({"error": "No autorizado"}), 401
-
-        data = request.get_json(silent=True) or {}
-        cliente_id = data.get("cliente_id")
-        if not cliente_id:
-            return jsonify({"error": "Cliente requerido"}), 400
-        try:
-            cliente_id = int(cliente_id)
-        except (TypeError, ValueError):
-            return jsonify({"error": "Cliente invalido"}), 400
-
-        start_raw = (data.get("start_date") or "").strip()
-        end_raw = (data.get("end_date") or "").strip()
-        try:
-            start_date, end_exclusive = parse_report_date_range(start_raw, end_raw)
-        except ValueError:
-            return jsonify({"error": "Rango de fechas invalido."}), 400
-
-        cliente = Cliente.query.get(cliente_id)
-        if not cliente:
-            return jsonify({"error": "Cliente no encontrado"}), 404
-
-        productos = query_productos_por_cliente(cliente_id, start_date, end_exclusive)
-        total_compras = sum(item["total"] for item in productos)
-        settings = get_business_settings()
-        safe_base = f"productos-cliente-{cliente_id}-{datetime.utcnow():%Y%m%d%H%M%S}"
-        filename = build_invoice_pdf_filename(safe_base)
-        file_path = os.path.join(app.config["INVOICE_PDF_FOLDER"], filename)
-        cleanup_old_pdfs(app.config["INVOICE_PDF_FOLDER"], prefix="productos-cliente-")
-        create_products_by_client_pdf(
-            file_path, settings, cliente, productos, total_compras, start_date, end_exclusive
-        )
-        pdf_url = url_for("static", filename=f"invoices/{filename}", _external=True)
-        return jsonify({"pdf_url": pdf_url})
-
-    def create_account_statement_pdf(file_path, settings, cliente, facturas, total_saldo):
-        styles = getSampleStyleSheet()
-        doc = SimpleDocTemplate(
-            file_path,
-            pagesize=letter,
-            leftMargin=22,
-            rightMargin=22,
-            topMargin=22,
-            bottomMargin=22,
-        )
-        story = []
-        logo_path = os.path.join(app.static_folder, "assets", "logo.jpg")
-        logo_image = None
-        if os.path.exists(logo_path):
-            logo_image = Image(logo_path, width=60, height=60)
-
-        header_center = (
-            f"<b>{settings.nombre}</b><br/>"
-            f"{settings.direccion or ''}<br/>"
-            f"RTN: {settings.rtn or '-'} &nbsp;&nbsp; TEL: {settings.telefono or '-'}<br/>"
-            f"{settings.email or ''}"
-        )
-        header_right = f"<b>ESTADO DE CUENTA</b><br/>FECHA: {datetime.utcnow():%d/%m/%Y}"
-        header_table = Table(
-            [
-                [
-                    logo_image or "",
-                    Paragraph(header_center, styles["Normal"]),
-                    Paragraph(header_right, styles["Normal"]),
-                ]
-            ],
-            colWidths=[90, 300, 130],
-        )
-        header_table.setStyle(
-            TableStyle(
-                [
-                    ("VALIGN", (0, 0), (-1, -1), "TOP"),
-                    ("ALIGN", (2, 0), (2, 0), "RIGHT"),
-                    ("LINEBELOW", (0, 0), (-1, 0), 0.75, colors.black),
-                ]
-            )
-        )
-        story.append(header_table)
-        story.append(Spacer(1, 10))
-
-        cliente_line = (
-            f"<b>CLIENTE:</b> {cliente.nombre} &nbsp;&nbsp; "
-            f"<b>RTN:</b> {cliente.ruc_dni or '-'} &nbsp;&nbsp; "
-            f"<b>TEL:</b> {cliente.telefono or '-'}"
-        )
-        story.append(Paragraph(cliente_line, styles["Normal"]))
-        story.append(Spacer(1, 8))
-
-        table_data = [["FACTURA", "FECHA", "TOTAL", "ABONADO", "SALDO"]]
-        for factura in facturas:
-            table_data.append(
-                [
-                    factura["numero_factura"],
-                    factura["fecha"],
-                    f"L {factura['total']:.2f}",
-                    f"L {factura['abonado']:.2f}",
-                    f"L {factura['saldo']:.2f}",
-                ]
-            )
-        table = Table(table_data, colWidths=[120, 90, 90, 90, 90])
-        table.setStyle(
-            TableStyle(
-                [
-                    ("BOX", (0, 0), (-1, -1), 0.75, colors.black),
-                    ("LINEBELOW", (0, 0), (-1, 0), 0.6, colors.black),
-                    ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
-                    ("ALIGN", (2, 1), (-1, -1), "RIGHT"),
-                    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                    ("FONTSIZE", (0, 0), (-1, 0), 9),
-                    ("FONTSIZE", (0, 1), (-1, -1), 9),
-                ]
-            )
-        )
-        story.append(table)
-        story.append(Spacer(1, 10))
-
-        total_table = Table(
-            [["TOTAL PENDIENTE", f"L {total_saldo:.2f}"]],
-            colWidths=[150, 120],
-        )
-        total_table.setStyle(
-            TableStyle(
-                [
-                    ("ALIGN", (0, 0), (-1, -1), "RIGHT"),
-                    ("FONTNAME", (0, 0), (-1, -1), "Helvetica-Bold"),
-                    ("FONTSIZE", (0, 0), (-1, -1), 10),
-                ]
-            )
-        )
-        story.append(total_table)
-        doc.build(story)
-
-    def create_products_by_client_pdf(
-        file_path, settings, cliente, productos, total_compras, start_date, end_exclusive
-    ):
-        styles = getSampleStyleSheet()
-        doc = SimpleDocTemplate(
-            file_path,
-            pagesize=letter,
-            leftMargin=22,
-            rightMargin=22,
-            topMargin=22,
-            bottomMargin=22,
-        )
-        story = []
-        logo_path = os.path.join(app.static_folder, "assets", "logo.jpg")
-        logo_image = None
-        if os.path.exists(logo_path):
-            logo_image = Image(logo_path, width=60, height=60)
-
-        header_center = (
-            f"<b>{settings.nombre}</b><br/>"
-            f"{settings.direccion or ''}<br/>"
-            f"RTN: {settings.rtn or '-'} &nbsp;&nbsp; TEL: {settings.telefono or '-'}<br/>"
-            f"{settings.email or ''}"
-        )
-        rango_texto = (
-            f"{start_date:%d/%m/%Y} - {(end_exclusive - timedelta(days=1)):%d/%m/%Y}"
-        )
-        header_right = f"<b>PRODUCTOS POR CLIENTE</b><br/>RANGO: {rango_texto}"
-        header_table = Table(
-            [
-                [
-                    logo_image or "",
-                    Paragraph(header_center, styles["Normal"]),
-                    Paragraph(header_right, styles["Normal"]),
-                ]
-            ],
-            colWidths=[90, 300, 130],
-        )
-        header_table.setStyle(
-            TableStyle(
-                [
-                    ("VALIGN", (0, 0), (-1, -1), "TOP"),
-                    ("ALIGN", (2, 0), (2, 0), "RIGHT"),
-                    ("LINEBELOW", (0, 0), (-1, 0), 0.75, colors.black),
-                ]
-            )
-        )
-        story.append(header_table)
-        story.append(Spacer(1, 10))
-
-        cliente_line = (
-            f"<b>CLIENTE:</b> {cliente.nombre} &nbsp;&nbsp; "
-            f"<b>RTN:</b> {cliente.ruc_dni or '-'} &nbsp;&nbsp; "
-            f"<b>TEL:</b> {cliente.telefono or '-'}"
-        )
-        story.append(Paragraph(cliente_line, styles["Normal"]))
-        story.append(Spacer(1, 8))
-
-        table_data = [["CODIGO", "PRODUCTO", "UNIDADES", "TOTAL"]]
-        for producto in productos:
-            table_data.append(
-                [
-                    producto["codigo"],
-                    producto["nombre"],
-                    str(producto["cantidad"]),
-                    f"L {producto['total']:.2f}",
-                ]
-            )
-        table = Table(table_data, colWidths=[90, 230, 90, 90])
-        table.setStyle(
-            TableStyle(
-                [
-                    ("BOX", (0, 0), (-1, -1), 0.75, colors.black),
-                    ("LINEBELOW", (0, 0), (-1, 0), 0.6, colors.black),
-                    ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
-                    ("ALIGN", (2, 1), (-1, -1), "RIGHT"),
-                    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                    ("FONTSIZE", (0, 0), (-1, 0), 9),
-                    ("FONTSIZE", (0, 1), (-1, -1), 9),
-                ]
-            )
-        )
-        story.append(table)
-        story.append(Spacer(1, 10))
-
-        total_table = Table(
-            [["TOTAL COMPRADO", f"L {total_compras:.2f}"]],
-            colWidths=[150, 120],
-        )
-        total_table.setStyle(
-            TableStyle(
-                [
-                    ("ALIGN", (0, 0), (-1, -1), "RIGHT"),
-                    ("FONTNAME", (0, 0), (-1, -1), "Helvetica-Bold"),
-                    ("FONTSIZE", (0, 0), (-1, -1), 10),
-                ]
-            )
-        )
-        story.append(total_table)
-        doc.build(story)
-
-    def create_top_products_pdf(
-        file_path, settings, productos, total_vendido, start_date, end_exclusive
-    ):
-        styles = getSampleStyleSheet()
-        doc = SimpleDocTemplate(
-            file_path,
-            pagesize=letter,
-            leftMargin=22,
-            rightMargin=22,
-            topMargin=22,
-            bottomMargin=22,
-        )
-        story = []
-        logo_path = os.path.join(app.static_folder, "assets", "logo.jpg")
-        logo_image = None
-        if os.path.exists(logo_path):
-            logo_image = Image(logo_path, width=60, height=60)
-
-        header_center = (
-            f"<b>{settings.nombre}</b><br/>"
-            f"{settings.direccion or ''}<br/>"
-            f"RTN: {settings.rtn or '-'} &nbsp;&nbsp; TEL: {settings.telefono or '-'}<br/>"
-            f"{settings.email or ''}"
-        )
-        rango_texto = (
-            f"{start_date:%d/%m/%Y} - {(end_exclusive - timedelta(days=1)):%d/%m/%Y}"
-        )
-        header_right = f"<b>TOP PRODUCTOS</b><br/>RANGO: {rango_texto}"
-        header_table = Table(
-            [
-                [
-                    logo_image or "",
-                    Paragraph(header_center, styles["Normal"]),
-                    Paragraph(header_right, styles["Normal"]),
-                ]
-            ],
-            colWidths=[90, 300, 130],
-        )
-        header_table.setStyle(
-            TableStyle(
-                [
-                    ("VALIGN", (0, 0), (-1, -1), "TOP"),
-                    ("ALIGN", (2, 0), (2, 0), "RIGHT"),
-                    ("LINEBELOW", (0, 0), (-1, 0), 0.75, colors.black),
-                ]
-            )
-        )
-        story.append(header_table)
-        story.append(Spacer(1, 10))
-
-        table_data = [["CODIGO", "PRODUCTO", "UNIDADES", "TOTAL"]]
-        for producto in productos:
-            table_data.append(
-                [
-                    producto["codigo"],
-                    producto["nombre"],
-                    str(producto["cantidad"]),
-                    f"L {producto['total']:.2f}",
-                ]
-            )
-        table = Table(table_data, colWidths=[90, 230, 90, 90])
-        table.setStyle(
-            TableStyle(
-                [
-                    ("BOX", (0, 0), (-1, -1), 0.75, colors.black),
-                    ("LINEBELOW", (0, 0), (-1, 0), 0.6, colors.black),
-                    ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
-                    ("ALIGN", (2, 1), (-1, -1), "RIGHT"),
-                    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                    ("FONTSIZE", (0, 0), (-1, 0), 9),
-                    ("FONTSIZE", (0, 1), (-1, -1), 9),
-                ]
-            )
-        )
-        story.append(table)
-        story.append(Spacer(1, 10))
-
-        total_table = Table(
-            [["TOTAL VENDIDO", f"L {total_vendido:.2f}"]],
-            colWidths=[150, 120],
-        )
-        total_table.setStyle(
-            TableStyle(
-                [
-                    ("ALIGN", (0, 0), (-1, -1), "RIGHT"),
-                    ("FONTNAME", (0, 0), (-1, -1), "Helvetica-Bold"),
-                    ("FONTSIZE", (0, 0), (-1, -1), 10),
-                ]
-            )
-        )
-        story.append(total_table)
-        doc.build(story)
-
-    def create_client_purchases_pdf(
-        file_path, settings, cliente, facturas, total_compras, start_date, end_exclusive
-    ):
-        styles = getSampleStyleSheet()
-        doc = SimpleDocTemplate(
-            file_path,
-            pagesize=letter,
-            leftMargin=22,
-            rightMargin=22,
-            topMargin=22,
-            bottomMargin=22,
-        )
-        story = []
-        logo_path = os.path.join(app.static_folder, "assets", "logo.jpg")
-        logo_image = None
-        if os.path.exists(logo_path):
-            logo_image = Image(logo_path, width=60, height=60)
-
-        header_center = (
-            f"<b>{settings.nombre}</b><br/>"
-            f"{settings.direccion or ''}<br/>"
-            f"RTN: {settings.rtn or '-'} &nbsp;&nbsp; TEL: {settings.telefono or '-'}<br/>"
-            f"{settings.email or ''}"
-        )
-        rango_texto = (
-            f"{start_date:%d/%m/%Y} - {(end_exclusive - timedelta(days=1)):%d/%m/%Y}"
-        )
-        header_right = f"<b>COMPRAS POR CLIENTE</b><br/>RANGO: {rango_texto}"
-        header_table = Table(
-            [
-                [
-                    logo_image or "",
-                    Paragraph(header_center, styles["Normal"]),
-                    Paragraph(header_right, styles["Normal"]),
-                ]
-            ],
-            colWidths=[90, 300, 130],
-        )
-        header_table.setStyle(
-            TableStyle(
-                [
-                    ("VALIGN", (0, 0), (-1, -1), "TOP"),
-                    ("ALIGN", (2, 0), (2, 0), "RIGHT"),
-                    ("LINEBELOW", (0, 0), (-1, 0), 0.75, colors.black),
-                ]
-            )
-        )
-        story.append(header_table)
-        story.append(Spacer(1, 10))
-
-        cliente_line = (
-            f"<b>CLIENTE:</b> {cliente.nombre} &nbsp;&nbsp; "
-            f"<b>RTN:</b> {cliente.ruc_dni or '-'} &nbsp;&nbsp; "
-            f"<b>TEL:</b> {cliente.telefono or '-'}"
-        )
-        story.append(Paragraph(cliente_line, styles["Normal"]))
-        story.append(Spacer(1, 8))
-
-        table_data = [["FACTURA", "FECHA", "ESTADO", "TOTAL"]]
-        for factura in facturas:
-            table_data.append(
-                [
-                    factura["numero_factura"],
-                    factura["fecha"],
-                    factura["estado"],
-                    f"L {factura['total']:.2f}",
-                ]
-            )
-        table = Table(table_data, colWidths=[130, 90, 90, 90])
-        table.setStyle(
-            TableStyle(
-                [
-                    ("BOX", (0, 0), (-1, -1), 0.75, colors.black),
-                    ("LINEBELOW", (0, 0), (-1, 0), 0.6, colors.black),
-                    ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
-                    ("ALIGN", (3, 1), (3, -1), "RIGHT"),
-                    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                    ("FONTSIZE", (0, 0), (-1, 0), 9),
-                    ("FONTSIZE", (0, 1), (-1, -1), 9),
-                ]
-            )
-        )
-        story.append(table)
-        story.append(Spacer(1, 10))
-
-        total_table = Table(
-            [["TOTAL COMPRADO", f"L {total_compras:.2f}"]],
-            colWidths=[150, 120],
-        )
-        total_table.setStyle(
-            TableStyle(
-                [
-                    ("ALIGN", (0, 0), (-1, -1), "RIGHT"),
-                    ("FONTNAME", (0, 0), (-1, -1), "Helvetica-Bold"),
-                    ("FONTSIZE", (0, 0), (-1, -1), 10),
-                ]
-            )
-        )
-        story.append(total_table)
-        doc.build(story)
-
-    @app.post("/reportes/estado-cuenta/pdf")
-    def reportes_estado_cuenta_pdf():
-        if not session.get("user"):
-            return jsonify({"error": "No autorizado"}), 401
-
-        data = request.get_json(silent=True) or {}
-        cliente_id = data.get("cliente_id")
-        if not cliente_id:
-            return jsonify({"error": "Cliente requerido"}), 400
-        try:
-            cliente_id = int(cliente_id)
-        except (TypeError, ValueError):
-            return jsonify({"error": "Cliente invalido"}), 400
-
-        cliente = Cliente.query.get(cliente_id)
-        if not cliente:
-            return jsonify({"error": "Cliente no encontrado"}), 404
-
-        facturas_raw = (
-            FacturaContado.query.filter_by(estado="credito", cliente_id=cliente_id)
-            .order_by(FacturaContado.fecha.asc())
-            .all()
-        )
-        facturas_credito = []
-        total_saldo = Decimal("0")
-        for factura in facturas_raw:
-            total = Decimal(str(factura.total or 0))
-            abonado = Decimal(str(factura.pago or 0))
-            saldo = total - abonado
-            if saldo <= 0:
-                continue
-            total_saldo += saldo
-            facturas_credito.append(
-                {
-                    "numero_factura": factura.numero_factura,
-                    "fecha": factura.fecha.strftime("%d/%m/%Y")
-                    if factura.fecha
-                    else "-",
-                    "total": float(total),
-                    "abonado": float(abonado),
-                    "saldo": float(saldo),
-                }
-            )
-        settings = get_business_settings()
-        safe_base = f"estado-cuenta-{cliente_id}-{datetime.utcnow():%Y%m%d%H%M%S}"
-        filename = build_invoice_pdf_filename(safe_base)
-        file_path = os.path.join(app.config["INVOICE_PDF_FOLDER"], filename)
-        cleanup_old_pdfs(app.config["INVOICE_PDF_FOLDER"], prefix="estado-cuenta-")
-        create_account_statement_pdf(
-            file_path, settings, cliente, facturas_credito, total_saldo
-        )
-        pdf_url = url_for("static", filename=f"invoices/{filename}")
-        return jsonify({"pdf_url": pdf_url})
-
-    @app.route("/ajustes", methods=["GET", "POST"])
-    @admin_required
-    def ajustes():
-        settings = AjustesNegocio.query.first()
-        if not settings:
-            settings = AjustesNegocio(nombre="Invagro")
-            db.session.add(settings)
-            db.session.commit()
-
-        if request.method == "POST":
-            settings.nombre = request.form.get("nombre", "").strip() or "Invagro"
-            settings.rtn = request.form.get("rtn", "").strip()
-            settings.telefono = request.form.get("telefono", "").strip()
-            settings.email = request.form.get("email", "").strip()
-            settings.direccion = request.form.get("direccion", "").strip()
-            settings.cai = request.form.get("cai", "").strip()
-            settings.rango_autorizado = request.form.get("rango_autorizado", "").strip()
-            settings.rango_autorizado_inicio = request.form.get(
-                "rango_autorizado_inicio", ""
-            ).strip()
-            settings.rango_autorizado_fin = request.form.get(
-                "rango_autorizado_fin", ""
-            ).strip()
-            settings.fecha_limite_emision = request.form.get("fecha_limite_emision", "").strip()
-            settings.mensaje = request.form.get("mensaje", "").strip()
-            db.session.commit()
-            return redirect(url_for("ajustes"))
-
-        return render_template("ajustes.html", user=session["user"], settings=settings)
-
-    @app.get("/facturas/credito")
-    @admin_required
-    def facturas_credito():
-        try:
-            facturas_raw = FacturaContado.query.filter_by(estado="credito").order_by(
-                FacturaContado.fecha.desc()
-            ).all()
-        except SQLAlchemyError:
-            db.session.rollback()
-            facturas_raw = []
-        detalles_por_factura = {}
-        productos_detalle_map = {}
-        if facturas_raw:
-            try:
-                factura_ids = [factura.id for factura in facturas_raw]
-                detalles_raw = (
-                    DetalleFacturaContado.query
-                    .filter(DetalleFacturaContado.factura_id.in_(factura_ids))
-                    .order_by(DetalleFacturaContado.id.asc())
-                    .all()
-                )
-                producto_ids = list(
-                    {detalle.producto_id for detalle in detalles_raw if detalle.producto_id}
-                )
-                if producto_ids:
-                    productos_detalle_map = {
-                        producto.id: producto
-                        for producto in Producto.query.filter(Producto.id.in_(producto_ids)).all()
-                    }
-                for detalle in detalles_raw:
-                    detalles_por_factura.setdefault(detalle.factura_id, []).append(detalle)
-            except SQLAlchemyError:
-                db.session.rollback()
-                detalles_por_factura = {}
-                productos_detalle_map = {}
-        vendedores_map = build_user_name_map(
-            [factura.usuario_id for factura in facturas_raw if factura.usuario_id]
-        )
-        vendedores = get_active_vendedores()
-        facturas = []
-        for factura in facturas_raw:
-            fecha_label = factura.fecha.strftime("%d/%m/%Y") if factura.fecha else "-"
-            abonado = factura.pago or Decimal("0")
-            saldo = (factura.total or Decimal("0")) - abonado
-            items = []
-            for detalle in detalles_por_factura.get(factura.id, []):
-                producto = productos_detalle_map.get(detalle.producto_id)
-                items.append(
-                    {
-                        "codigo": producto.codigo if producto else "-",
-                        "nombre": producto.nombre if producto else "Producto no disponible",
-                        "cantidad": detalle.cantidad or 0,
-                        "precio_unitario": detalle.precio_unitario or Decimal("0"),
-                        "descuento": detalle.descuento or Decimal("0"),
-                        "subtotal": detalle.subtotal or Decimal("0"),
-                    }
-                )
-            facturas.append(
-                {
-                    "id": factura.id,
-                    "numero_factura": factura.numero_factura,
-                    "cliente_id": factura.cliente_id,
-                    "fecha": factura.fecha,
-                    "fecha_label": fecha_label,
-                    "total": factura.total,
-                    "abonado": abonado,
-                    "saldo": saldo,
-                    "estado_label": "credito",
-                    "pdf_filename": factura.pdf_filename,
-                    "vendedor": vendedores_map.get(factura.usuario_id, "General"),
-                    "vendedor_id": factura.usuario_id,
-                    "subtotal": factura.subtotal or Decimal("0"),
-                    "descuento": factura.descuento or Decimal("0"),
-                    "isv": factura.isv or Decimal("0"),
-                    "items": items,
-                }
-            )
-        clientes = Cliente.query.all()
-        clientes_map = {cliente.id: cliente.nombre for cliente in clientes}
-        recibo_filename = request.args.get("recibo")
-        recibo_url = None
-        whatsapp_url = None
-        if recibo_filename:
-            recibo_url = url_for("receipt_file", filename=recibo_filename)
-            full_link = request.url_root.rstrip("/") + recibo_url
-            whatsapp_url = (
-                "https://wa.me/?text="
-                + urllib.parse.quote(f"Recibo de cobro: {full_link}")
-            )
-        return render_template(
-            "facturas_credito.html",
-            user=session["user"],
-            facturas=facturas,
-            clientes_map=clientes_map,
-            vendedores=vendedores,
-            recibo_url=recibo_url,
-            whatsapp_url=whatsapp_url,
-        )
-
-    @app.get("/pagos")
+    @app.post("/usuarios/<int:usuario_id>/delete")
     @admin_required
-    def pagos():
+    def eliminar_usuario(usuario_id):
+        usuario = User.query.get_or_404(usuario_id)
+        # No permitir auto-eliminación
+        if usuario.username == session.get("user"):
+            return redirect(url_for("usuarios"))
+        # No permitir quedarse sin admin
+        if usuario.rol == "admin":
+            admins_activos = User.query.filter(
+                User.rol == "admin",
+                User.activo == True,  # noqa: E712
+                User.id != usuario.id,
+            ).count()
+            if admins_activos == 0:
+                return redirect(url_for("usuarios"))
         try:
-            pagos_raw = (
-                db.session.query(AbonoFactura, FacturaContado, Cliente, User)
-                .outerjoin(FacturaContado, AbonoFactura.factura_id == FacturaContado.id)
-                .outerjoin(Cliente, FacturaContado.cliente_id == Cliente.id)
-                .outerjoin(User, AbonoFactura.usuario_id == User.id)
-                .order_by(AbonoFactura.fecha.desc())
-                .all()
-            )
+            usuario.activo = False
+            db.session.commit()
+            invalidate_user_directory()
         except SQLAlchemyError:
             db.session.rollback()
-            pagos_raw = []
+        return redirect(url_for("usuarios"))
 
-        vendedores_map = build_user_name_map(
-            [
-                factura.usuario_id
-                for _, factura, _, _ in pagos_raw
-                if factura and factura.usuario_id
-            ]
-        )
-        pagos_view = []
-        for abono, factura, cliente, usuario in pagos_raw:
-            fecha = abono.fecha if abono else None
-            fecha_label = fecha.strftime("%d/%m/%Y") if fecha else "-"
-            fecha_iso = fecha.strftime("%Y-%m-%d") if fecha else ""
-            numero_factura = factura.numero_factura if factura else "-"
-            cliente_nombre = cliente.nombre if cliente else "N/A"
-            usuario_nombre = get_user_display_name(usuario, fallback="N/A")
-            saldo = Decimal("0")
-            if factura:
-                saldo = (factura.total or Decimal("0")) - (factura.pago or Decimal("0"))
-            recibo_filename = None
-            recibo_url = None
-            receipts_folder = app.config.get("RECEIPT_PDF_FOLDER")
-            if factura and abono and receipts_folder:
-                recibo_filename = build_receipt_pdf_filename(
-                    factura.numero_factura, abono.id
-                )
-                recibo_path = os.path.join(receipts_folder, recibo_filename)
-                if os.path.isfile(recibo_path):
-                    recibo_url = url_for("receipt_file", filename=recibo_filename)
-            pagos_view.append(
+    # Sugerencias de /buscar/clientes y /buscar/productos: índice en memoria
+    # por worker (TYPEAHEAD_TTL) en lugar de mandar la tabla entera a la página.
+    def load_client_suggestions():
+        rows = db.session.query(Cliente.id, Cliente.nombre, Cliente.ruc_dni, Cliente.telefono).all()
+        return [
+            (
+                row.id,
+                row.nombre,
+                (row.ruc_dni, row.telefono),
                 {
-                    "fecha_label": fecha_label,
-                    "fecha_iso": fecha_iso,
-                    "numero_factura": numero_factura,
-                    "cliente": cliente_nombre,
-                    "monto": abono.monto if abono else Decimal("0"),
-                    "saldo": saldo,
-                    "usuario": usuario_nombre,
-                    "vendedor": (
-                        vendedores_map.get(factura.usuario_id, "General")
-                        if factura
-                        else "General"
-                    ),
-                    "recibo_url": recibo_url,
-                }
+                    "id": row.id,
+                    "nombre": row.nombre,
+                    "rtn": row.ruc_dni or "",
+                    "telefono": row.telefono or "",
+                },
             )
+            for row in rows
+        ]
 
-        return render_template(
-            "pagos.html",
-            user=session["user"],
-            pagos=pagos_view,
-        )
-
-    @app.get("/comisiones")
-    @admin_required
-    def comisiones():
-        today = datetime.utcnow().date()
-        first_day = today.replace(day=1)
-
-        fecha_inicio_raw = (request.args.get("fecha_inicio") or first_day.isoformat()).strip()
-        fecha_fin_raw = (request.args.get("fecha_fin") or today.isoformat()).strip()
-        vendedor_id_raw = (request.args.get("vendedor_id") or "").strip()
-        porcentaje_raw = (request.args.get("porcentaje") or "5").strip()
-
-        try:
-            fecha_inicio = datetime.strptime(fecha_inicio_raw, "%Y-%m-%d")
-        except ValueError:
-            fecha_inicio = datetime.combine(first_day, datetime.min.time())
-            fecha_inicio_raw = first_day.isoformat()
-        try:
-            fecha_fin_date = datetime.strptime(fecha_fin_raw, "%Y-%m-%d")
-        except ValueError:
-            fecha_fin_date = datetime.combine(today, datetime.min.time())
-            fecha_fin_raw = today.isoformat()
-        fecha_fin = fecha_fin_date.replace(hour=23, minute=59, second=59, microsecond=999999)
-
-        try:
-            porcentaje = Decimal(porcentaje_raw)
-        except Exception:
-            porcentaje = Decimal("5")
-            porcentaje_raw = "5"
-        porcentaje = max(Decimal("0"), min(Decimal("100"), porcentaje))
-
-        vendedores = get_active_vendedores()
-        vendedores_map = {vendedor.id: get_user_display_name(vendedor) for vendedor in vendedores}
-        vendedor_id = None
-        if vendedor_id_raw.isdigit():
-            posible_id = int(vendedor_id_raw)
-            if posible_id in vendedores_map:
-                vendedor_id = posible_id
-
-        try:
-            pagos_raw = (
-                db.session.query(AbonoFactura, FacturaContado, Cliente, User)
-                .join(FacturaContado, AbonoFactura.factura_id == FacturaContado.id)
-                .outerjoin(Cliente, FacturaContado.cliente_id == Cliente.id)
-                .join(User, AbonoFactura.usuario_id == User.id)
-                .filter(
-                    User.rol == "vendedor",
-                    AbonoFactura.fecha >= fecha_inicio,
-                    AbonoFactura.fecha <= fecha_fin,
-                )
-                .order_by(AbonoFactura.fecha.desc())
+    def load_product_suggestions():
+        rows = (
+            db.session.query(
+                Producto.id,
+                Producto.codigo,
+                Producto.nombre,
+                Producto.categoria,
+                Producto.precio,
+                Producto.isv_aplica,
             )
-            if vendedor_id:
-                pagos_raw = pagos_raw.filter(AbonoFactura.usuario_id == vendedor_id)
-            pagos_raw = pagos_raw.all()
-        except SQLAlchemyError:
-            db.session.rollback()
-            pagos_raw = []
-
-        vendedores_venta_map = build_user_name_map(
-            [
-                factura.usuario_id
-                for _, factura, _, _ in pagos_raw
-                if factura and factura.usuario_id
-            ]
+            .filter(Producto.activo == True)  # noqa: E712
+            .all()
         )
-        porcentaje_factor = porcentaje / Decimal("100")
-        total_cobrado = Decimal("0")
-        total_comision = Decimal("0")
-        breakdown = {}
-        commission_rows = []
-
-        for abono, factura, cliente, cobrador in pagos_raw:
-            monto = abono.monto or Decimal("0")
-            comision = (monto * porcentaje_factor).quantize(Decimal("0.01"))
-            cobrador_nombre = get_user_display_name(cobrador, fallback="N/A")
-            vendedor_venta = (
-                vendedores_venta_map.get(factura.usuario_id, "General")
-                if factura
-                else "General"
-            )
-            total_cobrado += monto
-            total_comision += comision
-            bucket = breakdown.setdefault(
-                cobrador_nombre,
-                {"vendedor": cobrador_nombre, "cobrado": Decimal("0"), "comision": Decimal("0"), "cantidad": 0},
-            )
-            bucket["cobrado"] += monto
-            bucket["comision"] += comision
-            bucket["cantidad"] += 1
-            commission_rows.append(
+        return [
+            (
+                row.id,
+                row.nombre,
+                (row.codigo,),
                 {
-                    "fecha_label": abono.fecha.strftime("%d/%m/%Y") if abono.fecha else "-",
-                    "numero_factura": factura.numero_factura if factura else "-",
-                    "cliente": cliente.nombre if cliente else "N/A",
-                    "vendedor_venta": vendedor_venta,
-                    "cobrador": cobrador_nombre,
-                    "monto": monto,
-                    "comision": comision,
-                }
-            )
-
-        breakdown_rows = sorted(
-            breakdown.values(),
-            key=lambda item: (item["cobrado"], item["cantidad"]),
-            reverse=True,
-        )
-
-        return render_template(
-            "comisiones.html",
-            user=session["user"],
-            vendedores=vendedores,
-            vendedor_id=vendedor_id,
-            porcentaje=porcentaje,
-            fecha_inicio=fecha_inicio_raw,
-            fecha_fin=fecha_fin_raw,
-            commission_rows=commission_rows,
-            breakdown_rows=breakdown_rows,
-            total_cobrado=total_cobrado,
-            total_comision=total_comision,
-            total_cobros=len(commission_rows),
-        )
-
-    @app.route("/cobros-personales", methods=["GET", "POST"])
-    def cobros_personales():
-        if not session.get("user"):
-            return redirect(url_for("login"))
-
-        if request.method == "POST":
-            detail_descriptions = request.form.getlist("detalle_descripcion")
-            detail_quantities = request.form.getlist("detalle_cantidad")
-            detail_unit_prices = request.form.getlist("detalle_precio_unitario")
-            detail_items = []
-            detail_count = max(
-                len(detail_descriptions),
-                len(detail_quantities),
-                len(detail_unit_prices),
-                1,
+                    "id": row.id,
+                    "codigo": row.codigo,
+                    "nombre": row.nombre,
+                    "categoria": row.categoria or "",
+                    "precio": float(row.precio or 0),
+                    "isv_aplica": bool(row.isv_aplica),
+                },
             )
-            for index in range(detail_count):
-                detail_items.append(
-                    {
-                        "descripcion": (
-                            detail_descriptions[index] if index < len(detail_descriptions) else ""
-                        ).strip(),
-                        "cantidad": (
-                            detail_quantities[index] if index < len(detail_quantities) else ""
-                        ).strip()
-                        or "1",
-                        "precio_unitario": (
-                            detail_unit_prices[index] if index < len(detail_unit_prices) else ""
-                        ).strip(),
-                    }
-                )
-
-            form_values = {
-                "cliente_id": (request.form.get("cliente_id") or "").strip(),
-                "nombre": (request.form.get("nombre") or "").strip(),
-                "concepto": (request.form.get("concepto") or "").strip(),
-                "telefono": (request.form.get("telefono") or "").strip(),
-                "fecha_vencimiento": (request.form.get("fecha_vencimiento") or "").strip(),
-                "total": (request.form.get("total") or "").strip(),
-                "observaciones": (request.form.get("observaciones") or "").strip(),
-                "detalle_items": detail_items,
-            }
-            try:
-                raw_items, parsed_items, total = parse_personal_charge_items(request.form)
-                form_values["detalle_items"] = raw_items
-                form_values["total"] = f"{total:.2f}"
-            except ValueError as exc:
-                return render_template(
-                    "cobros_personales.html",
-                    user=session["user"],
-                    **build_personal_charges_context(
-                        form_values=form_values,
-                        error=str(exc),
-                    ),
-                )
-
-            selected_cliente = None
-            cliente_id = None
-            if form_values["cliente_id"]:
-                try:
-                    cliente_id = int(form_values["cliente_id"])
-                except ValueError:
-                    return render_template(
-                        "cobros_personales.html",
-                        user=session["user"],
-                        **build_personal_charges_context(
-                            form_values=form_values,
-                            error="Selecciona un cliente valido.",
-                        ),
-                    )
-                selected_cliente = Cliente.query.get(cliente_id)
-                if not selected_cliente:
-                    return render_template(
-                        "cobros_personales.html",
-                        user=session["user"],
-                        **build_personal_charges_context(
-                            form_values=form_values,
-                            error="No se encontro el cliente seleccionado.",
-                        ),
-                    )
-                form_values["nombre"] = selected_cliente.nombre
-                if selected_cliente.telefono:
-                    form_values["telefono"] = selected_cliente.telefono
-
-            if not form_values["nombre"] or not form_values["total"]:
-                return render_template(
-                    "cobros_personales.html",
-                    user=session["user"],
-                    **build_personal_charges_context(
-                        form_values=form_values,
-                        error="Completa el nombre y al menos una linea del cobro.",
-                    ),
-                )
-
-            if total <= 0:
-                return render_template(
-                    "cobros_personales.html",
-                    user=session["user"],
-                    **build_personal_charges_context(
-                        form_values=form_values,
-                        error="El monto total del cobro debe ser mayor a cero.",
-                    ),
-                )
+            for row in rows
+        ]
 
-            fecha_vencimiento = None
-            if form_values["fecha_vencimiento"]:
-                try:
-                    fecha_vencimiento = datetime.strptime(
-                        form_values["fecha_vencimiento"], "%Y-%m-%d"
-                    ).date()
-                except ValueError:
-                    return render_template(
-                        "cobros_personales.html",
-                        user=session["user"],
-                        **build_personal_charges_context(
-                            form_values=form_values,
-                            error="La fecha de vencimiento no es valida.",
-                        ),
-                    )
+    client_suggestions = TypeaheadIndex(load_client_suggestions, ttl_seconds=app.config["TYPEAHEAD_TTL"])
+    product_suggestions = TypeaheadIndex(load_product_suggestions, ttl_seconds=app.config["TYPEAHEAD_TTL"])
 
-            try:
-                usuario = User.query.filter_by(username=session["user"]).first()
-                concepto_resumen = form_values["concepto"] or parsed_items[0]["descripcion"]
-                cobro = CobroPersonal(
-                    numero_cobro=generate_personal_charge_number(),
-                    cliente_id=cliente_id,
-                    nombre=form_values["nombre"],
-                    concepto=concepto_resumen,
-                    telefono=form_values["telefono"] or None,
-                    fecha=datetime.utcnow(),
-                    fecha_vencimiento=fecha_vencimiento,
-                    total=total,
-                    saldo=total,
-                    observaciones=form_values["observaciones"] or None,
-                    usuario_id=usuario.id if usuario else None,
-                    estado="pendiente",
-                )
-                db.session.add(cobro)
-                db.session.flush()
-                for item in parsed_items:
-                    db.session.add(
-                        CobroPersonalDetalle(
-                            cobro_id=cobro.id,
-                            descripcion=item["descripcion"],
-                            cantidad=item["cantidad"],
-                            precio_unitario=item["precio_unitario"],
-                            subtotal=item["subtotal"],
-                        )
-                    )
-                db.session.commit()
-            except SQLAlchemyError:
-                db.session.rollback()
-                return render_template(
-                    "cobros_personales.html",
-                    user=session["user"],
-                    **build_personal_charges_context(
-                        form_values=form_values,
-                        error="No se pudo guardar el cobro personal.",
-                    ),
-                )
+    def suggestions_response(index):
+        limit = request.args.get("limit", 10, type=int) or 10
+        limit = min(max(1, limit), app.config["TYPEAHEAD_MAX_RESULTS"])
+        results = index.search((request.args.get("q") or "")[:80], limit=limit)
+        response = jsonify({"results": results})
+        response.cache_control.private = True
+        response.cache_control.max_age = app.config["TYPEAHEAD_TTL"]
+        return response
 
-            return redirect(url_for("cobros_personales", status="created"))
+    @app.get("/buscar/clientes")
+    @login_required
+    def buscar_clientes():
+        """Clientes que coinciden con `q` (sin acentos ni mayúsculas), hasta `limit`."""
+        return suggestions_response(client_suggestions)
 
+    @app.get("/buscar/productos")
+    @login_required
+    def buscar_productos():
+        """Productos activos por nombre o código, hasta `limit`."""
+        return suggestions_response(product_suggestions)
+
+    def render_clientes_page(error=None, import_result=None):
+        # Sin búsqueda solo los más recientes; con `q`, las coincidencias del índice.
+        query = (request.args.get("q") or "").strip()
+        limite = app.config["CLIENT_LIST_LIMIT"]
+        if query:
+            ids = [item["id"] for item in client_suggestions.search(query, limit=limite)]
+            por_id = {
+                cliente.id: cliente
+                for cliente in Cliente.query.filter(Cliente.id.in_(ids)).all()
+            } if ids else {}
+            clientes_list = [por_id[cliente_id] for cliente_id in ids if cliente_id in por_id]
+        else:
+            clientes_list = Cliente.query.order_by(Cliente.id.desc()).limit(limite).all()
         return render_template(
-            "cobros_personales.html",
+            "clientes.html",
             user=session["user"],
-            **build_personal_charges_context(
-                status_code=(request.args.get("status") or "").strip().lower()
-            ),
+            clientes=clientes_list,
+            query=query,
+            limite=limite,
+            error=error,
+            import_result=import_result,
         )
 
-    @app.post("/cobros-personales/<int:cobro_id>/abonos")
-    def registrar_abono_cobro_personal(cobro_id):
-        if not session.get("user"):
-            return redirect(url_for("login"))
-
-        try:
-            monto = Decimal((request.form.get("monto") or "0").strip())
-        except Exception:
-            return redirect(url_for("cobros_personales", status="invalid_amount"))
-
-        comentario = (request.form.get("comentario") or "").strip() or None
-
-        try:
-            cobro = CobroPersonal.query.get_or_404(cobro_id)
-        except Exception:
-            return redirect(url_for("cobros_personales", status="invalid_charge"))
-
-        if cobro.estado != "pendiente":
-            return redirect(url_for("cobros_personales", status="closed_charge"))
-
-        saldo_actual = cobro.saldo or Decimal("0")
-        if monto <= 0 or monto > saldo_actual:
-            return redirect(url_for("cobros_personales", status="invalid_amount"))
-
-        try:
-            usuario = User.query.filter_by(username=session["user"]).first()
-            abono = AbonoCobroPersonal(
-                cobro_id=cobro.id,
-                usuario_id=usuario.id if usuario else None,
-                monto=monto,
-                comentario=comentario,
-                fecha=datetime.utcnow(),
-            )
-            db.session.add(abono)
-            cobro.saldo = saldo_actual - monto
-            if cobro.saldo <= 0:
-                cobro.saldo = Decimal("0")
-                cobro.estado = "pagado"
-            db.session.commit()
-        except SQLAlchemyError:
-            db.session.rollback()
-            return redirect(url_for("cobros_personales", status="payment_error"))
-
-        return redirect(url_for(
-            "cobro_personal_detalle", cobro_id=cobro.id, status="payment_recorded"
-        ))
-
-    @app.get("/cobros-personales/<int:cobro_id>/orden")
-    def imprimir_orden_cobro_personal(cobro_id):
-        if not session.get("user"):
-            return redirect(url_for("login"))
-
-        try:
-            cobro = CobroPersonal.query.get_or_404(cobro_id)
-            usuario = User.query.get(cobro.usuario_id) if cobro.usuario_id else None
-            settings = get_business_settings()
-            details = (
-                CobroPersonalDetalle.query.filter_by(cobro_id=cobro.id)
-                .order_by(CobroPersonalDetalle.id.asc())
-                .all()
-            )
-        except SQLAlchemyError:
-            db.session.rollback()
-            return redirect(url_for("cobros_personales", status="invalid_charge"))
-
-        safe_base = f"orden-entrega-{cobro.id}-{datetime.utcnow():%Y%m%d%H%M%S}"
-        filename = build_invoice_pdf_filename(safe_base)
-        file_path = os.path.join(app.config["INVOICE_PDF_FOLDER"], filename)
-        cleanup_old_pdfs(app.config["INVOICE_PDF_FOLDER"], prefix="orden-entrega-")
-        create_personal_charge_order_pdf(file_path, settings, cobro, usuario, details)
-        return redirect(url_for("static", filename=f"invoices/{filename}"))
-
-    @app.get("/receipts/<path:filename>")
-    def receipt_file(filename):
-        if not session.get("user"):
-            return redirect(url_for("login"))
-        folder = app.config.get("RECEIPT_PDF_FOLDER")
-        if not folder or not os.path.isdir(folder):
-            abort(404)
-        return send_from_directory(folder, filename, as_attachment=False)
-
-    @app.post("/facturas/credito/<int:factura_id>/cobrar")
-    def cobrar_factura_credito(factura_id):
-        if not session.get("user"):
-            return redirect(url_for("login"))
-
-        try:
-            factura = FacturaContado.query.get_or_404(factura_id)
-        except SQLAlchemyError:
-            db.session.rollback()
-            return redirect(url_for("facturas_credito"))
-        if factura.estado != "credito":
-            return redirect(url_for("facturas_credito"))
-
-        recibo_filename = None
-        try:
-            usuario = User.query.filter_by(username=session["user"]).first()
-            cobrador_id_raw = (request.form.get("cobrador_id") or "").strip()
-            cobrador = usuario
-            if cobrador_id_raw.isdigit():
-                posible_cobrador = User.query.get(int(cobrador_id_raw))
-                if posible_cobrador and posible_cobrador.activo:
-                    cobrador = posible_cobrador
-            usuario_id = cobrador.id if cobrador else None
-            saldo = (factura.total or Decimal("0")) - (factura.pago or Decimal("0"))
-            if saldo > 0:
-                abono = AbonoFactura(
-                    factura_id=factura.id,
-                    usuario_id=usuario_id,
-                    monto=saldo,
-                    fecha=datetime.utcnow(),
-                )
-                db.session.add(abono)
-                db.session.flush()
-            factura.estado = "pagada"
-            factura.pago = factura.total
-            factura.cambio = Decimal("0")
-            db.session.commit()
-            if saldo > 0:
-                try:
-                    settings = get_business_settings()
-                    cliente = (
-                        Cliente.query.get(factura.cliente_id)
-                        if factura.cliente_id
-                        else None
-                    )
-                    recibo_filename = generate_receipt_pdf(
-                        settings,
-                        factura,
-                        cliente,
-                        cobrador,
-                        saldo,
-                        Decimal("0"),
-                        abono.id,
-                    )
-                except Exception:
-                    app.logger.exception("No se pudo generar recibo de cobro.")
-        except SQLAlchemyError:
-            db.session.rollback()
-        if recibo_filename:
-            return redirect(url_for("facturas_credito", recibo=recibo_filename))
-        return redirect(url_for("facturas_credito"))
-
-    @app.post("/facturas/credito/<int:factura_id>/abonos")
-    def registrar_abono_factura(factura_id):
-        if not session.get("user"):
-            return redirect(url_for("login"))
-
-        try:
-            monto_raw = request.form.get("monto", "0").strip()
-            monto = Decimal(monto_raw)
-        except Exception:
-            return redirect(url_for("facturas_credito"))
-        if monto <= 0:
-            return redirect(url_for("facturas_credito"))
-
-        factura = FacturaContado.query.get_or_404(factura_id)
-        if factura.estado != "credito":
-            return redirect(url_for("facturas_credito"))
-
-        pago_actual = factura.pago or Decimal("0")
-        saldo = (factura.total or Decimal("0")) - pago_actual
-        if monto > saldo:
-            return redirect(url_for("facturas_credito"))
-
-        recibo_filename = None
-        try:
-            usuario = User.query.filter_by(username=session["user"]).first()
-            cobrador_id_raw = (request.form.get("cobrador_id") or "").strip()
-            cobrador = usuario
-            if cobrador_id_raw.isdigit():
-                posible_cobrador = User.query.get(int(cobrador_id_raw))
-                if posible_cobrador and posible_cobrador.activo:
-                    cobrador = posible_cobrador
-            usuario_id = cobrador.id if cobrador else None
-            abono = AbonoFactura(
-                factura_id=factura.id,
-                usuario_id=usuario_id,
-                monto=monto,
-                fecha=datetime.utcnow(),
-            )
-            db.session.add(abono)
-            db.session.flush()
-            factura.pago = pago_actual + monto
-            nuevo_saldo = saldo - monto
-            if nuevo_saldo <= 0:
-                factura.estado = "pagada"
-                factura.cambio = Decimal("0")
-            db.session.commit()
-            try:
-                settings = get_business_settings()
-                cliente = (
-                    Cliente.query.get(factura.cliente_id)
-                    if factura.cliente_id
-                    else None
-                )
-                recibo_filename = generate_receipt_pdf(
-                    settings,
-                    factura,
-                    cliente,
-                    cobrador,
-                    monto,
-                    max(Decimal("0"), nuevo_saldo),
-                    abono.id,
-                )
-            except Exception:
-                app.logger.exception("No se pudo generar recibo de abono.")
-        except SQLAlchemyError:
-            db.session.rollback()
-        if recibo_filename:
-            return redirect(url_for("facturas_credito", recibo=recibo_filename))
-        return redirect(url_for("facturas_credito"))
-
-    @app.get("/facturas/historial")
-    @admin_required
-    def facturas_historial():
-        try:
-            facturas_contado = FacturaContado.query.order_by(
-                FacturaContado.fecha.desc()
-            ).all()
-        except SQLAlchemyError:
-            db.session.rollback()
-            facturas_contado = []
-        detalles_historial_map = {}
-        productos_historial_map = {}
-        if facturas_contado:
-            try:
-                factura_ids = [factura.id for factura in facturas_contado]
-                detalles_historial = (
-                    DetalleFacturaContado.query
-                    .filter(DetalleFacturaContado.factura_id.in_(factura_ids))
-                    .order_by(DetalleFacturaContado.id.asc())
-                    .all()
-                )
-                producto_ids = list(
-                    {
-                        detalle.producto_id
-                        for detalle in detalles_historial
-                        if detalle.producto_id
-                    }
-                )
-                if producto_ids:
-                    productos_historial_map = {
-                        producto.id: producto
-                        for producto in Producto.query.filter(
-                            Producto.id.in_(producto_ids)
-                        ).all()
-                    }
-                for detalle in detalles_historial:
-                    detalles_historial_map.setdefault(
-                        detalle.factura_id, []
-                    ).append(detalle)
-            except SQLAlchemyError:
-                db.session.rollback()
-                detalles_historial_map = {}
-                productos_historial_map = {}
-        vendedores_map = build_user_name_map(
-            [factura.usuario_id for factura in facturas_contado if factura.usuario_id]
-        )
-        facturas = []
-        clientes = Cliente.query.all()
-        clientes_map = {
-            cliente.id: clean_conflict_artifacts(cliente.nombre, fallback="Cliente sin nombre")
-            for cliente in clientes
-        }
-        for factura in facturas_contado:
-            fecha_label = factura.fecha.strftime("%d/%m/%Y") if factura.fecha else "-"
-            total = factura.total or Decimal("0")
-            pagado_raw = factura.pago or Decimal("0")
-            abonado = min(total, pagado_raw)
-            saldo = max(Decimal("0"), total - abonado)
-            items = []
-            for detalle in detalles_historial_map.get(factura.id, []):
-                producto = productos_historial_map.get(detalle.producto_id)
-                items.append(
-                    {
-                        "codigo": producto.codigo if producto else "-",
-                        "nombre": producto.nombre if producto else "Producto no disponible",
-                        "cantidad": detalle.cantidad or 0,
-                        "precio_unitario": detalle.precio_unitario or Decimal("0"),
-                        "descuento": detalle.descuento or Decimal("0"),
-                        "subtotal": detalle.subtotal or Decimal("0"),
-                    }
-                )
-            if factura.estado == "credito":
-                estado_label = "credito"
-            elif factura.estado == "pagada":
-                estado_label = "pagada"
-            elif factura.estado == "anulada":
-                estado_label = "anulada"
-            else:
-                estado_label = "contado"
-            facturas.append(
-                {
-                    "id": factura.id,
-                    "tipo": "credito" if estado_label == "credito" else "contado",
-                    "numero_factura": clean_conflict_artifacts(
-                        factura.numero_factura, fallback="Sin numero"
-                    ),
-                    "cliente_id": factura.cliente_id,
-                    "cliente": clientes_map.get(factura.cliente_id, "Cliente no disponible"),
-                    "fecha": factura.fecha,
-                    "fecha_label": fecha_label,
-                    "subtotal": factura.subtotal or Decimal("0"),
-                    "descuento": factura.descuento or Decimal("0"),
-                    "isv": factura.isv or Decimal("0"),
-                    "total": total,
-                    "abonado": abonado,
-                    "saldo": saldo,
-                    "items": items,
-                    "estado_label": clean_conflict_artifacts(
-                        estado_label.upper(), fallback="SIN ESTADO"
-                    ),
-                    "pdf_filename": factura.pdf_filename,
-                    "vendedor": clean_conflict_artifacts(
-                        vendedores_map.get(factura.usuario_id, "General"),
-                        fallback="General",
-                    ),
-                }
-            )
-        facturas.sort(
-            key=lambda item: item.get("fecha") or datetime.min,
-            reverse=True,
-        )
+    def render_productos_page(error=None, import_result=None):
+        productos_list = Producto.query.filter_by(activo=True).order_by(Producto.id.desc()).all()
+        categorias_list = Categoria.query.filter_by(activo=True).order_by(
+            Categoria.nombre.asc()
+        ).all()
         return render_template(
-            "facturas_historial.html",
+            "productos.html",
             user=session["user"],
-            facturas=facturas,
+            productos=productos_list,
+            categorias=categorias_list,
+            error=error,
+            import_result=import_result,
         )
 
-    @app.get("/facturas/<int:factura_id>/detalle")
-    @admin_required
-    def factura_detalle(factura_id):
-        factura = FacturaContado.query.get_or_404(factura_id)
-        cliente = Cliente.query.get(factura.cliente_id) if factura.cliente_id else None
-        vendedor = User.query.get(factura.usuario_id) if factura.usuario_id else None
-        detalles = (
-            DetalleFacturaContado.query
-            .filter_by(factura_id=factura.id)
-            .order_by(DetalleFacturaContado.id.asc())
-            .all()
-        )
-        producto_ids = [detalle.producto_id for detalle in detalles if detalle.producto_id]
-        productos = {
-            producto.id: producto
-            for producto in Producto.query.filter(Producto.id.in_(producto_ids)).all()
-        } if producto_ids else {}
-
-        items = []
-        unidades = 0
-        total_productos = Decimal("0")
-        for detalle in detalles:
-            producto = productos.get(detalle.producto_id)
-            subtotal_linea = detalle.subtotal or Decimal("0")
-            cantidad = detalle.cantidad or 0
-            unidades += cantidad
-            total_productos += subtotal_linea
-            items.append(
-                {
-                    "codigo": producto.codigo if producto else "-",
-                    "nombre": producto.nombre if producto else "Producto no disponible",
-                    "cantidad": cantidad,
-                    "precio_unitario": detalle.precio_unitario or Decimal("0"),
-                    "descuento": detalle.descuento or Decimal("0"),
-                    "subtotal": subtotal_linea,
-                    "participacion": 0,
-                }
-            )
-        for item in items:
-            item["participacion"] = (
-                float(item["subtotal"] / total_productos * 100)
-                if total_productos > 0 else 0
-            )
-        items_analisis = sorted(
-            items, key=lambda item: item["subtotal"], reverse=True
-        )[:6]
-
-        total = factura.total or Decimal("0")
-        pagado = min(total, factura.pago or Decimal("0"))
-        saldo = max(Decimal("0"), total - pagado)
-        porcentaje_pagado = float(pagado / total * 100) if total > 0 else 0
-        estado = (factura.estado or "contado").upper()
-
-        abonos_db = (
-            AbonoFactura.query
-            .filter_by(factura_id=factura.id)
-            .order_by(AbonoFactura.fecha.asc(), AbonoFactura.id.asc())
-            .all()
-        )
-        usuarios_abono = build_user_name_map(
-            [abono.usuario_id for abono in abonos_db if abono.usuario_id]
-        )
-        receipts_folder = app.config.get("RECEIPT_PDF_FOLDER")
-        abonos = []
-        for abono in abonos_db:
-            recibo_filename = build_receipt_pdf_filename(
-                factura.numero_factura, abono.id
-            )
-            recibo_disponible = bool(
-                receipts_folder
-                and os.path.isfile(os.path.join(receipts_folder, recibo_filename))
-            )
-            abonos.append(
-                {
-                    "id": abono.id,
-                    "fecha": abono.fecha,
-                    "monto": abono.monto or Decimal("0"),
-                    "usuario": usuarios_abono.get(abono.usuario_id, "General") or "General",
-                    "recibo_url": url_for(
-                        "receipt_file", filename=recibo_filename
-                    ) if recibo_disponible else None,
-                }
+    def run_csv_import(kind):
+        """Importa el CSV subido en `archivo`; devuelve (error, resumen)."""
+        from bulk_import import import_csv
+
+        upload = request.files.get("archivo")
+        if not upload or not upload.filename:
+            return "Selecciona un archivo CSV.", None
+        encoding = "latin-1" if request.form.get("encoding") == "latin-1" else "utf-8-sig"
+        decimal = request.form.get("decimal") if request.form.get("decimal") in {",", "."} else None
+        stream = io.TextIOWrapper(upload.stream, encoding=encoding, newline="")
+
+        def log_progress(result):
+            app.logger.info(
+                "import %s: %s filas, %s nuevas, %s actualizadas, %s con error (%.0f filas/s)",
+                kind,
+                result["total"],
+                result["inserted"],
+                result["updated"],
+                result["error_count"],
+                result["rows_per_second"],
             )
 
-        vendedor_nombre = (
-            (vendedor.nombre_completo or vendedor.username) if vendedor else "General"
-        ) or "General"
-        return render_template(
-            "factura_detalle.html",
-            user=session["user"],
-            factura=factura,
-            cliente=cliente,
-            vendedor=vendedor_nombre,
-            items=items,
-            items_analisis=items_analisis,
-            unidades=unidades,
-            total=total,
-            pagado=pagado,
-            saldo=saldo,
-            porcentaje_pagado=porcentaje_pagado,
-            estado=estado,
-            abonos=abonos,
-        )
+        try:
+            result = import_csv(
+                db.session,
+                kind,
+                stream,
+                batch_size=app.config["IMPORT_BATCH_SIZE"],
+                progress=log_progress,
+                decimal=decimal,
+                usuario_id=current_user_id(),
+            )
+        except UnicodeDecodeError:
+            db.session.rollback()
+            return (
+                "El archivo no esta en UTF-8; vuelve a subirlo con la codificacion Windows "
+                "(las filas anteriores al error ya se guardaron).",
+                None,
+            )
+        except ValueError as exc:
+            return str(exc), None
+        return None, result
 
-    @app.route("/facturas/<path:factura_ref>/delete", methods=["POST", "GET"])
-    def eliminar_factura(factura_ref):
+    @app.route("/clientes", methods=["GET", "POST"])
+    def clientes():
         if not session.get("user"):
             return redirect(url_for("login"))
 
-        tipo = (request.form.get("tipo", "") or "").strip().lower()
-        ref = factura_ref.strip()
-        factura_id = None
-        numero_ref = None
+        error = None
+        if request.method == "POST":
+            nombre = request.form.get("nombre", "").strip()
+            ruc_dni = request.form.get("ruc_dni", "").strip() or None
+            direccion = request.form.get("direccion", "").strip() or None
+            telefono = request.form.get("telefono", "").strip() or None
+            email = request.form.get("email", "").strip() or None
 
-        if "/" in ref and not tipo:
-            factura = FacturaContado.query.filter_by(numero_factura=ref).first()
-            if factura:
+            if not nombre:
+                error = "El nombre del cliente es obligatorio."
+            else:
                 try:
-                    DetalleFacturaContado.query.filter_by(
-                        factura_id=factura.id
-                    ).delete(synchronize_session=False)
-                    db.session.delete(factura)
+                    cliente = Cliente(
+                        nombre=nombre,
+                        ruc_dni=ruc_dni,
+                        direccion=direccion,
+                        telefono=telefono,
+                        email=email,
+                    )
+                    db.session.add(cliente)
                     db.session.commit()
+                    client_suggestions.invalidate()
+                    return redirect(url_for("clientes"))
                 except SQLAlchemyError:
                     db.session.rollback()
-                return redirect(url_for("facturas_historial"))
-
-        parts = [part for part in ref.split("/") if part]
-        if len(parts) == 2 and parts[0] in {"contado", "credito"} and parts[1].isdigit():
-            tipo = parts[0]
-            factura_id = int(parts[1])
-        elif ref.isdigit():
-            factura_id = int(ref)
-        elif parts and parts[-1].isdigit():
-            factura_id = int(parts[-1])
-        else:
-            numero_ref = ref
+                    error = "No se pudo guardar el cliente."
 
-        try:
-            if tipo in {"contado", "credito"} and factura_id is not None:
-                factura = FacturaContado.query.get_or_404(factura_id)
-                DetalleFacturaContado.query.filter_by(
-                    factura_id=factura_id
-                ).delete(synchronize_session=False)
-                db.session.delete(factura)
-            elif factura_id is not None:
-                factura = FacturaContado.query.get(factura_id)
-                if not factura:
-                    return redirect(url_for("facturas_historial"))
-                DetalleFacturaContado.query.filter_by(
-                    factura_id=factura_id
-                ).delete(synchronize_session=False)
-                db.session.delete(factura)
+        return render_clientes_page(error=error)
+
+    @app.route("/productos", methods=["GET", "POST"])
+    @login_required
+    def productos():
+        # Vendedor solo puede VER el catálogo, no crear productos
+        if request.method == "POST" and current_user_role() != "admin":
+            abort(403)
+
+        error = None
+        if request.method == "POST":
+            codigo = request.form.get("codigo", "").strip()
+            nombre = request.form.get("nombre", "").strip()
+            categoria = request.form.get("categoria", "").strip()
+            precio = request.form.get("precio", "").strip()
+            stock = request.form.get("stock", "").strip()
+            descripcion = request.form.get("descripcion", "").strip() or None
+            activo = request.form.get("activo") == "on"
+            isv_aplica = request.form.get("isv_aplica") == "on"
+            foto_file = request.files.get("foto")
+
+            if not codigo or not nombre or not categoria or not precio:
+                error = "Completa codigo, nombre, categoria y precio."
+            elif not re.fullmatch(r"-?\d*", stock):
+                error = "Stock invalido."
             else:
-                factura = None
-                if numero_ref:
-                    factura = FacturaContado.query.filter_by(
-                        numero_factura=numero_ref
-                    ).first()
-                    if factura:
-                        DetalleFacturaContado.query.filter_by(
-                            factura_id=factura.id
-                        ).delete(synchronize_session=False)
-                        db.session.delete(factura)
-                    else:
-                        return redirect(url_for("facturas_historial"))
-                else:
-                    return redirect(url_for("facturas_historial"))
+                try:
+                    foto_filename = save_product_image(foto_file)
+                    producto = Producto(
+                        codigo=codigo,
+                        nombre=nombre,
+                        categoria=categoria,
+                        precio=precio,
+                        stock=0,
+                        descripcion=descripcion,
+                        activo=activo,
+                        isv_aplica=isv_aplica,
+                        foto=foto_filename,
+                    )
+                    db.session.add(producto)
+                    db.session.flush()
+                    if int(stock or 0):
+                        record_movement(
+                            db.session,
+                            producto.id,
+                            "ajuste",
+                            int(stock),
+                            current_user_id(),
+                            nota="Stock inicial",
+                            enforce=False,
+                        )
+                    db.session.commit()
+                    product_suggestions.invalidate()
+                    return redirect(url_for("productos"))
+                except ValueError as exc:
+                    error = str(exc)
+                except SQLAlchemyError:
+                    db.session.rollback()
+                    error = "No se pudo guardar el producto."
 
+        return render_productos_page(error=error)
+
+    @app.post("/clientes/importar")
+    @admin_required
+    def importar_clientes():
+        error, result = run_csv_import("clientes")
+        client_suggestions.invalidate()
+        return render_clientes_page(error=error, import_result=result)
+
+    @app.post("/productos/importar")
+    @admin_required
+    def importar_productos():
+        error, result = run_csv_import("productos")
+        product_suggestions.invalidate()
+        return render_productos_page(error=error, import_result=result)
+
+    @app.route("/ajustes", methods=["GET", "POST"])
+    @admin_required
+    def ajustes():
+        settings = AjustesNegocio.query.first()
+        if not settings:
+            settings = AjustesNegocio(nombre="Invagro")
+            db.session.add(settings)
             db.session.commit()
-        except SQLAlchemyError:
-            db.session.rollback()
-        return redirect(url_for("facturas_historial"))
+
+        if request.method == "POST":
+            settings.nombre = request.form.get("nombre", "").strip() or "Invagro"
+            settings.rtn = request.form.get("rtn", "").strip()
+            settings.telefono = request.form.get("telefono", "").strip()
+            settings.email = request.form.get("email", "").strip()
+            settings.direccion = request.form.get("direccion", "").strip()
+            settings.cai = request.form.get("cai", "").strip()
+            settings.rango_autorizado = request.form.get("rango_autorizado", "").strip()
+            settings.rango_autorizado_inicio = request.form.get(
+                "rango_autorizado_inicio", ""
+            ).strip()
+            settings.rango_autorizado_fin = request.form.get(
+                "rango_autorizado_fin", ""
+            ).strip()
+            settings.fecha_limite_emision = request.form.get("fecha_limite_emision", "").strip()
+            settings.mensaje = request.form.get("mensaje", "").strip()
+            db.session.commit()
+            return redirect(url_for("ajustes"))
+
+        return render_template("ajustes.html", user=session["user"], settings=settings)
 
     @app.route("/clientes/<int:cliente_id>/edit", methods=["GET", "POST"])
     def editar_cliente(cliente_id):
@@ -6058,6 +1238,7 @@ def create_app():
                     cliente.telefono = telefono
                     cliente.email = email
                     db.session.commit()
+                    client_suggestions.invalidate()
                     return redirect(url_for("clientes"))
                 except SQLAlchemyError:
                     db.session.rollback()
@@ -6079,6 +1260,7 @@ def create_app():
         try:
             db.session.delete(cliente)
             db.session.commit()
+            client_suggestions.invalidate()
         except SQLAlchemyError:
             db.session.rollback()
         return redirect(url_for("clientes"))
@@ -6098,6 +1280,7 @@ def create_app():
             categoria = request.form.get("categoria", "").strip()
             precio = request.form.get("precio", "").strip()
             stock = request.form.get("stock", "").strip()
+            stock_original = request.form.get("stock_original", "").strip()
             descripcion = request.form.get("descripcion", "").strip() or None
             activo = request.form.get("activo") == "on"
             isv_aplica = request.form.get("isv_aplica") == "on"
@@ -6105,13 +1288,28 @@ def create_app():
 
             if not codigo or not nombre or not categoria or not precio:
                 error = "Completa codigo, nombre, categoria y precio."
+            elif not re.fullmatch(r"-?\d*", stock) or not re.fullmatch(r"-?\d*", stock_original):
+                error = "Stock invalido."
             else:
                 try:
                     producto.codigo = codigo
                     producto.nombre = nombre
                     producto.categoria = categoria
                     producto.precio = precio
-                    producto.stock = stock or 0
+                    # El stock no se sobreescribe: se ajusta por la diferencia con el
+                    # valor que tenía el formulario, así no se pierden las ventas
+                    # hechas mientras se editaba.
+                    ajuste = int(stock or 0) - int(stock_original or producto.stock or 0)
+                    if ajuste:
+                        record_movement(
+                            db.session,
+                            producto.id,
+                            "ajuste",
+                            ajuste,
+                            current_user_id(),
+                            nota="Edicion del producto",
+                            enforce=app.config["INVENTORY_ENFORCE_STOCK"],
+                        )
                     producto.descripcion = descripcion
                     producto.activo = activo
                     producto.isv_aplica = isv_aplica
@@ -6123,23 +1321,72 @@ def create_app():
                             )
                             if os.path.exists(old_path):
                                 os.remove(old_path)
+                            remove_variants(app.config["PRODUCT_UPLOAD_FOLDER"], producto.foto)
                         producto.foto = foto_filename
                     db.session.commit()
+                    product_suggestions.invalidate()
                     return redirect(url_for("productos"))
+                except StockInsuficiente as exc:
+                    error = str(exc)
                 except ValueError as exc:
+                    db.session.rollback()
                     error = str(exc)
                 except SQLAlchemyError:
                     db.session.rollback()
                     error = "No se pudo actualizar el producto."
 
+        return render_producto_form(producto, categorias_list, error)
+
+    def render_producto_form(producto, categorias_list, error=None):
+        movimientos = (
+            MovimientoInventario.query.filter_by(producto_id=producto.id)
+            .order_by(MovimientoInventario.id.desc())
+            .limit(20)
+            .all()
+        )
         return render_template(
             "producto_form.html",
             user=session["user"],
             producto=producto,
             categorias=categorias_list,
+            movimientos=movimientos,
+            usuarios=get_user_directory(),
             error=error,
         )
 
+    @app.post("/productos/<int:producto_id>/movimientos")
+    @admin_required
+    def registrar_movimiento(producto_id):
+        producto = Producto.query.get_or_404(producto_id)
+        tipo = request.form.get("tipo", "").strip()
+        cantidad = request.form.get("cantidad", "").strip()
+        nota = request.form.get("nota", "").strip()[:255] or None
+        if not re.fullmatch(r"-?\d+", cantidad):
+            error = "Cantidad invalida."
+        else:
+            try:
+                record_movement(
+                    db.session,
+                    producto.id,
+                    tipo,
+                    int(cantidad),
+                    current_user_id(),
+                    nota=nota,
+                    enforce=app.config["INVENTORY_ENFORCE_STOCK"],
+                )
+                db.session.commit()
+                return redirect(url_for("editar_producto", producto_id=producto.id))
+            except StockInsuficiente as exc:
+                error = str(exc)
+            except ValueError as exc:
+                db.session.rollback()
+                error = str(exc)
+            except SQLAlchemyError:
+                db.session.rollback()
+                error = "No se pudo registrar el movimiento."
+        categorias_list = Categoria.query.filter_by(activo=True).order_by(Categoria.nombre.asc()).all()
+        return render_producto_form(producto, categorias_list, error)
+
     @app.post("/productos/<int:producto_id>/delete")
     @admin_required
     def eliminar_producto(producto_id):
@@ -6147,6 +1394,7 @@ def create_app():
         try:
             producto.activo = False
             db.session.commit()
+            product_suggestions.invalidate()
         except SQLAlchemyError:
             db.session.rollback()
         return redirect(url_for("productos"))
@@ -6177,302 +1425,135 @@ def create_app():
             db.session.rollback()
         return redirect(url_for("productos"))
 
-    @app.post("/facturas")
-    def crear_factura():
-        if not session.get("user"):
-            return jsonify({"error": "No autorizado."}), 401
-        if current_user_role() != "admin":
-            return jsonify({"error": "Solo administradores pueden facturar."}), 403
-
-        data = request.get_json(silent=True) or {}
-        tipo = (data.get("tipo") or "").strip().lower()
-        cliente_id = data.get("cliente_id") or None
-        rtn = (data.get("rtn") or "").strip() or None
-        pago_raw = data.get("pago", 0)
-        fecha_raw = (data.get("fecha") or "").strip()
-        items = data.get("items") or []
-        pedido_id = data.get("pedido_id")
-
-        if tipo not in {"contado", "credito"}:
-            return jsonify({"error": "Tipo de factura invalido."}), 400
-        if not items:
-            return jsonify({"error": "No hay productos en la factura."}), 400
-
+    @app.get("/media/productos/<int:width>/<name>")
+    def product_thumbnail(width, name):
+        filename, _, fmt = name.rpartition(".")
+        if not filename or secure_filename(filename) != filename:
+            abort(404)
+        upload_dir = app.config["PRODUCT_UPLOAD_FOLDER"]
         try:
-            pago = Decimal(str(pago_raw))
-        except Exception:
-            return jsonify({"error": "Pago invalido."}), 400
-        if fecha_raw:
-            try:
-                fecha_factura = datetime.strptime(fecha_raw, "%Y-%m-%d")
-            except ValueError:
-                return jsonify({"error": "Fecha invalida."}), 400
-        else:
-            fecha_factura = datetime.utcnow()
+            path = variant_path(upload_dir, filename, width, fmt)
+        except (ValueError, FileNotFoundError):
+            abort(404)
+        except ImportError:
+            return redirect(url_for("static", filename=f"uploads/productos/{filename}"))
+        except OSError:
+            app.logger.warning("No se pudo generar la miniatura de %s", filename)
+            abort(404)
+        response = send_from_directory(
+            os.path.dirname(path),
+            os.path.basename(path),
+            mimetype="image/webp" if fmt == "webp" else "image/jpeg",
+            max_age=app.config["STATIC_IMMUTABLE_MAX_AGE"],
+        )
+        # El nombre del original es un uuid: el contenido de esta URL no cambia nunca.
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    @app.get("/dist/<path:filename>")
+    def built_asset(filename):
+        if not is_hashed_asset(filename):
+            abort(404)
+        dist_folder = os.path.join(app.static_folder, DIST_DIRNAME)
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        served, encoding = filename, None
+        for candidate, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if candidate in request.accept_encodings and os.path.isfile(
+                os.path.join(dist_folder, filename + suffix)
+            ):
+                served, encoding = filename + suffix, candidate
+                break
+        response = send_from_directory(
+            dist_folder,
+            served,
+            mimetype=mimetype,
+            max_age=app.config["STATIC_IMMUTABLE_MAX_AGE"],
+        )
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        # El nombre lleva el hash del contenido: si cambia el archivo, cambia la URL.
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
 
-        producto_ids = []
-        parsed_items = []
-        for item in items:
-            try:
-                producto_id = int(item.get("producto_id"))
-                cantidad = int(item.get("cantidad"))
-                descuento = Decimal(str(item.get("descuento", 0) or 0))
-            except (TypeError, ValueError):
-                return jsonify({"error": "Producto o cantidad invalida."}), 400
-            if cantidad <= 0:
-                return jsonify({"error": "Cantidad invalida."}), 400
-            if descuento < 0:
-                return jsonify({"error": "Descuento invalido."}), 400
-            producto_ids.append(producto_id)
-            parsed_items.append((producto_id, cantidad, descuento))
-
-        productos = Producto.query.filter(Producto.id.in_(producto_ids)).all()
-        productos_map = {producto.id: producto for producto in productos}
-        if len(productos_map) != len(set(producto_ids)):
-            return jsonify({"error": "Producto no encontrado."}), 400
-
-        subtotal = Decimal("0")
-        isv = Decimal("0")
-        descuento_total = Decimal("0")
-        detalles = []
-        for producto_id, cantidad, descuento in parsed_items:
-            producto = productos_map[producto_id]
-            precio = Decimal(str(producto.precio))
-            linea_bruta = precio * Decimal(cantidad)
-            descuento_unit = min(descuento, precio)
-            descuento_aplicado = descuento_unit * Decimal(cantidad)
-            linea_neta = max(Decimal("0"), (precio - descuento_unit) * Decimal(cantidad))
-            subtotal += linea_bruta
-            descuento_total += descuento_aplicado
-            if producto.isv_aplica:
-                isv += linea_neta * Decimal("0.15")
-            detalles.append((producto, cantidad, precio, linea_neta, descuento_unit))
-
-        total = max(Decimal("0"), subtotal - descuento_total) + isv
-        if pago < 0:
-            return jsonify({"error": "Pago invalido."}), 400
-        if tipo == "contado" and pago < total:
-            return jsonify({"error": "Pago insuficiente para contado."}), 400
-
-        usuario = User.query.filter_by(username=session["user"]).first()
-        usuario_id = usuario.id if usuario else None
-        vendedor_factura = usuario
-        vendedor_factura_id = usuario_id
-        numero_factura = generate_invoice_number()
+    @app.get("/receipts/<path:filename>")
+    def receipt_file(filename):
+        if not session.get("user"):
+            return redirect(url_for("login"))
+        folder = app.config.get("RECEIPT_PDF_FOLDER")
+        if not folder or not os.path.isdir(folder):
+            abort(404)
+        return send_protected_file(folder, filename, "receipts")
+
+    @app.get("/health")
+    def health_check():
+        return jsonify({"status": "ok"})
 
+    def seed_aves_user():
         try:
-            pedido = None
-            if pedido_id:
-                try:
-                    pedido_ref = int(pedido_id)
-                except (TypeError, ValueError):
-                    pedido_ref = None
-                if pedido_ref:
-                    pedido = Pedido.query.get(pedido_ref)
-                    if pedido and pedido.usuario_id:
-                        vendedor_factura_id = pedido.usuario_id
-                        vendedor_factura = User.query.get(pedido.usuario_id)
-            if tipo == "contado":
-                cambio = pago - total
-                factura = FacturaContado(
-                    numero_factura=numero_factura,
-                    cliente_id=cliente_id,
-                    usuario_id=vendedor_factura_id,
-                    rtn=rtn,
-                    fecha=fecha_factura,
-                    subtotal=subtotal,
-                    isv=isv,
-                    descuento=descuento_total,
-                    total=total,
-                    pago=pago,
-                    cambio=cambio,
-                    estado="contado",
-                )
-                db.session.add(factura)
-                db.session.flush()
-                for producto, cantidad, precio, linea, descuento_unit in detalles:
-                    db.session.add(
-                        DetalleFacturaContado(
-                            factura_id=factura.id,
-                            producto_id=producto.id,
-                            cantidad=cantidad,
-                            precio_unitario=precio,
-                            subtotal=linea,
-                            descuento=descuento_unit,
-                            isv_aplica=producto.isv_aplica,
-                        )
+            aves_user = AvesUser.query.filter_by(username="Luis").first()
+            if not aves_user:
+                db.session.add(
+                    AvesUser(
+                        username="Luis",
+                        password=generate_password_hash("Luis82847"),
+                        nombre_completo="Luis",
+                        activo=True,
+                        fecha_creacion=datetime.utcnow(),
                     )
-            else:
-                factura = FacturaContado(
-                    numero_factura=numero_factura,
-                    cliente_id=cliente_id,
-                    usuario_id=vendedor_factura_id,
-                    rtn=rtn,
-                    fecha=fecha_factura,
-                    subtotal=subtotal,
-                    isv=isv,
-                    descuento=descuento_total,
-                    total=total,
-                    pago=pago,
-                    cambio=Decimal("0"),
-                    estado="credito",
                 )
-                db.session.add(factura)
-                db.session.flush()
-                for producto, cantidad, precio, linea, descuento_unit in detalles:
-                    db.session.add(
-                        DetalleFacturaContado(
-                            factura_id=factura.id,
-                            producto_id=producto.id,
-                            cantidad=cantidad,
-                            precio_unitario=precio,
-                            subtotal=linea,
-                            descuento=descuento_unit,
-                            isv_aplica=producto.isv_aplica,
-                        )
-                    )
-            if pedido:
-                pedido.estado = "facturado"
-            db.session.commit()
+                db.session.commit()
         except SQLAlchemyError:
             db.session.rollback()
-            return jsonify({"error": "No se pudo guardar la factura."}), 500
-
-        pdf_url = None
-        try:
-            settings = get_business_settings()
-            cliente = Cliente.query.get(cliente_id) if cliente_id else None
-            detalles_pdf = [
-                {
-                    "producto": producto,
-                    "cantidad": cantidad,
-                    "precio": float(precio),
-                    "subtotal": float(linea),
-                    "descuento": float(descuento_unit),
-                    "isv_aplica": producto.isv_aplica,
-                }
-                for producto, cantidad, precio, linea, descuento_unit in detalles
-            ]
-            random_token = uuid4().hex[:6]
-            pdf_filename = build_invoice_pdf_filename(numero_factura, token=random_token)
-            pdf_path = os.path.join(app.config["INVOICE_PDF_FOLDER"], pdf_filename)
-            create_invoice_pdf(
-                pdf_path,
-                settings,
-                factura,
-                detalles_pdf,
-                tipo,
-                cliente,
-                usuario,
-                vendedor_factura,
-            )
-            factura.pdf_filename = pdf_filename
-            db.session.commit()
-            pdf_url = url_for("static", filename=f"invoices/{pdf_filename}")
-        except Exception:
-            app.logger.exception("No se pudo generar el PDF de la factura.")
-
-        return jsonify(
-            {
-                "numero_factura": numero_factura,
-                "total": float(total),
-                "tipo": tipo,
-                "pdf_url": pdf_url,
-            }
-        )
-
-    @app.post("/api/chat")
-    def chat_api():
-        try:
-            if not session.get("user"):
-                return jsonify({"error": "No autorizado."}), 401
-            payload = request.get_json(silent=True) or {}
-            message = (payload.get("message") or "").strip()
-            if not message:
-                return jsonify({"error": "Mensaje vacio."}), 400
-
-            if reject_if_mutation_request(message):
-                return jsonify(
-                    {
-                        "reply": "Solo puedo hacer consultas. Si quieres modificar datos, hazlo desde los modulos del sistema."
-                    }
-                )
-
-            username = session.get("user")
-            chat_session = get_or_create_chat_session(username)
-            store_chat_message(chat_session.id, "user", message)
 
-            request_id = uuid4().hex
-            intent = detect_intent(message)
-            query_hint = extract_query(message)
-            db_summary = ""
-            if intent:
-                try:
-                    if intent == "clientes":
-                        rows = fetch_clients(limit=20, q=query_hint)
-                    elif intent == "productos":
-                        rows = fetch_products(limit=20, q=query_hint)
-                    else:
-                        rows = fetch_invoices(limit=20)
-                    db_summary = build_db_summary(intent, rows)
-                except Exception as exc:
-                    app.logger.error("DB query failed request_id=%s error=%s", request_id, exc)
-                    db_summary = "No se pudo consultar la base de datos."
-
-            if db_summary == "No se pudo consultar la base de datos.":
-                store_chat_message(chat_session.id, "assistant", db_summary)
-                return jsonify({"reply": db_summary})
-
-            if intent and db_summary:
-                reply = (
-                    f"{db_summary}\n\nTotal mostrado: {min(len(db_summary.splitlines()) - 1, 20)}"
-                    if db_summary != "No se encontraron resultados."
-                    else db_summary
-                )
-                store_chat_message(chat_session.id, "assistant", reply)
-                return jsonify({"reply": reply})
+    # El esquema y los datos iniciales se preparan aquí (deploy), no en cada
+    # arranque de worker: create_all refleja todas las tablas y el seed
+    # consulta la base, lo que hacía lento cada reinicio de gunicorn.
+    def move_legacy_private_pdfs():
+        """Pasa a instance/ las facturas y recibos que versiones viejas dejaban en static/."""
+        for legacy, config_key in (("invoices", "INVOICE_PDF_FOLDER"), ("receipts", "RECEIPT_PDF_FOLDER")):
+            source = os.path.join(app.static_folder, legacy)
+            target = app.config.get(config_key)
+            if not target or not os.path.isdir(source):
+                continue
+            moved = 0
+            for name in os.listdir(source):
+                path = os.path.join(source, name)
+                if name.lower().endswith(".pdf") and os.path.isfile(path):
+                    os.replace(path, os.path.join(target, name))
+                    moved += 1
+            if moved:
+                click.echo(f"{moved} PDF movidos de static/{legacy} a {target}.")
 
-            messages = build_llm_messages(chat_session.id, message)
-            if db_summary:
-                messages.insert(
-                    1,
-                    {
-                        "role": "system",
-                        "content": f"Datos relevantes de la base de datos:\n{db_summary}",
-                    },
-                )
+    @app.cli.command("init-db")
+    def init_db():
+        from migrations import apply_migrations
 
-            llm_response, llm_error = call_llm(messages, request_id=request_id)
-            if llm_error:
-                store_chat_message(chat_session.id, "assistant", llm_error)
-                maybe_update_summary(chat_session.id)
-                return jsonify(
-                    {
-                        "reply": "El asistente no esta disponible temporalmente. Intenta de nuevo."
-                    }
-                )
+        db.create_all()
+        # Las tablas recién creadas ya traen los índices de models.py; esto
+        # solo registra las versiones (o completa lo que falte en tablas viejas).
+        apply_migrations(db.engine, echo=click.echo)
+        seed_aves_user()
+        move_legacy_private_pdfs()
+        click.echo("Tablas creadas o verificadas.")
 
-            reply = None
-            if llm_response:
-                reply = extract_response_text_and_calls(llm_response).get("text")
-            if not reply:
-                reply = "No pude generar respuesta. Intenta reformular tu pregunta."
+    @app.cli.command("db-upgrade")
+    @click.option("--target", type=int, default=None, help="Aplicar hasta esta version.")
+    def db_upgrade(target):
+        from migrations import apply_migrations
 
-            store_chat_message(chat_session.id, "assistant", reply)
-            maybe_update_summary(chat_session.id)
-            return jsonify({"reply": reply})
-        except Exception as exc:
-            app.logger.exception("Chat error")
-            return jsonify({"error": f"No se pudo procesar la consulta: {exc}"}), 500
+        applied = apply_migrations(db.engine, echo=click.echo, target=target)
+        click.echo(f"Migraciones aplicadas: {len(applied)}.")
 
-    @app.get("/health")
-    def health_check():
-        return jsonify({"status": "ok"})
+    @app.cli.command("db-status")
+    def db_status():
+        from migrations import migration_status
 
-    @app.cli.command("init-db")
-    def init_db():
-        db.create_all()
-        click.echo("Tablas creadas o verificadas.")
+        for migration, applied in migration_status(db.engine):
+            mark = "aplicada" if applied else "pendiente"
+            click.echo(f"{migration.version:03d} {migration.name:32} {mark}")
 
     @app.cli.command("create-admin")
     @click.option("--username", default="admin", show_default=True)
@@ -6495,6 +1576,317 @@ def create_app():
         db.session.commit()
         click.echo("Usuario admin creado.")
 
+    @app.cli.command("seed-synthetic")
+    @click.option("--invoices", default=10000, show_default=True)
+    @click.option("--clients", type=int, default=None, help="Por defecto invoices/20.")
+    @click.option("--products", type=int, default=None, help="Por defecto invoices/100 (max 2000).")
+    @click.option("--vendedores", default=5, show_default=True)
+    @click.option("--pedidos", type=int, default=None, help="Por defecto invoices/10.")
+    @click.option("--cobros", type=int, default=None, help="Por defecto invoices/20.")
+    @click.option("--lotes", type=int, default=None, help="Por defecto invoices/500.")
+    @click.option("--days", default=365, show_default=True, help="Dias hacia atras para las fechas.")
+    @click.option("--seed", default=42, show_default=True)
+    @click.option("--batch-size", default=5000, show_default=True)
+    def seed_synthetic_command(
+        invoices, clients, products, vendedores, pedidos, cobros, lotes, days, seed, batch_size
+    ):
+        """Carga datos sinteticos reproducibles para pruebas de volumen."""
+        from synthetic_data import seed_synthetic
+
+        counts = seed_synthetic(
+            invoices=invoices,
+            clients=clients,
+            products=products,
+            vendedores=vendedores,
+            pedidos=pedidos,
+            cobros=cobros,
+            lotes=lotes,
+            days=days,
+            seed=seed,
+            batch_size=batch_size,
+            echo=click.echo,
+        )
+        for table_name, total in counts.items():
+            click.echo(f"{table_name}: {total}")
+
+    @app.cli.command("import-csv")
+    @click.argument("tipo", type=click.Choice(["productos", "clientes"]))
+    @click.argument("archivo", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--batch-size", type=int, default=None, help="Por defecto IMPORT_BATCH_SIZE.")
+    @click.option("--encoding", default="utf-8-sig", show_default=True)
+    @click.option(
+        "--decimal",
+        type=click.Choice([",", "."]),
+        default=None,
+        help="Separador decimal. Por defecto coma si el CSV usa ';', punto si usa ','.",
+    )
+    def import_csv_command(tipo, archivo, batch_size, encoding, decimal):
+        """Importa productos (clave codigo) o clientes (clave ruc_dni) desde un CSV."""
+        from bulk_import import import_csv
+
+        def echo_progress(result):
+            click.echo(
+                f"[{result['seconds']:7.1f}s] {result['total']} filas: "
+                f"{result['inserted']} nuevas, {result['updated']} actualizadas, "
+                f"{result['error_count']} con error ({result['rows_per_second']:.0f} filas/s)"
+            )
+
+        with open(archivo, encoding=encoding, newline="") as handle:
+            try:
+                result = import_csv(
+                    db.session,
+                    tipo,
+                    handle,
+                    batch_size=batch_size or app.config["IMPORT_BATCH_SIZE"],
+                    progress=echo_progress,
+                    decimal=decimal,
+                )
+            except ValueError as exc:
+                raise click.ClickException(str(exc))
+        for line, key, message in result["errors"]:
+            click.echo(f"  linea {line} ({key}): {message}")
+        if result["error_count"] > len(result["errors"]):
+            click.echo(f"  ... y {result['error_count'] - len(result['errors'])} errores mas")
+        if result["duplicates"]:
+            click.echo(f"{result['duplicates']} claves repetidas en el archivo (se uso la ultima).")
+
+    @app.cli.command("product-thumbs")
+    @click.option("--force", is_flag=True, help="Regenerar aunque ya existan.")
+    def product_thumbs(force):
+        """Genera las miniaturas de las fotos de productos que aun no las tienen."""
+        upload_dir = app.config["PRODUCT_UPLOAD_FOLDER"]
+        fotos = [
+            foto
+            for (foto,) in db.session.query(Producto.foto).filter(Producto.foto.isnot(None)).distinct()
+            if foto
+        ]
+        created = failed = 0
+        for foto in fotos:
+            if not os.path.isfile(os.path.join(upload_dir, foto)):
+                failed += 1
+                click.echo(f"  falta el original: {foto}")
+                continue
+            if force:
+                remove_variants(upload_dir, foto)
+            try:
+                for width in THUMB_WIDTHS:
+                    for fmt in THUMB_FORMATS:
+                        variant_path(upload_dir, foto, width, fmt)
+                created += 1
+            except ImportError:
+                raise click.ClickException("Instala Pillow para generar miniaturas.")
+            except (OSError, ValueError) as exc:
+                failed += 1
+                click.echo(f"  {foto}: {exc}")
+        click.echo(f"{created} fotos con miniaturas, {failed} con error.")
+
+    @app.cli.command("build-assets")
+    def build_assets_command():
+        """Minifica, versiona con hash y precomprime los CSS/JS en static/dist."""
+
+        def show(row):
+            sizes = [f"{row['original']:>8}", f"{row['minified']:>8}"]
+            sizes += [f"{row[key]:>7}" if row[key] is not None else f"{'-':>7}" for key in ("gzip", "br")]
+            click.echo(f"  {row['file']:48} {' '.join(sizes)}")
+
+        if not js_minifier_available():
+            click.secho(
+                "AVISO: rjsmin no esta instalado; los JS se publican sin minificar "
+                "(pip install -r requirements.txt).",
+                fg="yellow",
+                err=True,
+            )
+        click.echo(f"  {'archivo':48} {'original':>8} {'minif.':>8} {'gzip':>7} {'br':>7}")
+        report = build_assets(app.static_folder, echo=show)
+        original = sum(row["original"] for row in report)
+        compressed = sum(row["gzip"] or row["minified"] for row in report)
+        click.echo(f"{len(report)} archivos: {original} -> {compressed} bytes con gzip.")
+
+    def delete_in_batches(model, criterion, batch_size, pause):
+        """Borra por lotes de ids para no bloquear la tabla por mucho tiempo."""
+        total = 0
+        while True:
+            ids = [
+                row_id
+                for (row_id,) in db.session.query(model.id)
+                .filter(criterion)
+                .order_by(model.id)
+                .limit(batch_size)
+                .all()
+            ]
+            if not ids:
+                return total
+            model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            total += len(ids)
+            if pause:
+                time.sleep(pause)
+
+    def fsync_directory(path):
+        """Deja en disco el rename hecho dentro de `path` (no aplica en Windows)."""
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def read_archived_session_ids(archive_path):
+        """Ids de sesión de un archivo de chat-retention; falla si está truncado."""
+        session_ids = []
+        with gzip.open(archive_path, "rt", encoding="utf-8") as handle:
+            for line in handle:
+                session_ids.append(json.loads(line)["id"])
+        return session_ids
+
+    @app.cli.command("idempotency-sweep")
+    @click.option("--batch-size", default=1000, show_default=True, help="Claves por lote.")
+    @click.option("--pause", default=0.1, show_default=True, help="Segundos de espera entre lotes.")
+    def idempotency_sweep(batch_size, pause):
+        """Borra las claves de idempotencia vencidas (IDEMPOTENCY_TTL_HOURS)."""
+        deleted = delete_in_batches(
+            IdempotencyKey, IdempotencyKey.expira < datetime.utcnow(), max(1, batch_size), pause
+        )
+        click.echo(f"Claves de idempotencia vencidas eliminadas: {deleted}.")
+
+    @app.cli.command("chat-retention")
+    @click.option("--days", default=90, show_default=True, help="Sesiones sin actividad por mas de N dias.")
+    @click.option("--output-dir", default="chat_archive", show_default=True)
+    @click.option("--batch-size", default=200, show_default=True, help="Sesiones o filas por lote.")
+    @click.option("--pause", default=0.2, show_default=True, help="Segundos de espera entre lotes.")
+    @click.option("--purge/--no-purge", default=False, show_default=True, help="Borrar lo archivado.")
+    @click.option("--audit-days", type=int, default=None, help="Borrar auditoria con mas de N dias.")
+    def chat_retention(days, output_dir, batch_size, pause, purge, audit_days):
+        """Archiva sesiones de chat antiguas en JSONL comprimido y opcionalmente las purga."""
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        batch_size = max(1, batch_size)
+        os.makedirs(output_dir, exist_ok=True)
+        archive_path = os.path.join(
+            output_dir, f"chat-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.jsonl.gz"
+        )
+        activity = func.coalesce(ChatSession.updated_at, ChatSession.created_at)
+        sessions_done = 0
+        messages_done = 0
+        last_id = ""
+        # Primera pasada: solo escribe. El archivo se escribe en .part y se
+        # renombra cuando ya está cerrado y en disco.
+        partial_path = archive_path + ".part"
+        with open(partial_path, "wb") as raw:
+            with gzip.open(raw, "wt", encoding="utf-8") as handle:
+                while True:
+                    batch = (
+                        ChatSession.query.filter(activity < cutoff, ChatSession.id > last_id)
+                        .order_by(ChatSession.id)
+                        .limit(batch_size)
+                        .all()
+                    )
+                    if not batch:
+                        break
+                    last_id = batch[-1].id
+                    session_ids = [item.id for item in batch]
+                    messages_by_session = {}
+                    for msg in (
+                        ChatMessage.query.filter(ChatMessage.session_id.in_(session_ids))
+                        .order_by(ChatMessage.session_id, ChatMessage.id)
+                        .all()
+                    ):
+                        messages_by_session.setdefault(msg.session_id, []).append(
+                            {
+                                "id": msg.id,
+                                "role": msg.role,
+                                "content": msg.content,
+                                "created_at": msg.created_at.isoformat() if msg.created_at else None,
+                            }
+                        )
+                    summaries = {
+                        item.session_id: item.summary
+                        for item in ChatSummary.query.filter(ChatSummary.session_id.in_(session_ids))
+                        .order_by(ChatSummary.id)
+                        .all()
+                    }
+                    for item in batch:
+                        messages = messages_by_session.get(item.id, [])
+                        handle.write(
+                            json.dumps(
+                                {
+                                    "id": item.id,
+                                    "username": item.username,
+                                    "created_at": item.created_at.isoformat() if item.created_at else None,
+                                    "updated_at": item.updated_at.isoformat() if item.updated_at else None,
+                                    "summary": summaries.get(item.id),
+                                    "messages": messages,
+                                },
+                                ensure_ascii=False,
+                            )
+                            + "\n"
+                        )
+                        messages_done += len(messages)
+                    sessions_done += len(batch)
+                    db.session.expunge_all()
+                    if pause:
+                        time.sleep(pause)
+            raw.flush()
+            os.fsync(raw.fileno())
+
+        if not sessions_done:
+            os.remove(partial_path)
+            click.echo("No hay sesiones para archivar.")
+        else:
+            os.replace(partial_path, archive_path)
+            fsync_directory(output_dir)
+            click.echo(
+                f"Archivadas {sessions_done} sesiones y {messages_done} mensajes en {archive_path}."
+            )
+
+        if purge and sessions_done:
+            # Segunda pasada: solo se borra lo que se puede volver a leer del archivo.
+            try:
+                archived_ids = read_archived_session_ids(archive_path)
+            except (OSError, EOFError, KeyError, ValueError) as exc:
+                raise click.ClickException(f"El archivo no se pudo verificar, no se borra nada: {exc}")
+            if len(archived_ids) != sessions_done:
+                raise click.ClickException(
+                    f"El archivo tiene {len(archived_ids)} sesiones y se escribieron "
+                    f"{sessions_done}; no se borra nada."
+                )
+            purged = 0
+            for offset in range(0, len(archived_ids), batch_size):
+                chunk = archived_ids[offset : offset + batch_size]
+                # Las que tuvieron actividad después de archivarlas se quedan.
+                session_ids = [
+                    row.id
+                    for row in db.session.query(ChatSession.id)
+                    .filter(ChatSession.id.in_(chunk), activity < cutoff)
+                    .all()
+                ]
+                if not session_ids:
+                    continue
+                delete_in_batches(
+                    ChatMessage, ChatMessage.session_id.in_(session_ids), batch_size * 10, pause
+                )
+                delete_in_batches(
+                    ChatSummary, ChatSummary.session_id.in_(session_ids), batch_size, pause
+                )
+                ChatSession.query.filter(ChatSession.id.in_(session_ids)).delete(
+                    synchronize_session=False
+                )
+                db.session.commit()
+                purged += len(session_ids)
+                if pause:
+                    time.sleep(pause)
+            click.echo(f"Sesiones archivadas eliminadas: {purged}.")
+
+        if audit_days is not None:
+            audit_cutoff = datetime.utcnow() - timedelta(days=audit_days)
+            deleted = delete_in_batches(
+                ChatAudit, ChatAudit.created_at < audit_cutoff, batch_size * 10, pause
+            )
+            click.echo(f"Auditoria eliminada: {deleted} filas.")
+
     return app
 
 
@@ -26,22 +26,41 @@ Cómo se usa:
     user = current_user()              # objeto User o None
     es_admin = current_user_is_admin()
     uid = current_user_id()            # int o None
+
+    # Nombres de usuarios por id (cache por worker):
+    directorio = get_user_directory()  # {id: UserEntry}
+    invalidate_user_directory()        # tras crear/editar/desactivar usuarios
 """
 
+import time
+from collections import namedtuple
 from functools import wraps
-from flask import session, redirect, url_for, abort
+from flask import current_app, g, session, redirect, url_for, abort
+
+from models import User, db
+
 
-from models import User
+UserEntry = namedtuple("UserEntry", ["id", "username", "display_name", "rol", "activo"])
+
+# Directorio de usuarios por proceso (cada worker de gunicorn tiene el suyo).
+# Se recarga al invalidarlo o cuando vence USER_DIRECTORY_TTL, para que los
+# cambios hechos desde otro worker tambien se vean.
+_user_directory = {"entries": None, "loaded_at": 0.0}
 
 
 # --------------- Helpers públicos para usar en vistas ---------------
 
 def current_user():
-    """Devuelve el objeto User actualmente logueado, o None."""
+    """Devuelve el objeto User actualmente logueado, o None (una consulta por request)."""
     username = session.get("user")
     if not username:
         return None
-    return User.query.filter_by(username=username).first()
+    cached = g.get("_current_user")
+    if cached is not None and cached[0] == username:
+        return cached[1]
+    user = User.query.filter_by(username=username).first()
+    g._current_user = (username, user)
+    return user
 
 
 def current_user_id():
@@ -71,6 +90,35 @@ def current_user_is_vendedor():
     return current_user_role() == "vendedor"
 
 
+def get_user_directory():
+    """Devuelve {id: UserEntry} con todos los usuarios, cacheado por worker."""
+    ttl = current_app.config.get("USER_DIRECTORY_TTL", 60)
+    now = time.monotonic()
+    entries = _user_directory["entries"]
+    if entries is None or now - _user_directory["loaded_at"] > ttl:
+        rows = db.session.query(
+            User.id, User.username, User.nombre_completo, User.rol, User.activo
+        ).all()
+        entries = {
+            row.id: UserEntry(
+                id=row.id,
+                username=row.username,
+                display_name=(row.nombre_completo or row.username or "").strip(),
+                rol=row.rol,
+                activo=bool(row.activo),
+            )
+            for row in rows
+        }
+        _user_directory["entries"] = entries
+        _user_directory["loaded_at"] = now
+    return entries
+
+
+def invalidate_user_directory():
+    """Fuerza la recarga del directorio en este worker."""
+    _user_directory["entries"] = None
+
+
 # --------------- Decoradores ---------------
 
 def login_required(view_func):
@@ -0,0 +1,77 @@
+"""
+background.py · Sistema Invagro
+
+Cola en memoria con un hilo de trabajo por proceso, para tareas que no
+deben demorar la respuesta HTTP (por ejemplo los PDF de una facturación
+por lote). Cada tarea corre dentro de `app.app_context()`, así que puede
+usar `db.session`; la sesión se cierra al terminar la tarea.
+
+No es una cola persistente: si el proceso se reinicia, las tareas
+pendientes se pierden. Quien encola debe dejar en la base una marca que
+permita recuperarlas (una factura sin `pdf_filename` se puede volver a
+generar con `flask facturacion render-pdfs`).
+
+Cómo se usa:
+
+    pdf_jobs = BackgroundQueue(app, "invoice-pdf")
+
+    pdf_jobs.put(render_invoice_pdf, factura_id, cajero_id)   # no bloquea
+    pdf_jobs.join(timeout=30)                                 # scripts/CLI
+
+El hilo arranca con la primera tarea (después del fork de gunicorn).
+"""
+
+import queue
+import threading
+
+
+class BackgroundQueue:
+    def __init__(self, app, name, maxsize=1000):
+        self.app = app
+        self.name = name
+        self._jobs = queue.Queue(maxsize=maxsize)
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def put(self, func, *args):
+        """Encola `func(*args)`. Devuelve False si la cola está llena."""
+        self._ensure_worker()
+        try:
+            self._jobs.put_nowait((func, args))
+        except queue.Full:
+            self.app.logger.warning("Cola %s llena; se descarta una tarea.", self.name)
+            return False
+        return True
+
+    def join(self, timeout=None):
+        """Espera a que la cola se vacíe. Devuelve False si se agotó `timeout`."""
+        done = threading.Event()
+
+        def wait_all():
+            self._jobs.join()
+            done.set()
+
+        threading.Thread(target=wait_all, daemon=True).start()
+        return done.wait(timeout)
+
+    def __len__(self):
+        return self._jobs.qsize()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name=f"bg-{self.name}", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            func, args = self._jobs.get()
+            try:
+                with self.app.app_context():
+                    func(*args)
+            except Exception:
+                self.app.logger.exception("Fallo una tarea de la cola %s.", self.name)
+            finally:
+                self._jobs.task_done()
@@ -0,0 +1,353 @@
+"""
+bulk_import.py · Sistema Invagro
+
+Importación masiva de productos y clientes desde CSV.
+
+El archivo se lee fila por fila (nunca completo en memoria), cada fila se
+valida y las válidas se guardan por lotes con un solo INSERT multi-fila que
+actualiza las existentes (ON DUPLICATE KEY UPDATE en MySQL, ON CONFLICT en
+SQLite). La clave es `codigo` para productos y `ruc_dni` para clientes.
+Cada lote es una transacción: si el lote falla se reintenta fila por fila
+para aislar la que da error y guardar las demás.
+
+Cómo se usa:
+
+    flask --app wsgi import-csv productos catalogo.csv --batch-size 500
+
+    from bulk_import import import_csv
+    with open("catalogo.csv", encoding="utf-8-sig", newline="") as handle:
+        result = import_csv(db.session, "productos", handle, progress=print)
+    result["inserted"], result["updated"], result["errors"]
+
+Los números siguen una sola convención por archivo: con separador `;`
+(Excel en español) la coma es el decimal y el punto separa miles
+(`1.234,56`); con `,` es al revés (`1,234.56`). `decimal=","` o `"."`
+la fija a mano. Un valor que no encaja (`1,5` con decimal punto) es un
+error de esa fila, nunca se adivina.
+
+Solo se actualizan las columnas presentes en el CSV: un archivo sin la
+columna `stock` actualiza precios y nombres sin tocar las existencias.
+La columna `stock` se toma como conteo y no entra en el upsert: la
+diferencia con el stock actual se registra como movimiento `ajuste`
+(`inventory.record_counts`), y un producto nuevo recibe su inventario
+inicial de la misma forma. Una celda `stock` vacía deja el stock de ese
+producto como está.
+Las categorías que no existen se crean activas.
+"""
+
+import csv
+import itertools
+import re
+import time
+import unicodedata
+from collections import namedtuple
+from decimal import Decimal
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from db_dialect import upsert_statement
+from inventory import record_counts
+from models import Categoria, Cliente, Producto
+
+
+ImportSpec = namedtuple("ImportSpec", "model key required optional parse")
+
+DEFAULT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 200
+PRECIO_MAXIMO = Decimal("99999999.99")
+
+# Separador decimal por defecto según el delimitador del CSV.
+DECIMAL_BY_DELIMITER = {",": ".", ";": ","}
+_NUMBER_PATTERNS = {
+    mark: re.compile(
+        rf"^-?(?:\d{{1,3}}(?:{re.escape(thousands)}\d{{3}})+|\d+)(?:{re.escape(mark)}\d+)?$"
+    )
+    for mark, thousands in ((".", ","), (",", "."))
+}
+
+TRUE_VALUES = {"1", "si", "sí", "s", "true", "x", "yes", "y", "activo"}
+FALSE_VALUES = {"0", "no", "n", "false", "inactivo"}
+
+HEADER_ALIASES = {
+    "code": "codigo",
+    "sku": "codigo",
+    "producto": "nombre",
+    "name": "nombre",
+    "price": "precio",
+    "existencia": "stock",
+    "existencias": "stock",
+    "isv": "isv_aplica",
+    "ruc": "ruc_dni",
+    "dni": "ruc_dni",
+    "rtn": "ruc_dni",
+    "documento": "ruc_dni",
+    "correo": "email",
+}
+
+
+def normalize_header(name):
+    text = unicodedata.normalize("NFKD", (name or "").strip().lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = text.replace("/", "_").replace("-", "_").replace(" ", "_")
+    return HEADER_ALIASES.get(text, text)
+
+
+def _text(raw, field, max_length, required=False):
+    value = (raw.get(field) or "").strip()
+    if not value:
+        if required:
+            raise ValueError(f"{field} es obligatorio.")
+        return None
+    if len(value) > max_length:
+        raise ValueError(f"{field} supera {max_length} caracteres.")
+    return value
+
+
+def _number(raw, field, decimal_mark):
+    """Decimal de la celda según `decimal_mark`; el otro signo solo separa miles."""
+    value = (raw.get(field) or "").strip().upper().removeprefix("L").strip().replace(" ", "")
+    if not _NUMBER_PATTERNS[decimal_mark].match(value):
+        raise ValueError(
+            f"{field} '{value}' no es un número válido (decimales con '{decimal_mark}')."
+        )
+    thousands = "," if decimal_mark == "." else "."
+    return Decimal(value.replace(thousands, "").replace(decimal_mark, "."))
+
+
+def _decimal(raw, field, decimal_mark):
+    value = _number(raw, field, decimal_mark)
+    amount = value.quantize(Decimal("0.01"))
+    if amount != value:
+        raise ValueError(f"{field} tiene más de 2 decimales.")
+    if amount < 0 or amount > PRECIO_MAXIMO:
+        raise ValueError(f"{field} fuera de rango.")
+    return amount
+
+
+def _integer(raw, field, decimal_mark):
+    """Entero de la celda; None si está vacía (la columna no se toca en esa fila)."""
+    if not (raw.get(field) or "").strip():
+        return None
+    value = _number(raw, field, decimal_mark)
+    if value != value.to_integral_value():
+        raise ValueError(f"{field} no es un entero válido.")
+    return int(value)
+
+
+def _boolean(raw, field, default):
+    value = (raw.get(field) or "").strip().lower()
+    if not value:
+        return default
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f"{field} debe ser si/no.")
+
+
+def parse_producto(raw, columns, decimal_mark):
+    row = {
+        "codigo": _text(raw, "codigo", 50, required=True),
+        "nombre": _text(raw, "nombre", 100, required=True),
+        "categoria": _text(raw, "categoria", 50, required=True),
+        "precio": _decimal(raw, "precio", decimal_mark),
+    }
+    if "stock" in columns:
+        stock = _integer(raw, "stock", decimal_mark)
+        if stock is not None:
+            row["stock"] = stock
+    if "descripcion" in columns:
+        row["descripcion"] = (raw.get("descripcion") or "").strip() or None
+    if "activo" in columns:
+        row["activo"] = _boolean(raw, "activo", True)
+    if "isv_aplica" in columns:
+        row["isv_aplica"] = _boolean(raw, "isv_aplica", False)
+    return row
+
+
+def parse_cliente(raw, columns, decimal_mark):
+    row = {
+        "ruc_dni": _text(raw, "ruc_dni", 20, required=True),
+        "nombre": _text(raw, "nombre", 100, required=True),
+    }
+    if "direccion" in columns:
+        row["direccion"] = (raw.get("direccion") or "").strip() or None
+    if "telefono" in columns:
+        row["telefono"] = _text(raw, "telefono", 20)
+    if "email" in columns:
+        row["email"] = _text(raw, "email", 100)
+    return row
+
+
+IMPORT_SPECS = {
+    "productos": ImportSpec(
+        Producto,
+        "codigo",
+        ("codigo", "nombre", "categoria", "precio"),
+        ("stock", "descripcion", "activo", "isv_aplica"),
+        parse_producto,
+    ),
+    "clientes": ImportSpec(
+        Cliente,
+        "ruc_dni",
+        ("ruc_dni", "nombre"),
+        ("direccion", "telefono", "email"),
+        parse_cliente,
+    ),
+}
+
+
+def read_csv(stream):
+    """(columnas normalizadas, iterador de (línea, dict), delimitador). Detecta `;` o `,`."""
+    first_line = stream.readline()
+    delimiter = ";" if first_line.count(";") > first_line.count(",") else ","
+    reader = csv.reader(itertools.chain([first_line], stream), delimiter=delimiter)
+    try:
+        header = [normalize_header(name) for name in next(reader)]
+    except StopIteration:
+        raise ValueError("El archivo está vacío.") from None
+
+    def rows():
+        for values in reader:
+            if not any(value.strip() for value in values):
+                continue
+            yield reader.line_num, dict(zip(header, values))
+
+    return header, rows(), delimiter
+
+
+def ensure_categories(session, names, known):
+    """Crea las categorías que falten; `known` es el cache de nombres ya vistos."""
+    missing = {name for name in names if name not in known}
+    if not missing:
+        return
+    existing = set(
+        session.execute(select(Categoria.nombre).where(Categoria.nombre.in_(missing))).scalars()
+    )
+    for name in sorted(missing - existing):
+        session.add(Categoria(nombre=name, activo=True))
+    known.update(missing)
+
+
+def import_csv(
+    session, kind, stream, batch_size=DEFAULT_BATCH_SIZE, progress=None, decimal=None, usuario_id=None
+):
+    """Importa `stream` (texto CSV) y devuelve el resumen.
+
+    El resumen trae `total`, `inserted`, `updated`, `duplicates` (claves
+    repetidas dentro del archivo; gana la última), `error_count`, `errors`
+    (las primeras MAX_REPORTED_ERRORS como (línea, clave, mensaje)),
+    `seconds` y `rows_per_second`. `progress(resumen)` se llama tras cada lote.
+    `decimal` ("," o ".") fija el separador decimal; sin él sale del delimitador.
+    `usuario_id` queda en los movimientos de inventario de la columna `stock`.
+    """
+    spec = IMPORT_SPECS[kind]
+    table = spec.model.__table__
+    key_column = getattr(spec.model, spec.key)
+    dialect = session.get_bind().dialect.name
+    header, rows, delimiter = read_csv(stream)
+    decimal_mark = decimal if decimal in _NUMBER_PATTERNS else DECIMAL_BY_DELIMITER[delimiter]
+    missing = [column for column in spec.required if column not in header]
+    if missing:
+        raise ValueError(f"Faltan columnas obligatorias: {', '.join(missing)}.")
+    columns = set(header)
+    update_columns = [
+        column
+        for column in spec.required + spec.optional
+        if column in columns and column not in {spec.key, "stock"}
+    ]
+
+    started = time.perf_counter()
+    result = {
+        "kind": kind,
+        "decimal": decimal_mark,
+        "total": 0,
+        "inserted": 0,
+        "updated": 0,
+        "duplicates": 0,
+        "error_count": 0,
+        "errors": [],
+        "seconds": 0.0,
+        "rows_per_second": 0.0,
+    }
+    known_categories = set()
+
+    def add_error(line, key, message):
+        result["error_count"] += 1
+        if len(result["errors"]) < MAX_REPORTED_ERRORS:
+            result["errors"].append((line, key or "-", message))
+
+    def save(batch):
+        values = []
+        counts = {}
+        for key, (_, row) in batch.items():
+            row = dict(row)
+            if "stock" in row:
+                counts[key] = row.pop("stock")
+            values.append(row)
+        if kind == "productos":
+            ensure_categories(session, {row["categoria"] for row in values}, known_categories)
+        existing = set(
+            session.execute(select(key_column).where(key_column.in_(list(batch)))).scalars()
+        )
+        session.execute(upsert_statement(table, values, spec.key, update_columns, dialect))
+        if counts:
+            ids = dict(
+                session.execute(
+                    select(key_column, spec.model.id).where(key_column.in_(list(counts)))
+                ).all()
+            )
+            for nota, keys in (
+                ("Conteo (importacion CSV)", [key for key in counts if key in existing]),
+                ("Inventario inicial (importacion CSV)", [key for key in counts if key not in existing]),
+            ):
+                record_counts(session, {ids[key]: counts[key] for key in keys}, usuario_id, nota=nota)
+        session.commit()
+        return existing
+
+    def flush(batch):
+        if not batch:
+            return
+        try:
+            existing = save(batch)
+            result["updated"] += len(existing)
+            result["inserted"] += len(batch) - len(existing)
+        except SQLAlchemyError:
+            session.rollback()
+            known_categories.clear()
+            # Se reintenta fila por fila para guardar las buenas y señalar la mala.
+            for key, item in batch.items():
+                try:
+                    existing = save({key: item})
+                    result["updated" if existing else "inserted"] += 1
+                except SQLAlchemyError as exc:
+                    session.rollback()
+                    known_categories.clear()
+                    detail = str(getattr(exc, "orig", exc)).splitlines()[0][:160]
+                    add_error(item[0], key, f"No se pudo guardar: {detail}")
+        result["seconds"] = time.perf_counter() - started
+        result["rows_per_second"] = result["total"] / result["seconds"] if result["seconds"] else 0.0
+        if progress:
+            progress(result)
+
+    batch = {}
+    for line, raw in rows:
+        result["total"] += 1
+        try:
+            row = spec.parse(raw, columns, decimal_mark)
+        except ValueError as exc:
+            add_error(line, (raw.get(spec.key) or "").strip(), str(exc))
+            continue
+        key = row[spec.key]
+        if key in batch:
+            result["duplicates"] += 1
+        batch[key] = (line, row)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = {}
+    flush(batch)
+
+    result["seconds"] = time.perf_counter() - started
+    result["rows_per_second"] = result["total"] / result["seconds"] if result["seconds"] else 0.0
+    return result
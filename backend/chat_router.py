@@ -0,0 +1,142 @@
+"""
+chat_router.py · Sistema Invagro
+
+Enrutador precompilado de intenciones para /api/chat.
+
+Normaliza el mensaje una sola vez y lo recorre con una unica expresion
+regular (alternacion de todas las palabras clave) para decidir al mismo
+tiempo: intencion de consulta directa, tool sugerida y si el mensaje pide
+modificar datos.
+
+Cómo se usa:
+
+    from chat_router import normalize_text, route_message
+
+    route = route_message("top productos del mes")
+    route.intent        # "productos" | "clientes" | "facturas" | None
+    route.tool          # "top_productos" | ... | None
+    route.is_mutation   # True si pide insertar/borrar/modificar
+    route.normalized    # texto ya normalizado (reutilizable)
+"""
+
+import re
+import unicodedata
+from collections import namedtuple
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Orden = prioridad: la primera categoria con coincidencia gana.
+INTENT_KEYWORDS = (
+    ("clientes", ("cliente", "clientes", "lista de clientes", "top clientes")),
+    ("productos", ("producto", "productos", "inventario")),
+    ("facturas", ("factura", "facturas", "venta", "ventas")),
+)
+
+MUTATION_KEYWORDS = (
+    "insert",
+    "update",
+    "delete",
+    "drop",
+    "alter",
+    "elimina",
+    "borra",
+    "borrar",
+    "modifica",
+    "modificar",
+    "actualiza",
+    "actualizar",
+    "agrega",
+    "agregar",
+)
+
+# Cada regla: (tool, grupos). La regla aplica si cada grupo tiene al menos
+# una palabra presente. Se evalua en orden.
+TOOL_RULES = (
+    ("productos_disminuidos", (("disminuido",), ("compra",))),
+    ("top_productos", (("producto mas vendido", "top productos"),)),
+    ("productos_por_cliente", (("productos",), ("compra",))),
+    ("clientes_inactivos", (("clientes",), ("inact",))),
+    ("compras_por_cliente", (("compras",), ("cliente",))),
+)
+
+ChatRoute = namedtuple("ChatRoute", ["normalized", "intent", "tool", "is_mutation"])
+
+
+def normalize_text(text_value):
+    """Minusculas, sin acentos y con espacios colapsados."""
+    if not text_value:
+        return ""
+    normalized = unicodedata.normalize("NFKD", text_value)
+    normalized = "".join(ch for ch in normalized if not unicodedata.combining(ch))
+    normalized = _WHITESPACE_RE.sub(" ", normalized)
+    return normalized.strip().lower()
+
+
+class ChatRouter:
+    """Compila todas las palabras clave en una sola alternacion."""
+
+    def __init__(self, intents=INTENT_KEYWORDS, mutations=MUTATION_KEYWORDS, tool_rules=TOOL_RULES):
+        self.intents = tuple((name, frozenset(words)) for name, words in intents)
+        self.mutations = frozenset(mutations)
+        self.tool_rules = tuple(
+            (tool, tuple(frozenset(group) for group in groups)) for tool, groups in tool_rules
+        )
+
+        keywords = set(self.mutations)
+        for _, words in self.intents:
+            keywords.update(words)
+        for _, groups in self.tool_rules:
+            for group in groups:
+                keywords.update(group)
+
+        # Lookahead de ancho cero: una coincidencia por posicion, incluso si se
+        # solapan. Con las mas largas primero, la alternacion devuelve la
+        # palabra mas larga que empieza en cada posicion; las palabras clave
+        # contenidas en ella se agregan con `_contained`.
+        ordered = sorted(keywords, key=lambda word: (-len(word), word))
+        self._pattern = re.compile(
+            "(?=(" + "|".join(re.escape(word) for word in ordered) + "))"
+        )
+        self._contained = {
+            word: frozenset(other for other in keywords if other in word)
+            for word in keywords
+        }
+
+    def matched_keywords(self, normalized):
+        found = set()
+        for match in self._pattern.finditer(normalized):
+            word = match.group(1)
+            if word not in found:
+                found.update(self._contained[word])
+        return found
+
+    def route(self, text_value):
+        normalized = normalize_text(text_value)
+        found = self.matched_keywords(normalized) if normalized else set()
+
+        intent = None
+        for name, words in self.intents:
+            if found & words:
+                intent = name
+                break
+
+        tool = None
+        for tool_name, groups in self.tool_rules:
+            if all(found & group for group in groups):
+                tool = tool_name
+                break
+
+        return ChatRoute(
+            normalized=normalized,
+            intent=intent,
+            tool=tool,
+            is_mutation=bool(found & self.mutations),
+        )
+
+
+default_router = ChatRouter()
+
+
+def route_message(text_value):
+    return default_router.route(text_value)
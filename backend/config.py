@@ -26,14 +26,25 @@ load_environment()
 class Config:
     SECRET_KEY = require_env("SECRET_KEY")
     FLASK_ENV = require_env("FLASK_ENV")
-    DB_HOST = require_env("DB_HOST")
-    DB_PORT = os.getenv("DB_PORT", "3306")
-    DB_USER = require_env("DB_USER")
-    DB_PASS = require_env("DB_PASS")
-    DB_NAME = require_env("DB_NAME")
-    SQLALCHEMY_DATABASE_URI = (
-        f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-    )
+    # DB_ENGINE=sqlite usa un archivo local (SQLITE_PATH) y no requiere MySQL.
+    DB_ENGINE = os.getenv("DB_ENGINE", "mysql").strip().lower()
+    if DB_ENGINE == "sqlite":
+        DB_HOST = DB_PORT = DB_USER = DB_PASS = None
+        SQLITE_PATH = os.path.abspath(
+            os.getenv("SQLITE_PATH")
+            or os.path.join(os.path.dirname(os.path.abspath(__file__)), "invagro.sqlite3")
+        )
+        DB_NAME = None
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{SQLITE_PATH}"
+    else:
+        DB_HOST = require_env("DB_HOST")
+        DB_PORT = os.getenv("DB_PORT", "3306")
+        DB_USER = require_env("DB_USER")
+        DB_PASS = require_env("DB_PASS")
+        DB_NAME = require_env("DB_NAME")
+        SQLALCHEMY_DATABASE_URI = (
+            f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+        )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
     SESSION_REFRESH_EACH_REQUEST = False
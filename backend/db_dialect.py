@@ -0,0 +1,103 @@
+"""
+db_dialect.py · Sistema Invagro
+
+Capa mínima para que el SQL crudo y la configuración del motor funcionen
+igual en MySQL (producción) y en SQLite (pruebas y benchmarks locales).
+
+Cómo se usa:
+
+    from db_dialect import configure_sqlite, quote_table, year_of
+
+    configure_sqlite(app)               # dentro de create_app, tras db.init_app
+
+    dialect = db.engine.dialect.name    # "mysql" | "sqlite"
+    sql = f"SELECT {year_of('f.fecha', dialect)} FROM {quote_table('inva-clientes', dialect)}"
+
+    # INSERT de varias filas que actualiza las que ya existen por `codigo`.
+    stmt = upsert_statement(Producto.__table__, rows, "codigo", ["nombre", "precio"], dialect)
+    db.session.execute(stmt)
+
+Con SQLite se activan WAL y pragmas pensados para muchas lecturas
+concurrentes desde varios workers sobre un mismo archivo.
+"""
+
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+SQLITE_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("foreign_keys", "ON"),
+    ("busy_timeout", "5000"),
+    ("temp_store", "MEMORY"),
+    ("cache_size", "-65536"),
+    ("mmap_size", "268435456"),
+)
+
+_pragmas_installed = False
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        # En bases en memoria journal_mode=WAL se ignora sin error.
+        for name, value in SQLITE_PRAGMAS:
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def configure_sqlite(app):
+    """Aplica los pragmas de SQLite a cada conexión nueva (no afecta a MySQL)."""
+    global _pragmas_installed
+    if not app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+        return
+    if not _pragmas_installed:
+        event.listen(Engine, "connect", _apply_sqlite_pragmas)
+        _pragmas_installed = True
+
+
+def quote_table(name, dialect):
+    """Cita un nombre de tabla con guiones según el motor."""
+    if dialect == "mysql":
+        return f"`{name}`"
+    return f'"{name}"'
+
+
+def year_of(column, dialect):
+    """Expresión SQL para el año de una columna fecha."""
+    if dialect == "sqlite":
+        return f"CAST(strftime('%Y', {column}) AS INTEGER)"
+    return f"YEAR({column})"
+
+
+def upsert_statement(table, rows, key, update_columns, dialect):
+    """INSERT multi-fila que actualiza `update_columns` cuando `key` ya existe.
+
+    MySQL usa ON DUPLICATE KEY UPDATE y SQLite ON CONFLICT(key) DO UPDATE;
+    en ambos casos `key` debe tener un índice único.
+    """
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+
+        stmt = insert(table).values(rows)
+        if not update_columns:
+            return stmt.prefix_with("IGNORE")
+        return stmt.on_duplicate_key_update(
+            {column: stmt.inserted[column] for column in update_columns}
+        )
+
+    from sqlalchemy.dialects.sqlite import insert
+
+    stmt = insert(table).values(rows)
+    if not update_columns:
+        return stmt.on_conflict_do_nothing(index_elements=[key])
+    return stmt.on_conflict_do_update(
+        index_elements=[key],
+        set_={column: stmt.excluded[column] for column in update_columns},
+    )
@@ -0,0 +1,182 @@
+"""
+escpos.py · Sistema Invagro
+
+Ticket de venta para impresora térmica, en texto plano o en ESC/POS, a
+partir de los mismos datos que el PDF de la factura. No usa Flask ni la base
+de datos: recibe un dict y devuelve `str` o `bytes`, así que el mismo dict
+produce siempre los mismos bytes (se puede comparar contra un archivo
+guardado sin impresora).
+
+El ticket de texto sirve para imprimir desde el navegador con el driver
+"Generic / Text Only"; el ESC/POS se manda tal cual a la impresora
+(`cat ticket.bin > /dev/usb/lp0`, `copy /b ticket.bin \\\\pc\\termica`).
+Varios tickets seguidos forman un archivo de cola: cada uno termina con
+avance y corte.
+
+Cómo se usa:
+
+    from escpos import render_escpos, render_text
+
+    ticket = {
+        "negocio": {"nombre": "Invagro", "rtn": "...", "cai": "...", ...},
+        "numero": "F001-...", "fecha": datetime(...), "tipo": "contado",
+        "cliente": "Consumidor final", "cajero": "Ana", "vendedor": "Ana",
+        "lineas": [{"descripcion": "...", "cantidad": 2, "precio": Decimal("12.50"),
+                    "descuento": Decimal("0"), "subtotal": Decimal("25.00"),
+                    "isv_aplica": True}],
+        "descuento": ..., "subtotal": ..., "total": ..., "pago": ..., "cambio": ...,
+        "total_en_letras": "VEINTICINCO LEMPIRAS CON 00/100",
+    }
+    texto = render_text(ticket, columns=48)
+    datos = render_escpos(ticket, columns=48)
+
+48 columnas es la fuente A de una impresora de 80 mm; 32 para 58 mm.
+"""
+
+import textwrap
+from decimal import Decimal
+
+ESC = b"\x1b"
+GS = b"\x1d"
+INIT = ESC + b"@"
+CODEPAGE_PC850 = ESC + b"t\x02"
+ALIGN = {"left": ESC + b"a\x00", "center": ESC + b"a\x01"}
+BOLD_ON, BOLD_OFF = ESC + b"E\x01", ESC + b"E\x00"
+DOUBLE_HEIGHT_ON, DOUBLE_HEIGHT_OFF = GS + b"!\x01", GS + b"!\x00"
+FEED_AND_CUT = ESC + b"d\x04" + GS + b"V\x01"
+
+ISV_RATE = Decimal("0.15")
+
+
+def _money(value):
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value or 0))
+    return f"L {value:.2f}"
+
+
+def _wrap(text, columns):
+    text = str(text or "")
+    if len(text) <= columns and "\n" not in text:
+        return [text]
+    # Sin cortar en guiones: números de factura, RTN y CAI quedan enteros.
+    return textwrap.wrap(text, columns, break_on_hyphens=False) or [""]
+
+
+def _pair(label, value, columns):
+    """`label ......... value` en una línea; si no cabe, el valor va abajo a la derecha."""
+    gap = columns - len(label) - len(value)
+    if gap >= 1:
+        return [label + " " * gap + value]
+    return _wrap(label, columns) + [value.rjust(columns)]
+
+
+def receipt_lines(ticket, columns=48):
+    """Líneas del ticket como (estilo, alineación, texto); estilo: normal, bold o big."""
+    negocio = ticket.get("negocio") or {}
+    rule = ("normal", "left", "-" * columns)
+    lines = []
+
+    def add(text, style="normal", align="left"):
+        for part in _wrap(text, columns):
+            lines.append((style, align, part))
+
+    add(negocio.get("nombre") or "", "big", "center")
+    for value in (
+        negocio.get("direccion"),
+        f"RTN: {negocio.get('rtn') or '-'}  TEL: {negocio.get('telefono') or '-'}",
+        negocio.get("email"),
+    ):
+        if value:
+            add(value, align="center")
+    lines.append(rule)
+
+    fecha = ticket.get("fecha")
+    add(f"FACTURA: {ticket.get('numero') or '-'}", "bold")
+    add(f"FECHA: {fecha:%d/%m/%Y %I:%M %p}" if fecha else "FECHA: -")
+    add(f"CLIENTE: {ticket.get('cliente') or 'N/A'}")
+    add(f"RTN: {ticket.get('rtn') or '-'}")
+    add(f"CAJERO: {ticket.get('cajero') or '-'}")
+    add(f"VENDEDOR: {ticket.get('vendedor') or '-'}")
+    terminos = "CONTADO" if ticket.get("tipo") == "contado" else "CREDITO"
+    add(f"TERMINOS: {terminos}  ESTADO: {(ticket.get('estado') or '-').upper()}")
+    lines.append(rule)
+
+    exento = gravado = Decimal("0")
+    for linea in ticket.get("lineas") or []:
+        subtotal = linea.get("subtotal") or Decimal("0")
+        if not isinstance(subtotal, Decimal):
+            subtotal = Decimal(str(subtotal))
+        if linea.get("isv_aplica"):
+            gravado += subtotal
+        else:
+            exento += subtotal
+        add(linea.get("descripcion") or "")
+        detalle = f"  {linea.get('cantidad')} x {_money(linea.get('precio'))}"
+        descuento = Decimal(str(linea.get("descuento") or 0))
+        if descuento:
+            detalle += f" -{_money(descuento)}"
+        marca = "G" if linea.get("isv_aplica") else "E"
+        for part in _pair(detalle, f"{_money(subtotal)} {marca}", columns):
+            lines.append(("normal", "left", part))
+    lines.append(rule)
+
+    totales = [
+        ("DESCUENTOS Y REBAJAS", ticket.get("descuento")),
+        ("SUBTOTAL", ticket.get("subtotal")),
+        ("IMPORTE EXENTO", exento),
+        ("IMPORTE EXONERADO", 0),
+        ("IMPORTE GRAVADO 15%", gravado),
+        ("ISV 15.00%", gravado * ISV_RATE),
+    ]
+    for label, value in totales:
+        for part in _pair(label, _money(value), columns):
+            lines.append(("normal", "left", part))
+    for part in _pair("TOTAL A PAGAR", _money(ticket.get("total")), columns):
+        lines.append(("big", "left", part))
+    if ticket.get("tipo") == "contado":
+        for label, key in (("EFECTIVO", "pago"), ("CAMBIO", "cambio")):
+            for part in _pair(label, _money(ticket.get(key)), columns):
+                lines.append(("normal", "left", part))
+    add(f"TOTAL EN LETRAS: {ticket.get('total_en_letras') or ''}")
+    add("G = gravado 15%  E = exento")
+    lines.append(rule)
+
+    if negocio.get("cai") or negocio.get("rango") or negocio.get("fecha_limite"):
+        add(f"CAI: {negocio.get('cai') or '-'}")
+        add(f"RANGO AUTORIZADO: {negocio.get('rango') or '-'}")
+        add(f"FECHA LIMITE DE EMISION: {negocio.get('fecha_limite') or '-'}")
+    if negocio.get("mensaje"):
+        add(negocio["mensaje"], align="center")
+    return lines
+
+
+def render_text(ticket, columns=48):
+    """Ticket en texto plano (una línea por renglón, termina en salto de línea)."""
+    out = []
+    for _, align, text in receipt_lines(ticket, columns):
+        out.append(text.center(columns).rstrip() if align == "center" else text)
+    return "\n".join(out) + "\n\n\n"
+
+
+def render_escpos(ticket, columns=48):
+    """Ticket en ESC/POS (página de códigos PC850), con avance y corte al final."""
+    out = [INIT, CODEPAGE_PC850]
+    current = ("normal", "left")
+    run = []  # renglones seguidos con el mismo estilo: se codifican juntos
+
+    def flush():
+        if run:
+            out.append("".join(run).encode("cp850", "replace"))
+            run.clear()
+
+    for style, align, text in receipt_lines(ticket, columns):
+        if (style, align) != current:
+            flush()
+            out.append(ALIGN[align])
+            out.append(BOLD_ON if style in {"bold", "big"} else BOLD_OFF)
+            out.append(DOUBLE_HEIGHT_ON if style == "big" else DOUBLE_HEIGHT_OFF)
+            current = (style, align)
+        run.append(text + "\n")
+    flush()
+    out.append(ALIGN["left"] + BOLD_OFF + DOUBLE_HEIGHT_OFF + FEED_AND_CUT)
+    return b"".join(out)
@@ -0,0 +1,271 @@
+"""
+export_stream.py · Sistema Invagro
+
+Exportaciones CSV / XLSX que se envían mientras se leen de la base de datos.
+Las filas llegan en lotes por un cursor del lado del servidor
+(`yield_per` + `stream_results`; en MySQL usa SSCursor de pymysql) y se
+escriben al cliente por bloques. La memoria del worker queda acotada por el
+tamaño del lote y no por la cantidad de filas, y el primer byte sale en
+cuanto la consulta devuelve la primera fila.
+
+Cómo se usa:
+
+    from export_stream import export_response, stream_rows
+
+    statement = select(FacturaContado.numero_factura, FacturaContado.total)
+    rows = stream_rows(db.session, statement)
+    return export_response("facturas-2024-01", "xlsx", ["Factura", "Total"], rows)
+
+El XLSX se arma a mano (SpreadsheetML mínimo dentro de un zip escrito en
+modo streaming), sin openpyxl: openpyxl en modo write_only igual junta el
+archivo completo antes de poder enviarlo. Si una hoja llega al límite de
+filas de Excel se continúa en una hoja nueva.
+"""
+
+import csv
+import io
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from flask import Response, stream_with_context
+
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+EXPORT_BATCH_SIZE = 1000
+CSV_CHUNK_ROWS = 500
+XLSX_MAX_ROWS = 1048576
+
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def stream_rows(session, statement, batch_size=EXPORT_BATCH_SIZE):
+    """Itera las filas de `statement` con un cursor del servidor, de a `batch_size`."""
+    result = session.execute(
+        statement.execution_options(yield_per=batch_size, stream_results=True)
+    )
+    try:
+        for row in result:
+            yield row
+    finally:
+        result.close()
+
+
+def format_value(value):
+    """Texto de una celda para CSV (fechas ISO, decimales sin notación científica)."""
+    if type(value) is str:
+        return value
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return "si" if value else "no"
+    if isinstance(value, Decimal):
+        return format(value, "f")
+    return str(value)
+
+
+def csv_chunks(header, rows, chunk_rows=CSV_CHUNK_ROWS):
+    """Genera el CSV en bloques de bytes (UTF-8 con BOM para que Excel respete acentos)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+    buffer.seek(0)
+    buffer.truncate()
+
+    pending = 0
+    for row in rows:
+        writer.writerow([format_value(value) for value in row])
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """Destino de escritura sin seek para zipfile: acumula bytes hasta que se drenan."""
+
+    def __init__(self):
+        self._parts = []
+        self._offset = 0
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _column_name(index):
+    name = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        name = chr(65 + remainder) + name
+    return name
+
+
+def _xlsx_cell(ref, value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        value = "si" if value else "no"
+    elif isinstance(value, (int, float, Decimal)):
+        return f'<c r="{ref}"><v>{format_value(value)}</v></c>'
+    text = escape(_XML_INVALID.sub("", format_value(value)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(number, values, columns):
+    cells = "".join(
+        _xlsx_cell(f"{column}{number}", value) for column, value in zip(columns, values)
+    )
+    return f'<row r="{number}">{cells}</row>'
+
+
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    "<sheetData>"
+)
+_SHEET_TAIL = "</sheetData></worksheet>"
+
+
+def _xlsx_package_parts(sheet_names):
+    """Partes fijas del paquete (se escriben al final, cuando se sabe cuántas hojas hubo)."""
+    sheets = "".join(
+        f'<sheet name="{escape(name)}" sheetId="{index}" r:id="rId{index}"/>'
+        for index, name in enumerate(sheet_names, start=1)
+    )
+    sheet_rels = "".join(
+        f'<Relationship Id="rId{index}" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        f'Target="worksheets/sheet{index}.xml"/>'
+        for index in range(1, len(sheet_names) + 1)
+    )
+    sheet_types = "".join(
+        f'<Override PartName="/xl/worksheets/sheet{index}.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        for index in range(1, len(sheet_names) + 1)
+    )
+    return [
+        (
+            "xl/workbook.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f"<sheets>{sheets}</sheets></workbook>",
+        ),
+        (
+            "xl/_rels/workbook.xml.rels",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f"{sheet_rels}</Relationships>",
+        ),
+        (
+            "_rels/.rels",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="xl/workbook.xml"/></Relationships>',
+        ),
+        (
+            "[Content_Types].xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            f"{sheet_types}</Types>",
+        ),
+    ]
+
+
+def xlsx_chunks(header, rows, sheet_name="Datos", chunk_rows=CSV_CHUNK_ROWS, max_rows=XLSX_MAX_ROWS):
+    """Genera un XLSX en bloques de bytes; cada hoja repite el encabezado."""
+    columns = [_column_name(index) for index in range(len(header))]
+    sink = _ChunkSink()
+    package = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED)
+    sheet_names = []
+    pending = []
+
+    def open_sheet():
+        sheet_names.append(sheet_name if not sheet_names else f"{sheet_name} {len(sheet_names) + 1}")
+        handle = package.open(f"xl/worksheets/sheet{len(sheet_names)}.xml", mode="w")
+        handle.write((_SHEET_HEAD + _xlsx_row(1, header, columns)).encode("utf-8"))
+        return handle
+
+    sheet = open_sheet()
+    row_number = 1
+    # La cabecera del zip sale antes de la primera fila: el navegador empieza la descarga.
+    yield sink.drain()
+    for row in rows:
+        if row_number >= max_rows:
+            sheet.write("".join(pending).encode("utf-8"))
+            pending = []
+            sheet.write(_SHEET_TAIL.encode("utf-8"))
+            sheet.close()
+            sheet = open_sheet()
+            row_number = 1
+        row_number += 1
+        pending.append(_xlsx_row(row_number, row, columns))
+        if len(pending) >= chunk_rows:
+            sheet.write("".join(pending).encode("utf-8"))
+            pending = []
+            data = sink.drain()
+            if data:
+                yield data
+    sheet.write(("".join(pending) + _SHEET_TAIL).encode("utf-8"))
+    sheet.close()
+    for name, content in _xlsx_package_parts(sheet_names):
+        package.writestr(name, content)
+    package.close()
+    yield sink.drain()
+
+
+def export_response(filename, export_format, header, rows, sheet_name="Datos"):
+    """Response en streaming con el archivo `filename.<formato>`.
+
+    Debe llamarse dentro de la vista: `stream_with_context` mantiene la
+    sesión de base de datos abierta mientras el generador sigue leyendo.
+    """
+    if export_format == "xlsx":
+        chunks = xlsx_chunks(header, rows, sheet_name=sheet_name)
+    else:
+        export_format = "csv"
+        chunks = csv_chunks(header, rows)
+    return Response(
+        stream_with_context(chunks),
+        content_type=EXPORT_FORMATS[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{export_format}"',
+            "Cache-Control": "no-store",
+            # Evita que nginx junte toda la respuesta antes de reenviarla.
+            "X-Accel-Buffering": "no",
+        },
+    )
@@ -0,0 +1,53 @@
+"""
+file_serving.py · Sistema Invagro
+
+Descarga de archivos que exigen sesión (recibos, PDF de facturas). Flask
+revisa el permiso y, según FILE_SERVING:
+
+    flask     envía el archivo con send_from_directory (desarrollo, SQLite)
+    x-accel   responde vacío con `X-Accel-Redirect` y nginx envía el archivo
+              desde una location `internal` (producción, ver scripts/deploy.sh)
+
+Con x-accel el worker de gunicorn queda libre apenas termina la revisión;
+la transferencia, los rangos y los 304 los resuelve nginx. Las locations
+internas se llaman `<X_ACCEL_PREFIX>/<location>/`, por ejemplo
+`/_protected/receipts/`, y apuntan a la misma carpeta que `directory`.
+
+Cómo se usa:
+
+    from file_serving import send_protected_file
+
+    return send_protected_file(
+        app.config["RECEIPT_PDF_FOLDER"], filename, "receipts", mimetype="application/pdf"
+    )
+"""
+
+import mimetypes
+import os
+from urllib.parse import quote
+
+from flask import abort, current_app, send_from_directory
+from werkzeug.security import safe_join
+
+FILE_SERVING_MODES = {"flask", "x-accel"}
+
+
+def send_protected_file(directory, filename, location, mimetype=None, download_name=None):
+    """Respuesta con el archivo `filename` de `directory` (404 si no existe)."""
+    if current_app.config["FILE_SERVING"] != "x-accel":
+        return send_from_directory(
+            directory, filename, mimetype=mimetype, download_name=download_name
+        )
+
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    response = current_app.response_class(
+        mimetype=mimetype or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    )
+    response.headers["X-Accel-Redirect"] = (
+        f"{current_app.config['X_ACCEL_PREFIX']}/{location}/{quote(filename)}"
+    )
+    if download_name:
+        response.headers.set("Content-Disposition", "inline", filename=download_name)
+    return response
@@ -0,0 +1,164 @@
+"""
+idempotency.py · Sistema Invagro
+
+Claves de idempotencia para los POST que crean facturas y pedidos. El POS
+manda un encabezado `Idempotency-Key` (un UUID por intento de guardar) y,
+si el Wi-Fi corta la respuesta, reintenta con la misma clave. La primera
+petición guarda su respuesta en `inva-idempotency_keys`; los reintentos la
+reciben tal cual (con `Idempotent-Replayed: true`) sin volver a validar,
+insertar, descontar stock ni generar el PDF.
+
+    misma clave, mismo cuerpo, ya respondida   -> respuesta guardada
+    misma clave, mismo cuerpo, aún en proceso  -> 409, el cliente reintenta
+    misma clave, otro cuerpo                   -> 422
+    sin encabezado                             -> la vista normal
+
+Las respuestas 5xx no se guardan (se borra la clave) para que el reintento
+vuelva a intentarlo. La clave es por usuario y ruta; vence a las
+IDEMPOTENCY_TTL_HOURS y `flask idempotency-sweep` borra las vencidas por
+lotes.
+
+Cómo se usa:
+
+    from idempotency import idempotent
+
+    @bp.post("/facturas")
+    @idempotent("facturas")
+    def crear_factura():
+        ...
+"""
+
+import hashlib
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, jsonify, request
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from auth_helpers import current_user_id
+from models import IdempotencyKey, db
+
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 64
+# Una clave "en proceso" más vieja que esto quedó huérfana (worker caído).
+PENDING_TIMEOUT = timedelta(minutes=2)
+
+_keys = IdempotencyKey.__table__
+
+
+def _json_error(message, status):
+    response = jsonify({"error": message})
+    response.status_code = status
+    return response
+
+
+def _in_progress():
+    response = _json_error("La solicitud anterior aun se esta procesando.", 409)
+    response.headers["Retry-After"] = "1"
+    return response
+
+
+def _replay(row):
+    response = current_app.response_class(
+        row.respuesta or "", status=row.status_code, mimetype="application/json"
+    )
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _claim(usuario_id, ruta, clave, huella):
+    """Registra la clave como "en proceso". Devuelve (id, None) o (None, respuesta)."""
+    now = datetime.utcnow()
+    values = {
+        "huella": huella,
+        "status_code": None,
+        "respuesta": None,
+        "creado": now,
+        "expira": now + timedelta(hours=current_app.config["IDEMPOTENCY_TTL_HOURS"]),
+    }
+    try:
+        result = db.session.execute(
+            insert(_keys).values(usuario_id=usuario_id, ruta=ruta, clave=clave, **values)
+        )
+        db.session.commit()
+        return result.inserted_primary_key[0], None
+    except IntegrityError:
+        db.session.rollback()
+
+    row = db.session.execute(
+        select(_keys).where(
+            _keys.c.usuario_id == usuario_id, _keys.c.ruta == ruta, _keys.c.clave == clave
+        )
+    ).first()
+    if row is None:
+        return None, _json_error("No se pudo registrar la clave de idempotencia.", 409)
+    if row.expira > now and row.status_code is not None:
+        if row.huella != huella:
+            return None, _json_error("La clave de idempotencia ya se uso con otro contenido.", 422)
+        return None, _replay(row)
+    if row.expira > now and row.creado > now - PENDING_TIMEOUT:
+        if row.huella != huella:
+            return None, _json_error("La clave de idempotencia ya se uso con otro contenido.", 422)
+        return None, _in_progress()
+
+    # Vencida o huérfana: se toma con un UPDATE condicional, como un insert nuevo.
+    result = db.session.execute(
+        update(_keys)
+        .where(_keys.c.id == row.id, _keys.c.creado == row.creado)
+        .values(**values)
+    )
+    db.session.commit()
+    if result.rowcount != 1:
+        return None, _in_progress()
+    return row.id, None
+
+
+def _finish(key_id, response):
+    try:
+        if response.status_code >= 500:
+            db.session.execute(delete(_keys).where(_keys.c.id == key_id))
+        else:
+            db.session.execute(
+                update(_keys)
+                .where(_keys.c.id == key_id)
+                .values(status_code=response.status_code, respuesta=response.get_data(as_text=True))
+            )
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        current_app.logger.exception("No se pudo guardar la respuesta idempotente.")
+
+
+def idempotent(ruta):
+    """Decorador para vistas JSON: repite la respuesta guardada si la clave ya se uso."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            clave = (request.headers.get(HEADER) or "").strip()
+            usuario_id = current_user_id()
+            if not clave or usuario_id is None:
+                return view(*args, **kwargs)
+            if len(clave) > MAX_KEY_LENGTH:
+                return _json_error("Clave de idempotencia invalida.", 400)
+
+            huella = hashlib.sha256(request.get_data()).hexdigest()
+            key_id, cached = _claim(usuario_id, ruta, clave, huella)
+            if cached is not None:
+                return cached
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+            except Exception:
+                db.session.rollback()
+                db.session.execute(delete(_keys).where(_keys.c.id == key_id))
+                db.session.commit()
+                raise
+            _finish(key_id, response)
+            return response
+
+        return wrapper
+
+    return decorator
+
@@ -0,0 +1,237 @@
+"""
+inventory.py · Sistema Invagro
+
+Existencias de productos con un libro de movimientos
+(`inva-movimientos_inventario`): venta, anulación, ajuste y compra. Cada
+movimiento guarda la cantidad con signo, así que el stock de un producto es
+la suma de sus movimientos desde el último conteo.
+
+El stock nunca se lee, se modifica en Python y se vuelve a escribir: con
+varias cajas vendiendo el mismo producto eso pierde ventas o vende de más.
+Se descuenta con un UPDATE condicional, uno solo por factura:
+
+    UPDATE `inva-productos`
+       SET stock = stock - CASE id WHEN 7 THEN 2 WHEN 9 THEN 1 END
+     WHERE id IN (7, 9) AND stock >= CASE id WHEN 7 THEN 2 WHEN 9 THEN 1 END
+
+Si alguna fila no cumple la condición, el UPDATE afecta menos filas que
+productos tiene la factura: se hace rollback y se lanza StockInsuficiente,
+así la factura no se guarda. No hay SELECT ... FOR UPDATE: las filas
+quedan bloqueadas solo desde el UPDATE hasta el commit, por eso se ejecuta
+como último paso antes del commit. Un solo UPDATE por factura también
+bloquea las filas siempre en el mismo orden (por id), sin deadlocks entre
+dos cajas que venden los mismos productos.
+
+Cómo se usa:
+
+    from inventory import StockInsuficiente, record_sale, revert_sale
+
+    try:
+        db.session.add(factura)
+        db.session.flush()
+        record_sale(db.session, [(producto_id, cantidad), ...], factura.id,
+                    usuario_id, referencia=factura.numero_factura)
+        db.session.commit()
+    except StockInsuficiente as exc:
+        return jsonify({"error": str(exc)}), 409
+
+Por defecto (INVENTORY_ENFORCE_STOCK=0) el stock se descuenta igual pero
+puede quedar negativo: el stock de antes de esta versión nunca se descontó y
+no es confiable. Con INVENTORY_ENFORCE_STOCK=1, después del primer conteo,
+las ventas sin stock se rechazan.
+"""
+
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import case, func, insert, select, update
+
+from models import MovimientoInventario, Producto
+
+
+MOVEMENT_TYPES = ("venta", "anulacion", "ajuste", "compra")
+
+Faltante = namedtuple("Faltante", "producto_id nombre solicitado disponible")
+
+_productos = Producto.__table__
+_movimientos = MovimientoInventario.__table__
+
+
+class StockInsuficiente(Exception):
+    """Uno o más productos no tienen existencias para la cantidad pedida."""
+
+    def __init__(self, faltantes):
+        self.faltantes = faltantes
+        detalle = ", ".join(
+            f"{item.nombre} (pedido {item.solicitado}, disponible {item.disponible})"
+            for item in faltantes
+        )
+        super().__init__(f"Stock insuficiente: {detalle}.")
+
+
+def aggregate_items(items):
+    """Suma las cantidades por producto (una factura puede repetir un producto)."""
+    totals = {}
+    for producto_id, cantidad in items:
+        totals[producto_id] = totals.get(producto_id, 0) + int(cantidad)
+    return totals
+
+
+def find_shortages(session, quantities):
+    """Productos cuyo stock actual no cubre `quantities` ({producto_id: cantidad})."""
+    if not quantities:
+        return []
+    rows = session.execute(
+        select(_productos.c.id, _productos.c.nombre, func.coalesce(_productos.c.stock, 0)).where(
+            _productos.c.id.in_(list(quantities))
+        )
+    ).all()
+    return [
+        Faltante(producto_id, nombre, quantities[producto_id], disponible)
+        for producto_id, nombre, disponible in sorted(rows)
+        if disponible < quantities[producto_id]
+    ]
+
+
+def apply_stock_deltas(session, deltas, enforce=True):
+    """Suma `deltas` ({producto_id: cantidad con signo}) al stock en un solo UPDATE.
+
+    Con `enforce`, si alguna fila quedaría negativa se hace rollback de la
+    transacción completa y se lanza StockInsuficiente con lo disponible.
+    """
+    deltas = {producto_id: delta for producto_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    stock = func.coalesce(_productos.c.stock, 0)
+    delta = case(deltas, value=_productos.c.id)
+    statement = (
+        update(_productos)
+        .where(_productos.c.id.in_(sorted(deltas)))
+        .values(stock=stock + delta)
+    )
+    if enforce:
+        statement = statement.where(stock + delta >= 0)
+    result = session.execute(statement)
+    if result.rowcount != len(deltas):
+        # Las filas que sí cumplieron ya se descontaron: primero el rollback,
+        # después se lee lo disponible.
+        session.rollback()
+        salidas = {producto_id: -delta for producto_id, delta in deltas.items() if delta < 0}
+        faltantes = find_shortages(session, salidas)
+        if not faltantes:
+            faltantes = [Faltante(producto_id, f"#{producto_id}", 0, 0) for producto_id in deltas]
+        raise StockInsuficiente(faltantes)
+
+
+def _movement_rows(deltas, tipo, usuario_id, fecha, factura_id=None, referencia=None, nota=None):
+    return [
+        {
+            "producto_id": producto_id,
+            "tipo": tipo,
+            "cantidad": delta,
+            "factura_id": factura_id,
+            "usuario_id": usuario_id,
+            "referencia": referencia,
+            "nota": nota,
+            "fecha": fecha,
+        }
+        for producto_id, delta in sorted(deltas.items())
+        if delta
+    ]
+
+
+def _record(session, deltas, tipo, usuario_id, factura_id=None, referencia=None, nota=None):
+    rows = _movement_rows(
+        deltas, tipo, usuario_id, datetime.utcnow(), factura_id=factura_id, referencia=referencia, nota=nota
+    )
+    if rows:
+        session.execute(insert(_movimientos), rows)
+
+
+def record_sale(session, items, factura_id, usuario_id, referencia=None, enforce=True):
+    """Registra la venta de `items` [(producto_id, cantidad)] y descuenta el stock.
+
+    Los movimientos se insertan primero y el UPDATE va al final, para que
+    las filas de productos estén bloqueadas el menor tiempo posible.
+    """
+    deltas = {producto_id: -cantidad for producto_id, cantidad in aggregate_items(items).items()}
+    _record(session, deltas, "venta", usuario_id, factura_id=factura_id, referencia=referencia)
+    apply_stock_deltas(session, deltas, enforce=enforce)
+
+
+def record_sales(session, ventas, usuario_id, enforce=True):
+    """Varias facturas a la vez: `ventas` es [(factura_id, referencia, items)].
+
+    Un solo INSERT de movimientos y un solo UPDATE de stock para todo el
+    lote; si a un producto no le alcanza, no se guarda ninguna factura.
+    """
+    fecha = datetime.utcnow()
+    rows = []
+    totals = {}
+    for factura_id, referencia, items in ventas:
+        deltas = {producto_id: -cantidad for producto_id, cantidad in aggregate_items(items).items()}
+        rows.extend(
+            _movement_rows(deltas, "venta", usuario_id, fecha, factura_id=factura_id, referencia=referencia)
+        )
+        for producto_id, delta in deltas.items():
+            totals[producto_id] = totals.get(producto_id, 0) + delta
+    if rows:
+        session.execute(insert(_movimientos), rows)
+    apply_stock_deltas(session, totals, enforce=enforce)
+
+
+def revert_sale(session, factura_id, usuario_id, referencia=None):
+    """Devuelve al stock lo que la factura descontó. Devuelve {producto_id: cantidad}.
+
+    Se basa en los movimientos de la factura, no en su detalle: una factura
+    anterior al libro de movimientos no descontó nada y no devuelve nada, y
+    revertir dos veces la misma factura no suma dos veces.
+    """
+    rows = session.execute(
+        select(_movimientos.c.producto_id, func.sum(_movimientos.c.cantidad))
+        .where(_movimientos.c.factura_id == factura_id)
+        .group_by(_movimientos.c.producto_id)
+    ).all()
+    deltas = {producto_id: -int(neto) for producto_id, neto in rows if neto}
+    _record(session, deltas, "anulacion", usuario_id, factura_id=factura_id, referencia=referencia)
+    apply_stock_deltas(session, deltas, enforce=False)
+    return deltas
+
+
+def record_movement(session, producto_id, tipo, cantidad, usuario_id, nota=None, enforce=True):
+    """Compra (entrada) o ajuste (con signo) de un producto."""
+    if tipo not in {"ajuste", "compra"}:
+        raise ValueError("Tipo de movimiento invalido.")
+    if tipo == "compra" and cantidad <= 0:
+        raise ValueError("La compra debe ser una cantidad positiva.")
+    deltas = {producto_id: cantidad}
+    _record(session, deltas, tipo, usuario_id, nota=nota)
+    apply_stock_deltas(session, deltas, enforce=enforce)
+
+
+def record_counts(session, counts, usuario_id, nota=None):
+    """Conteo físico: deja el stock de cada producto en `counts` ({producto_id: cantidad}).
+
+    La diferencia con el stock actual queda como un movimiento `ajuste`, así
+    la suma de movimientos sigue explicando el stock. Es el único caso que
+    lee antes de escribir: la lectura bloquea las filas (FOR UPDATE) para
+    que una venta en paralelo no se pierda entre la lectura y el UPDATE.
+    Devuelve {producto_id: diferencia}.
+    """
+    if not counts:
+        return {}
+    current = dict(
+        session.execute(
+            select(_productos.c.id, func.coalesce(_productos.c.stock, 0))
+            .where(_productos.c.id.in_(sorted(counts)))
+            .with_for_update()
+        ).all()
+    )
+    deltas = {
+        producto_id: cantidad - current[producto_id]
+        for producto_id, cantidad in counts.items()
+        if producto_id in current
+    }
+    _record(session, deltas, "ajuste", usuario_id, nota=nota)
+    apply_stock_deltas(session, deltas, enforce=False)
+    return {producto_id: delta for producto_id, delta in deltas.items() if delta}
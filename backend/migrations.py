@@ -0,0 +1,207 @@
+"""
+migrations.py · Sistema Invagro
+
+Migraciones versionadas del esquema. `db.create_all()` solo crea tablas que
+no existen: nunca agrega índices ni columnas a tablas ya creadas. Cada
+migración tiene un número de versión y se registra en la tabla
+`inva-schema_migrations` al aplicarse, así cada ambiente (MySQL en
+producción, SQLite en pruebas) sabe qué le falta.
+
+Cómo se usa:
+
+    flask db-status            # versiones aplicadas y pendientes
+    flask db-upgrade           # aplica las pendientes en orden
+
+    from migrations import apply_migrations
+    apply_migrations(db.engine, echo=print)
+
+Para agregar una migración se añade un `Migration` al final de MIGRATIONS
+con la siguiente versión. Los pasos deben ser idempotentes (por ejemplo
+`index_pack` omite los índices que ya existen), porque una base creada con
+`flask init-db` ya tiene los índices declarados en models.py.
+"""
+
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select
+
+from db_dialect import quote_table
+
+
+Migration = namedtuple("Migration", "version name upgrade")
+IndexSpec = namedtuple("IndexSpec", "table name columns")
+
+schema_metadata = MetaData()
+schema_migrations = Table(
+    "inva-schema_migrations",
+    schema_metadata,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String(120), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def existing_index_names(conn, table):
+    return {item["name"] for item in inspect(conn).get_indexes(table) if item.get("name")}
+
+
+def create_index_if_missing(conn, spec):
+    """Crea el índice si la tabla no lo tiene. Devuelve True si lo creó."""
+    if spec.name in existing_index_names(conn, spec.table):
+        return False
+    dialect = conn.dialect.name
+    quote = conn.dialect.identifier_preparer.quote
+    columns = ", ".join(quote(column) for column in spec.columns)
+    conn.exec_driver_sql(
+        f"CREATE INDEX {quote(spec.name)} ON {quote_table(spec.table, dialect)} ({columns})"
+    )
+    return True
+
+
+def table_pack(*names):
+    """Paso de migración que crea tablas nuevas declaradas en models.py (si faltan)."""
+
+    def upgrade(conn, echo):
+        from models import db
+
+        existing = set(inspect(conn).get_table_names())
+        for name in names:
+            created = name not in existing
+            if created:
+                db.metadata.tables[name].create(conn)
+            echo(f"  {'+' if created else '='} {name}")
+
+    return upgrade
+
+
+def column_pack(*specs):
+    """Paso de migración que agrega columnas (table, name, ddl) si faltan."""
+
+    def upgrade(conn, echo):
+        dialect = conn.dialect.name
+        quote = conn.dialect.identifier_preparer.quote
+        for table, name, ddl in specs:
+            existing = {column["name"] for column in inspect(conn).get_columns(table)}
+            created = name not in existing
+            if created:
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {quote_table(table, dialect)} ADD COLUMN {quote(name)} {ddl}"
+                )
+            echo(f"  {'+' if created else '='} {table}.{name}")
+
+    return upgrade
+
+
+def index_pack(*specs):
+    """Paso de migración que crea un conjunto de índices (los existentes se omiten)."""
+
+    def upgrade(conn, echo):
+        for spec in specs:
+            created = create_index_if_missing(conn, spec)
+            echo(f"  {'+' if created else '='} {spec.table}.{spec.name} ({', '.join(spec.columns)})")
+
+    return upgrade
+
+
+MIGRATIONS = [
+    Migration(
+        1,
+        "chat_retention_indexes",
+        index_pack(
+            IndexSpec("inva-chat_messages", "idx_chat_messages_session_id", ("session_id", "id")),
+            IndexSpec("inva-chat_summaries", "idx_chat_summaries_session_id", ("session_id", "id")),
+            IndexSpec("inva-chat_sessions", "idx_chat_sessions_updated", ("updated_at",)),
+            IndexSpec("inva-chat_audit", "idx_chat_audit_created", ("created_at",)),
+        ),
+    ),
+    Migration(
+        2,
+        "hot_path_indexes",
+        index_pack(
+            # Créditos por fecha, historial y reportes por rango de fechas.
+            IndexSpec("inva-facturas_contado", "idx_facturas_contado_estado_fecha", ("estado", "fecha")),
+            IndexSpec("inva-facturas_contado", "idx_facturas_contado_fecha", ("fecha",)),
+            IndexSpec("inva-facturas_contado", "idx_facturas_contado_cliente_fecha", ("cliente_id", "fecha")),
+            IndexSpec("inva-facturas_contado", "idx_facturas_contado_usuario_fecha", ("usuario_id", "fecha")),
+            # Abonos por factura (detalle) y por rango/vendedor (pagos, comisiones).
+            IndexSpec("inva-abonos_facturas", "idx_abonos_facturas_factura_fecha", ("factura_id", "fecha")),
+            IndexSpec("inva-abonos_facturas", "idx_abonos_facturas_fecha", ("fecha",)),
+            IndexSpec("inva-abonos_facturas", "idx_abonos_facturas_usuario_fecha", ("usuario_id", "fecha")),
+            # Cobros pendientes por vencimiento y por vendedor.
+            IndexSpec("inva-cobros_personales", "idx_cobros_personales_estado_vencimiento", ("estado", "fecha_vencimiento")),
+            IndexSpec("inva-cobros_personales", "idx_cobros_personales_usuario_estado", ("usuario_id", "estado")),
+            # Pedidos por vendedor en el mes y listas por estado.
+            IndexSpec("inva-pedidos", "idx_pedidos_usuario_fecha", ("usuario_id", "fecha")),
+            IndexSpec("inva-pedidos", "idx_pedidos_estado_fecha", ("estado", "fecha")),
+            # Registro de actividades del plan sanitario de un lote.
+            IndexSpec(
+                "inva_aves_lote_actividades",
+                "idx_aves_lote_actividades_lote_plan_fecha",
+                ("lote_id", "plan_id", "fecha_programada"),
+            ),
+        ),
+    ),
+    Migration(
+        3,
+        "inventory_ledger",
+        # La tabla trae sus índices (producto+fecha, factura) al crearse.
+        table_pack("inva-movimientos_inventario"),
+    ),
+    Migration(
+        4,
+        "optimistic_versions",
+        column_pack(
+            ("inva-facturas_contado", "version", "INTEGER NOT NULL DEFAULT 0"),
+            ("inva-cobros_personales", "version", "INTEGER NOT NULL DEFAULT 0"),
+        ),
+    ),
+    Migration(
+        5,
+        "idempotency_keys",
+        # Clave única (usuario, ruta, clave) e índice por expiración para la limpieza.
+        table_pack("inva-idempotency_keys"),
+    ),
+]
+
+
+def applied_versions(conn):
+    schema_metadata.create_all(conn, tables=[schema_migrations])
+    return {row.version for row in conn.execute(select(schema_migrations.c.version))}
+
+
+def migration_status(engine):
+    """Lista de (Migration, aplicada: bool) en orden de versión."""
+    with engine.begin() as conn:
+        applied = applied_versions(conn)
+    return [(migration, migration.version in applied) for migration in MIGRATIONS]
+
+
+def apply_migrations(engine, echo=None, target=None):
+    """Aplica en orden las migraciones pendientes (hasta `target` si se indica).
+
+    Cada migración corre en su propia transacción junto con su registro. En
+    MySQL el DDL hace commit implícito, por eso los pasos son idempotentes:
+    si algo falla a mitad, volver a ejecutar continúa donde quedó.
+    """
+    echo = echo or (lambda message: None)
+    with engine.begin() as conn:
+        applied = applied_versions(conn)
+    done = []
+    for migration in sorted(MIGRATIONS, key=lambda item: item.version):
+        if migration.version in applied:
+            continue
+        if target is not None and migration.version > target:
+            break
+        echo(f"{migration.version:03d} {migration.name}")
+        with engine.begin() as conn:
+            migration.upgrade(conn, echo)
+            conn.execute(
+                schema_migrations.insert().values(
+                    version=migration.version,
+                    name=migration.name,
+                    applied_at=datetime.utcnow(),
+                )
+            )
+        done.append(migration)
+    return done
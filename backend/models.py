@@ -76,7 +76,12 @@ class AvesLote(db.Model):
 
 class AvesLoteActividad(db.Model):
     __tablename__ = "inva_aves_lote_actividades"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        db.Index(
+            "idx_aves_lote_actividades_lote_plan_fecha", "lote_id", "plan_id", "fecha_programada"
+        ),
+        {"extend_existing": True},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     lote_id = db.Column(db.Integer, nullable=False, index=True)
@@ -132,6 +137,52 @@ class Producto(db.Model):
     foto = db.Column(db.String(255))
 
 
+class MovimientoInventario(db.Model):
+    __tablename__ = "inva-movimientos_inventario"
+    __table_args__ = (
+        db.Index("idx_movimientos_inventario_producto_fecha", "producto_id", "fecha"),
+        db.Index("idx_movimientos_inventario_factura", "factura_id"),
+        {"extend_existing": True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    producto_id = db.Column(
+        db.Integer, db.ForeignKey("inva-productos.id"), nullable=False
+    )
+    tipo = db.Column(
+        db.Enum("venta", "anulacion", "ajuste", "compra"), nullable=False
+    )
+    # Con signo: negativo sale del inventario, positivo entra.
+    cantidad = db.Column(db.Integer, nullable=False)
+    # Sin FK: el movimiento se conserva aunque la factura se elimine.
+    factura_id = db.Column(db.Integer)
+    usuario_id = db.Column(db.Integer, db.ForeignKey("inva-usuarios.id"))
+    referencia = db.Column(db.String(60))
+    nota = db.Column(db.String(255))
+    fecha = db.Column(db.DateTime, nullable=False)
+
+
+class IdempotencyKey(db.Model):
+    __tablename__ = "inva-idempotency_keys"
+    __table_args__ = (
+        db.UniqueConstraint("usuario_id", "ruta", "clave", name="uq_idempotency_keys_usuario_ruta_clave"),
+        db.Index("idx_idempotency_keys_expira", "expira"),
+        {"extend_existing": True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    clave = db.Column(db.String(64), nullable=False)
+    usuario_id = db.Column(db.Integer, nullable=False)
+    ruta = db.Column(db.String(60), nullable=False)
+    # sha256 del cuerpo: la misma clave con otro contenido se rechaza.
+    huella = db.Column(db.String(64), nullable=False)
+    # NULL mientras la primera petición se está procesando.
+    status_code = db.Column(db.Integer)
+    respuesta = db.Column(db.Text)
+    creado = db.Column(db.DateTime, nullable=False)
+    expira = db.Column(db.DateTime, nullable=False)
+
+
 class Categoria(db.Model):
     __tablename__ = "inva-categorias"
     __table_args__ = {"extend_existing": True}
@@ -162,7 +213,13 @@ class AjustesNegocio(db.Model):
 
 class FacturaContado(db.Model):
     __tablename__ = "inva-facturas_contado"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        db.Index("idx_facturas_contado_estado_fecha", "estado", "fecha"),
+        db.Index("idx_facturas_contado_fecha", "fecha"),
+        db.Index("idx_facturas_contado_cliente_fecha", "cliente_id", "fecha"),
+        db.Index("idx_facturas_contado_usuario_fecha", "usuario_id", "fecha"),
+        {"extend_existing": True},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     numero_factura = db.Column(db.String(50), unique=True, nullable=False)
@@ -180,6 +237,10 @@ class FacturaContado(db.Model):
         db.Enum("contado", "credito", "pagada", "anulada"), default="contado"
     )
     pdf_filename = db.Column(db.String(255))
+    # Concurrencia optimista: cada UPDATE exige la versión leída (ver optimistic.py).
+    version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    __mapper_args__ = {"version_id_col": version}
 
 
 class DetalleFacturaContado(db.Model):
@@ -202,7 +263,12 @@ class DetalleFacturaContado(db.Model):
 
 class AbonoFactura(db.Model):
     __tablename__ = "inva-abonos_facturas"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        db.Index("idx_abonos_facturas_factura_fecha", "factura_id", "fecha"),
+        db.Index("idx_abonos_facturas_fecha", "fecha"),
+        db.Index("idx_abonos_facturas_usuario_fecha", "usuario_id", "fecha"),
+        {"extend_existing": True},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     factura_id = db.Column(
@@ -215,7 +281,11 @@ class AbonoFactura(db.Model):
 
 class CobroPersonal(db.Model):
     __tablename__ = "inva-cobros_personales"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        db.Index("idx_cobros_personales_estado_vencimiento", "estado", "fecha_vencimiento"),
+        db.Index("idx_cobros_personales_usuario_estado", "usuario_id", "estado"),
+        {"extend_existing": True},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     numero_cobro = db.Column(db.String(50), unique=True, nullable=False)
@@ -232,6 +302,9 @@ class CobroPersonal(db.Model):
     estado = db.Column(
         db.Enum("pendiente", "pagado", "anulado"), default="pendiente"
     )
+    version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    __mapper_args__ = {"version_id_col": version}
 
 
 class CobroPersonalDetalle(db.Model):
@@ -304,7 +377,11 @@ class DetalleFacturaCredito(db.Model):
 
 class Pedido(db.Model):
     __tablename__ = "inva-pedidos"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        db.Index("idx_pedidos_usuario_fecha", "usuario_id", "fecha"),
+        db.Index("idx_pedidos_estado_fecha", "estado", "fecha"),
+        {"extend_existing": True},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     numero_pedido = db.Column(db.String(50), unique=True, nullable=False)
@@ -341,7 +418,10 @@ class DetallePedido(db.Model):
 
 class ChatSession(db.Model):
     __tablename__ = "inva-chat_sessions"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        db.Index("idx_chat_sessions_updated", "updated_at"),
+        {"extend_existing": True},
+    )
 
     id = db.Column(db.String(36), primary_key=True)
     username = db.Column(db.String(50))
@@ -351,7 +431,10 @@ class ChatSession(db.Model):
 
 class ChatMessage(db.Model):
     __tablename__ = "inva-chat_messages"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        db.Index("idx_chat_messages_session_id", "session_id", "id"),
+        {"extend_existing": True},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.String(36), db.ForeignKey("inva-chat_sessions.id"))
@@ -362,7 +445,10 @@ class ChatMessage(db.Model):
 
 class ChatSummary(db.Model):
     __tablename__ = "inva-chat_summaries"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        db.Index("idx_chat_summaries_session_id", "session_id", "id"),
+        {"extend_existing": True},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.String(36), db.ForeignKey("inva-chat_sessions.id"))
@@ -372,7 +458,10 @@ class ChatSummary(db.Model):
 
 class ChatAudit(db.Model):
     __tablename__ = "inva-chat_audit"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        db.Index("idx_chat_audit_created", "created_at"),
+        {"extend_existing": True},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.String(36))
@@ -0,0 +1,71 @@
+"""
+optimistic.py · Sistema Invagro
+
+Concurrencia optimista para saldos: facturas de crédito (`pago`) y cobros
+personales (`saldo`). Esos modelos tienen una columna `version` declarada
+como `version_id_col`, así que cada UPDATE del ORM sale como
+
+    UPDATE `inva-facturas_contado` SET pago=..., version=8
+     WHERE id = 42 AND version = 7
+
+Si otra caja abonó a la misma factura entre la lectura y el commit, el
+UPDATE no encuentra la fila y SQLAlchemy lanza StaleDataError en lugar de
+pisar el abono anterior. No se toma ningún lock al leer.
+
+Cómo se usa:
+
+    from optimistic import ConflictoConcurrente, retry_on_conflict
+
+    def aplicar():
+        factura = db.session.get(FacturaContado, factura_id)   # relee en cada intento
+        if monto > factura.total - factura.pago:
+            return None                                          # nada que guardar
+        db.session.add(AbonoFactura(...))
+        factura.pago += monto
+        return factura
+
+    try:
+        factura = retry_on_conflict(db.session, aplicar)
+    except ConflictoConcurrente:
+        ...  # muchas cajas sobre la misma fila; se pide reintentar
+
+`operation` se vuelve a ejecutar completa tras cada conflicto: debe leer y
+validar de nuevo (un abono que cabía en el saldo puede ya no caber).
+"""
+
+import logging
+import random
+import time
+
+from sqlalchemy.orm.exc import StaleDataError
+
+
+DEFAULT_ATTEMPTS = 5
+BACKOFF_SECONDS = 0.01
+
+logger = logging.getLogger(__name__)
+
+
+class ConflictoConcurrente(Exception):
+    """El registro cambió en cada intento; no se guardó nada."""
+
+
+def retry_on_conflict(session, operation, attempts=DEFAULT_ATTEMPTS, backoff=BACKOFF_SECONDS):
+    """Ejecuta `operation()` y hace commit; ante StaleDataError, rollback y otra vez.
+
+    Devuelve lo que devuelva `operation`. Entre intentos espera un tiempo
+    aleatorio creciente para que dos cajas en conflicto no choquen de nuevo
+    al mismo instante. Cada conflicto se registra en el log `optimistic`.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            result = operation()
+            session.commit()
+            return result
+        except StaleDataError:
+            session.rollback()
+            logger.info("conflicto optimista (intento %d de %d)", attempt, attempts)
+            if attempt == attempts:
+                break
+            time.sleep(random.uniform(0, backoff * attempt))
+    raise ConflictoConcurrente("El registro cambio mientras se guardaba; intenta de nuevo.")
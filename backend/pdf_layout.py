@@ -0,0 +1,194 @@
+"""
+pdf_layout.py · Sistema Invagro
+
+Piezas de ReportLab que se repiten en todas las facturas, recibos,
+órdenes de entrega y reportes: la hoja de estilos, el logo y los
+`TableStyle` del encabezado, las tablas de detalle y los totales. Se
+arman una vez por proceso (el primer PDF paga la importación de
+ReportLab) y después cada documento solo crea sus flowables.
+
+Los `TableStyle` y los estilos de párrafo se comparten entre hilos porque
+ReportLab solo los lee; los flowables (`Image`, `Table`, `Paragraph`) sí
+guardan estado al dibujarse, así que se crean nuevos en cada documento.
+
+Cómo se usa:
+
+    from pdf_layout import build_header_table, stylesheet, table_style
+
+    styles = stylesheet()
+    story.append(build_header_table(app.static_folder, centro_html, derecha_html))
+    tabla = Table(filas, colWidths=[90, 230, 90, 90])
+    tabla.setStyle(table_style("report", align_from=2))
+
+`clear_caches()` vuelve al comportamiento en frío (lo usa
+scripts/bench_pdf.py para comparar).
+"""
+
+import os
+from functools import lru_cache
+
+
+@lru_cache(maxsize=1)
+def stylesheet():
+    """`getSampleStyleSheet()` una sola vez por proceso."""
+    from reportlab.lib.styles import getSampleStyleSheet
+
+    return getSampleStyleSheet()
+
+
+@lru_cache(maxsize=8)
+def logo_path(static_folder):
+    """Ruta de assets/logo.jpg, o None si no existe (se revisa una vez por proceso)."""
+    path = os.path.join(static_folder, "assets", "logo.jpg")
+    return path if os.path.exists(path) else None
+
+
+def logo_image(static_folder, size=60):
+    """`Image` del logo a `size` x `size` puntos, o "" si no hay logo.
+
+    Cada documento recibe su propio flowable; ReportLab solo lee la cabecera
+    del JPEG y lo incrusta sin decodificarlo.
+    """
+    from reportlab.platypus import Image
+
+    path = logo_path(static_folder)
+    if path is None:
+        return ""
+    return Image(path, width=size, height=size)
+
+
+def _commands(name, params):
+    from reportlab.lib import colors
+
+    if name == "header":
+        commands = [
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+            ("ALIGN", (2, 0), (2, 0), "RIGHT"),
+            ("LINEBELOW", (0, 0), (-1, 0), 0.75, colors.black),
+        ]
+        if params.get("bottom_padding"):
+            commands.append(("BOTTOMPADDING", (0, 0), (-1, -1), params["bottom_padding"]))
+        return commands
+    if name == "report":
+        # Tablas de reportes: encabezado gris, montos alineados a la derecha.
+        return [
+            ("BOX", (0, 0), (-1, -1), 0.75, colors.black),
+            ("LINEBELOW", (0, 0), (-1, 0), 0.6, colors.black),
+            ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
+            ("ALIGN", (params.get("align_from", 2), 1), (-1, -1), "RIGHT"),
+            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("FONTSIZE", (0, 0), (-1, 0), 9),
+            ("FONTSIZE", (0, 1), (-1, -1), 9),
+        ]
+    if name == "report_total":
+        return [
+            ("ALIGN", (0, 0), (-1, -1), "RIGHT"),
+            ("FONTNAME", (0, 0), (-1, -1), "Helvetica-Bold"),
+            ("FONTSIZE", (0, 0), (-1, -1), 10),
+        ]
+    if name == "invoice_products":
+        return [
+            ("BOX", (0, 0), (-1, -1), 0.75, colors.black),
+            ("LINEBELOW", (0, 0), (-1, 0), 0.6, colors.black),
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("FONTSIZE", (0, 0), (-1, 0), params["header_font_size"]),
+            ("FONTSIZE", (0, 1), (-1, -1), params["body_font_size"]),
+            ("ALIGN", (2, 1), (-1, -1), "RIGHT"),
+            ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
+            ("LEFTPADDING", (0, 0), (-1, -1), 3),
+            ("RIGHTPADDING", (0, 0), (-1, -1), 3),
+            ("TOPPADDING", (0, 0), (-1, -1), 2),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 2),
+        ]
+    if name == "invoice_totals":
+        return [
+            ("BOX", (0, 0), (-1, -1), 0.75, colors.black),
+            ("FONTNAME", (0, -1), (-1, -1), "Helvetica-Bold"),
+            ("ALIGN", (1, 0), (1, -1), "RIGHT"),
+            ("BACKGROUND", (0, -1), (-1, -1), colors.whitesmoke),
+            ("LEFTPADDING", (0, 0), (-1, -1), 3),
+            ("RIGHTPADDING", (0, 0), (-1, -1), 3),
+            ("TOPPADDING", (0, 0), (-1, -1), 2),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 2),
+        ]
+    if name == "invoice_bottom":
+        return [
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+            ("ALIGN", (1, 0), (1, 0), "RIGHT"),
+        ]
+    if name == "charge_receiver":
+        return [
+            ("BACKGROUND", (0, 0), (0, -1), colors.HexColor("#f3f4f6")),
+            ("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold"),
+            ("BOX", (0, 0), (-1, -1), 0.6, colors.HexColor("#d1d5db")),
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.HexColor("#e5e7eb")),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+            ("LEFTPADDING", (0, 0), (-1, -1), 8),
+            ("RIGHTPADDING", (0, 0), (-1, -1), 8),
+            ("TOPPADDING", (0, 0), (-1, -1), 7),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 7),
+        ]
+    if name == "charge_details":
+        return [
+            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#f3f4f6")),
+            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("BOX", (0, 0), (-1, -1), 0.75, colors.black),
+            ("LINEBELOW", (0, 0), (-1, 0), 0.6, colors.black),
+            ("ALIGN", (1, 1), (-1, -1), "RIGHT"),
+            ("LEFTPADDING", (0, 0), (-1, -1), 8),
+            ("RIGHTPADDING", (0, 0), (-1, -1), 8),
+            ("TOPPADDING", (0, 0), (-1, -1), 8),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
+        ]
+    if name == "signatures":
+        return [
+            ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+            ("TOPPADDING", (0, 0), (-1, -1), 10),
+        ]
+    if name == "receipt_amounts":
+        return [
+            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#f3f4f6")),
+            ("TEXTCOLOR", (0, 0), (-1, 0), colors.HexColor("#111827")),
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.HexColor("#d1d5db")),
+            ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
+            ("ALIGN", (1, 0), (-1, -1), "RIGHT"),
+        ]
+    raise KeyError(f"Estilo de tabla desconocido: {name}")
+
+
+@lru_cache(maxsize=64)
+def _table_style(name, params):
+    from reportlab.platypus import TableStyle
+
+    return TableStyle(_commands(name, dict(params)))
+
+
+def table_style(name, **params):
+    """`TableStyle` prearmado; los parámetros (tamaños de letra, columna) son parte de la clave."""
+    return _table_style(name, tuple(sorted(params.items())))
+
+
+def build_header_table(
+    static_folder,
+    center_html,
+    right_html,
+    col_widths=(90, 300, 130),
+    logo_size=60,
+    bottom_padding=None,
+):
+    """Encabezado de tres columnas: logo, datos del negocio y título del documento."""
+    from reportlab.platypus import Paragraph, Table
+
+    normal = stylesheet()["Normal"]
+    table = Table(
+        [[logo_image(static_folder, logo_size), Paragraph(center_html, normal), Paragraph(right_html, normal)]],
+        colWidths=list(col_widths),
+    )
+    table.setStyle(table_style("header", bottom_padding=bottom_padding))
+    return table
+
+
+def clear_caches():
+    for cached in (stylesheet, logo_path, _table_style):
+        cached.cache_clear()
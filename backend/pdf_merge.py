@@ -0,0 +1,197 @@
+"""
+pdf_merge.py · Sistema Invagro
+
+Une varios PDF ya generados en uno solo y lo envía por partes, sin volver a
+dibujar las páginas. Cada archivo se lee, se copian sus objetos con otra
+numeración (los de la factura 2 van después de los de la factura 1) y se
+escriben al cliente enseguida; al final van el árbol de páginas, la tabla
+xref y el trailer. En memoria queda un solo archivo de entrada y la lista de
+offsets, no el PDF combinado: alcanza para cientos de facturas.
+
+Lee PDF con tabla xref clásica y sin actualizaciones incrementales, que es
+lo que escribe ReportLab. Un archivo con xref comprimida (PDF 1.5+),
+cifrado, dañado o que ya no existe se reemplaza con lo que devuelva
+`fallback` (por ejemplo, la factura generada de nuevo con ReportLab).
+
+Cómo se usa:
+
+    from pdf_merge import PdfNoSoportado, merged_pdf_chunks
+
+    def archivos():
+        for factura in facturas:
+            yield ruta_del_pdf(factura)
+
+    chunks = merged_pdf_chunks(archivos(), fallback=regenerar)
+    return Response(stream_with_context(chunks), mimetype="application/pdf")
+
+`merged_pdf_chunks` también acepta bytes en lugar de rutas.
+"""
+
+import re
+
+
+class PdfNoSoportado(Exception):
+    """El archivo no es un PDF que se pueda copiar objeto por objeto."""
+
+
+_STARTXREF = re.compile(rb"startxref\s+(\d+)\s*%%EOF\s*$")
+_SUBSECTION = re.compile(rb"(\d+)\s+(\d+)\s*\r?\n")
+_OBJ_HEADER = re.compile(rb"\s*(\d+)\s+(\d+)\s+obj\b")
+_REFERENCE = re.compile(rb"(\d+)\s+(\d+)\s+R\b")
+_STREAM_START = re.compile(rb">>\s*stream(\r\n|\n|\r)")
+_ROOT = re.compile(rb"/Root\s+(\d+)\s+\d+\s+R")
+_INFO = re.compile(rb"/Info\s+(\d+)\s+\d+\s+R")
+_PAGES = re.compile(rb"/Pages\s+(\d+)\s+\d+\s+R")
+_KIDS = re.compile(rb"/Kids\s*\[([^\]]*)\]")
+_PARENT = re.compile(rb"/Parent\s+\d+\s+\d+\s+R")
+_TYPE_PAGES = re.compile(rb"/Type\s*/Pages\b")
+
+
+def _read(source):
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    with open(source, "rb") as handle:
+        return handle.read()
+
+
+def _xref_offsets(data):
+    """{número de objeto: offset} de la tabla xref, más el texto del trailer."""
+    match = _STARTXREF.search(data[-64:])
+    if not match:
+        raise PdfNoSoportado("Falta startxref.")
+    position = int(match.group(1))
+    if data[position:position + 4] != b"xref":
+        raise PdfNoSoportado("La tabla xref esta comprimida o fuera de lugar.")
+    position += 4
+    offsets = {}
+    while True:
+        while data[position:position + 1] in (b" ", b"\r", b"\n"):
+            position += 1
+        if data.startswith(b"trailer", position):
+            break
+        header = _SUBSECTION.match(data, position)
+        if not header:
+            raise PdfNoSoportado("Tabla xref ilegible.")
+        first, count = int(header.group(1)), int(header.group(2))
+        position = header.end()
+        for index in range(count):
+            entry = data[position:position + 20]
+            if entry[17:18] == b"n":
+                offsets[first + index] = int(entry[:10])
+            position += 20
+    trailer = data[position:data.rfind(b"startxref")]
+    if b"/Prev" in trailer or b"/Encrypt" in trailer:
+        raise PdfNoSoportado("PDF con actualizaciones incrementales o cifrado.")
+    return offsets, trailer
+
+
+def _objects(data):
+    """{número: cuerpo entre `obj` y `endobj`} de todos los objetos en uso."""
+    offsets, trailer = _xref_offsets(data)
+    ordered = sorted(offsets.items(), key=lambda item: item[1])
+    objects = {}
+    for index, (number, offset) in enumerate(ordered):
+        end = ordered[index + 1][1] if index + 1 < len(ordered) else len(data)
+        header = _OBJ_HEADER.match(data, offset)
+        if not header or int(header.group(1)) != number:
+            raise PdfNoSoportado(f"El objeto {number} no esta donde indica la xref.")
+        close = data.rfind(b"endobj", header.end(), end)
+        if close < 0:
+            raise PdfNoSoportado(f"El objeto {number} no termina.")
+        objects[number] = data[header.end():close]
+    return objects, trailer
+
+
+def _page_numbers(objects, node):
+    """Páginas del árbol que cuelga de `node`, en orden."""
+    body = objects.get(node, b"")
+    if not _TYPE_PAGES.search(body):
+        return [node]
+    kids = _KIDS.search(body)
+    pages = []
+    for kid in _REFERENCE.finditer(kids.group(1) if kids else b""):
+        pages.extend(_page_numbers(objects, int(kid.group(1))))
+    return pages
+
+
+def _parse(data):
+    """(objetos, páginas en orden, número del objeto /Info o None)."""
+    objects, trailer = _objects(data)
+    root = _ROOT.search(trailer)
+    catalog = objects.get(int(root.group(1))) if root else None
+    pages_root = _PAGES.search(catalog or b"")
+    if not pages_root:
+        raise PdfNoSoportado("No se encontro el arbol de paginas.")
+    pages = _page_numbers(objects, int(pages_root.group(1)))
+    if not pages:
+        raise PdfNoSoportado("El PDF no tiene paginas.")
+    info = _INFO.search(trailer)
+    return objects, pages, int(info.group(1)) if info else None
+
+
+def _renumber(body, shift):
+    """Suma `shift` a las referencias `n g R` del diccionario; el stream va tal cual."""
+    stream = _STREAM_START.search(body)
+    head, tail = (body[:stream.start()], body[stream.start():]) if stream else (body, b"")
+    head = _REFERENCE.sub(lambda match: b"%d 0 R" % (int(match.group(1)) + shift), head)
+    return head + tail
+
+
+def merged_pdf_chunks(sources, fallback=None, pages_object=2):
+    """Genera los bytes de un PDF con todas las páginas de `sources`, en orden.
+
+    `sources` se consume de a uno (puede ser un generador que produzca los
+    archivos a medida que se piden). Si uno no se puede copiar y hay
+    `fallback`, se usa lo que devuelva `fallback(source)` (bytes o ruta de
+    un PDF nuevo); si devuelve None, ese archivo se omite. El objeto 1 es el catálogo y el 2 el árbol de páginas,
+    que se escribe al final cuando ya se conocen todas.
+    """
+    offsets = {}
+    kids = []
+    position = 0
+    next_number = 3
+
+    def emit(number, body):
+        nonlocal position
+        chunk = b"%d 0 obj\n" % number + body.strip(b"\r\n") + b"\nendobj\n"
+        offsets[number] = position
+        position += len(chunk)
+        return chunk
+
+    header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+    position = len(header)
+    yield header + emit(1, b"<< /Type /Catalog /Pages %d 0 R >>" % pages_object)
+
+    for source in sources:
+        try:
+            objects, pages, info_number = _parse(_read(source))
+        except (OSError, PdfNoSoportado):
+            if fallback is None:
+                raise
+            replacement = fallback(source)
+            if replacement is None:
+                continue
+            objects, pages, info_number = _parse(_read(replacement))
+        page_set = set(pages)
+        shift = next_number - 1
+        parts = []
+        for number in range(1, max(objects) + 1):
+            body = objects.get(number)
+            if body is None or number == info_number:
+                body = b"null"
+            else:
+                body = _renumber(body, shift)
+                if number in page_set:
+                    body = _PARENT.sub(b"/Parent %d 0 R" % pages_object, body, count=1)
+            parts.append(emit(number + shift, body))
+        kids.extend(number + shift for number in pages)
+        next_number += max(objects)
+        yield b"".join(parts)
+
+    kids_text = b" ".join(b"%d 0 R" % number for number in kids)
+    tail = emit(pages_object, b"<< /Type /Pages /Count %d /Kids [ %s ] >>" % (len(kids), kids_text))
+    xref_position = position
+    lines = [b"xref\n0 %d\n" % next_number, b"0000000000 65535 f \n"]
+    lines.extend(b"%010d 00000 n \n" % offsets[number] for number in range(1, next_number))
+    lines.append(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (next_number, xref_position))
+    yield tail + b"".join(lines)
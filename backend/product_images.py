@@ -0,0 +1,129 @@
+"""
+product_images.py · Sistema Invagro
+
+Miniaturas de las fotos de productos. Las fotos suben tal cual (a veces
+varios MB desde un celular); las tarjetas del POS y del catálogo muestran
+variantes de ancho fijo en WebP, con JPEG de respaldo, en lugar del
+original.
+
+Las variantes se generan al subir la foto y, para fotos anteriores o si se
+borró el cache, la primera vez que se piden. Se guardan en
+`uploads/productos/thumbs/` con el nombre del original más el ancho:
+
+    abc123.jpg  ->  thumbs/abc123.jpg-240.webp, thumbs/abc123.jpg-480.jpg, ...
+
+Cómo se usa:
+
+    from product_images import generate_variants, variant_path, remove_variants
+
+    generate_variants(upload_dir, "abc123.jpg")            # al guardar la foto
+    path = variant_path(upload_dir, "abc123.jpg", 240, "webp")  # crea si falta
+    remove_variants(upload_dir, "abc123.jpg")              # al reemplazarla
+
+Las fotos que Pillow rechaza por tamaño (DecompressionBombError, más de
+~180 millones de píxeles) se reportan como ValueError, igual que una imagen
+dañada.
+
+Como cada foto subida recibe un nombre nuevo (uuid), la URL de una variante
+nunca cambia de contenido y puede cachearse como `immutable`. Pillow se
+importa recién al generar; si no está instalado, `variant_path` lanza
+ImportError y la ruta sirve el original.
+"""
+
+import os
+from uuid import uuid4
+
+
+THUMB_WIDTHS = (240, 480)
+THUMB_FORMATS = {"webp": "WEBP", "jpg": "JPEG"}
+THUMB_DIRNAME = "thumbs"
+THUMB_QUALITY = 80
+
+
+def thumbs_dir(upload_dir):
+    return os.path.join(upload_dir, THUMB_DIRNAME)
+
+
+def variant_name(filename, width, fmt):
+    return f"{filename}-{width}.{fmt}"
+
+
+def _open_source(source_path, width):
+    from PIL import Image, ImageOps
+
+    try:
+        image = Image.open(source_path)
+        # En JPEG decodifica directo a una escala menor: mucho más rápido con fotos de celular.
+        image.draft("RGB", (width * 2, width * 2))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((width, width * 2), Image.LANCZOS)
+    except Image.DecompressionBombError as exc:
+        # Hereda de Exception, no de OSError: se trata como una imagen inválida.
+        raise ValueError(f"Imagen demasiado grande: {exc}") from exc
+    return image
+
+
+def _save_variant(image, target_path, fmt):
+    from PIL import Image
+
+    if fmt == "jpg" and image.mode != "RGB":
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        if image.mode in {"RGBA", "LA", "P"}:
+            image = image.convert("RGBA")
+            background.paste(image, mask=image.split()[-1])
+        else:
+            background.paste(image.convert("RGB"))
+        image = background
+    elif fmt == "webp" and image.mode not in {"RGB", "RGBA"}:
+        image = image.convert("RGBA" if "A" in image.getbands() or image.mode == "P" else "RGB")
+
+    options = {"quality": THUMB_QUALITY}
+    if fmt == "jpg":
+        options.update(optimize=True, progressive=True)
+    else:
+        options["method"] = 4
+    # Se escribe a un temporal y se renombra: otro worker nunca ve un archivo a medias.
+    temp_path = f"{target_path}.{uuid4().hex}.tmp"
+    try:
+        image.save(temp_path, THUMB_FORMATS[fmt], **options)
+        os.replace(temp_path, target_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def generate_variants(upload_dir, filename, widths=THUMB_WIDTHS, formats=tuple(THUMB_FORMATS)):
+    """Genera todas las variantes de una foto. Devuelve las rutas creadas."""
+    source_path = os.path.join(upload_dir, filename)
+    target_dir = thumbs_dir(upload_dir)
+    os.makedirs(target_dir, exist_ok=True)
+    created = []
+    for width in widths:
+        image = _open_source(source_path, width)
+        for fmt in formats:
+            target_path = os.path.join(target_dir, variant_name(filename, width, fmt))
+            _save_variant(image, target_path, fmt)
+            created.append(target_path)
+    return created
+
+
+def variant_path(upload_dir, filename, width, fmt):
+    """Ruta de la variante; la genera si falta. FileNotFoundError si no hay original."""
+    if width not in THUMB_WIDTHS or fmt not in THUMB_FORMATS:
+        raise ValueError("Variante no soportada.")
+    source_path = os.path.join(upload_dir, filename)
+    if not os.path.isfile(source_path):
+        raise FileNotFoundError(filename)
+    target_path = os.path.join(thumbs_dir(upload_dir), variant_name(filename, width, fmt))
+    if not os.path.isfile(target_path):
+        os.makedirs(thumbs_dir(upload_dir), exist_ok=True)
+        _save_variant(_open_source(source_path, width), target_path, fmt)
+    return target_path
+
+
+def remove_variants(upload_dir, filename):
+    for width in THUMB_WIDTHS:
+        for fmt in THUMB_FORMATS:
+            path = os.path.join(thumbs_dir(upload_dir), variant_name(filename, width, fmt))
+            if os.path.exists(path):
+                os.remove(path)
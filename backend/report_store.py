@@ -0,0 +1,60 @@
+"""
+report_store.py · Sistema Invagro
+
+Almacén acotado en memoria para resultados de reportes.
+
+El endpoint que calcula un reporte guarda las filas y devuelve un
+`result_id` corto; el endpoint /pdf recibe ese id y arma el PDF con las
+mismas filas, sin repetir la consulta. Cada worker tiene su propio
+almacén: si el id no está (expiró, fue desalojado o lo creó otro worker),
+el llamador vuelve a consultar la base de datos.
+
+Cómo se usa:
+
+    report_results = ReportResultStore(max_entries=128, ttl_seconds=900)
+
+    result_id = report_results.put("productos-top", username, params, payload)
+    payload = report_results.get(result_id, "productos-top", username, params)
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from uuid import uuid4
+
+
+class ReportResultStore:
+    def __init__(self, max_entries=128, ttl_seconds=900):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, kind, owner, params, payload):
+        result_id = uuid4().hex
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._entries[result_id] = (kind, owner, params, payload, expires_at)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result_id
+
+    def get(self, result_id, kind, owner, params):
+        """Devuelve el payload si el id es vigente y coincide con el reporte pedido."""
+        if not result_id:
+            return None
+        with self._lock:
+            entry = self._entries.get(result_id)
+            if entry is None:
+                return None
+            entry_kind, entry_owner, entry_params, payload, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[result_id]
+                return None
+            if (entry_kind, entry_owner, entry_params) != (kind, owner, params):
+                return None
+            self._entries.move_to_end(result_id)
+            return payload
+
+    def __len__(self):
+        return len(self._entries)
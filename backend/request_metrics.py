@@ -0,0 +1,239 @@
+"""
+request_metrics.py · Sistema Invagro
+
+Instrumentación por request: consultas SQL, tiempo de base de datos,
+plantillas y generación de PDF.
+
+Cómo se usa:
+
+    from request_metrics import init_request_metrics, timed_section
+
+    init_request_metrics(app)          # dentro de create_app
+
+    @timed_section("pdf")
+    def create_invoice_pdf(...):
+        ...
+
+Por cada request se agrega el header `Server-Timing` (db, tpl, pdf, app) y se
+escribe una línea JSON en el log (`perf {...}`). Las sentencias idénticas que
+se repiten PERF_N_PLUS_ONE_THRESHOLD veces o más se reportan como posible N+1.
+Si el request supera PERF_SLOW_REQUEST_MS se registra además la lista
+completa de consultas (sin parámetros, que traen RTN, nombres y montos,
+salvo con PERF_LOG_PARAMS=1).
+
+En respuestas por streaming (exportaciones, PDF de lote, tickets) el cuerpo
+se genera después de after_request: la línea `perf` se escribe al cerrar la
+respuesta e incluye las consultas del generador; el header Server-Timing
+solo cubre lo previo al primer byte.
+
+Variables de entorno:
+    PERF_INSTRUMENTATION=1         activar/desactivar (por defecto activo)
+    PERF_SLOW_REQUEST_MS=1000      umbral de request lento
+    PERF_N_PLUS_ONE_THRESHOLD=5    repeticiones para marcar N+1
+    PERF_SERVER_TIMING=1           enviar el header Server-Timing
+    PERF_LOG_PARAMS=0              incluir parámetros en slow_request (depuración)
+"""
+
+import json
+import os
+import re
+import time
+from functools import wraps
+
+from flask import g, has_app_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_listeners_installed = False
+
+
+def _env_flag(name, default="1"):
+    return os.getenv(name, default).strip().lower() not in {"0", "false", "no", "off", ""}
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.db_ms = 0.0
+        self.sections = {}
+        self._template_starts = []
+
+    def add_section(self, name, elapsed_ms):
+        self.sections[name] = self.sections.get(name, 0.0) + elapsed_ms
+
+    def repeated_statements(self, threshold):
+        counts = {}
+        for statement, _, _ in self.queries:
+            key = _WHITESPACE_RE.sub(" ", statement).strip()
+            counts[key] = counts.get(key, 0) + 1
+        return sorted(
+            ({"sql": sql, "count": count} for sql, count in counts.items() if count >= threshold),
+            key=lambda item: item["count"],
+            reverse=True,
+        )
+
+
+def current_metrics():
+    if not has_app_context():
+        return None
+    return g.get("_request_metrics")
+
+
+def timed_section(name):
+    """Decorador: acumula el tiempo de la función en la sección `name`."""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            metrics = current_metrics()
+            if metrics is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.add_section(name, (time.perf_counter() - start) * 1000)
+
+        return wrapper
+
+    return decorator
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_metrics() is not None:
+        conn.info.setdefault("_request_metrics_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    metrics = current_metrics()
+    starts = conn.info.get("_request_metrics_start")
+    if metrics is None or not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+    metrics.db_ms += elapsed_ms
+    metrics.queries.append((statement, parameters, elapsed_ms))
+
+
+def _handle_error(context):
+    # Si la sentencia falla no corre after_cursor_execute: se descarta su
+    # inicio para que no quede desfasado el de la siguiente consulta.
+    conn = context.connection
+    starts = conn.info.get("_request_metrics_start") if conn is not None else None
+    if starts:
+        starts.pop()
+
+
+def _before_render(sender, template, context, **extra):
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics._template_starts.append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    metrics = current_metrics()
+    if metrics is not None and metrics._template_starts:
+        metrics.add_section("tpl", (time.perf_counter() - metrics._template_starts.pop()) * 1000)
+
+
+def _install_listeners():
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+    _listeners_installed = True
+
+
+def init_request_metrics(app):
+    app.config.setdefault("PERF_INSTRUMENTATION", _env_flag("PERF_INSTRUMENTATION"))
+    app.config.setdefault("PERF_SLOW_REQUEST_MS", float(os.getenv("PERF_SLOW_REQUEST_MS", "1000")))
+    app.config.setdefault(
+        "PERF_N_PLUS_ONE_THRESHOLD", int(os.getenv("PERF_N_PLUS_ONE_THRESHOLD", "5"))
+    )
+    app.config.setdefault("PERF_SERVER_TIMING", _env_flag("PERF_SERVER_TIMING"))
+    app.config.setdefault("PERF_LOG_PARAMS", _env_flag("PERF_LOG_PARAMS", "0"))
+    if not app.config["PERF_INSTRUMENTATION"]:
+        return
+
+    _install_listeners()
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.before_request
+    def _start_request_metrics():
+        g._request_metrics = RequestMetrics()
+
+    def _log_request_metrics(metrics, record):
+        total_ms = (time.perf_counter() - metrics.started) * 1000
+        tpl_ms = metrics.sections.get("tpl", 0.0)
+        pdf_ms = metrics.sections.get("pdf", 0.0)
+        repeated = metrics.repeated_statements(app.config["PERF_N_PLUS_ONE_THRESHOLD"])
+        record.update(
+            {
+                "total_ms": round(total_ms, 1),
+                "db_ms": round(metrics.db_ms, 1),
+                "queries": len(metrics.queries),
+                "tpl_ms": round(tpl_ms, 1),
+                "pdf_ms": round(pdf_ms, 1),
+            }
+        )
+        if repeated:
+            record["n_plus_one"] = [
+                {"sql": item["sql"][:300], "count": item["count"]} for item in repeated
+            ]
+        app.logger.info("perf %s", json.dumps(record, ensure_ascii=False))
+
+        if total_ms >= app.config["PERF_SLOW_REQUEST_MS"]:
+            queries = []
+            for statement, parameters, elapsed_ms in metrics.queries:
+                query = {"sql": _WHITESPACE_RE.sub(" ", statement).strip(), "ms": round(elapsed_ms, 2)}
+                if app.config["PERF_LOG_PARAMS"]:
+                    query["params"] = repr(parameters)[:500]
+                queries.append(query)
+            app.logger.warning(
+                "slow_request %s",
+                json.dumps(
+                    {"path": record["path"], "total_ms": round(total_ms, 1), "queries": queries},
+                    ensure_ascii=False,
+                ),
+            )
+
+    @app.after_request
+    def _finish_request_metrics(response):
+        metrics = g.get("_request_metrics")
+        if metrics is None:
+            return response
+
+        if app.config["PERF_SERVER_TIMING"]:
+            total_ms = (time.perf_counter() - metrics.started) * 1000
+            response.headers.add(
+                "Server-Timing",
+                ", ".join(
+                    [
+                        f'db;dur={metrics.db_ms:.1f};desc="{len(metrics.queries)} queries"',
+                        f"tpl;dur={metrics.sections.get('tpl', 0.0):.1f}",
+                        f"pdf;dur={metrics.sections.get('pdf', 0.0):.1f}",
+                        f"app;dur={total_ms:.1f}",
+                    ]
+                ),
+            )
+
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+        }
+        if response.is_streamed:
+            # Las métricas siguen en g mientras el generador consulta; se
+            # reportan cuando el servidor termina de enviar el cuerpo.
+            record["streamed"] = True
+            response.call_on_close(lambda: _log_request_metrics(metrics, record))
+            return response
+        g.pop("_request_metrics", None)
+        _log_request_metrics(metrics, record)
+        return response
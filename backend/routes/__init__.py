@@ -1 +1,44 @@
-# Package marker for routes.
+"""
+routes · Sistema Invagro
+
+Subsistemas de la app como blueprints que se registran según la
+configuración de cada despliegue. Un módulo deshabilitado no se importa:
+sus rutas, closures y dependencias no ocupan memoria en los workers.
+
+Cómo se usa:
+
+    from routes import parse_enabled_modules, register_blueprints
+
+    app.config["ENABLED_MODULES"] = parse_enabled_modules(os.getenv("ENABLED_MODULES"))
+    register_blueprints(app, helpers)      # dentro de create_app
+
+Variable de entorno:
+    ENABLED_MODULES=facturacion,cobros,reportes,aves,chat   (por defecto todos)
+
+Los endpoints quedan con el prefijo del blueprint: `url_for("aves.aves_lotes")`.
+"""
+
+from importlib import import_module
+
+
+AVAILABLE_MODULES = ("facturacion", "cobros", "reportes", "aves", "chat")
+
+
+def parse_enabled_modules(raw_value):
+    """Lista de módulos habilitados a partir de un texto separado por comas."""
+    if raw_value is None or not raw_value.strip():
+        return list(AVAILABLE_MODULES)
+    requested = [item.strip().lower() for item in raw_value.split(",") if item.strip()]
+    unknown = sorted(set(requested) - set(AVAILABLE_MODULES))
+    if unknown:
+        raise RuntimeError(
+            f"ENABLED_MODULES tiene módulos desconocidos: {', '.join(unknown)}. "
+            f"Disponibles: {', '.join(AVAILABLE_MODULES)}."
+        )
+    return [name for name in AVAILABLE_MODULES if name in requested]
+
+
+def register_blueprints(app, helpers):
+    for name in app.config["ENABLED_MODULES"]:
+        module = import_module(f"routes.{name}")
+        app.register_blueprint(module.create_blueprint(app, helpers))
@@ -0,0 +1,1342 @@
+"""
+aves.py · Sistema Invagro
+
+Portal de aves: clientes de granja, lotes, planes sanitarios y la
+programación de actividades por edad del lote.
+
+Cómo se usa:
+
+    from routes.aves import create_blueprint
+
+    app.register_blueprint(create_blueprint(app, helpers))
+
+Si el módulo no está habilitado, /login ignora `?portal=aves`.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from flask import (
+    Blueprint,
+    redirect,
+    render_template,
+    request,
+    session,
+    url_for,
+)
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import (
+    AvesGranjaCliente,
+    AvesLoteActividad,
+    AvesLoteCierre,
+    AvesLote,
+    AvesLotePlanPersonalizado,
+    AvesPlan,
+    db,
+)
+
+
+def create_blueprint(app, helpers):
+    bp = Blueprint("aves", __name__)
+
+    @bp.get("/aves")
+    def aves_landing():
+        return redirect(url_for("login", portal="aves"))
+
+    def normalize_aves_plan_type(raw_value):
+        value = (raw_value or "").strip().lower()
+        allowed = {"vacunacion", "despique", "desparasitacion"}
+        return value if value in allowed else None
+
+    def aves_plan_type_label(plan_type):
+        labels = {
+            "vacunacion": "Vacunacion",
+            "despique": "Despique",
+            "desparasitacion": "Desparasitacion",
+        }
+        return labels.get(plan_type, "Actividad")
+
+    def aves_lote_age_weeks_label(fecha_nacimiento, reference_date=None):
+        if not fecha_nacimiento:
+            return "Edad no disponible"
+        age_days = max(((reference_date or datetime.utcnow().date()) - fecha_nacimiento).days, 0)
+        weeks = age_days // 7
+        return f"Edad: {weeks} semanas"
+
+    def build_aves_plan_groups(planes_rows):
+        required_types = ("vacunacion", "despique", "desparasitacion")
+        groups = {}
+        for plan_row in planes_rows:
+            plan_name = (plan_row.plan_nombre or "").strip()
+            if not plan_name:
+                continue
+            group = groups.setdefault(
+                plan_name,
+                {
+                    "name": plan_name,
+                    "types": set(),
+                    "activities_count": 0,
+                },
+            )
+            if plan_row.tipo:
+                group["types"].add(plan_row.tipo)
+            group["activities_count"] += 1
+
+        result = []
+        for plan_name, group in groups.items():
+            missing_types = [plan_type for plan_type in required_types if plan_type not in group["types"]]
+            result.append(
+                {
+                    "name": plan_name,
+                    "is_complete": len(missing_types) == 0,
+                    "missing_types": missing_types,
+                    "missing_labels": [aves_plan_type_label(plan_type) for plan_type in missing_types],
+                    "activities_count": group["activities_count"],
+                }
+            )
+
+        result.sort(key=lambda item: item["name"].lower())
+        return result
+
+    def build_aves_lote_activity_lookup(rows):
+        lookup = {}
+        for row in rows:
+            lookup[(row.lote_id, row.plan_id, row.fecha_programada)] = row
+        return lookup
+
+    def build_aves_lote_plan_rows(lote, standard_plan_rows, custom_plan_rows):
+        custom_rows = [row for row in custom_plan_rows if row.activo]
+        if custom_rows:
+            custom_rows.sort(
+                key=lambda item: (item.edad_dias, item.tipo, item.nombre.lower())
+            )
+            return custom_rows, "personalizado"
+        return standard_plan_rows, "base"
+
+    def build_aves_lote_schedule(lote, plan_rows, activity_lookup=None, today=None):
+        if not lote.fecha_nacimiento:
+            return []
+
+        activity_lookup = activity_lookup or {}
+        today = today or datetime.utcnow().date()
+        schedule = []
+        for plan_row in plan_rows:
+            if plan_row.edad_dias is None or plan_row.edad_dias < 0:
+                continue
+            is_custom = isinstance(plan_row, AvesLotePlanPersonalizado)
+            activity_plan_id = (-int(plan_row.id)) if is_custom else int(plan_row.id)
+            scheduled_date = lote.fecha_nacimiento + timedelta(days=int(plan_row.edad_dias))
+            activity_row = activity_lookup.get((lote.id, activity_plan_id, scheduled_date))
+            is_completed = activity_row is not None
+            days_delta = (scheduled_date - today).days
+            if days_delta < 0:
+                status = "atrasada"
+                status_label = f"Atrasada {abs(days_delta)} dias"
+            elif days_delta == 0:
+                status = "hoy"
+                status_label = "Corresponde hoy"
+            else:
+                status = "proxima"
+                status_label = f"Faltan {days_delta} dias"
+            schedule.append(
+                {
+                    "plan_id": activity_plan_id,
+                    "custom_id": plan_row.id if is_custom else None,
+                    "is_custom": is_custom,
+                    "actividad_nombre": plan_row.nombre,
+                    "tipo": plan_row.tipo,
+                    "tipo_label": aves_plan_type_label(plan_row.tipo),
+                    "tipo_class": f"aves-type-{plan_row.tipo or 'actividad'}",
+                    "descripcion": (plan_row.descripcion or "").strip()
+                    or "Sin descripcion adicional.",
+                    "dia": int(plan_row.edad_dias),
+                    "fecha_programada": scheduled_date,
+                    "fecha_programada_label": scheduled_date.strftime("%d/%m/%Y"),
+                    "is_completed": is_completed,
+                    "status": status,
+                    "status_label": status_label,
+                    "realizada_label": (
+                        activity_row.fecha_realizacion.strftime("%d/%m/%Y")
+                        if activity_row and activity_row.fecha_realizacion
+                        else None
+                    ),
+                    "fecha_realizacion": (
+                        activity_row.fecha_realizacion if activity_row else None
+                    ),
+                    "comentarios": (
+                        (activity_row.comentarios or "").strip() if activity_row else ""
+                    ),
+                }
+            )
+
+        schedule.sort(key=lambda item: (item["fecha_programada"], item["tipo_label"]))
+        return schedule
+
+    def build_aves_upcoming_activities(limit=None, days_ahead=None):
+        today = datetime.utcnow().date()
+        try:
+            lotes_aves = AvesLote.query.filter_by(activo=True).all()
+            planes_aves = AvesPlan.query.filter_by(activo=True).all()
+            completed_rows = AvesLoteActividad.query.all()
+            custom_plan_rows = AvesLotePlanPersonalizado.query.filter_by(activo=True).all()
+            closure_rows = AvesLoteCierre.query.all()
+        except SQLAlchemyError:
+            db.session.rollback()
+            return []
+
+        planes_by_name = {}
+        for plan_aves in planes_aves:
+            key = (plan_aves.plan_nombre or "").strip().lower()
+            if not key:
+                continue
+            planes_by_name.setdefault(key, []).append(plan_aves)
+
+        custom_by_lote = {}
+        for custom_row in custom_plan_rows:
+            custom_by_lote.setdefault(custom_row.lote_id, []).append(custom_row)
+
+        closure_lookup = {row.lote_id: row for row in closure_rows}
+        completed_lookup = build_aves_lote_activity_lookup(completed_rows)
+        activities = []
+        for lote_aves in lotes_aves:
+            if closure_lookup.get(lote_aves.id):
+                continue
+            if not lote_aves.fecha_nacimiento:
+                continue
+            client_plan_key = (lote_aves.plan_nombre or "").strip().lower()
+            selected_plans, _ = build_aves_lote_plan_rows(
+                lote_aves,
+                planes_by_name.get(client_plan_key, []),
+                custom_by_lote.get(lote_aves.id, []),
+            )
+            if not selected_plans:
+                continue
+            schedule = build_aves_lote_schedule(
+                lote_aves,
+                selected_plans,
+                activity_lookup=completed_lookup,
+                today=today,
+            )
+            for activity in schedule:
+                if activity["is_completed"] or activity["fecha_programada"] < today:
+                    continue
+                days_left = (activity["fecha_programada"] - today).days
+                if days_ahead is not None and days_left > days_ahead:
+                    continue
+                activities.append(
+                    {
+                        "lote_nombre": lote_aves.nombre,
+                        "cliente_nombre": lote_aves.encargado or "Cliente sin asignar",
+                        "lote_id": lote_aves.id,
+                        "plan_nombre": lote_aves.plan_nombre,
+                        "actividad_nombre": activity["actividad_nombre"],
+                        "tipo": activity["tipo"],
+                        "tipo_label": activity["tipo_label"],
+                        "dia": activity["dia"],
+                        "fecha": activity["fecha_programada"],
+                        "fecha_label": activity["fecha_programada_label"],
+                        "dias_restantes": days_left,
+                    }
+                )
+
+        activities.sort(
+            key=lambda item: (
+                item["fecha"],
+                item["tipo_label"],
+                item["cliente_nombre"].lower(),
+            )
+        )
+        if limit is None:
+            return activities
+        return activities[:limit]
+
+    @bp.get("/dashboard-aves")
+    def aves_dashboard():
+        if not session.get("user"):
+            return redirect(url_for("login", portal="aves"))
+        try:
+            aves_clientes_count = AvesGranjaCliente.query.filter_by(activo=True).count()
+            aves_lotes_count = AvesLote.query.filter_by(activo=True).count()
+            aves_planes_count = (
+                db.session.query(func.count(func.distinct(AvesPlan.plan_nombre)))
+                .filter(AvesPlan.activo.is_(True))
+                .scalar()
+                or 0
+            )
+        except SQLAlchemyError:
+            db.session.rollback()
+            aves_clientes_count = 0
+            aves_lotes_count = 0
+            aves_planes_count = 0
+
+        upcoming_activities = build_aves_upcoming_activities(days_ahead=30)
+        upcoming_week_count = len(
+            [activity for activity in upcoming_activities if activity["dias_restantes"] <= 7]
+        )
+
+        return render_template(
+            "aves_dashboard.html",
+            user=session["user"],
+            aves_clientes_count=aves_clientes_count,
+            aves_lotes_count=aves_lotes_count,
+            aves_planes_count=aves_planes_count,
+            upcoming_week_count=upcoming_week_count,
+            upcoming_activities=upcoming_activities[:8],
+        )
+
+    @bp.route("/aves/clientes", methods=["GET", "POST"])
+    def aves_clientes():
+        if not session.get("user"):
+            return redirect(url_for("login", portal="aves"))
+
+        error = None
+        open_create_client_modal = False
+        form_values = {
+            "nombre": "",
+            "contacto": "",
+            "telefono": "",
+            "email": "",
+            "direccion": "",
+            "observaciones": "",
+        }
+
+        if request.method == "POST":
+            action = (request.form.get("action") or "create_client").strip()
+            nombre = (request.form.get("nombre") or "").strip()
+            contacto = (request.form.get("contacto") or "").strip() or None
+            telefono = (request.form.get("telefono") or "").strip() or None
+            email = (request.form.get("email") or "").strip() or None
+            direccion = (request.form.get("direccion") or "").strip() or None
+            observaciones = (request.form.get("observaciones") or "").strip() or None
+            form_values = {
+                "nombre": nombre,
+                "contacto": contacto or "",
+                "telefono": telefono or "",
+                "email": email or "",
+                "direccion": direccion or "",
+                "observaciones": observaciones or "",
+            }
+            open_create_client_modal = action == "create_client"
+
+            if not nombre:
+                error = "El nombre del cliente es obligatorio."
+
+            if action == "delete_client":
+                client_id_raw = (request.form.get("client_id") or "").strip()
+                try:
+                    client_id = int(client_id_raw)
+                except ValueError:
+                    client_id = 0
+
+                if client_id <= 0:
+                    error = "Cliente invalido."
+                else:
+                    try:
+                        cliente = AvesGranjaCliente.query.filter_by(id=client_id, activo=True).first()
+                        if not cliente:
+                            error = "Cliente no encontrado."
+                        else:
+                            cliente.activo = False
+                            db.session.commit()
+                            return redirect(url_for("aves.aves_clientes"))
+                    except SQLAlchemyError:
+                        db.session.rollback()
+                        error = "No se pudo eliminar el cliente."
+
+            elif action == "update_client" and not error:
+                client_id_raw = (request.form.get("client_id") or "").strip()
+                try:
+                    client_id = int(client_id_raw)
+                except ValueError:
+                    client_id = 0
+
+                if client_id <= 0:
+                    error = "Cliente invalido."
+
+                if not error:
+                    try:
+                        cliente = AvesGranjaCliente.query.filter_by(id=client_id, activo=True).first()
+                        if not cliente:
+                            error = "Cliente no encontrado."
+                        else:
+                            cliente.nombre = nombre
+                            cliente.contacto = contacto
+                            cliente.telefono = telefono
+                            cliente.email = email
+                            cliente.direccion = direccion
+                            cliente.observaciones = observaciones
+                            db.session.commit()
+                            return redirect(url_for("aves.aves_clientes"))
+                    except SQLAlchemyError:
+                        db.session.rollback()
+                        error = "No se pudo actualizar el cliente."
+
+            elif not error:
+                try:
+                    cliente = AvesGranjaCliente(
+                        nombre=nombre,
+                        contacto=contacto,
+                        telefono=telefono,
+                        email=email,
+                        direccion=direccion,
+                        observaciones=observaciones,
+                        activo=True,
+                        fecha_registro=datetime.utcnow(),
+                    )
+                    db.session.add(cliente)
+                    db.session.commit()
+                    return redirect(url_for("aves.aves_clientes"))
+                except SQLAlchemyError:
+                    db.session.rollback()
+                    error = "No se pudo guardar el cliente."
+
+        try:
+            clientes_count = AvesGranjaCliente.query.filter_by(activo=True).count()
+            clientes = (
+                AvesGranjaCliente.query.filter_by(activo=True)
+                .order_by(AvesGranjaCliente.nombre.asc(), AvesGranjaCliente.id.desc())
+                .all()
+            )
+        except SQLAlchemyError:
+            db.session.rollback()
+            clientes_count = 0
+            clientes = []
+            if not error:
+                error = "No se pudo cargar la informacion de clientes."
+
+        return render_template(
+            "aves_clientes.html",
+            user=session["user"],
+            error=error,
+            clientes_count=clientes_count,
+            clientes=clientes,
+            open_create_client_modal=open_create_client_modal,
+            form_values=form_values,
+        )
+
+    @bp.route("/aves/lotes", methods=["GET", "POST"])
+    def aves_lotes():
+        if not session.get("user"):
+            return redirect(url_for("login", portal="aves"))
+
+        error = None
+        open_create_lote_modal = False
+        form_values = {
+            "nombre": "",
+            "fecha_nacimiento": "",
+            "cantidad_aves": "0",
+            "observaciones": "",
+        }
+
+        if request.method == "POST":
+            open_create_lote_modal = True
+            nombre = (request.form.get("nombre") or "").strip()
+            fecha_nacimiento_raw = (request.form.get("fecha_nacimiento") or "").strip()
+            cantidad_aves_raw = (request.form.get("cantidad_aves") or "").strip()
+            observaciones = (request.form.get("observaciones") or "").strip() or None
+            form_values = {
+                "nombre": nombre,
+                "fecha_nacimiento": fecha_nacimiento_raw,
+                "cantidad_aves": cantidad_aves_raw or "0",
+                "observaciones": request.form.get("observaciones") or "",
+            }
+
+            if not nombre or not fecha_nacimiento_raw:
+                error = "Lote y fecha de nacimiento son obligatorios."
+            else:
+                try:
+                    fecha_nacimiento = datetime.strptime(
+                        fecha_nacimiento_raw, "%Y-%m-%d"
+                    ).date()
+                except ValueError:
+                    error = "Fecha de nacimiento invalida."
+                    fecha_nacimiento = None
+
+            if not error:
+                try:
+                    cantidad_aves = int(cantidad_aves_raw or 0)
+                    if cantidad_aves < 0:
+                        raise ValueError
+                except ValueError:
+                    error = "La cantidad de aves debe ser un numero valido."
+
+            if not error:
+                try:
+                    lote = AvesLote(
+                        nombre=nombre,
+                        encargado=None,
+                        telefono=None,
+                        fecha_nacimiento=fecha_nacimiento,
+                        plan_nombre=None,
+                        cantidad_aves=cantidad_aves,
+                        observaciones=observaciones,
+                        activo=True,
+                        fecha_registro=datetime.utcnow(),
+                    )
+                    db.session.add(lote)
+                    if error:
+                        raise ValueError(error)
+                    db.session.commit()
+                    return redirect(url_for("aves.aves_lotes"))
+                except ValueError:
+                    db.session.rollback()
+                except SQLAlchemyError as exc:
+                    db.session.rollback()
+                    error = f"No se pudo guardar el lote. {exc}"
+
+        try:
+            all_active_plan_rows = (
+                AvesPlan.query.filter_by(activo=True)
+                .order_by(AvesPlan.plan_nombre.asc(), AvesPlan.edad_dias.asc(), AvesPlan.tipo.asc())
+                .all()
+            )
+            lotes_raw = (
+                AvesLote.query.filter_by(activo=True)
+                .order_by(AvesLote.fecha_registro.desc(), AvesLote.id.desc())
+                .all()
+            )
+            completed_rows = AvesLoteActividad.query.all()
+            custom_plan_rows = AvesLotePlanPersonalizado.query.filter_by(activo=True).all()
+            closure_rows = AvesLoteCierre.query.all()
+        except SQLAlchemyError:
+            db.session.rollback()
+            all_active_plan_rows = []
+            lotes_raw = []
+            completed_rows = []
+            custom_plan_rows = []
+            closure_rows = []
+            if not error:
+                error = "No se pudo cargar la informacion de lotes."
+
+        plans_by_name = {}
+        for plan_row in all_active_plan_rows:
+            plan_key = (plan_row.plan_nombre or "").strip().lower()
+            if not plan_key:
+                continue
+            plans_by_name.setdefault(plan_key, []).append(plan_row)
+
+        custom_by_lote = {}
+        for custom_row in custom_plan_rows:
+            custom_by_lote.setdefault(custom_row.lote_id, []).append(custom_row)
+
+        closure_lookup = {row.lote_id: row for row in closure_rows}
+        completed_lookup = build_aves_lote_activity_lookup(completed_rows)
+        today = datetime.utcnow().date()
+        lotes_view = []
+        lotes_cerrados_view = []
+        for lote in lotes_raw:
+            plan_key = (lote.plan_nombre or "").strip().lower()
+            selected_plan_rows, plan_source = build_aves_lote_plan_rows(
+                lote,
+                plans_by_name.get(plan_key, []),
+                custom_by_lote.get(lote.id, []),
+            )
+            has_plan = bool(plan_key) or plan_source == "personalizado"
+            schedule = build_aves_lote_schedule(
+                lote,
+                selected_plan_rows,
+                activity_lookup=completed_lookup,
+            )
+            next_activity = next(
+                (activity for activity in schedule if not activity["is_completed"]),
+                None,
+            )
+            closure_row = closure_lookup.get(lote.id)
+            lote_item = {
+                "id": lote.id,
+                "nombre": lote.nombre,
+                "cliente_nombre": lote.encargado or "Sin cliente asignado",
+                "plan_nombre": (
+                    "Plan personalizado"
+                    if plan_source == "personalizado"
+                    else ((lote.plan_nombre or "").strip() or "Sin programa")
+                ),
+                "cantidad_aves": lote.cantidad_aves or 0,
+                "fecha_nacimiento_label": lote.fecha_nacimiento.strftime("%d/%m/%Y"),
+                "edad_semanas_label": aves_lote_age_weeks_label(
+                    lote.fecha_nacimiento,
+                    reference_date=(closure_row.fecha_cierre if closure_row else today),
+                ),
+                "next_activity": next_activity,
+                "next_activity_label": (
+                    next_activity["actividad_nombre"]
+                    if next_activity
+                    else ("Sin actividades pendientes" if has_plan else "Sin programa asignado")
+                ),
+                "next_activity_date": (
+                    next_activity["fecha_programada_label"]
+                    if next_activity
+                    else ("-" if has_plan else "Pendiente")
+                ),
+                "next_activity_status": (
+                    next_activity["status_label"]
+                    if next_activity
+                    else (
+                        "Todo el plan esta al dia"
+                        if has_plan
+                        else "Asigna un programa para generar actividades"
+                    )
+                ),
+                "plan_source": plan_source,
+                "is_closed": bool(closure_row),
+                "closed_label": (
+                    closure_row.fecha_cierre.strftime("%d/%m/%Y") if closure_row else None
+                ),
+                "closed_reason": closure_row.motivo if closure_row else None,
+            }
+            if closure_row:
+                lotes_cerrados_view.append(lote_item)
+            else:
+                lotes_view.append(lote_item)
+
+        return render_template(
+            "aves_lotes.html",
+            user=session["user"],
+            error=error,
+            open_create_lote_modal=open_create_lote_modal,
+            form_values=form_values,
+            lotes=lotes_view,
+            lotes_count=len(lotes_view),
+            lotes_cerrados=lotes_cerrados_view,
+            lotes_cerrados_count=len(lotes_cerrados_view),
+        )
+
+    @bp.route("/aves/lotes/<int:lote_id>", methods=["GET", "POST"])
+    def aves_lote_detalle(lote_id):
+        if not session.get("user"):
+            return redirect(url_for("login", portal="aves"))
+
+        error = None
+        try:
+            lote = AvesLote.query.filter_by(id=lote_id, activo=True).first()
+            clientes_options = (
+                AvesGranjaCliente.query.filter_by(activo=True)
+                .order_by(AvesGranjaCliente.nombre.asc(), AvesGranjaCliente.id.asc())
+                .all()
+            )
+            all_active_plan_rows = (
+                AvesPlan.query.filter_by(activo=True)
+                .order_by(AvesPlan.plan_nombre.asc(), AvesPlan.edad_dias.asc(), AvesPlan.tipo.asc())
+                .all()
+            )
+            completed_rows = (
+                AvesLoteActividad.query.filter_by(lote_id=lote_id)
+                .order_by(AvesLoteActividad.fecha_realizacion.desc(), AvesLoteActividad.id.desc())
+                .all()
+            )
+            custom_plan_rows = (
+                AvesLotePlanPersonalizado.query.filter_by(lote_id=lote_id, activo=True)
+                .order_by(
+                    AvesLotePlanPersonalizado.edad_dias.asc(),
+                    AvesLotePlanPersonalizado.tipo.asc(),
+                    AvesLotePlanPersonalizado.id.asc(),
+                )
+                .all()
+            )
+            closure_row = AvesLoteCierre.query.filter_by(lote_id=lote_id).first()
+        except SQLAlchemyError:
+            db.session.rollback()
+            lote = None
+            clientes_options = []
+            all_active_plan_rows = []
+            completed_rows = []
+            custom_plan_rows = []
+            closure_row = None
+            error = "No se pudo cargar la informacion del lote."
+
+        if not lote:
+            return redirect(url_for("aves.aves_lotes"))
+
+        plan_groups = build_aves_plan_groups(all_active_plan_rows)
+        plan_names = [group["name"] for group in plan_groups if group["is_complete"]]
+        clients_by_id = {cliente.id: cliente for cliente in clientes_options}
+        plans_by_id = {plan_row.id: plan_row for plan_row in all_active_plan_rows}
+        custom_by_id = {row.id: row for row in custom_plan_rows}
+        plans_by_name = {}
+        for plan_row in all_active_plan_rows:
+            plan_key = (plan_row.plan_nombre or "").strip().lower()
+            if not plan_key:
+                continue
+            plans_by_name.setdefault(plan_key, []).append(plan_row)
+
+        if request.method == "POST":
+            action = (request.form.get("action") or "").strip()
+            if action == "delete_lote":
+                try:
+                    AvesLoteActividad.query.filter_by(lote_id=lote.id).delete()
+                    AvesLotePlanPersonalizado.query.filter_by(lote_id=lote.id).delete()
+                    AvesLoteCierre.query.filter_by(lote_id=lote.id).delete()
+                    db.session.delete(lote)
+                    db.session.commit()
+                    return redirect(url_for("aves.aves_lotes"))
+                except SQLAlchemyError as exc:
+                    db.session.rollback()
+                    error = f"No se pudo eliminar el lote. {exc}"
+
+            if closure_row and action in {
+                "update_lote",
+                "complete_activity",
+                "add_custom_activity",
+                "delete_custom_activity",
+            }:
+                error = "El lote ya esta cerrado. Solo puedes consultarlo."
+
+            if action == "update_lote" and not error:
+                nombre = (request.form.get("nombre") or "").strip()
+                fecha_nacimiento_raw = (request.form.get("fecha_nacimiento") or "").strip()
+                cliente_id_raw = (request.form.get("cliente_id") or "").strip()
+                plan_nombre = (request.form.get("plan_nombre") or "").strip()
+                cantidad_aves_raw = (request.form.get("cantidad_aves") or "").strip()
+                observaciones = (request.form.get("observaciones") or "").strip() or None
+
+                if not nombre or not fecha_nacimiento_raw:
+                    error = "Lote y fecha de nacimiento son obligatorios."
+                else:
+                    try:
+                        fecha_nacimiento = datetime.strptime(
+                            fecha_nacimiento_raw, "%Y-%m-%d"
+                        ).date()
+                    except ValueError:
+                        error = "Fecha de nacimiento invalida."
+                        fecha_nacimiento = None
+
+                try:
+                    cantidad_aves = int(cantidad_aves_raw or 0)
+                    if cantidad_aves < 0:
+                        raise ValueError
+                except ValueError:
+                    error = "La cantidad de aves debe ser un numero valido."
+                    cantidad_aves = 0
+
+                try:
+                    cliente_id = int(cliente_id_raw) if cliente_id_raw else 0
+                except ValueError:
+                    cliente_id = 0
+
+                cliente_selected = clients_by_id.get(cliente_id) if cliente_id else None
+                if not error and cliente_id and not cliente_selected:
+                    error = "Selecciona un cliente valido."
+
+                if not error and plan_nombre and plan_nombre not in plan_names:
+                    error = "Selecciona un programa valido y completo."
+
+                if not error:
+                    try:
+                        lote.nombre = nombre
+                        lote.encargado = cliente_selected.nombre if cliente_selected else None
+                        lote.telefono = cliente_selected.telefono if cliente_selected else None
+                        lote.fecha_nacimiento = fecha_nacimiento
+                        lote.plan_nombre = plan_nombre or None
+                        lote.cantidad_aves = cantidad_aves
+                        lote.observaciones = observaciones
+                        db.session.commit()
+                        return redirect(url_for("aves.aves_lote_detalle", lote_id=lote.id))
+                    except SQLAlchemyError as exc:
+                        db.session.rollback()
+                        error = f"No se pudo guardar el lote. {exc}"
+
+            if action == "add_custom_activity" and not error:
+                custom_nombre = (request.form.get("custom_nombre") or "").strip()
+                custom_tipo = normalize_aves_plan_type(request.form.get("custom_tipo"))
+                custom_edad_dias_raw = (request.form.get("custom_edad_dias") or "").strip()
+                custom_descripcion = (request.form.get("custom_descripcion") or "").strip() or None
+
+                if not custom_nombre or not custom_tipo or not custom_edad_dias_raw:
+                    error = "Nombre, tipo y dia son obligatorios para el plan personalizado."
+                else:
+                    try:
+                        custom_edad_dias = int(custom_edad_dias_raw)
+                        if custom_edad_dias < 0:
+                            raise ValueError
+                    except ValueError:
+                        error = "El dia del plan personalizado debe ser valido."
+                        custom_edad_dias = 0
+
+                if not error:
+                    try:
+                        db.session.add(
+                            AvesLotePlanPersonalizado(
+                                lote_id=lote.id,
+                                nombre=custom_nombre,
+                                tipo=custom_tipo,
+                                edad_dias=custom_edad_dias,
+                                descripcion=custom_descripcion,
+                                activo=True,
+                                fecha_registro=datetime.utcnow(),
+                            )
+                        )
+                        db.session.commit()
+                        return redirect(url_for("aves.aves_lote_detalle", lote_id=lote.id))
+                    except SQLAlchemyError as exc:
+                        db.session.rollback()
+                        error = f"No se pudo guardar la actividad personalizada. {exc}"
+
+            if action == "delete_custom_activity" and not error:
+                custom_id_raw = (request.form.get("custom_id") or "").strip()
+                try:
+                    custom_id = int(custom_id_raw)
+                except ValueError:
+                    custom_id = 0
+
+                custom_row = custom_by_id.get(custom_id)
+                if not custom_row:
+                    error = "No se encontro la actividad personalizada."
+                else:
+                    try:
+                        custom_row.activo = False
+                        db.session.commit()
+                        return redirect(url_for("aves.aves_lote_detalle", lote_id=lote.id))
+                    except SQLAlchemyError as exc:
+                        db.session.rollback()
+                        error = f"No se pudo quitar la actividad personalizada. {exc}"
+
+            if action == "complete_activity" and not error:
+                plan_id_raw = (request.form.get("plan_id") or "").strip()
+                fecha_programada_raw = (request.form.get("fecha_programada") or "").strip()
+                fecha_realizacion_raw = (request.form.get("fecha_realizacion") or "").strip()
+                comentarios = (request.form.get("comentarios") or "").strip() or None
+
+                try:
+                    plan_id = int(plan_id_raw) if plan_id_raw else 0
+                except ValueError:
+                    plan_id = 0
+
+                source_row = custom_by_id.get(abs(plan_id)) if plan_id < 0 else plans_by_id.get(plan_id)
+                if not source_row:
+                    error = "No se encontro la actividad del plan."
+
+                try:
+                    fecha_programada = datetime.strptime(
+                        fecha_programada_raw, "%Y-%m-%d"
+                    ).date()
+                except ValueError:
+                    error = "La fecha programada es invalida."
+                    fecha_programada = None
+
+                if not error:
+                    try:
+                        fecha_realizacion = datetime.strptime(
+                            fecha_realizacion_raw, "%Y-%m-%d"
+                        ).date()
+                    except ValueError:
+                        error = "La fecha de realizacion es invalida."
+                        fecha_realizacion = None
+
+                if not error:
+                    try:
+                        activity_row = AvesLoteActividad.query.filter_by(
+                            lote_id=lote.id,
+                            plan_id=plan_id,
+                            fecha_programada=fecha_programada,
+                        ).first()
+                        if not activity_row:
+                            activity_row = AvesLoteActividad(
+                                lote_id=lote.id,
+                                plan_id=plan_id,
+                                actividad_nombre=source_row.nombre,
+                                tipo=source_row.tipo,
+                                edad_dias=int(source_row.edad_dias),
+                                fecha_programada=fecha_programada,
+                                fecha_realizacion=fecha_realizacion,
+                                comentarios=comentarios,
+                                fecha_registro=datetime.utcnow(),
+                            )
+                            db.session.add(activity_row)
+                        else:
+                            activity_row.fecha_realizacion = fecha_realizacion
+                            activity_row.comentarios = comentarios
+                        db.session.commit()
+                        return redirect(url_for("aves.aves_lote_detalle", lote_id=lote.id))
+                    except SQLAlchemyError as exc:
+                        db.session.rollback()
+                        error = f"No se pudo registrar la actividad. {exc}"
+
+            if action == "close_lote":
+                fecha_cierre_raw = (request.form.get("fecha_cierre") or "").strip()
+                motivo_cierre = (request.form.get("motivo_cierre") or "").strip()
+                comentarios_cierre = (request.form.get("comentarios_cierre") or "").strip() or None
+
+                if closure_row:
+                    error = "El lote ya estaba cerrado."
+                elif not fecha_cierre_raw or not motivo_cierre:
+                    error = "Fecha y motivo de cierre son obligatorios."
+                else:
+                    try:
+                        fecha_cierre = datetime.strptime(
+                            fecha_cierre_raw, "%Y-%m-%d"
+                        ).date()
+                    except ValueError:
+                        error = "La fecha de cierre es invalida."
+                        fecha_cierre = None
+
+                if not error:
+                    try:
+                        db.session.add(
+                            AvesLoteCierre(
+                                lote_id=lote.id,
+                                fecha_cierre=fecha_cierre,
+                                motivo=motivo_cierre,
+                                comentarios=comentarios_cierre,
+                                fecha_registro=datetime.utcnow(),
+                            )
+                        )
+                        db.session.commit()
+                        return redirect(url_for("aves.aves_lotes"))
+                    except SQLAlchemyError as exc:
+                        db.session.rollback()
+                        error = f"No se pudo cerrar el lote. {exc}"
+
+            try:
+                completed_rows = (
+                    AvesLoteActividad.query.filter_by(lote_id=lote_id)
+                    .order_by(AvesLoteActividad.fecha_realizacion.desc(), AvesLoteActividad.id.desc())
+                    .all()
+                )
+                custom_plan_rows = (
+                    AvesLotePlanPersonalizado.query.filter_by(lote_id=lote_id, activo=True)
+                    .order_by(
+                        AvesLotePlanPersonalizado.edad_dias.asc(),
+                        AvesLotePlanPersonalizado.tipo.asc(),
+                        AvesLotePlanPersonalizado.id.asc(),
+                    )
+                    .all()
+                )
+                custom_by_id = {row.id: row for row in custom_plan_rows}
+                closure_row = AvesLoteCierre.query.filter_by(lote_id=lote_id).first()
+            except SQLAlchemyError:
+                db.session.rollback()
+
+        completed_lookup = build_aves_lote_activity_lookup(completed_rows)
+        selected_plan_rows, plan_source = build_aves_lote_plan_rows(
+            lote,
+            plans_by_name.get((lote.plan_nombre or "").strip().lower(), []),
+            custom_plan_rows,
+        )
+        schedule = build_aves_lote_schedule(
+            lote,
+            selected_plan_rows,
+            activity_lookup=completed_lookup,
+        )
+        pending_activities = [activity for activity in schedule if not activity["is_completed"]]
+        completed_activities = sorted(
+            [activity for activity in schedule if activity["is_completed"]],
+            key=lambda item: (item["fecha_realizacion"], item["fecha_programada"]),
+            reverse=True,
+        )
+        next_activity = pending_activities[0] if pending_activities else None
+        has_plan = bool((lote.plan_nombre or "").strip()) or plan_source == "personalizado"
+
+        lote_view = {
+            "id": lote.id,
+            "nombre": lote.nombre,
+            "cliente_nombre": lote.encargado or "Sin cliente asignado",
+            "telefono": lote.telefono or "-",
+            "plan_nombre": (
+                "Plan personalizado"
+                if plan_source == "personalizado"
+                else ((lote.plan_nombre or "").strip() or "Sin programa asignado")
+            ),
+            "plan_source": plan_source,
+            "cantidad_aves": lote.cantidad_aves or 0,
+            "fecha_nacimiento_value": lote.fecha_nacimiento.strftime("%Y-%m-%d"),
+            "fecha_nacimiento_label": lote.fecha_nacimiento.strftime("%d/%m/%Y"),
+            "observaciones": lote.observaciones or "",
+            "next_activity_label": (
+                next_activity["actividad_nombre"]
+                if next_activity
+                else ("Sin actividades pendientes" if has_plan else "Sin programa asignado")
+            ),
+            "next_activity_date": (
+                next_activity["fecha_programada_label"]
+                if next_activity
+                else ("-" if has_plan else "Pendiente")
+            ),
+            "next_activity_status": (
+                next_activity["status_label"]
+                if next_activity
+                else (
+                    "Todo el plan esta al dia"
+                    if has_plan
+                    else "Asigna un programa para generar actividades"
+                )
+            ),
+            "is_closed": bool(closure_row),
+            "closed_label": closure_row.fecha_cierre.strftime("%d/%m/%Y") if closure_row else None,
+            "closed_reason": closure_row.motivo if closure_row else None,
+            "closed_comments": (closure_row.comentarios or "") if closure_row else "",
+        }
+
+        custom_plan_activities = [
+            {
+                "id": row.id,
+                "nombre": row.nombre,
+                "tipo": row.tipo,
+                "tipo_label": aves_plan_type_label(row.tipo),
+                "tipo_class": f"aves-type-{row.tipo or 'actividad'}",
+                "edad_dias": row.edad_dias,
+                "descripcion": (row.descripcion or "").strip() or "Sin descripcion adicional.",
+            }
+            for row in custom_plan_rows
+        ]
+
+        return render_template(
+            "aves_lote_detalle.html",
+            user=session["user"],
+            error=error,
+            lote=lote_view,
+            clientes=clientes_options,
+            planes_nombres=plan_names,
+            pending_activities=pending_activities,
+            completed_activities=completed_activities,
+            custom_plan_activities=custom_plan_activities,
+            today_value=datetime.utcnow().strftime("%Y-%m-%d"),
+        )
+
+    @bp.route("/aves/programacion", methods=["GET"])
+    def aves_programacion():
+        return redirect(url_for("aves.aves_lotes"))
+
+    @bp.route("/aves/planes", methods=["GET"])
+    def aves_planes():
+        if not session.get("user"):
+            return redirect(url_for("login", portal="aves"))
+
+        error = None
+        try:
+            planes_raw = (
+                AvesPlan.query.filter_by(activo=True)
+                .order_by(
+                    AvesPlan.plan_nombre.asc(),
+                    AvesPlan.edad_dias.asc(),
+                    AvesPlan.tipo.asc(),
+                    AvesPlan.id.desc(),
+                )
+                .all()
+            )
+        except SQLAlchemyError:
+            db.session.rollback()
+            planes_raw = []
+            if not error:
+                error = "No se pudieron cargar los planes."
+
+        plan_groups = build_aves_plan_groups(planes_raw)
+        search_query = (request.args.get("q") or "").strip()
+        if search_query:
+            search_key = search_query.lower()
+            plan_groups = [
+                group for group in plan_groups if search_key in group["name"].lower()
+            ]
+
+        return render_template(
+            "aves_planes.html",
+            user=session["user"],
+            error=error,
+            plan_groups=plan_groups,
+            search_query=search_query,
+        )
+
+    @bp.route("/aves/planes/nuevo", methods=["GET", "POST"])
+    def aves_plan_nuevo():
+        if not session.get("user"):
+            return redirect(url_for("login", portal="aves"))
+
+        error = None
+        form_values = {
+            "plan_nombre": "",
+            "nombre": "",
+            "tipo": "",
+            "edad_dias": "",
+            "descripcion": "",
+        }
+
+        if request.method == "POST":
+            plan_nombre = (request.form.get("plan_nombre") or "").strip()
+            nombre = (request.form.get("nombre") or "").strip()
+            tipo = normalize_aves_plan_type(request.form.get("tipo"))
+            edad_dias_raw = (request.form.get("edad_dias") or "").strip()
+            descripcion = (request.form.get("descripcion") or "").strip() or None
+
+            form_values = {
+                "plan_nombre": plan_nombre,
+                "nombre": nombre,
+                "tipo": (request.form.get("tipo") or "").strip().lower(),
+                "edad_dias": edad_dias_raw,
+                "descripcion": request.form.get("descripcion") or "",
+            }
+
+            if not plan_nombre or not nombre or not tipo or not edad_dias_raw:
+                error = "Plan, actividad, tipo y dia son obligatorios."
+            else:
+                try:
+                    edad_dias = int(edad_dias_raw)
+                    if edad_dias < 0:
+                        raise ValueError
+                except ValueError:
+                    error = "El dia de actividad debe ser un numero positivo."
+
+            if not error:
+                try:
+                    db.session.add(
+                        AvesPlan(
+                            plan_nombre=plan_nombre,
+                            nombre=nombre,
+                            tipo=tipo,
+                            edad_dias=edad_dias,
+                            descripcion=descripcion,
+                            activo=True,
+                            fecha_creacion=datetime.utcnow(),
+                        )
+                    )
+                    db.session.commit()
+                    return redirect(url_for("aves.aves_plan_editar", plan=plan_nombre))
+                except SQLAlchemyError:
+                    db.session.rollback()
+                    error = "No se pudo guardar el plan."
+
+        return render_template(
+            "aves_plan_nuevo.html",
+            user=session["user"],
+            error=error,
+            form_values=form_values,
+        )
+
+    @bp.route("/aves/planes/editar", methods=["GET", "POST"])
+    def aves_plan_editar():
+        if not session.get("user"):
+            return redirect(url_for("login", portal="aves"))
+
+        plan_nombre_original = (
+            request.args.get("plan")
+            or request.form.get("plan_original")
+            or ""
+        ).strip()
+        if not plan_nombre_original:
+            return redirect(url_for("aves.aves_planes"))
+
+        error = None
+        open_add_activity_modal = False
+        add_activity_form = {
+            "nombre": "",
+            "tipo": "",
+            "edad_dias": "",
+            "descripcion": "",
+        }
+
+        if request.method == "POST":
+            action = (request.form.get("action") or "").strip()
+
+            if action == "rename_plan":
+                nuevo_nombre = (request.form.get("plan_nombre_nuevo") or "").strip()
+                if not nuevo_nombre:
+                    error = "El nombre del plan no puede estar vacio."
+                elif nuevo_nombre != plan_nombre_original:
+                    try:
+                        name_taken = (
+                            AvesPlan.query.filter(
+                                AvesPlan.activo.is_(True),
+                                AvesPlan.plan_nombre == nuevo_nombre,
+                            ).first()
+                        )
+                        if name_taken:
+                            error = "Ya existe un plan con ese nombre."
+                        else:
+                            AvesPlan.query.filter(
+                                AvesPlan.activo.is_(True),
+                                AvesPlan.plan_nombre == plan_nombre_original,
+                            ).update({"plan_nombre": nuevo_nombre})
+                            db.session.commit()
+                            return redirect(url_for("aves.aves_plan_editar", plan=nuevo_nombre))
+                    except SQLAlchemyError:
+                        db.session.rollback()
+                        error = "No se pudo actualizar el nombre del plan."
+
+            elif action == "add_activity":
+                nombre = (request.form.get("nombre") or "").strip()
+                tipo = normalize_aves_plan_type(request.form.get("tipo"))
+                edad_dias_raw = (request.form.get("edad_dias") or "").strip()
+                descripcion = (request.form.get("descripcion") or "").strip() or None
+                open_add_activity_modal = True
+                add_activity_form = {
+                    "nombre": nombre,
+                    "tipo": (request.form.get("tipo") or "").strip().lower(),
+                    "edad_dias": edad_dias_raw,
+                    "descripcion": request.form.get("descripcion") or "",
+                }
+
+                if not nombre or not tipo or not edad_dias_raw:
+                    error = "Actividad, tipo y dia son obligatorios."
+                else:
+                    try:
+                        edad_dias = int(edad_dias_raw)
+                        if edad_dias < 0:
+                            raise ValueError
+                    except ValueError:
+                        error = "El dia debe ser un numero positivo."
+
+                if not error:
+                    try:
+                        db.session.add(
+                            AvesPlan(
+                                plan_nombre=plan_nombre_original,
+                                nombre=nombre,
+                                tipo=tipo,
+                                edad_dias=edad_dias,
+                                descripcion=descripcion,
+                                activo=True,
+                                fecha_creacion=datetime.utcnow(),
+                            )
+                        )
+                        db.session.commit()
+                        return redirect(
+                            url_for("aves.aves_plan_editar", plan=plan_nombre_original)
+                        )
+                    except SQLAlchemyError:
+                        db.session.rollback()
+                        error = "No se pudo agregar la actividad."
+
+            elif action == "update_activity":
+                activity_id_raw = (request.form.get("activity_id") or "").strip()
+                nombre = (request.form.get("nombre") or "").strip()
+                tipo = normalize_aves_plan_type(request.form.get("tipo"))
+                edad_dias_raw = (request.form.get("edad_dias") or "").strip()
+                descripcion = (request.form.get("descripcion") or "").strip() or None
+
+                try:
+                    activity_id = int(activity_id_raw)
+                except ValueError:
+                    activity_id = 0
+
+                if activity_id <= 0 or not nombre or not tipo or not edad_dias_raw:
+                    error = "Completa correctamente los datos de la actividad."
+                else:
+                    try:
+                        edad_dias = int(edad_dias_raw)
+                        if edad_dias < 0:
+                            raise ValueError
+                    except ValueError:
+                        error = "El dia debe ser un numero positivo."
+
+                if not error:
+                    try:
+                        activity_row = (
+                            AvesPlan.query.filter(
+                                AvesPlan.id == activity_id,
+                                AvesPlan.activo.is_(True),
+                                AvesPlan.plan_nombre == plan_nombre_original,
+                            ).first()
+                        )
+                        if not activity_row:
+                            error = "Actividad no encontrada."
+                    except SQLAlchemyError:
+                        db.session.rollback()
+                        error = "No se pudo cargar la actividad."
+
+                if not error:
+                    try:
+                        activity_row.nombre = nombre
+                        activity_row.tipo = tipo
+                        activity_row.edad_dias = edad_dias
+                        activity_row.descripcion = descripcion
+                        db.session.commit()
+                        return redirect(
+                            url_for("aves.aves_plan_editar", plan=plan_nombre_original)
+                        )
+                    except SQLAlchemyError:
+                        db.session.rollback()
+                        error = "No se pudo actualizar la actividad."
+
+            elif action == "delete_activity":
+                activity_id_raw = (request.form.get("activity_id") or "").strip()
+                try:
+                    activity_id = int(activity_id_raw)
+                except ValueError:
+                    activity_id = 0
+
+                if activity_id > 0:
+                    try:
+                        activity_row = (
+                            AvesPlan.query.filter(
+                                AvesPlan.id == activity_id,
+                                AvesPlan.activo.is_(True),
+                                AvesPlan.plan_nombre == plan_nombre_original,
+                            ).first()
+                        )
+                        if activity_row:
+                            activity_row.activo = False
+                            db.session.commit()
+                    except SQLAlchemyError:
+                        db.session.rollback()
+                        error = "No se pudo eliminar la actividad."
+
+                return redirect(url_for("aves.aves_plan_editar", plan=plan_nombre_original))
+
+        try:
+            plan_rows = (
+                AvesPlan.query.filter(
+                    AvesPlan.activo.is_(True),
+                    AvesPlan.plan_nombre == plan_nombre_original,
+                )
+                .order_by(AvesPlan.edad_dias.asc(), AvesPlan.id.asc())
+                .all()
+            )
+        except SQLAlchemyError:
+            db.session.rollback()
+            plan_rows = []
+            if not error:
+                error = "No se pudo cargar el plan solicitado."
+
+        if not plan_rows:
+            return redirect(url_for("aves.aves_planes"))
+
+        plan_status = build_aves_plan_groups(plan_rows)[0]
+        type_counts = {
+            "vacunacion": 0,
+            "despique": 0,
+            "desparasitacion": 0,
+        }
+        grouped_by_day = {}
+        for row in plan_rows:
+            dia = int(row.edad_dias)
+            if row.tipo in type_counts:
+                type_counts[row.tipo] += 1
+            day_group = grouped_by_day.setdefault(
+                dia,
+                {
+                    "dia": dia,
+                    "items": [],
+                },
+            )
+            day_group["items"].append(
+                {
+                    "id": row.id,
+                    "tipo": row.tipo,
+                    "tipo_label": aves_plan_type_label(row.tipo),
+                    "nombre": row.nombre,
+                    "descripcion": row.descripcion or "",
+                }
+            )
+
+        activity_day_groups = [grouped_by_day[dia] for dia in sorted(grouped_by_day)]
+        plan_summary = {
+            "days_count": len(activity_day_groups),
+            "first_day": activity_day_groups[0]["dia"] if activity_day_groups else None,
+            "last_day": activity_day_groups[-1]["dia"] if activity_day_groups else None,
+            "vacunacion_count": type_counts["vacunacion"],
+            "despique_count": type_counts["despique"],
+            "desparasitacion_count": type_counts["desparasitacion"],
+        }
+
+        return render_template(
+            "aves_plan_editar.html",
+            user=session["user"],
+            error=error,
+            plan_nombre=plan_nombre_original,
+            plan_status=plan_status,
+            activity_day_groups=activity_day_groups,
+            plan_summary=plan_summary,
+            open_add_activity_modal=open_add_activity_modal,
+            add_activity_form=add_activity_form,
+        )
+
+    return bp
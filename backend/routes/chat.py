@@ -0,0 +1,945 @@
+"""
+chat.py · Sistema Invagro
+
+Asistente de /api/chat: reglas de `chat_router`, herramientas de consulta
+de solo lectura, historial y resúmenes de conversación, llamadas al LLM.
+
+Cómo se usa:
+
+    from routes.chat import create_blueprint
+
+    app.register_blueprint(create_blueprint(app, helpers))
+
+Usa CHAT_DB_URI y CHAT_LLM_* de la configuración que arma create_app.
+"""
+
+import json
+import re
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy import (
+    bindparam,
+    create_engine,
+    text,
+    or_,
+)
+from flask import (
+    Blueprint,
+    jsonify,
+    request,
+    session,
+)
+
+from models import (
+    Cliente,
+    ChatAudit,
+    ChatMessage,
+    ChatSession,
+    ChatSummary,
+    FacturaContado,
+    Producto,
+    db,
+)
+from chat_router import normalize_text, route_message
+from db_dialect import quote_table, year_of
+
+
+def create_blueprint(app, helpers):
+    bp = Blueprint("chat", __name__)
+
+    def get_chat_engine():
+        uri = app.config.get("CHAT_DB_URI")
+        if not uri:
+            return None
+        return create_engine(uri, pool_pre_ping=True)
+
+    def run_chat_query(sql, params):
+        statement = text(sql)
+        if "cliente_ids" in params:
+            statement = statement.bindparams(bindparam("cliente_ids", expanding=True))
+        engine = get_chat_engine()
+        if engine:
+            with engine.connect() as connection:
+                return connection.execute(statement, params).mappings().all()
+        return db.session.execute(statement, params).mappings().all()
+
+    def format_money(value):
+        if value is None:
+            return "0.00"
+        return f"{float(value):,.2f}"
+
+    def format_int(value):
+        if value is None:
+            return "0"
+        return f"{int(value):,}"
+
+    def parse_date(value):
+        if not value:
+            return None
+        if isinstance(value, datetime):
+            return value
+        for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+            try:
+                return datetime.strptime(str(value), fmt)
+            except ValueError:
+                continue
+        return None
+
+    def ensure_date_range(start, end, max_days=730):
+        if not start or not end:
+            return False
+        if end < start:
+            return False
+        if (end - start).days > max_days:
+            return False
+        return True
+
+    def find_clientes_by_name(name):
+        if not name:
+            return []
+        return Cliente.query.filter(Cliente.nombre.ilike(f"%{name.strip()}%")).all()
+
+    def fetch_clients(limit=50, q=None):
+        limit = min(int(limit or 50), 50)
+        query = db.session.query(
+            Cliente.id, Cliente.nombre, Cliente.ruc_dni, Cliente.telefono, Cliente.email
+        )
+        if q:
+            like_q = f"%{q}%"
+            query = query.filter(
+                or_(
+                    Cliente.nombre.like(like_q),
+                    Cliente.ruc_dni.like(like_q),
+                    Cliente.id == (int(q) if str(q).isdigit() else -1),
+                )
+            )
+        rows = query.order_by(Cliente.nombre.asc()).limit(limit).all()
+        return [dict(row._mapping) for row in rows]
+
+    def fetch_products(limit=50, q=None):
+        limit = min(int(limit or 50), 50)
+        query = db.session.query(
+            Producto.id,
+            Producto.codigo,
+            Producto.nombre,
+            Producto.categoria,
+            Producto.precio,
+            Producto.stock,
+            Producto.activo,
+        )
+        if q:
+            like_q = f"%{q}%"
+            query = query.filter(
+                or_(
+                    Producto.nombre.like(like_q),
+                    Producto.codigo.like(like_q),
+                    Producto.id == (int(q) if str(q).isdigit() else -1),
+                )
+            )
+        rows = query.order_by(Producto.nombre.asc()).limit(limit).all()
+        return [dict(row._mapping) for row in rows]
+
+    def fetch_invoices(limit=20, date_from=None, date_to=None):
+        limit = min(int(limit or 20), 20)
+        query = db.session.query(
+            FacturaContado.id,
+            FacturaContado.numero_factura,
+            FacturaContado.cliente_id,
+            FacturaContado.fecha,
+            FacturaContado.total,
+            FacturaContado.estado,
+        )
+        if date_from:
+            query = query.filter(FacturaContado.fecha >= date_from)
+        if date_to:
+            query = query.filter(FacturaContado.fecha <= date_to)
+        rows = query.order_by(FacturaContado.fecha.desc()).limit(limit).all()
+        return [dict(row._mapping) for row in rows]
+
+    def extract_query(text, normalized=None):
+        if not text:
+            return None
+        quoted = re.search(r"\"([^\"]+)\"|'([^']+)'", text)
+        if quoted:
+            return (quoted.group(1) or quoted.group(2)).strip()
+        if normalized is None:
+            normalized = normalize_text(text)
+        for keyword in ["clientes", "cliente", "productos", "producto", "facturas", "factura"]:
+            if keyword in normalized:
+                parts = normalized.split(keyword, 1)
+                if len(parts) > 1:
+                    candidate = parts[1].strip(" :,-")
+                    if candidate:
+                        return candidate
+        return None
+
+    def build_db_summary(intent, rows):
+        if not rows:
+            return "No se encontraron resultados."
+        lines = []
+        if intent == "clientes":
+            lines.append("Clientes:")
+            for row in rows:
+                lines.append(
+                    f"- {row.get('id')}: {row.get('nombre')} ({row.get('ruc_dni') or 'sin doc'})"
+                )
+        elif intent == "productos":
+            lines.append("Productos:")
+            for row in rows:
+                lines.append(
+                    f"- {row.get('id')}: {row.get('nombre')} ({row.get('codigo')}) L {row.get('precio')}"
+                )
+        elif intent == "facturas":
+            lines.append("Facturas:")
+            for row in rows:
+                fecha = row.get("fecha")
+                fecha_txt = fecha.strftime("%Y-%m-%d") if fecha else "sin fecha"
+                lines.append(
+                    f"- {row.get('numero_factura')} cliente {row.get('cliente_id')} {fecha_txt} L {row.get('total')} {row.get('estado')}"
+                )
+        return "\n".join(lines[:21])
+
+    TOOL_DEFS = [
+        {
+            "type": "function",
+            "name": "top_productos",
+            "description": "Top productos vendidos en un rango de fechas.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "fecha_inicio": {"type": "string", "description": "YYYY-MM-DD"},
+                    "fecha_fin": {"type": "string", "description": "YYYY-MM-DD"},
+                    "limite": {
+                        "type": ["integer", "null"],
+                        "description": "Max 50 (opcional)",
+                    },
+                },
+                "required": ["fecha_inicio", "fecha_fin", "limite"],
+                "additionalProperties": False,
+            },
+            "strict": True,
+        },
+        {
+            "type": "function",
+            "name": "clientes_inactivos",
+            "description": "Clientes sin compras en los ultimos N dias.",
+            "parameters": {
+                "type": "object",
+                "properties": {"dias": {"type": "integer", "description": "Cantidad de dias"}},
+                "required": ["dias"],
+                "additionalProperties": False,
+            },
+            "strict": True,
+        },
+        {
+            "type": "function",
+            "name": "compras_por_cliente",
+            "description": "Totales de compras de un cliente en un rango.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "cliente_id": {"type": "integer"},
+                    "fecha_inicio": {"type": "string", "description": "YYYY-MM-DD"},
+                    "fecha_fin": {"type": "string", "description": "YYYY-MM-DD"},
+                },
+                "required": ["cliente_id", "fecha_inicio", "fecha_fin"],
+                "additionalProperties": False,
+            },
+            "strict": True,
+        },
+        {
+            "type": "function",
+            "name": "productos_por_cliente",
+            "description": "Productos comprados por un cliente en un rango.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "cliente_id": {"type": "integer"},
+                    "fecha_inicio": {"type": "string", "description": "YYYY-MM-DD"},
+                    "fecha_fin": {"type": "string", "description": "YYYY-MM-DD"},
+                    "limite": {
+                        "type": ["integer", "null"],
+                        "description": "Max 50 (opcional)",
+                    },
+                },
+                "required": ["cliente_id", "fecha_inicio", "fecha_fin", "limite"],
+                "additionalProperties": False,
+            },
+            "strict": True,
+        },
+        {
+            "type": "function",
+            "name": "productos_disminuidos",
+            "description": "Productos con disminucion de compras comparando dos anos.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "cliente_id": {"type": "integer"},
+                    "year_actual": {"type": "integer"},
+                    "year_pasado": {"type": "integer"},
+                },
+                "required": ["cliente_id", "year_actual", "year_pasado"],
+                "additionalProperties": False,
+            },
+            "strict": True,
+        },
+    ]
+
+    def extract_response_text_and_calls(response_json):
+        output_items = response_json.get("output", [])
+        tool_calls = []
+        text_chunks = []
+        for item in output_items:
+            item_type = item.get("type")
+            if item_type == "function_call":
+                tool_calls.append(
+                    {
+                        "call_id": item.get("call_id"),
+                        "name": item.get("name"),
+                        "arguments": item.get("arguments"),
+                    }
+                )
+            elif item_type == "message":
+                content = item.get("content") or []
+                for part in content:
+                    if part.get("type") == "output_text":
+                        text_chunks.append(part.get("text", ""))
+        return {"text": "\n".join([t for t in text_chunks if t]), "tool_calls": tool_calls}
+
+    def to_responses_input(messages):
+        if not messages:
+            return []
+        if isinstance(messages[0], dict) and messages[0].get("type"):
+            return messages
+        converted = []
+        for msg in messages:
+            content = msg.get("content", "")
+            role = msg.get("role", "user")
+            content_type = "output_text" if role == "assistant" else "input_text"
+            converted.append(
+                {
+                    "role": role,
+                    "content": [{"type": content_type, "text": content}],
+                }
+            )
+        return converted
+
+    def validate_responses_input(input_payload):
+        issues = []
+        for idx, item in enumerate(input_payload):
+            role = item.get("role")
+            content = item.get("content") or []
+            if not content:
+                issues.append(f"input[{idx}] role={role} content vacio")
+                continue
+            ctype = content[0].get("type")
+            if role == "assistant" and ctype != "output_text":
+                issues.append(f"input[{idx}] role=assistant type={ctype}")
+            if role in {"user", "system"} and ctype != "input_text":
+                issues.append(f"input[{idx}] role={role} type={ctype}")
+        return issues
+
+    def validate_tools(tools):
+        issues = []
+        for idx, tool in enumerate(tools):
+            if not tool.get("name"):
+                issues.append(f"tools[{idx}] missing name")
+        return issues
+
+    def call_llm(messages, tools=None, tool_choice="auto", request_id=None):
+        import requests
+
+        api_key = app.config.get("CHAT_LLM_API_KEY")
+        model = app.config.get("CHAT_LLM_MODEL")
+        if not api_key:
+            app.logger.error("Missing CHAT_LLM_API_KEY")
+            return None, "Falta CHAT_LLM_API_KEY en el entorno."
+        if not model:
+            app.logger.error("Missing CHAT_LLM_MODEL")
+            return None, "Falta CHAT_LLM_MODEL en el entorno."
+        base_url = app.config.get("CHAT_LLM_BASE_URL") or "https://api.openai.com/v1"
+        base_url = base_url.rstrip("/")
+        if base_url.endswith("/v1"):
+            url = base_url + "/responses"
+        else:
+            url = base_url + "/v1/responses"
+        input_payload = to_responses_input(messages)
+        payload = {
+            "model": model,
+            "input": input_payload,
+        }
+        if tools:
+            tool_issues = validate_tools(tools)
+            if tool_issues:
+                app.logger.error("Tools invalid: %s", "; ".join(tool_issues))
+            else:
+                payload["tools"] = tools
+                payload["tool_choice"] = tool_choice
+        data = json.dumps(payload).encode("utf-8")
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}",
+        }
+        retryable = {500, 502, 503, 504}
+        delays = [0.5, 1.5]
+        for attempt in range(1, len(delays) + 2):
+            try:
+                start_time = time.time()
+                response = requests.post(
+                    url,
+                    headers=headers,
+                    data=data,
+                    timeout=20,
+                )
+                duration_ms = int((time.time() - start_time) * 1000)
+                if response.status_code >= 200 and response.status_code < 300:
+                    return response.json(), None
+                code = response.status_code
+                body = response.text or ""
+                if code == 400:
+                    issues = validate_responses_input(input_payload)
+                    if issues:
+                        app.logger.error(
+                            "OpenAI 400 input issues: %s", "; ".join(issues)
+                        )
+                    app.logger.error(
+                        "OpenAI 400 debug request_id=%s model=%s inputs=%s roles=%s types=%s",
+                        request_id,
+                        model,
+                        len(input_payload),
+                        [item.get("role") for item in input_payload],
+                        [
+                            (item.get("content") or [{}])[0].get("type")
+                            for item in input_payload
+                        ],
+                    )
+                app.logger.error(
+                    "OpenAI error request_id=%s status=%s duration_ms=%s attempt=%s",
+                    request_id,
+                    code,
+                    duration_ms,
+                    attempt,
+                )
+                if code == 429 and "insufficient_quota" in body:
+                    return None, "No hay saldo disponible en OpenAI."
+                if code in retryable and attempt <= len(delays):
+                    time.sleep(delays[attempt - 1])
+                    continue
+                return None, f"OpenAI {code}: {body}"
+            except Exception as exc:
+                app.logger.error(
+                    "OpenAI request failed request_id=%s attempt=%s error=%s",
+                    request_id,
+                    attempt,
+                    exc,
+                )
+                if attempt <= len(delays):
+                    time.sleep(delays[attempt - 1])
+                    continue
+                return None, str(exc)
+
+    def get_or_create_chat_session(username):
+        session_id = session.get("chat_session_id")
+        chat_session = None
+        if session_id:
+            chat_session = ChatSession.query.get(session_id)
+        if not chat_session:
+            session_id = str(uuid4())
+            chat_session = ChatSession(
+                id=session_id,
+                username=username,
+                created_at=datetime.utcnow(),
+                updated_at=datetime.utcnow(),
+            )
+            db.session.add(chat_session)
+            db.session.commit()
+            session["chat_session_id"] = session_id
+        else:
+            chat_session.updated_at = datetime.utcnow()
+            db.session.commit()
+        return chat_session
+
+    def store_chat_message(session_id, role, content):
+        message = ChatMessage(
+            session_id=session_id,
+            role=role,
+            content=content,
+            created_at=datetime.utcnow(),
+        )
+        db.session.add(message)
+        chat_session = ChatSession.query.get(session_id)
+        if chat_session:
+            chat_session.updated_at = datetime.utcnow()
+        db.session.commit()
+
+    def get_recent_messages(session_id, limit=8):
+        return (
+            ChatMessage.query.filter_by(session_id=session_id)
+            .order_by(ChatMessage.id.desc())
+            .limit(limit)
+            .all()[::-1]
+        )
+
+    def get_chat_summary(session_id):
+        return (
+            ChatSummary.query.filter_by(session_id=session_id)
+            .order_by(ChatSummary.id.desc())
+            .first()
+        )
+
+    def summarize_messages(messages):
+        if not messages:
+            return ""
+        joined = "\n".join([f"{msg.role}: {msg.content}" for msg in messages])
+        system_prompt = (
+            "Resume en 3-5 puntos lo esencial de la conversacion, en espanol y "
+            "sin detalles numericos."
+        )
+        response, err = call_llm(
+            [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": joined},
+            ]
+        )
+        if err:
+            app.logger.error("Resumen LLM fallo: %s", err)
+            return ""
+        if response:
+            summary_text = extract_response_text_and_calls(response).get("text", "")
+            return summary_text.strip() or ""
+        return ""
+
+    def maybe_update_summary(session_id):
+        if not app.config.get("CHAT_SUMMARY_ENABLED"):
+            return
+        try:
+            total_messages = ChatMessage.query.filter_by(session_id=session_id).count()
+            if total_messages < 12 or total_messages % 6 != 0:
+                return
+            messages = (
+                ChatMessage.query.filter_by(session_id=session_id)
+                .order_by(ChatMessage.id.asc())
+                .all()
+            )
+            summary_text = summarize_messages(messages[:-8])
+            if not summary_text:
+                return
+            summary = get_chat_summary(session_id)
+            if summary:
+                summary.summary = summary_text
+                summary.updated_at = datetime.utcnow()
+            else:
+                summary = ChatSummary(
+                    session_id=session_id,
+                    summary=summary_text,
+                    updated_at=datetime.utcnow(),
+                )
+                db.session.add(summary)
+            db.session.commit()
+        except Exception as exc:
+            app.logger.error("Fallo resumen, continuando sin resumen: %s", exc)
+
+    def build_system_prompt():
+        today = datetime.now().strftime("%Y-%m-%d")
+        return (
+            "Eres un asistente analitico para ventas y clientes. Responde en espanol. "
+            "Si falta informacion (fechas, cliente, periodo), pide una aclaracion antes "
+            "de ejecutar herramientas. No intentes modificar datos. "
+            "Usa los datos proporcionados en el contexto; no digas que no tienes acceso "
+            "a la base de datos. Si no hay resultados, indica que no se encontraron. "
+            "Explica el criterio de analisis en 2-4 frases y luego da el resultado. "
+            f"Fecha actual: {today}."
+        )
+
+    def execute_tool(tool_name, params, user_message):
+        start_time = time.time()
+        result = {"rows": [], "meta": {}}
+        dialect = sql_dialect()
+        productos_table = quote_table("inva-productos", dialect)
+        clientes_table = quote_table("inva-clientes", dialect)
+        year_fecha = year_of("v.fecha", dialect)
+        if tool_name == "top_productos":
+            fecha_inicio = parse_date(params.get("fecha_inicio"))
+            fecha_fin = parse_date(params.get("fecha_fin"))
+            limite = min(int(params.get("limite", 10) or 10), 50)
+            if not fecha_inicio or not fecha_fin:
+                return None, "Necesito fecha de inicio y fin."
+            fecha_fin_inclusive = fecha_fin + timedelta(days=1)
+            if not ensure_date_range(fecha_inicio, fecha_fin_inclusive):
+                return None, "Rango de fechas invalido o muy amplio."
+            sql = sales_cte_sql() + f"""
+                SELECT p.nombre AS producto,
+                       SUM(v.cantidad) AS qty_total,
+                       SUM(v.subtotal) AS total
+                FROM ventas v
+                JOIN {productos_table} p ON p.id = v.producto_id
+                WHERE v.fecha >= :start_date AND v.fecha < :end_date
+                GROUP BY p.id, p.nombre
+                ORDER BY qty_total DESC, total DESC
+                LIMIT :limite
+            """
+            rows = run_chat_query(
+                sql, {"start_date": fecha_inicio, "end_date": fecha_fin_inclusive, "limite": limite}
+            )
+            result["rows"] = rows
+            result["meta"] = {
+                "fecha_inicio": fecha_inicio.strftime("%Y-%m-%d"),
+                "fecha_fin": fecha_fin.strftime("%Y-%m-%d"),
+                "limite": limite,
+            }
+        elif tool_name == "clientes_inactivos":
+            dias = int(params.get("dias", 0) or 0)
+            if dias <= 0 or dias > 730:
+                return None, "Indica un numero de dias entre 1 y 730."
+            cutoff = datetime.now() - timedelta(days=dias)
+            sql = sales_cte_sql() + f"""
+                , ultimas AS (
+                    SELECT cliente_id, MAX(fecha) AS ultima_compra
+                    FROM ventas
+                    WHERE cliente_id IS NOT NULL
+                    GROUP BY cliente_id
+                )
+                SELECT c.id AS cliente_id, c.nombre AS cliente, u.ultima_compra AS ultima_compra
+                FROM {clientes_table} c
+                LEFT JOIN ultimas u ON u.cliente_id = c.id
+                WHERE u.ultima_compra IS NULL OR u.ultima_compra < :cutoff
+                ORDER BY u.ultima_compra ASC
+                LIMIT 50
+            """
+            rows = run_chat_query(sql, {"cutoff": cutoff})
+            result["rows"] = rows
+            result["meta"] = {"dias": dias}
+        elif tool_name in {"compras_por_cliente", "productos_por_cliente", "productos_disminuidos"}:
+            cliente_id = params.get("cliente_id")
+            if not cliente_id:
+                posibles = find_clientes_by_name(user_message)
+                if len(posibles) == 1:
+                    cliente_id = posibles[0].id
+                else:
+                    return None, "Necesito el cliente especifico (nombre o ID)."
+            try:
+                cliente_id = int(cliente_id)
+            except (TypeError, ValueError):
+                return None, "El cliente_id no es valido."
+
+            if tool_name == "compras_por_cliente":
+                fecha_inicio = parse_date(params.get("fecha_inicio"))
+                fecha_fin = parse_date(params.get("fecha_fin"))
+                if not fecha_inicio or not fecha_fin:
+                    return None, "Necesito fecha de inicio y fin."
+                fecha_fin_inclusive = fecha_fin + timedelta(days=1)
+                if not ensure_date_range(fecha_inicio, fecha_fin_inclusive):
+                    return None, "Rango de fechas invalido o muy amplio."
+                sql = sales_cte_sql() + f"""
+                    SELECT COUNT(*) AS lineas,
+                           SUM(v.cantidad) AS qty_total,
+                           SUM(v.subtotal) AS total,
+                           MAX(v.fecha) AS ultima_compra
+                    FROM ventas v
+                    WHERE v.cliente_id = :cliente_id
+                      AND v.fecha >= :start_date AND v.fecha < :end_date
+                """
+                rows = run_chat_query(
+                    sql,
+                    {"cliente_id": cliente_id, "start_date": fecha_inicio, "end_date": fecha_fin_inclusive},
+                )
+                result["rows"] = rows
+                result["meta"] = {
+                    "cliente_id": cliente_id,
+                    "fecha_inicio": fecha_inicio.strftime("%Y-%m-%d"),
+                    "fecha_fin": fecha_fin.strftime("%Y-%m-%d"),
+                }
+            elif tool_name == "productos_por_cliente":
+                fecha_inicio = parse_date(params.get("fecha_inicio"))
+                fecha_fin = parse_date(params.get("fecha_fin"))
+                limite = min(int(params.get("limite", 30) or 30), 50)
+                if not fecha_inicio or not fecha_fin:
+                    return None, "Necesito fecha de inicio y fin."
+                fecha_fin_inclusive = fecha_fin + timedelta(days=1)
+                if not ensure_date_range(fecha_inicio, fecha_fin_inclusive):
+                    return None, "Rango de fechas invalido o muy amplio."
+                sql = sales_cte_sql() + f"""
+                    SELECT p.nombre AS producto,
+                           SUM(v.cantidad) AS qty_total,
+                           SUM(v.subtotal) AS total
+                    FROM ventas v
+                    JOIN {productos_table} p ON p.id = v.producto_id
+                    WHERE v.cliente_id = :cliente_id
+                      AND v.fecha >= :start_date AND v.fecha < :end_date
+                    GROUP BY p.id, p.nombre
+                    ORDER BY qty_total DESC, total DESC
+                    LIMIT :limite
+                """
+                rows = run_chat_query(
+                    sql,
+                    {
+                        "cliente_id": cliente_id,
+                        "start_date": fecha_inicio,
+                        "end_date": fecha_fin_inclusive,
+                        "limite": limite,
+                    },
+                )
+                result["rows"] = rows
+                result["meta"] = {
+                    "cliente_id": cliente_id,
+                    "fecha_inicio": fecha_inicio.strftime("%Y-%m-%d"),
+                    "fecha_fin": fecha_fin.strftime("%Y-%m-%d"),
+                    "limite": limite,
+                }
+            else:
+                year_actual = int(params.get("year_actual", 0) or 0)
+                year_pasado = int(params.get("year_pasado", 0) or 0)
+                if year_actual <= 0 or year_pasado <= 0:
+                    return None, "Necesito year_actual y year_pasado."
+                sql = sales_cte_sql() + f"""
+                    SELECT p.nombre AS producto,
+                           SUM(CASE WHEN {year_fecha} = :year_actual THEN v.cantidad ELSE 0 END) AS qty_actual,
+                           SUM(CASE WHEN {year_fecha} = :year_pasado THEN v.cantidad ELSE 0 END) AS qty_pasado,
+                           SUM(CASE WHEN {year_fecha} = :year_actual THEN v.subtotal ELSE 0 END) AS total_actual,
+                           SUM(CASE WHEN {year_fecha} = :year_pasado THEN v.subtotal ELSE 0 END) AS total_pasado
+                    FROM ventas v
+                    JOIN {productos_table} p ON p.id = v.producto_id
+                    WHERE v.cliente_id = :cliente_id
+                    GROUP BY p.id, p.nombre
+                    HAVING (SUM(CASE WHEN {year_fecha} = :year_actual THEN v.cantidad ELSE 0 END)
+                            < SUM(CASE WHEN {year_fecha} = :year_pasado THEN v.cantidad ELSE 0 END))
+                        OR (SUM(CASE WHEN {year_fecha} = :year_actual THEN v.subtotal ELSE 0 END)
+                            < SUM(CASE WHEN {year_fecha} = :year_pasado THEN v.subtotal ELSE 0 END))
+                    ORDER BY (SUM(CASE WHEN {year_fecha} = :year_pasado THEN v.cantidad ELSE 0 END)
+                              - SUM(CASE WHEN {year_fecha} = :year_actual THEN v.cantidad ELSE 0 END)) DESC
+                    LIMIT 50
+                """
+                rows = run_chat_query(
+                    sql,
+                    {
+                        "cliente_id": cliente_id,
+                        "year_actual": year_actual,
+                        "year_pasado": year_pasado,
+                    },
+                )
+                result["rows"] = rows
+                result["meta"] = {
+                    "cliente_id": cliente_id,
+                    "year_actual": year_actual,
+                    "year_pasado": year_pasado,
+                }
+        else:
+            return None, "Tool no permitida."
+
+        elapsed_ms = int((time.time() - start_time) * 1000)
+        audit = ChatAudit(
+            session_id=session.get("chat_session_id"),
+            username=session.get("user"),
+            question=user_message,
+            tool_name=tool_name,
+            params_json=json.dumps(params, ensure_ascii=False),
+            elapsed_ms=elapsed_ms,
+            rows_returned=len(result["rows"]),
+            created_at=datetime.utcnow(),
+        )
+        db.session.add(audit)
+        db.session.commit()
+        return result, None
+
+    def build_llm_messages(session_id, user_message):
+        summary = get_chat_summary(session_id)
+        recent = get_recent_messages(session_id, limit=4)
+        messages = [{"role": "system", "content": build_system_prompt()}]
+        if summary and summary.summary:
+            messages.append({"role": "system", "content": f"Resumen: {summary.summary}"})
+        for msg in recent:
+            messages.append({"role": msg.role, "content": msg.content})
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    def format_tool_result_for_user(tool_name, result):
+        rows = result.get("rows", [])
+        meta = result.get("meta", {})
+        if tool_name == "top_productos":
+            if not rows:
+                return "No encontre ventas en ese rango."
+            lines = [
+                f"Analice ventas del {meta.get('fecha_inicio')} al {meta.get('fecha_fin')} y ordene por cantidad."
+            ]
+            for row in rows:
+                lines.append(
+                    f"- {row['producto']}: {format_int(row['qty_total'])} unidades | L {format_money(row['total'])}"
+                )
+            return "\n".join(lines)
+        if tool_name == "clientes_inactivos":
+            if not rows:
+                return "No hay clientes inactivos en ese periodo."
+            lines = [
+                f"Busque clientes sin compras en los ultimos {meta.get('dias')} dias."
+            ]
+            for row in rows:
+                fecha = row.get("ultima_compra")
+                fecha_txt = fecha.strftime("%Y-%m-%d") if fecha else "sin compras"
+                lines.append(f"- {row['cliente']}: {fecha_txt}")
+            return "\n".join(lines)
+        if tool_name == "compras_por_cliente":
+            if not rows:
+                return "No hay compras en ese periodo."
+            row = rows[0]
+            fecha = row.get("ultima_compra")
+            fecha_txt = fecha.strftime("%Y-%m-%d") if fecha else "sin compras"
+            return (
+                "Resumi las compras del cliente en el periodo solicitado.\n"
+                f"Total lineas: {format_int(row.get('lineas'))}, unidades: {format_int(row.get('qty_total'))}, "
+                f"monto: L {format_money(row.get('total'))}, ultima compra: {fecha_txt}."
+            )
+        if tool_name == "productos_por_cliente":
+            if not rows:
+                return "No hay productos comprados en ese periodo."
+            lines = [
+                "Liste productos por cantidad y monto dentro del periodo solicitado."
+            ]
+            for row in rows:
+                lines.append(
+                    f"- {row['producto']}: {format_int(row['qty_total'])} unidades | L {format_money(row['total'])}"
+                )
+            return "\n".join(lines)
+        if tool_name == "productos_disminuidos":
+            if not rows:
+                return "No hay productos con disminucion en los anos indicados."
+            lines = [
+                f"Compare {meta.get('year_pasado')} vs {meta.get('year_actual')} para el cliente."
+            ]
+            for row in rows:
+                lines.append(
+                    f"- {row['producto']}: {format_int(row['qty_pasado'])} -> {format_int(row['qty_actual'])} unidades | "
+                    f"L {format_money(row['total_pasado'])} -> L {format_money(row['total_actual'])}"
+                )
+            return "\n".join(lines)
+        return "Listo."
+
+    def find_clientes_by_name(name):
+        if not name:
+            return []
+        return Cliente.query.filter(Cliente.nombre.ilike(f"%{name.strip()}%")).all()
+
+    def run_chat_query(sql, params):
+        statement = text(sql)
+        if "cliente_ids" in params:
+            statement = statement.bindparams(bindparam("cliente_ids", expanding=True))
+        return db.session.execute(statement, params).mappings().all()
+
+    def format_money(value):
+        if value is None:
+            return "0.00"
+        return f"{float(value):,.2f}"
+
+    def format_int(value):
+        if value is None:
+            return "0"
+        return f"{int(value):,}"
+
+    def sql_dialect():
+        return db.engine.dialect.name
+
+    def sales_cte_sql():
+        dialect = sql_dialect()
+        return f"""
+            WITH ventas AS (
+                SELECT f.cliente_id AS cliente_id, d.producto_id AS producto_id, d.cantidad AS cantidad, d.subtotal AS subtotal, f.fecha AS fecha
+                FROM {quote_table("inva-facturas_contado", dialect)} f
+                JOIN {quote_table("inva-detalle_facturas_contado", dialect)} d ON d.factura_id = f.id
+                UNION ALL
+                SELECT f.cliente_id, d.producto_id, d.cantidad, d.subtotal, f.fecha
+                FROM {quote_table("inva-facturas_credito", dialect)} f
+                JOIN {quote_table("inva-detalle_facturas_credito", dialect)} d ON d.factura_id = f.id
+                UNION ALL
+                SELECT p.cliente_id, d.producto_id, d.cantidad, d.subtotal, p.fecha
+                FROM {quote_table("inva-pedidos", dialect)} p
+                JOIN {quote_table("inva-detalle_pedidos", dialect)} d ON d.pedido_id = p.id
+            )
+        """
+
+    @bp.post("/api/chat")
+    def chat_api():
+        try:
+            if not session.get("user"):
+                return jsonify({"error": "No autorizado."}), 401
+            payload = request.get_json(silent=True) or {}
+            message = (payload.get("message") or "").strip()
+            if not message:
+                return jsonify({"error": "Mensaje vacio."}), 400
+
+            route = route_message(message)
+            if route.is_mutation:
+                return jsonify(
+                    {
+                        "reply": "Solo puedo hacer consultas. Si quieres modificar datos, hazlo desde los modulos del sistema."
+                    }
+                )
+
+            username = session.get("user")
+            chat_session = get_or_create_chat_session(username)
+            store_chat_message(chat_session.id, "user", message)
+
+            request_id = uuid4().hex
+            intent = route.intent
+            query_hint = extract_query(message, route.normalized)
+            db_summary = ""
+            if intent:
+                try:
+                    if intent == "clientes":
+                        rows = fetch_clients(limit=20, q=query_hint)
+                    elif intent == "productos":
+                        rows = fetch_products(limit=20, q=query_hint)
+                    else:
+                        rows = fetch_invoices(limit=20)
+                    db_summary = build_db_summary(intent, rows)
+                except Exception as exc:
+                    app.logger.error("DB query failed request_id=%s error=%s", request_id, exc)
+                    db_summary = "No se pudo consultar la base de datos."
+
+            if db_summary == "No se pudo consultar la base de datos.":
+                store_chat_message(chat_session.id, "assistant", db_summary)
+                return jsonify({"reply": db_summary})
+
+            if intent and db_summary:
+                reply = (
+                    f"{db_summary}\n\nTotal mostrado: {min(len(db_summary.splitlines()) - 1, 20)}"
+                    if db_summary != "No se encontraron resultados."
+                    else db_summary
+                )
+                store_chat_message(chat_session.id, "assistant", reply)
+                return jsonify({"reply": reply})
+
+            messages = build_llm_messages(chat_session.id, message)
+            if db_summary:
+                messages.insert(
+                    1,
+                    {
+                        "role": "system",
+                        "content": f"Datos relevantes de la base de datos:\n{db_summary}",
+                    },
+                )
+
+            llm_response, llm_error = call_llm(messages, request_id=request_id)
+            if llm_error:
+                store_chat_message(chat_session.id, "assistant", llm_error)
+                maybe_update_summary(chat_session.id)
+                return jsonify(
+                    {
+                        "reply": "El asistente no esta disponible temporalmente. Intenta de nuevo."
+                    }
+                )
+
+            reply = None
+            if llm_response:
+                reply = extract_response_text_and_calls(llm_response).get("text")
+            if not reply:
+                reply = "No pude generar respuesta. Intenta reformular tu pregunta."
+
+            store_chat_message(chat_session.id, "assistant", reply)
+            maybe_update_summary(chat_session.id)
+            return jsonify({"reply": reply})
+        except Exception as exc:
+            app.logger.exception("Chat error")
+            return jsonify({"error": f"No se pudo procesar la consulta: {exc}"}), 500
+
+    return bp
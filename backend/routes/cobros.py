@@ -0,0 +1,1196 @@
+"""
+cobros.py · Sistema Invagro
+
+Cobranza: facturas a crédito y sus abonos, pagos recibidos, cobros
+personales con su orden PDF, y los recibos PDF de cada abono.
+
+Cómo se usa:
+
+    from routes.cobros import create_blueprint
+
+    app.register_blueprint(create_blueprint(app, helpers))
+
+Los recibos se guardan en RECEIPT_PDF_FOLDER y se sirven por
+`cobros.receipt_file`.
+"""
+
+import os
+from datetime import datetime
+from decimal import Decimal
+
+import urllib.parse
+
+from sqlalchemy import func
+from flask import (
+    Blueprint,
+    abort,
+    redirect,
+    render_template,
+    request,
+    session,
+    url_for,
+)
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import (
+    AbonoCobroPersonal,
+    AbonoFactura,
+    Cliente,
+    CobroPersonalDetalle,
+    CobroPersonal,
+    DetalleFacturaContado,
+    FacturaContado,
+    Producto,
+    User,
+    db,
+)
+from auth_helpers import (
+    admin_required,
+    current_user,
+    current_user_id,
+    current_user_is_vendedor,
+)
+from optimistic import ConflictoConcurrente, retry_on_conflict
+from pdf_layout import build_header_table, stylesheet, table_style
+from request_metrics import timed_section
+
+
+def create_blueprint(app, helpers):
+    bp = Blueprint("cobros", __name__)
+    amount_to_words = helpers.amount_to_words
+    build_invoice_pdf_filename = helpers.build_invoice_pdf_filename
+    build_receipt_pdf_filename = helpers.build_receipt_pdf_filename
+    build_client_name_map = helpers.build_client_name_map
+    build_user_name_map = helpers.build_user_name_map
+    cleanup_old_pdfs = helpers.cleanup_old_pdfs
+    get_active_vendedores = helpers.get_active_vendedores
+    get_business_settings = helpers.get_business_settings
+    get_user_display_name = helpers.get_user_display_name
+
+    def generate_personal_charge_number():
+        return f"CP-{datetime.utcnow():%Y%m%d%H%M%S}"
+
+    def generate_receipt_pdf(settings, factura, cliente, usuario, monto, saldo, abono_id):
+        receipts_folder = app.config.get("RECEIPT_PDF_FOLDER")
+        if not receipts_folder:
+            app.logger.warning("Carpeta de recibos no configurada.")
+            return None
+        recibo_filename = build_receipt_pdf_filename(factura.numero_factura, abono_id)
+        pdf_path = os.path.join(receipts_folder, recibo_filename)
+        create_receipt_pdf(
+            pdf_path,
+            settings,
+            factura,
+            cliente,
+            usuario,
+            monto,
+            saldo,
+        )
+        if os.path.isfile(pdf_path):
+            return recibo_filename
+        app.logger.warning("No se genero el PDF del recibo en %s.", pdf_path)
+        return None
+
+    def cleanup_old_receipts():
+        return
+
+    def get_personal_charge_status_message(status_code):
+        status_map = {
+            "created": ("Cobro personal creado correctamente.", False),
+            "payment_recorded": ("Pago registrado correctamente.", False),
+            "invalid_charge": ("No se encontro el cobro personal solicitado.", True),
+            "invalid_amount": ("El monto indicado no es valido para este cobro.", True),
+            "closed_charge": ("Este cobro ya no admite pagos porque no esta pendiente.", True),
+            "save_error": ("No se pudo guardar el cobro personal.", True),
+            "payment_error": ("No se pudo registrar el pago del cobro personal.", True),
+            "payment_conflict": (
+                "Otro usuario estaba registrando un pago en este cobro. Revisa el saldo e intenta de nuevo.",
+                True,
+            ),
+        }
+        return status_map.get(status_code, (None, False))
+
+    def get_credit_payment_status_message(status_code):
+        status_map = {
+            "payment_conflict": (
+                "Otro usuario estaba registrando un pago en esta factura y no se guardo el cobro. "
+                "Revisa el saldo e intenta de nuevo.",
+                True,
+            ),
+            "payment_error": ("No se pudo registrar el pago de la factura.", True),
+        }
+        return status_map.get(status_code, (None, False))
+
+    def build_default_personal_charge_items():
+        return [{"descripcion": "", "cantidad": "1", "precio_unitario": ""}]
+
+    def parse_personal_charge_items(form_data):
+        descriptions = form_data.getlist("detalle_descripcion")
+        quantities = form_data.getlist("detalle_cantidad")
+        unit_prices = form_data.getlist("detalle_precio_unitario")
+
+        raw_items = []
+        parsed_items = []
+        total = Decimal("0")
+        max_len = max(len(descriptions), len(quantities), len(unit_prices), 1)
+
+        for index in range(max_len):
+            descripcion = (descriptions[index] if index < len(descriptions) else "").strip()
+            cantidad_raw = (quantities[index] if index < len(quantities) else "").strip()
+            precio_raw = (unit_prices[index] if index < len(unit_prices) else "").strip()
+
+            raw_items.append(
+                {
+                    "descripcion": descripcion,
+                    "cantidad": cantidad_raw or "1",
+                    "precio_unitario": precio_raw,
+                }
+            )
+
+            if not descripcion and not cantidad_raw and not precio_raw:
+                continue
+            if not descripcion:
+                raise ValueError("Cada linea debe incluir una descripcion.")
+
+            try:
+                cantidad = Decimal(cantidad_raw or "0")
+                precio_unitario = Decimal(precio_raw or "0")
+            except Exception as exc:
+                raise ValueError("Cantidad y precio deben ser valores numericos.") from exc
+
+            if cantidad <= 0 or precio_unitario < 0:
+                raise ValueError("Cantidad debe ser mayor a cero y precio no puede ser negativo.")
+
+            subtotal = (cantidad * precio_unitario).quantize(Decimal("0.01"))
+            total += subtotal
+            parsed_items.append(
+                {
+                    "descripcion": descripcion,
+                    "cantidad": cantidad.quantize(Decimal("0.01")),
+                    "precio_unitario": precio_unitario.quantize(Decimal("0.01")),
+                    "subtotal": subtotal,
+                }
+            )
+
+        if not parsed_items:
+            raise ValueError("Agrega al menos una linea de producto o servicio.")
+
+        return raw_items or build_default_personal_charge_items(), parsed_items, total.quantize(Decimal("0.01"))
+
+    def build_personal_charges_context(form_values=None, status_code=None, error=None):
+        default_form_values = {
+            "cliente_id": "",
+            "nombre": "",
+            "concepto": "",
+            "telefono": "",
+            "fecha_vencimiento": "",
+            "total": "",
+            "observaciones": "",
+            "detalle_items": build_default_personal_charge_items(),
+        }
+        if form_values:
+            default_form_values.update(form_values)
+
+        message, is_error = get_personal_charge_status_message(status_code)
+        if error:
+            message = error
+            is_error = True
+
+        # Vendedor solo ve SUS cobros; admin/contador ven todos
+        es_vendedor_filtro = current_user_is_vendedor()
+        uid_filtro = current_user_id() if es_vendedor_filtro else None
+
+        try:
+            # Solo el cliente ya elegido (al volver con un error); el resto se
+            # busca desde el selector con /buscar/clientes.
+            cliente_seleccionado = None
+            if str(default_form_values.get("cliente_id") or "").isdigit():
+                cliente_seleccionado = db.session.get(Cliente, int(default_form_values["cliente_id"]))
+            pending_q = (
+                db.session.query(CobroPersonal, User)
+                .outerjoin(User, CobroPersonal.usuario_id == User.id)
+                .filter(CobroPersonal.estado == "pendiente")
+            )
+            if es_vendedor_filtro:
+                pending_q = pending_q.filter(CobroPersonal.usuario_id == uid_filtro)
+            pending_rows = pending_q.order_by(
+                CobroPersonal.fecha.desc(),
+                CobroPersonal.id.desc(),
+            ).all()
+
+            payment_q = (
+                db.session.query(AbonoCobroPersonal, CobroPersonal, User)
+                .join(CobroPersonal, AbonoCobroPersonal.cobro_id == CobroPersonal.id)
+                .outerjoin(User, AbonoCobroPersonal.usuario_id == User.id)
+            )
+            if es_vendedor_filtro:
+                payment_q = payment_q.filter(CobroPersonal.usuario_id == uid_filtro)
+            payment_rows = payment_q.order_by(AbonoCobroPersonal.fecha.desc()).all()
+
+            count_q = CobroPersonal.query.filter_by(estado="pendiente")
+            if es_vendedor_filtro:
+                count_q = count_q.filter(CobroPersonal.usuario_id == uid_filtro)
+            cobros_pendientes_count = count_q.count()
+
+            saldo_q = (
+                db.session.query(func.coalesce(func.sum(CobroPersonal.saldo), 0))
+                .filter(CobroPersonal.estado == "pendiente")
+            )
+            if es_vendedor_filtro:
+                saldo_q = saldo_q.filter(CobroPersonal.usuario_id == uid_filtro)
+            saldo_total = saldo_q.scalar() or 0
+
+            pagados_q = CobroPersonal.query.filter_by(estado="pagado")
+            if es_vendedor_filtro:
+                pagados_q = pagados_q.filter(CobroPersonal.usuario_id == uid_filtro)
+            cobros_pagados_count = pagados_q.count()
+            charges_q = (
+                db.session.query(CobroPersonal, User)
+                .outerjoin(User, CobroPersonal.usuario_id == User.id)
+            )
+            if es_vendedor_filtro:
+                charges_q = charges_q.filter(CobroPersonal.usuario_id == uid_filtro)
+            charge_rows = charges_q.order_by(
+                CobroPersonal.fecha.desc(), CobroPersonal.id.desc()
+            ).all()
+            detail_rows = CobroPersonalDetalle.query.order_by(
+                CobroPersonalDetalle.id.asc()
+            ).all()
+        except SQLAlchemyError:
+            db.session.rollback()
+            pending_rows = []
+            payment_rows = []
+            detail_rows = []
+            cliente_seleccionado = None
+            cobros_pendientes_count = 0
+            saldo_total = 0
+            cobros_pagados_count = 0
+            charge_rows = []
+            if not error:
+                message = "No se pudieron cargar los cobros personales."
+                is_error = True
+
+        detail_map = {}
+        for detail in detail_rows:
+            detail_map.setdefault(detail.cobro_id, []).append(detail)
+
+        pending_charges = []
+        for cobro, usuario in pending_rows:
+            usuario_nombre = (
+                usuario.nombre_completo
+                if usuario and usuario.nombre_completo
+                else (usuario.username if usuario else "N/A")
+            )
+            detail_count = len(detail_map.get(cobro.id, []))
+            pending_charges.append(
+                {
+                    "id": cobro.id,
+                    "numero_cobro": cobro.numero_cobro,
+                    "nombre": cobro.nombre,
+                    "concepto": cobro.concepto,
+                    "telefono": cobro.telefono or "-",
+                    "total": cobro.total or Decimal("0"),
+                    "saldo": cobro.saldo or Decimal("0"),
+                    "fecha_label": (
+                        cobro.fecha.strftime("%d/%m/%Y") if cobro.fecha else "-"
+                    ),
+                    "vencimiento_label": (
+                        cobro.fecha_vencimiento.strftime("%d/%m/%Y")
+                        if cobro.fecha_vencimiento
+                        else "-"
+                    ),
+                    "usuario": usuario_nombre,
+                    "observaciones": (cobro.observaciones or "").strip(),
+                    "detail_count": detail_count,
+                }
+            )
+
+        payment_history = []
+        for abono, cobro, usuario in payment_rows:
+            usuario_nombre = (
+                usuario.nombre_completo
+                if usuario and usuario.nombre_completo
+                else (usuario.username if usuario else "N/A")
+            )
+            payment_history.append(
+                {
+                    "numero_cobro": cobro.numero_cobro,
+                    "nombre": cobro.nombre,
+                    "concepto": cobro.concepto,
+                    "monto": abono.monto or Decimal("0"),
+                    "fecha_label": (
+                        abono.fecha.strftime("%d/%m/%Y %I:%M %p") if abono.fecha else "-"
+                    ),
+                    "usuario": usuario_nombre,
+                    "comentario": (abono.comentario or "").strip(),
+                }
+            )
+
+        charges = []
+        for cobro, usuario in charge_rows:
+            responsable = (
+                usuario.nombre_completo
+                if usuario and usuario.nombre_completo
+                else (usuario.username if usuario else "General")
+            )
+            charges.append(
+                {
+                    "id": cobro.id,
+                    "numero_cobro": cobro.numero_cobro,
+                    "nombre": cobro.nombre,
+                    "concepto": cobro.concepto,
+                    "fecha": cobro.fecha,
+                    "fecha_label": cobro.fecha.strftime("%d/%m/%Y") if cobro.fecha else "-",
+                    "vencimiento_label": (
+                        cobro.fecha_vencimiento.strftime("%d/%m/%Y")
+                        if cobro.fecha_vencimiento else "-"
+                    ),
+                    "total": cobro.total or Decimal("0"),
+                    "saldo": cobro.saldo or Decimal("0"),
+                    "estado": (cobro.estado or "pendiente").upper(),
+                    "responsable": responsable or "General",
+                }
+            )
+
+        return {
+            "form_values": default_form_values,
+            "personal_charge_message": message,
+            "personal_charge_message_error": is_error,
+            "cliente_seleccionado": cliente_seleccionado,
+            "pending_charges": pending_charges,
+            "charges": charges,
+            "payment_history": payment_history,
+            "cobros_pendientes_count": cobros_pendientes_count,
+            "cobros_pagados_count": cobros_pagados_count,
+            "cobros_saldo_total": saldo_total,
+        }
+
+    @timed_section("pdf")
+    def create_personal_charge_order_pdf(file_path, settings, cobro, usuario, details=None):
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table
+
+        parent_dir = os.path.dirname(file_path)
+        if parent_dir and not os.path.isdir(parent_dir):
+            os.makedirs(parent_dir, exist_ok=True)
+        styles = stylesheet()
+        doc = SimpleDocTemplate(
+            file_path,
+            pagesize=letter,
+            leftMargin=28,
+            rightMargin=28,
+            topMargin=26,
+            bottomMargin=26,
+        )
+        story = []
+
+        fecha_emision = cobro.fecha.strftime("%d/%m/%Y %I:%M %p") if cobro.fecha else "-"
+        header_center = (
+            f"<b>{settings.nombre}</b><br/>"
+            f"{settings.direccion or ''}<br/>"
+            f"TEL: {settings.telefono or '-'} &nbsp;&nbsp; EMAIL: {settings.email or '-'}"
+        )
+        header_right = (
+            "<b>ORDEN DE ENTREGA</b><br/>"
+            f"FECHA: {fecha_emision}"
+        )
+        story.append(
+            build_header_table(
+                app.static_folder,
+                header_center,
+                header_right,
+                col_widths=(82, 310, 120),
+                logo_size=62,
+                bottom_padding=8,
+            )
+        )
+        story.append(Spacer(1, 12))
+
+        receptor_data = [
+            ["Entregado a", cobro.nombre or "-"],
+            ["Telefono", cobro.telefono or "-"],
+            [
+                "Vencimiento",
+                cobro.fecha_vencimiento.strftime("%d/%m/%Y")
+                if cobro.fecha_vencimiento
+                else "-",
+            ],
+            [
+                "Preparado por",
+                usuario.nombre_completo if usuario and usuario.nombre_completo else (usuario.username if usuario else "-"),
+            ],
+        ]
+        receptor_table = Table(receptor_data, colWidths=[120, 392])
+        receptor_table.setStyle(table_style("charge_receiver"))
+        story.append(receptor_table)
+        story.append(Spacer(1, 14))
+
+        detail_rows = details or []
+        detalle_data = [["Descripcion", "Cantidad", "Precio unit.", "Subtotal"]]
+        if detail_rows:
+            for detail in detail_rows:
+                detalle_data.append(
+                    [
+                        detail.descripcion,
+                        f"{float(detail.cantidad or 0):,.2f}",
+                        f"L {float(detail.precio_unitario or 0):,.2f}",
+                        f"L {float(detail.subtotal or 0):,.2f}",
+                    ]
+                )
+        else:
+            detalle_data.append(
+                [
+                    cobro.concepto or "-",
+                    "1.00",
+                    f"L {float(cobro.total or 0):,.2f}",
+                    f"L {float(cobro.total or 0):,.2f}",
+                ]
+            )
+
+        detalle_table = Table(detalle_data, colWidths=[270, 72, 85, 85])
+        detalle_table.setStyle(table_style("charge_details"))
+        story.append(detalle_table)
+        story.append(Spacer(1, 12))
+
+        total_en_letras = amount_to_words(cobro.total or 0).upper()
+        story.append(Paragraph(f"<b>Total:</b> L {float(cobro.total or 0):,.2f}", styles["Normal"]))
+        story.append(Spacer(1, 6))
+        story.append(Paragraph(f"<b>Total en letras:</b> {total_en_letras}", styles["Normal"]))
+        story.append(Spacer(1, 10))
+
+        if cobro.observaciones:
+            story.append(Paragraph("<b>Observaciones:</b>", styles["Normal"]))
+            story.append(Spacer(1, 4))
+            story.append(Paragraph(cobro.observaciones, styles["Normal"]))
+            story.append(Spacer(1, 16))
+
+        story.append(Paragraph("Documento interno de entrega. No sustituye una factura fiscal.", styles["Normal"]))
+        story.append(Spacer(1, 34))
+
+        firmas = Table(
+            [["______________________________", "______________________________"], ["Entrega Invagro", "Recibe conforme"]],
+            colWidths=[256, 256],
+        )
+        firmas.setStyle(table_style("signatures"))
+        story.append(firmas)
+
+        doc.build(story)
+
+    @timed_section("pdf")
+    def create_receipt_pdf(file_path, settings, factura, cliente, usuario, monto, saldo):
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table
+
+        parent_dir = os.path.dirname(file_path)
+        if parent_dir and not os.path.isdir(parent_dir):
+            os.makedirs(parent_dir, exist_ok=True)
+        styles = stylesheet()
+        doc = SimpleDocTemplate(
+            file_path,
+            pagesize=letter,
+            leftMargin=22,
+            rightMargin=22,
+            topMargin=22,
+            bottomMargin=22,
+        )
+        story = []
+
+        header_title = Paragraph("<b>RECIBO DE COBRO</b>", styles["Title"])
+        story.append(header_title)
+        story.append(Spacer(1, 6))
+
+        negocio = settings.nombre if settings and settings.nombre else "Negocio"
+        story.append(Paragraph(f"{negocio}", styles["Normal"]))
+        if settings:
+            if settings.rtn:
+                story.append(Paragraph(f"RTN: {settings.rtn}", styles["Normal"]))
+            if settings.telefono:
+                story.append(Paragraph(f"Telefono: {settings.telefono}", styles["Normal"]))
+            if settings.email:
+                story.append(Paragraph(f"Email: {settings.email}", styles["Normal"]))
+        story.append(Spacer(1, 8))
+
+        cliente_nombre = cliente.nombre if cliente else "N/A"
+        story.append(Paragraph(f"Cliente: {cliente_nombre}", styles["Normal"]))
+        if cliente and cliente.ruc_dni:
+            story.append(Paragraph(f"Documento: {cliente.ruc_dni}", styles["Normal"]))
+        fecha_factura = factura.fecha.strftime("%d/%m/%Y") if factura.fecha else "-"
+        story.append(Paragraph(f"Factura: {factura.numero_factura}", styles["Normal"]))
+        story.append(Paragraph(f"Fecha factura: {fecha_factura}", styles["Normal"]))
+        story.append(Paragraph(f"Fecha pago: {datetime.utcnow().strftime('%d/%m/%Y %H:%M')}", styles["Normal"]))
+        if usuario:
+            nombre_usuario = usuario.nombre_completo or usuario.username
+            story.append(Paragraph(f"Cobrador: {nombre_usuario}", styles["Normal"]))
+
+        story.append(Spacer(1, 10))
+        data = [
+            ["Total factura", f"L {float(factura.total or 0):,.2f}"],
+            ["Monto pagado", f"L {float(monto):,.2f}"],
+            ["Saldo restante", f"L {float(saldo):,.2f}"],
+        ]
+        table = Table(data, colWidths=[180, 130])
+        table.setStyle(table_style("receipt_amounts"))
+        story.append(table)
+        story.append(Spacer(1, 12))
+        story.append(Paragraph("Gracias por su pago.", styles["Normal"]))
+
+        doc.build(story)
+
+    @bp.get("/cobros-personales/<int:cobro_id>/detalle")
+    def cobro_personal_detalle(cobro_id):
+        if not session.get("user"):
+            return redirect(url_for("login"))
+        cobro = CobroPersonal.query.get_or_404(cobro_id)
+        if current_user_is_vendedor() and cobro.usuario_id != current_user_id():
+            abort(403)
+        cliente = Cliente.query.get(cobro.cliente_id) if cobro.cliente_id else None
+        responsable = User.query.get(cobro.usuario_id) if cobro.usuario_id else None
+        detalles = (
+            CobroPersonalDetalle.query.filter_by(cobro_id=cobro.id)
+            .order_by(CobroPersonalDetalle.id.asc()).all()
+        )
+        total_detalles = sum(
+            (detalle.subtotal or Decimal("0") for detalle in detalles), Decimal("0")
+        )
+        items = []
+        unidades = Decimal("0")
+        for detalle in detalles:
+            cantidad = detalle.cantidad or Decimal("0")
+            subtotal = detalle.subtotal or Decimal("0")
+            unidades += cantidad
+            items.append(
+                {
+                    "descripcion": detalle.descripcion,
+                    "cantidad": cantidad,
+                    "precio_unitario": detalle.precio_unitario or Decimal("0"),
+                    "subtotal": subtotal,
+                    "participacion": (
+                        float(subtotal / total_detalles * 100)
+                        if total_detalles > 0 else 0
+                    ),
+                }
+            )
+        items_analisis = sorted(
+            items, key=lambda item: item["subtotal"], reverse=True
+        )[:6]
+        abonos_db = (
+            AbonoCobroPersonal.query.filter_by(cobro_id=cobro.id)
+            .order_by(AbonoCobroPersonal.fecha.asc(), AbonoCobroPersonal.id.asc()).all()
+        )
+        usuarios_map = build_user_name_map(
+            [abono.usuario_id for abono in abonos_db if abono.usuario_id]
+        )
+        abonos = [
+            {
+                "fecha": abono.fecha,
+                "monto": abono.monto or Decimal("0"),
+                "comentario": (abono.comentario or "").strip(),
+                "usuario": usuarios_map.get(abono.usuario_id, "General") or "General",
+            }
+            for abono in abonos_db
+        ]
+        total = cobro.total or Decimal("0")
+        saldo = max(Decimal("0"), cobro.saldo or Decimal("0"))
+        pagado = max(Decimal("0"), total - saldo)
+        porcentaje_pagado = float(pagado / total * 100) if total > 0 else 0
+        dias_vencido = 0
+        if cobro.fecha_vencimiento and saldo > 0:
+            dias_vencido = max(0, (datetime.utcnow().date() - cobro.fecha_vencimiento).days)
+        responsable_nombre = (
+            (responsable.nombre_completo or responsable.username)
+            if responsable else "General"
+        ) or "General"
+        return render_template(
+            "cobro_personal_detalle.html", user=session["user"], cobro=cobro,
+            cliente=cliente, responsable=responsable_nombre, items=items,
+            items_analisis=items_analisis, unidades=unidades, abonos=abonos,
+            total=total, saldo=saldo, pagado=pagado,
+            porcentaje_pagado=porcentaje_pagado, dias_vencido=dias_vencido,
+            status_code=(request.args.get("status") or "").strip().lower(),
+        )
+
+    @bp.get("/facturas/credito")
+    @admin_required
+    def facturas_credito():
+        try:
+            facturas_raw = FacturaContado.query.filter_by(estado="credito").order_by(
+                FacturaContado.fecha.desc()
+            ).all()
+        except SQLAlchemyError:
+            db.session.rollback()
+            facturas_raw = []
+        detalles_por_factura = {}
+        productos_detalle_map = {}
+        if facturas_raw:
+            try:
+                factura_ids = [factura.id for factura in facturas_raw]
+                detalles_raw = (
+                    DetalleFacturaContado.query
+                    .filter(DetalleFacturaContado.factura_id.in_(factura_ids))
+                    .order_by(DetalleFacturaContado.id.asc())
+                    .all()
+                )
+                producto_ids = list(
+                    {detalle.producto_id for detalle in detalles_raw if detalle.producto_id}
+                )
+                if producto_ids:
+                    productos_detalle_map = {
+                        producto.id: producto
+                        for producto in Producto.query.filter(Producto.id.in_(producto_ids)).all()
+                    }
+                for detalle in detalles_raw:
+                    detalles_por_factura.setdefault(detalle.factura_id, []).append(detalle)
+            except SQLAlchemyError:
+                db.session.rollback()
+                detalles_por_factura = {}
+                productos_detalle_map = {}
+        vendedores_map = build_user_name_map(
+            [factura.usuario_id for factura in facturas_raw if factura.usuario_id]
+        )
+        vendedores = get_active_vendedores()
+        facturas = []
+        for factura in facturas_raw:
+            fecha_label = factura.fecha.strftime("%d/%m/%Y") if factura.fecha else "-"
+            abonado = factura.pago or Decimal("0")
+            saldo = (factura.total or Decimal("0")) - abonado
+            items = []
+            for detalle in detalles_por_factura.get(factura.id, []):
+                producto = productos_detalle_map.get(detalle.producto_id)
+                items.append(
+                    {
+                        "codigo": producto.codigo if producto else "-",
+                        "nombre": producto.nombre if producto else "Producto no disponible",
+                        "cantidad": detalle.cantidad or 0,
+                        "precio_unitario": detalle.precio_unitario or Decimal("0"),
+                        "descuento": detalle.descuento or Decimal("0"),
+                        "subtotal": detalle.subtotal or Decimal("0"),
+                    }
+                )
+            facturas.append(
+                {
+                    "id": factura.id,
+                    "numero_factura": factura.numero_factura,
+                    "cliente_id": factura.cliente_id,
+                    "fecha": factura.fecha,
+                    "fecha_label": fecha_label,
+                    "total": factura.total,
+                    "abonado": abonado,
+                    "saldo": saldo,
+                    "estado_label": "credito",
+                    "pdf_filename": factura.pdf_filename,
+                    "vendedor": vendedores_map.get(factura.usuario_id, "General"),
+                    "vendedor_id": factura.usuario_id,
+                    "subtotal": factura.subtotal or Decimal("0"),
+                    "descuento": factura.descuento or Decimal("0"),
+                    "isv": factura.isv or Decimal("0"),
+                    "items": items,
+                }
+            )
+        clientes_map = build_client_name_map([factura["cliente_id"] for factura in facturas])
+        status_message, status_error = get_credit_payment_status_message(request.args.get("status"))
+        recibo_filename = request.args.get("recibo")
+        recibo_url = None
+        whatsapp_url = None
+        if recibo_filename:
+            recibo_url = url_for("receipt_file", filename=recibo_filename)
+            full_link = request.url_root.rstrip("/") + recibo_url
+            whatsapp_url = (
+                "https://wa.me/?text="
+                + urllib.parse.quote(f"Recibo de cobro: {full_link}")
+            )
+        return render_template(
+            "facturas_credito.html",
+            user=session["user"],
+            facturas=facturas,
+            clientes_map=clientes_map,
+            vendedores=vendedores,
+            recibo_url=recibo_url,
+            whatsapp_url=whatsapp_url,
+            status_message=status_message,
+            status_error=status_error,
+        )
+
+    @bp.get("/pagos")
+    @admin_required
+    def pagos():
+        try:
+            pagos_raw = (
+                db.session.query(AbonoFactura, FacturaContado, Cliente, User)
+                .outerjoin(FacturaContado, AbonoFactura.factura_id == FacturaContado.id)
+                .outerjoin(Cliente, FacturaContado.cliente_id == Cliente.id)
+                .outerjoin(User, AbonoFactura.usuario_id == User.id)
+                .order_by(AbonoFactura.fecha.desc())
+                .all()
+            )
+        except SQLAlchemyError:
+            db.session.rollback()
+            pagos_raw = []
+
+        vendedores_map = build_user_name_map(
+            [
+                factura.usuario_id
+                for _, factura, _, _ in pagos_raw
+                if factura and factura.usuario_id
+            ]
+        )
+        pagos_view = []
+        for abono, factura, cliente, usuario in pagos_raw:
+            fecha = abono.fecha if abono else None
+            fecha_label = fecha.strftime("%d/%m/%Y") if fecha else "-"
+            fecha_iso = fecha.strftime("%Y-%m-%d") if fecha else ""
+            numero_factura = factura.numero_factura if factura else "-"
+            cliente_nombre = cliente.nombre if cliente else "N/A"
+            usuario_nombre = get_user_display_name(usuario, fallback="N/A")
+            saldo = Decimal("0")
+            if factura:
+                saldo = (factura.total or Decimal("0")) - (factura.pago or Decimal("0"))
+            recibo_filename = None
+            recibo_url = None
+            receipts_folder = app.config.get("RECEIPT_PDF_FOLDER")
+            if factura and abono and receipts_folder:
+                recibo_filename = build_receipt_pdf_filename(
+                    factura.numero_factura, abono.id
+                )
+                recibo_path = os.path.join(receipts_folder, recibo_filename)
+                if os.path.isfile(recibo_path):
+                    recibo_url = url_for("receipt_file", filename=recibo_filename)
+            pagos_view.append(
+                {
+                    "fecha_label": fecha_label,
+                    "fecha_iso": fecha_iso,
+                    "numero_factura": numero_factura,
+                    "cliente": cliente_nombre,
+                    "monto": abono.monto if abono else Decimal("0"),
+                    "saldo": saldo,
+                    "usuario": usuario_nombre,
+                    "vendedor": (
+                        vendedores_map.get(factura.usuario_id, "General")
+                        if factura
+                        else "General"
+                    ),
+                    "recibo_url": recibo_url,
+                }
+            )
+
+        return render_template(
+            "pagos.html",
+            user=session["user"],
+            pagos=pagos_view,
+        )
+
+    @bp.route("/cobros-personales", methods=["GET", "POST"])
+    def cobros_personales():
+        if not session.get("user"):
+            return redirect(url_for("login"))
+
+        if request.method == "POST":
+            detail_descriptions = request.form.getlist("detalle_descripcion")
+            detail_quantities = request.form.getlist("detalle_cantidad")
+            detail_unit_prices = request.form.getlist("detalle_precio_unitario")
+            detail_items = []
+            detail_count = max(
+                len(detail_descriptions),
+                len(detail_quantities),
+                len(detail_unit_prices),
+                1,
+            )
+            for index in range(detail_count):
+                detail_items.append(
+                    {
+                        "descripcion": (
+                            detail_descriptions[index] if index < len(detail_descriptions) else ""
+                        ).strip(),
+                        "cantidad": (
+                            detail_quantities[index] if index < len(detail_quantities) else ""
+                        ).strip()
+                        or "1",
+                        "precio_unitario": (
+                            detail_unit_prices[index] if index < len(detail_unit_prices) else ""
+                        ).strip(),
+                    }
+                )
+
+            form_values = {
+                "cliente_id": (request.form.get("cliente_id") or "").strip(),
+                "nombre": (request.form.get("nombre") or "").strip(),
+                "concepto": (request.form.get("concepto") or "").strip(),
+                "telefono": (request.form.get("telefono") or "").strip(),
+                "fecha_vencimiento": (request.form.get("fecha_vencimiento") or "").strip(),
+                "total": (request.form.get("total") or "").strip(),
+                "observaciones": (request.form.get("observaciones") or "").strip(),
+                "detalle_items": detail_items,
+            }
+            try:
+                raw_items, parsed_items, total = parse_personal_charge_items(request.form)
+                form_values["detalle_items"] = raw_items
+                form_values["total"] = f"{total:.2f}"
+            except ValueError as exc:
+                return render_template(
+                    "cobros_personales.html",
+                    user=session["user"],
+                    **build_personal_charges_context(
+                        form_values=form_values,
+                        error=str(exc),
+                    ),
+                )
+
+            selected_cliente = None
+            cliente_id = None
+            if form_values["cliente_id"]:
+                try:
+                    cliente_id = int(form_values["cliente_id"])
+                except ValueError:
+                    return render_template(
+                        "cobros_personales.html",
+                        user=session["user"],
+                        **build_personal_charges_context(
+                            form_values=form_values,
+                            error="Selecciona un cliente valido.",
+                        ),
+                    )
+                selected_cliente = Cliente.query.get(cliente_id)
+                if not selected_cliente:
+                    return render_template(
+                        "cobros_personales.html",
+                        user=session["user"],
+                        **build_personal_charges_context(
+                            form_values=form_values,
+                            error="No se encontro el cliente seleccionado.",
+                        ),
+                    )
+                form_values["nombre"] = selected_cliente.nombre
+                if selected_cliente.telefono:
+                    form_values["telefono"] = selected_cliente.telefono
+
+            if not form_values["nombre"] or not form_values["total"]:
+                return render_template(
+                    "cobros_personales.html",
+                    user=session["user"],
+                    **build_personal_charges_context(
+                        form_values=form_values,
+                        error="Completa el nombre y al menos una linea del cobro.",
+                    ),
+                )
+
+            if total <= 0:
+                return render_template(
+                    "cobros_personales.html",
+                    user=session["user"],
+                    **build_personal_charges_context(
+                        form_values=form_values,
+                        error="El monto total del cobro debe ser mayor a cero.",
+                    ),
+                )
+
+            fecha_vencimiento = None
+            if form_values["fecha_vencimiento"]:
+                try:
+                    fecha_vencimiento = datetime.strptime(
+                        form_values["fecha_vencimiento"], "%Y-%m-%d"
+                    ).date()
+                except ValueError:
+                    return render_template(
+                        "cobros_personales.html",
+                        user=session["user"],
+                        **build_personal_charges_context(
+                            form_values=form_values,
+                            error="La fecha de vencimiento no es valida.",
+                        ),
+                    )
+
+            try:
+                usuario = current_user()
+                concepto_resumen = form_values["concepto"] or parsed_items[0]["descripcion"]
+                cobro = CobroPersonal(
+                    numero_cobro=generate_personal_charge_number(),
+                    cliente_id=cliente_id,
+                    nombre=form_values["nombre"],
+                    concepto=concepto_resumen,
+                    telefono=form_values["telefono"] or None,
+                    fecha=datetime.utcnow(),
+                    fecha_vencimiento=fecha_vencimiento,
+                    total=total,
+                    saldo=total,
+                    observaciones=form_values["observaciones"] or None,
+                    usuario_id=usuario.id if usuario else None,
+                    estado="pendiente",
+                )
+                db.session.add(cobro)
+                db.session.flush()
+                for item in parsed_items:
+                    db.session.add(
+                        CobroPersonalDetalle(
+                            cobro_id=cobro.id,
+                            descripcion=item["descripcion"],
+                            cantidad=item["cantidad"],
+                            precio_unitario=item["precio_unitario"],
+                            subtotal=item["subtotal"],
+                        )
+                    )
+                db.session.commit()
+            except SQLAlchemyError:
+                db.session.rollback()
+                return render_template(
+                    "cobros_personales.html",
+                    user=session["user"],
+                    **build_personal_charges_context(
+                        form_values=form_values,
+                        error="No se pudo guardar el cobro personal.",
+                    ),
+                )
+
+            return redirect(url_for("cobros.cobros_personales", status="created"))
+
+        return render_template(
+            "cobros_personales.html",
+            user=session["user"],
+            **build_personal_charges_context(
+                status_code=(request.args.get("status") or "").strip().lower()
+            ),
+        )
+
+    @bp.post("/cobros-personales/<int:cobro_id>/abonos")
+    def registrar_abono_cobro_personal(cobro_id):
+        if not session.get("user"):
+            return redirect(url_for("login"))
+
+        try:
+            monto = Decimal((request.form.get("monto") or "0").strip())
+        except Exception:
+            return redirect(url_for("cobros.cobros_personales", status="invalid_amount"))
+
+        comentario = (request.form.get("comentario") or "").strip() or None
+
+        try:
+            cobro = CobroPersonal.query.get_or_404(cobro_id)
+        except Exception:
+            return redirect(url_for("cobros.cobros_personales", status="invalid_charge"))
+
+        usuario = current_user()
+        usuario_id = usuario.id if usuario else None
+
+        def aplicar_abono():
+            # Se relee en cada intento: otro pago pudo cambiar el saldo o cerrar el cobro.
+            cobro = db.session.get(CobroPersonal, cobro_id)
+            if cobro.estado != "pendiente":
+                return "closed_charge"
+            saldo_actual = cobro.saldo or Decimal("0")
+            if monto <= 0 or monto > saldo_actual:
+                return "invalid_amount"
+            db.session.add(
+                AbonoCobroPersonal(
+                    cobro_id=cobro.id,
+                    usuario_id=usuario_id,
+                    monto=monto,
+                    comentario=comentario,
+                    fecha=datetime.utcnow(),
+                )
+            )
+            cobro.saldo = saldo_actual - monto
+            if cobro.saldo <= 0:
+                cobro.saldo = Decimal("0")
+                cobro.estado = "pagado"
+            return None
+
+        try:
+            rechazo = retry_on_conflict(
+                db.session, aplicar_abono, attempts=app.config["OPTIMISTIC_RETRIES"]
+            )
+        except ConflictoConcurrente:
+            return redirect(url_for("cobros.cobros_personales", status="payment_conflict"))
+        except SQLAlchemyError:
+            db.session.rollback()
+            return redirect(url_for("cobros.cobros_personales", status="payment_error"))
+        if rechazo:
+            return redirect(url_for("cobros.cobros_personales", status=rechazo))
+
+        return redirect(url_for(
+            "cobros.cobro_personal_detalle", cobro_id=cobro.id, status="payment_recorded"
+        ))
+
+    @bp.get("/cobros-personales/<int:cobro_id>/orden")
+    def imprimir_orden_cobro_personal(cobro_id):
+        if not session.get("user"):
+            return redirect(url_for("login"))
+
+        try:
+            cobro = CobroPersonal.query.get_or_404(cobro_id)
+            usuario = User.query.get(cobro.usuario_id) if cobro.usuario_id else None
+            settings = get_business_settings()
+            details = (
+                CobroPersonalDetalle.query.filter_by(cobro_id=cobro.id)
+                .order_by(CobroPersonalDetalle.id.asc())
+                .all()
+            )
+        except SQLAlchemyError:
+            db.session.rollback()
+            return redirect(url_for("cobros.cobros_personales", status="invalid_charge"))
+
+        safe_base = f"orden-entrega-{cobro.id}-{datetime.utcnow():%Y%m%d%H%M%S}"
+        filename = build_invoice_pdf_filename(safe_base)
+        file_path = os.path.join(app.config["REPORT_PDF_FOLDER"], filename)
+        cleanup_old_pdfs(app.config["REPORT_PDF_FOLDER"], prefix="orden-entrega-")
+        create_personal_charge_order_pdf(file_path, settings, cobro, usuario, details)
+        return redirect(url_for("static", filename=f"reports/{filename}"))
+
+    def resolve_cobrador():
+        """Usuario que recibe el pago: el elegido en el formulario o el de la sesión."""
+        cobrador = current_user()
+        cobrador_id_raw = (request.form.get("cobrador_id") or "").strip()
+        if cobrador_id_raw.isdigit():
+            posible_cobrador = User.query.get(int(cobrador_id_raw))
+            if posible_cobrador and posible_cobrador.activo:
+                cobrador = posible_cobrador
+        return cobrador
+
+    @bp.post("/facturas/credito/<int:factura_id>/cobrar")
+    def cobrar_factura_credito(factura_id):
+        if not session.get("user"):
+            return redirect(url_for("login"))
+
+        try:
+            factura = FacturaContado.query.get_or_404(factura_id)
+        except SQLAlchemyError:
+            db.session.rollback()
+            return redirect(url_for("cobros.facturas_credito"))
+        if factura.estado != "credito":
+            return redirect(url_for("cobros.facturas_credito"))
+
+        recibo_filename = None
+        try:
+            cobrador = resolve_cobrador()
+            usuario_id = cobrador.id if cobrador else None
+
+            def cobrar_saldo():
+                factura = db.session.get(FacturaContado, factura_id)
+                if factura.estado != "credito":
+                    return None
+                saldo = (factura.total or Decimal("0")) - (factura.pago or Decimal("0"))
+                abono = None
+                if saldo > 0:
+                    abono = AbonoFactura(
+                        factura_id=factura.id,
+                        usuario_id=usuario_id,
+                        monto=saldo,
+                        fecha=datetime.utcnow(),
+                    )
+                    db.session.add(abono)
+                    db.session.flush()
+                factura.estado = "pagada"
+                factura.pago = factura.total
+                factura.cambio = Decimal("0")
+                return factura, abono, saldo
+
+            cobrado = retry_on_conflict(
+                db.session, cobrar_saldo, attempts=app.config["OPTIMISTIC_RETRIES"]
+            )
+            factura, abono, saldo = cobrado or (None, None, Decimal("0"))
+            if saldo > 0:
+                try:
+                    settings = get_business_settings()
+                    cliente = (
+                        Cliente.query.get(factura.cliente_id)
+                        if factura.cliente_id
+                        else None
+                    )
+                    recibo_filename = generate_receipt_pdf(
+                        settings,
+                        factura,
+                        cliente,
+                        cobrador,
+                        saldo,
+                        Decimal("0"),
+                        abono.id,
+                    )
+                except Exception:
+                    app.logger.exception("No se pudo generar recibo de cobro.")
+        except ConflictoConcurrente:
+            app.logger.warning("Conflicto al cobrar la factura %s; no se registro el cobro.", factura_id)
+            return redirect(url_for("cobros.facturas_credito", status="payment_conflict"))
+        except SQLAlchemyError:
+            db.session.rollback()
+            return redirect(url_for("cobros.facturas_credito", status="payment_error"))
+        if recibo_filename:
+            return redirect(url_for("cobros.facturas_credito", recibo=recibo_filename))
+        return redirect(url_for("cobros.facturas_credito"))
+
+    @bp.post("/facturas/credito/<int:factura_id>/abonos")
+    def registrar_abono_factura(factura_id):
+        if not session.get("user"):
+            return redirect(url_for("login"))
+
+        try:
+            monto_raw = request.form.get("monto", "0").strip()
+            monto = Decimal(monto_raw)
+        except Exception:
+            return redirect(url_for("cobros.facturas_credito"))
+        if monto <= 0:
+            return redirect(url_for("cobros.facturas_credito"))
+
+        factura = FacturaContado.query.get_or_404(factura_id)
+        if factura.estado != "credito":
+            return redirect(url_for("cobros.facturas_credito"))
+
+        recibo_filename = None
+        try:
+            cobrador = resolve_cobrador()
+            usuario_id = cobrador.id if cobrador else None
+
+            def aplicar_abono():
+                # Se relee y se valida en cada intento; el UPDATE exige la versión leída.
+                factura = db.session.get(FacturaContado, factura_id)
+                if factura.estado != "credito":
+                    return None
+                pago_actual = factura.pago or Decimal("0")
+                saldo = (factura.total or Decimal("0")) - pago_actual
+                if monto > saldo:
+                    return None
+                abono = AbonoFactura(
+                    factura_id=factura.id,
+                    usuario_id=usuario_id,
+                    monto=monto,
+                    fecha=datetime.utcnow(),
+                )
+                db.session.add(abono)
+                db.session.flush()
+                factura.pago = pago_actual + monto
+                nuevo_saldo = saldo - monto
+                if nuevo_saldo <= 0:
+                    factura.estado = "pagada"
+                    factura.cambio = Decimal("0")
+                return factura, abono, nuevo_saldo
+
+            aplicado = retry_on_conflict(
+                db.session, aplicar_abono, attempts=app.config["OPTIMISTIC_RETRIES"]
+            )
+            if aplicado:
+                factura, abono, nuevo_saldo = aplicado
+                try:
+                    settings = get_business_settings()
+                    cliente = (
+                        Cliente.query.get(factura.cliente_id)
+                        if factura.cliente_id
+                        else None
+                    )
+                    recibo_filename = generate_receipt_pdf(
+                        settings,
+                        factura,
+                        cliente,
+                        cobrador,
+                        monto,
+                        max(Decimal("0"), nuevo_saldo),
+                        abono.id,
+                    )
+                except Exception:
+                    app.logger.exception("No se pudo generar recibo de abono.")
+        except ConflictoConcurrente:
+            app.logger.warning("Conflicto al abonar a la factura %s; no se registro el abono.", factura_id)
+            return redirect(url_for("cobros.facturas_credito", status="payment_conflict"))
+        except SQLAlchemyError:
+            db.session.rollback()
+            return redirect(url_for("cobros.facturas_credito", status="payment_error"))
+        if recibo_filename:
+            return redirect(url_for("cobros.facturas_credito", recibo=recibo_filename))
+        return redirect(url_for("cobros.facturas_credito"))
+
+    return bp
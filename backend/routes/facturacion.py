@@ -0,0 +1,1658 @@
+"""
+facturacion.py · Sistema Invagro
+
+Ventas: pantalla de facturación, pedidos de vendedores, creación de
+facturas (contado y crédito) con su PDF, historial, detalle y anulación.
+
+Cómo se usa:
+
+    from routes.facturacion import create_blueprint
+
+    app.register_blueprint(create_blueprint(app, helpers))
+
+Endpoints: `facturacion.facturas_historial`, `facturacion.pedidos`, ...
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from uuid import uuid4
+
+import click
+from sqlalchemy import insert, or_, select, update
+from flask import (
+    Blueprint,
+    Response,
+    abort,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    session,
+    stream_with_context,
+    url_for,
+)
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import (
+    AbonoFactura,
+    AjustesNegocio,
+    Categoria,
+    Cliente,
+    DetalleFacturaContado,
+    DetallePedido,
+    FacturaContado,
+    Pedido,
+    Producto,
+    User,
+    db,
+)
+from auth_helpers import (
+    admin_required,
+    current_user,
+    current_user_id,
+    current_user_is_vendedor,
+    current_user_role,
+    login_required,
+)
+from background import BackgroundQueue
+from escpos import render_escpos, render_text
+from file_serving import send_protected_file
+from idempotency import idempotent
+from inventory import (
+    StockInsuficiente,
+    aggregate_items,
+    find_shortages,
+    record_sale,
+    record_sales,
+    revert_sale,
+)
+from pdf_layout import build_header_table, stylesheet, table_style
+from pdf_merge import merged_pdf_chunks
+from request_metrics import timed_section
+
+
+def create_blueprint(app, helpers):
+    bp = Blueprint("facturacion", __name__)
+    amount_to_words = helpers.amount_to_words
+    build_invoice_pdf_filename = helpers.build_invoice_pdf_filename
+    build_receipt_pdf_filename = helpers.build_receipt_pdf_filename
+    build_client_name_map = helpers.build_client_name_map
+    build_user_name_map = helpers.build_user_name_map
+    clean_conflict_artifacts = helpers.clean_conflict_artifacts
+    get_business_settings = helpers.get_business_settings
+    get_user_display_name = helpers.get_user_display_name
+
+    def parse_rango_autorizado_inicio(rango_texto):
+        if not rango_texto:
+            return None
+        matches = list(re.finditer(r"\d+", rango_texto))
+        if not matches:
+            return None
+        start_match = matches[-1]
+        prefix = rango_texto[: start_match.start()]
+        start_raw = start_match.group(0)
+        try:
+            start_num = int(start_raw)
+        except ValueError:
+            return None
+        return {"prefix": prefix, "start_num": start_num, "width": len(start_raw)}
+
+    def generate_invoice_numbers(count):
+        """Bloque de `count` números consecutivos a partir de la última factura.
+
+        Reserva el bloque dentro de la transacción de quien llama: el UPDATE
+        sobre la fila de ajustes la bloquea hasta el commit o rollback, así
+        otra caja u otro lote espera y después lee la factura recién guardada.
+        """
+        settings = get_business_settings()
+        ajustes_table = AjustesNegocio.__table__
+        db.session.execute(
+            update(ajustes_table)
+            .where(ajustes_table.c.id == settings.id)
+            .values(id=ajustes_table.c.id)
+        )
+        rango_inicio = settings.rango_autorizado_inicio or settings.rango_autorizado or ""
+        rango_info = parse_rango_autorizado_inicio(rango_inicio)
+        if not rango_info:
+            base = f"F001-{datetime.utcnow():%Y%m%d%H%M%S}"
+            return [base] + [f"{base}-{index}" for index in range(2, count + 1)]
+
+        # Lectura con bloqueo compartido: en MySQL ve lo último confirmado
+        # aunque la transacción ya haya leído antes (REPEATABLE READ).
+        last_invoice = (
+            FacturaContado.query.order_by(FacturaContado.id.desc())
+            .with_for_update(read=True)
+            .first()
+        )
+        next_num = rango_info["start_num"]
+        if last_invoice and last_invoice.numero_factura:
+            if last_invoice.numero_factura.startswith(rango_info["prefix"]):
+                suffix = last_invoice.numero_factura[len(rango_info["prefix"]):]
+                if suffix.isdigit():
+                    next_num = int(suffix) + 1
+
+        return [
+            f"{rango_info['prefix']}{numero:0{rango_info['width']}d}"
+            for numero in range(next_num, next_num + count)
+        ]
+
+    def generate_invoice_number():
+        return generate_invoice_numbers(1)[0]
+
+    def price_lines(parsed_items, productos_map):
+        """Totales de [(producto_id, cantidad, descuento)] con el precio actual del producto.
+
+        Devuelve (subtotal, isv, descuento_total, total, detalles) con
+        detalles = [(producto, cantidad, precio, linea_neta, descuento_unit)].
+        """
+        subtotal = Decimal("0")
+        isv = Decimal("0")
+        descuento_total = Decimal("0")
+        detalles = []
+        for producto_id, cantidad, descuento in parsed_items:
+            producto = productos_map[producto_id]
+            precio = Decimal(str(producto.precio))
+            linea_bruta = precio * Decimal(cantidad)
+            descuento_unit = min(descuento, precio)
+            descuento_aplicado = descuento_unit * Decimal(cantidad)
+            linea_neta = max(Decimal("0"), (precio - descuento_unit) * Decimal(cantidad))
+            subtotal += linea_bruta
+            descuento_total += descuento_aplicado
+            if producto.isv_aplica:
+                isv += linea_neta * Decimal("0.15")
+            detalles.append((producto, cantidad, precio, linea_neta, descuento_unit))
+
+        total = max(Decimal("0"), subtotal - descuento_total) + isv
+        return subtotal, isv, descuento_total, total, detalles
+
+    def generate_order_number():
+        return f"PED-{datetime.utcnow():%Y%m%d%H%M%S}"
+
+    def rango_autorizado_texto(settings):
+        if settings.rango_autorizado_inicio or settings.rango_autorizado_fin:
+            return f"{settings.rango_autorizado_inicio or '-'} - {settings.rango_autorizado_fin or '-'}"
+        return settings.rango_autorizado or ""
+
+    @timed_section("pdf")
+    def create_invoice_pdf(
+        file_path,
+        settings,
+        invoice,
+        detalles,
+        tipo,
+        cliente,
+        cajero_usuario,
+        vendedor_usuario=None,
+    ):
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import (
+            KeepTogether,
+            Paragraph,
+            SimpleDocTemplate,
+            Spacer,
+            Table,
+        )
+
+        styles = stylesheet()
+        doc = SimpleDocTemplate(
+            file_path,
+            pagesize=letter,
+            leftMargin=22,
+            rightMargin=22,
+            topMargin=22,
+            bottomMargin=22,
+        )
+        story = []
+        usable_height = doc.height
+
+        header_center = (
+            f"<b>{settings.nombre}</b><br/>"
+            f"{settings.direccion or ''}<br/>"
+            f"RTN: {settings.rtn or '-'} &nbsp;&nbsp; TEL: {settings.telefono or '-'}<br/>"
+            f"{settings.email or ''}"
+        )
+        header_right = (
+            f"<b>FACTURA</b><br/>{invoice.numero_factura}<br/>"
+            f"FECHA: {invoice.fecha.strftime('%d/%m/%Y %I:%M %p')}"
+        )
+        header_table = build_header_table(app.static_folder, header_center, header_right)
+        story.append(header_table)
+        story.append(Spacer(1, 6))
+
+        cliente_nombre = cliente.nombre if cliente else "N/A"
+        cliente_telefono = cliente.telefono if cliente else "-"
+        cliente_line = (
+            f"<b>CLIENTE:</b> {cliente_nombre} &nbsp;&nbsp; "
+            f"<b>RTN:</b> {invoice.rtn or '-'} &nbsp;&nbsp; "
+            f"<b>TEL:</b> {cliente_telefono}"
+        )
+        cliente_paragraph = Paragraph(cliente_line, styles["Normal"])
+        story.append(cliente_paragraph)
+        story.append(Spacer(1, 4))
+
+        tipo_texto = "CONTADO" if tipo == "contado" else "CREDITO"
+        cajero = get_user_display_name(cajero_usuario)
+        vendedor = get_user_display_name(vendedor_usuario)
+        estado = invoice.estado.upper() if invoice.estado else "-"
+        meta_line = (
+            f"<b>CAJERO:</b> {cajero} &nbsp;&nbsp; "
+            f"<b>VENDEDOR:</b> {vendedor} &nbsp;&nbsp; "
+            f"<b>TERMINOS:</b> {tipo_texto} &nbsp;&nbsp; "
+            f"<b>ESTADO:</b> {estado}"
+        )
+        meta_paragraph = Paragraph(meta_line, styles["Normal"])
+        story.append(meta_paragraph)
+        story.append(Spacer(1, 6))
+
+        data = [
+            [
+                "CODIGO",
+                "DESCRIPCION",
+                "UNIDAD",
+                "CANTIDAD",
+                "PRECIO UNIT.",
+                "DESCTO",
+                "ISV %",
+                "TOTAL",
+            ]
+        ]
+        exento_total = Decimal("0")
+        gravado_total = Decimal("0")
+        for detalle in detalles:
+            producto = detalle["producto"]
+            isv_text = "15%" if detalle["isv_aplica"] else "0%"
+            if detalle["isv_aplica"]:
+                gravado_total += Decimal(str(detalle["subtotal"]))
+            else:
+                exento_total += Decimal(str(detalle["subtotal"]))
+            descuento_linea = Decimal(str(detalle.get("descuento", 0) or 0))
+            data.append(
+                [
+                    producto.codigo,
+                    producto.nombre,
+                    "UNIDAD",
+                    str(detalle["cantidad"]),
+                    f"L {detalle['precio']:.2f}",
+                    f"L {descuento_linea:.2f}",
+                    isv_text,
+                    f"L {detalle['subtotal']:.2f}",
+                ]
+            )
+        def build_product_table(rows, header_font_size, body_font_size):
+            table_instance = Table(rows, colWidths=[50, 195, 50, 50, 68, 45, 35, 45])
+            table_instance.setStyle(
+                table_style(
+                    "invoice_products",
+                    header_font_size=header_font_size,
+                    body_font_size=body_font_size,
+                )
+            )
+            return table_instance
+
+        isv_total = gravado_total * Decimal("0.15")
+        total_final = Decimal(str(invoice.total or 0))
+        total_en_letras = amount_to_words(total_final).upper()
+        descuento_valor = Decimal(str(getattr(invoice, "descuento", 0) or 0))
+        totals_data = [
+            ["DESCUENTOS Y REBAJAS", f"L {descuento_valor:.2f}"],
+            ["SUBTOTAL", f"L {invoice.subtotal:.2f}"],
+            ["IMPORTE EXENTO", f"L {exento_total:.2f}"],
+            ["IMPORTE EXONERADO", "L 0.00"],
+            ["IMPORTE GRAVADO 15%", f"L {gravado_total:.2f}"],
+            ["ISV 15.00%", f"L {isv_total:.2f}"],
+            ["TOTAL A PAGAR", f"L {total_final:.2f}"],
+        ]
+        totals_table = Table(totals_data, colWidths=[130, 85], hAlign="RIGHT")
+        totals_table.setStyle(table_style("invoice_totals"))
+
+        notes_text = (
+            "<b>DATOS DEL ADQUIRENTE EXONERADO</b><br/>"
+            "N° ORDEN DE COMPRA EXENTA:<br/>"
+            "N° CONST. REGISTRO EXONERADO:<br/>"
+            f"N° REGISTRO SAG:<br/>TOTAL EN LETRAS: {total_en_letras}"
+        )
+        notes_paragraph = Paragraph(notes_text, styles["Normal"])
+        bottom_block = Table(
+            [[notes_paragraph, totals_table]],
+            colWidths=[doc.width - 215, 215],
+        )
+        bottom_block.setStyle(table_style("invoice_bottom"))
+
+        # Calculate heights to stretch the product table and pin footer to the page bottom.
+        header_height = header_table.wrap(doc.width, usable_height)[1]
+        cliente_height = cliente_paragraph.wrap(doc.width, usable_height)[1]
+        meta_height = meta_paragraph.wrap(doc.width, usable_height)[1]
+        bottom_height = bottom_block.wrap(doc.width, usable_height)[1]
+
+        item_count = max(0, len(data) - 1)
+        if item_count > 18:
+            header_font_size = 7
+            body_font_size = 8
+        elif item_count > 12:
+            header_font_size = 8
+            body_font_size = 9
+        else:
+            header_font_size = 8
+            body_font_size = 9
+
+        # Las celdas son texto de una línea: todas las filas miden lo mismo, así
+        # que basta medir el encabezado y una fila en lugar de toda la tabla.
+        probe = build_product_table(data[:2], header_font_size, body_font_size)
+        probe.wrap(doc.width, usable_height)
+        header_row_height = probe._rowHeights[0]
+        row_height = probe._rowHeights[1] if len(probe._rowHeights) > 1 else 18
+        base_table_height = header_row_height + row_height * item_count
+        reserved_spacing = 6 + 4 + 6  # spacers after header, cliente y meta
+        extra_bottom_space = 142  # ~5 cm to leave room for legal/footer lines
+        target_table_height = max(
+            0,
+            usable_height
+            - (header_height + cliente_height + meta_height + bottom_height + reserved_spacing)
+            - extra_bottom_space,
+        )
+        if base_table_height < target_table_height and row_height:
+            extra_rows = int((target_table_height - base_table_height) / row_height)
+            if extra_rows > 0:
+                data.extend([["", "", "", "", "", "", "", ""]] * extra_rows)
+        product_table = build_product_table(data, header_font_size, body_font_size)
+
+        story.append(product_table)
+        story.append(Spacer(1, 4))
+        story.append(KeepTogether([bottom_block]))
+        story.append(Spacer(1, 4))
+
+        footer_blocks = []
+        if settings.mensaje:
+            footer_blocks.append(Paragraph(settings.mensaje, styles["Normal"]))
+        rango_texto = rango_autorizado_texto(settings)
+        if settings.cai or rango_texto or settings.fecha_limite_emision:
+            footer_text = (
+                f"CAI: {settings.cai or '-'}<br/>"
+                f"RANGO AUTORIZADO: {rango_texto or '-'}<br/>"
+                f"FECHA LIMITE DE EMISION: {settings.fecha_limite_emision or '-'}"
+            )
+            footer_blocks.append(Paragraph(footer_text, styles["Normal"]))
+        if footer_blocks:
+            story.append(KeepTogether(footer_blocks))
+        doc.build(story)
+
+    def write_invoice_pdf(factura, detalles, cliente, cajero, vendedor):
+        """Genera el PDF de `factura` y guarda su nombre. `detalles` como en price_lines."""
+        detalles_pdf = [
+            {
+                "producto": producto,
+                "cantidad": cantidad,
+                "precio": float(precio),
+                "subtotal": float(linea),
+                "descuento": float(descuento_unit),
+                "isv_aplica": producto.isv_aplica,
+            }
+            for producto, cantidad, precio, linea, descuento_unit in detalles
+        ]
+        pdf_filename = build_invoice_pdf_filename(factura.numero_factura, token=uuid4().hex[:6])
+        create_invoice_pdf(
+            invoice_pdf_path(pdf_filename),
+            get_business_settings(),
+            factura,
+            detalles_pdf,
+            "contado" if factura.estado == "contado" else "credito",
+            cliente,
+            cajero,
+            vendedor,
+        )
+        factura.pdf_filename = pdf_filename
+        try:
+            db.session.commit()
+        except SQLAlchemyError:
+            # Otro proceso guardó su PDF primero (versión de la factura): este sobra.
+            db.session.rollback()
+            os.remove(invoice_pdf_path(pdf_filename))
+            raise
+        return pdf_filename
+
+    def invoice_pdf_path(pdf_filename):
+        return os.path.join(app.config["INVOICE_PDF_FOLDER"], pdf_filename)
+
+    def render_invoice_pdf(factura_id, cajero_id=None, force=False):
+        """Genera el PDF de una factura guardada si aún no tiene (o si `force`)."""
+        factura = db.session.get(FacturaContado, factura_id)
+        if not factura:
+            return None
+        if factura.pdf_filename and not force and os.path.exists(invoice_pdf_path(factura.pdf_filename)):
+            return None
+        rows = (
+            db.session.query(DetalleFacturaContado, Producto)
+            .join(Producto, Producto.id == DetalleFacturaContado.producto_id)
+            .filter(DetalleFacturaContado.factura_id == factura.id)
+            .order_by(DetalleFacturaContado.id)
+            .all()
+        )
+        detalles = [
+            (
+                producto,
+                int(detalle.cantidad),
+                Decimal(str(detalle.precio_unitario)),
+                Decimal(str(detalle.subtotal)),
+                Decimal(str(detalle.descuento or 0)),
+            )
+            for detalle, producto in rows
+        ]
+        cliente = db.session.get(Cliente, factura.cliente_id) if factura.cliente_id else None
+        cajero = db.session.get(User, cajero_id) if cajero_id else None
+        vendedor = db.session.get(User, factura.usuario_id) if factura.usuario_id else None
+        return write_invoice_pdf(factura, detalles, cliente, cajero, vendedor)
+
+    def load_tickets(factura_ids, cajero_id=None):
+        """Datos de escpos.receipt_lines para cada factura, en el orden de `factura_ids`.
+
+        Una consulta por tabla para todo el lote (facturas, detalle con
+        producto, clientes, usuarios), no una por factura.
+        """
+        if not factura_ids:
+            return []
+        facturas = {
+            factura.id: factura
+            for factura in FacturaContado.query.filter(FacturaContado.id.in_(factura_ids)).all()
+        }
+        lineas = {}
+        # Columnas sueltas, sin armar objetos del ORM para cada línea.
+        rows = (
+            db.session.query(
+                DetalleFacturaContado.factura_id,
+                DetalleFacturaContado.cantidad,
+                DetalleFacturaContado.precio_unitario,
+                DetalleFacturaContado.descuento,
+                DetalleFacturaContado.subtotal,
+                DetalleFacturaContado.isv_aplica,
+                Producto.nombre,
+            )
+            .outerjoin(Producto, Producto.id == DetalleFacturaContado.producto_id)
+            .filter(DetalleFacturaContado.factura_id.in_(facturas))
+            .order_by(DetalleFacturaContado.factura_id, DetalleFacturaContado.id)
+            .all()
+        )
+        for factura_id, cantidad, precio, descuento, subtotal, isv_aplica, producto_nombre in rows:
+            lineas.setdefault(factura_id, []).append(
+                {
+                    "descripcion": producto_nombre or "Producto no disponible",
+                    "cantidad": int(cantidad or 0),
+                    "precio": precio,
+                    "descuento": descuento,
+                    "subtotal": subtotal,
+                    "isv_aplica": bool(isv_aplica),
+                }
+            )
+        cliente_ids = {factura.cliente_id for factura in facturas.values() if factura.cliente_id}
+        clientes = {
+            cliente.id: cliente
+            for cliente in Cliente.query.filter(Cliente.id.in_(cliente_ids)).all()
+        } if cliente_ids else {}
+        user_ids = {factura.usuario_id for factura in facturas.values() if factura.usuario_id}
+        if cajero_id:
+            user_ids.add(cajero_id)
+        usuarios = {
+            usuario.id: usuario for usuario in User.query.filter(User.id.in_(user_ids)).all()
+        } if user_ids else {}
+
+        settings = get_business_settings()
+        negocio = {
+            "nombre": settings.nombre,
+            "direccion": settings.direccion,
+            "rtn": settings.rtn,
+            "telefono": settings.telefono,
+            "email": settings.email,
+            "cai": settings.cai,
+            "rango": rango_autorizado_texto(settings),
+            "fecha_limite": settings.fecha_limite_emision,
+            "mensaje": settings.mensaje,
+        }
+        cajero = get_user_display_name(usuarios.get(cajero_id))
+        tickets = []
+        for factura_id in factura_ids:
+            factura = facturas.get(factura_id)
+            if not factura:
+                continue
+            cliente = clientes.get(factura.cliente_id)
+            tickets.append(
+                {
+                    "negocio": negocio,
+                    "numero": factura.numero_factura,
+                    "fecha": factura.fecha,
+                    "tipo": "contado" if factura.estado == "contado" else "credito",
+                    "estado": factura.estado,
+                    "cliente": cliente.nombre if cliente else "N/A",
+                    "rtn": factura.rtn,
+                    "cajero": cajero,
+                    "vendedor": get_user_display_name(usuarios.get(factura.usuario_id)),
+                    "lineas": lineas.get(factura_id, []),
+                    "descuento": factura.descuento,
+                    "subtotal": factura.subtotal,
+                    "total": factura.total,
+                    "pago": factura.pago,
+                    "cambio": factura.cambio,
+                    "total_en_letras": amount_to_words(factura.total).upper(),
+                }
+            )
+        return tickets
+
+    # Los PDF de una facturación por lote se generan fuera de la petición.
+    pdf_jobs = BackgroundQueue(app, "invoice-pdf")
+
+    # Descargas de /facturas/<id>/pdf servidas del disco vs. generadas en ese momento.
+    pdf_cache_stats = {"hits": 0, "renders": 0}
+    pdf_cache_lock = threading.Lock()
+
+    def invoice_pdf_token(factura_id, cajero_id, expira):
+        """Firma del enlace que se comparte por WhatsApp (el cliente no inicia sesión).
+
+        `expira` (segundos Unix) va dentro de la firma: el enlace deja de
+        servir pasado INVOICE_LINK_TTL_HOURS y no se puede alargar a mano.
+        """
+        key = app.secret_key.encode() if isinstance(app.secret_key, str) else app.secret_key
+        message = f"factura-pdf:{factura_id}:{cajero_id or ''}:{expira}".encode()
+        return hmac.new(key, message, hashlib.sha256).hexdigest()[:32]
+
+    def invoice_pdf_url(factura_id, cajero_id=None, **kwargs):
+        expira = int(time.time()) + app.config["INVOICE_LINK_TTL_HOURS"] * 3600
+        return url_for(
+            "facturacion.factura_pdf",
+            factura_id=factura_id,
+            cajero=cajero_id or None,
+            exp=expira,
+            t=invoice_pdf_token(factura_id, cajero_id, expira),
+            **kwargs,
+        )
+
+    def valid_invoice_pdf_token(factura_id, cajero_id, expira, token):
+        if not token or not expira or expira < time.time():
+            return False
+        return hmac.compare_digest(token, invoice_pdf_token(factura_id, cajero_id, expira))
+
+    @bp.cli.command("render-pdfs")
+    @click.option("--limit", default=500, show_default=True, help="Facturas por ejecucion.")
+    def render_pending_pdfs(limit):
+        """Genera los PDF de facturas que quedaron sin archivo (cola perdida o fallida)."""
+        pendientes = [
+            factura_id
+            for (factura_id,) in db.session.query(FacturaContado.id)
+            .filter(FacturaContado.pdf_filename.is_(None), FacturaContado.estado != "anulada")
+            .order_by(FacturaContado.id)
+            .limit(limit)
+            .all()
+        ]
+        generados = 0
+        for factura_id in pendientes:
+            try:
+                if render_invoice_pdf(factura_id):
+                    generados += 1
+            except Exception as exc:
+                db.session.rollback()
+                click.echo(f"Factura {factura_id}: {exc}", err=True)
+        click.echo(f"PDF generados: {generados} de {len(pendientes)} pendientes.")
+
+    @bp.get("/facturacion")
+    @login_required
+    def facturacion():
+        # Vendedor accede para CAPTURAR pedidos; los botones de facturar
+        # se ocultan en el template mediante role-vendedor CSS. Los clientes
+        # se buscan desde el selector (/buscar/clientes), no van en la página.
+        categorias_list = Categoria.query.filter_by(activo=True).order_by(
+            Categoria.nombre.asc()
+        ).all()
+        productos_list = Producto.query.filter_by(activo=True).order_by(Producto.nombre.asc()).all()
+        pedidos_query = Pedido.query.filter(Pedido.estado.in_(("pendiente", "listo")))
+        if current_user_is_vendedor():
+            pedidos_query = pedidos_query.filter(Pedido.usuario_id == current_user_id())
+        pedidos_listos = pedidos_query.order_by(Pedido.fecha.desc()).all()
+        clientes_map = build_client_name_map([pedido.cliente_id for pedido in pedidos_listos])
+        return render_template(
+            "facturacion.html",
+            user=session["user"],
+            clientes_map=clientes_map,
+            categorias=categorias_list,
+            productos=productos_list,
+            pedidos_listos=pedidos_listos,
+        )
+
+    @bp.get("/pedidos")
+    @login_required
+    def pedidos():
+        # Vendedor solo ve SUS pedidos; admin/contador ven todos
+        base_query = Pedido.query.filter(
+            or_(Pedido.estado.is_(None), Pedido.estado != "facturado")
+        )
+        if current_user_is_vendedor():
+            base_query = base_query.filter(Pedido.usuario_id == current_user_id())
+
+        pedidos_list = base_query.order_by(Pedido.fecha.desc()).all()
+        clientes_map = build_client_name_map([pedido.cliente_id for pedido in pedidos_list])
+        pedidos_view = []
+        vendedores_map = build_user_name_map(
+            [pedido.usuario_id for pedido in pedidos_list if pedido.usuario_id]
+        )
+        for pedido in pedidos_list:
+            fecha_label = pedido.fecha.strftime("%d/%m/%Y") if pedido.fecha else "-"
+            estado_label = (pedido.estado or "-").replace("_", " ").upper()
+            pedidos_view.append(
+                {
+                    "id": pedido.id,
+                    "numero_pedido": pedido.numero_pedido,
+                    "cliente_id": pedido.cliente_id,
+                    "fecha_label": fecha_label,
+                    "total": pedido.total or Decimal("0"),
+                    "estado": pedido.estado or "-",
+                    "estado_label": estado_label,
+                    "vendedor": vendedores_map.get(pedido.usuario_id, "General"),
+                }
+            )
+        return render_template(
+            "pedidos.html",
+            user=session["user"],
+            pedidos=pedidos_view,
+            clientes_map=clientes_map,
+        )
+
+    @bp.post("/pedidos")
+    @idempotent("pedidos")
+    def crear_pedido():
+        if not session.get("user"):
+            return jsonify({"error": "No autorizado."}), 401
+
+        data = request.get_json(silent=True) or {}
+        cliente_id = data.get("cliente_id") or None
+        rtn = (data.get("rtn") or "").strip() or None
+        fecha_raw = (data.get("fecha") or "").strip()
+        items = data.get("items") or []
+        pedido_id = data.get("pedido_id")
+
+        if not items:
+            return jsonify({"error": "No hay productos en el pedido."}), 400
+
+        if fecha_raw:
+            try:
+                fecha_pedido = datetime.strptime(fecha_raw, "%Y-%m-%d")
+            except ValueError:
+                return jsonify({"error": "Fecha invalida."}), 400
+        else:
+            fecha_pedido = datetime.utcnow()
+
+        producto_ids = []
+        parsed_items = []
+        for item in items:
+            try:
+                producto_id = int(item.get("producto_id"))
+                cantidad = int(item.get("cantidad"))
+                descuento = Decimal(str(item.get("descuento", 0) or 0))
+            except (TypeError, ValueError):
+                return jsonify({"error": "Producto o cantidad invalida."}), 400
+            if cantidad <= 0:
+                return jsonify({"error": "Cantidad invalida."}), 400
+            if descuento < 0:
+                return jsonify({"error": "Descuento invalido."}), 400
+            producto_ids.append(producto_id)
+            parsed_items.append((producto_id, cantidad, descuento))
+
+        productos = Producto.query.filter(Producto.id.in_(producto_ids)).all()
+        productos_map = {producto.id: producto for producto in productos}
+        if len(productos_map) != len(set(producto_ids)):
+            return jsonify({"error": "Producto no encontrado."}), 400
+
+        subtotal, isv, descuento_total, total, detalles = price_lines(parsed_items, productos_map)
+
+        # El pedido no reserva stock (se descuenta al facturarlo), pero avisa
+        # al vendedor si ya no alcanza.
+        if app.config["INVENTORY_ENFORCE_STOCK"]:
+            cantidades = aggregate_items((producto_id, cantidad) for producto_id, cantidad, _ in parsed_items)
+            faltantes = find_shortages(db.session, cantidades)
+            if faltantes:
+                return jsonify({"error": str(StockInsuficiente(faltantes))}), 409
+
+        usuario = current_user()
+        usuario_id = usuario.id if usuario else None
+
+        # Guardar de nuevo un pedido abierto lo actualiza en lugar de duplicarlo.
+        pedido = None
+        if pedido_id:
+            try:
+                pedido = db.session.get(Pedido, int(pedido_id))
+            except (TypeError, ValueError):
+                return jsonify({"error": "Pedido invalido."}), 400
+            if not pedido:
+                return jsonify({"error": "Pedido no encontrado."}), 404
+            if not _pedido_pertenece_al_usuario(pedido):
+                return jsonify({"error": "No autorizado."}), 403
+            if pedido.estado in {"facturado", "anulado"}:
+                return jsonify({"error": "El pedido ya fue facturado o anulado."}), 409
+
+        try:
+            if pedido:
+                numero_pedido = pedido.numero_pedido
+                pedido.cliente_id = cliente_id
+                pedido.rtn = rtn
+                pedido.fecha = fecha_pedido
+                pedido.subtotal = subtotal
+                pedido.isv = isv
+                pedido.descuento = descuento_total
+                pedido.total = total
+                pedido.estado = "pendiente"
+                DetallePedido.query.filter_by(pedido_id=pedido.id).delete(synchronize_session=False)
+            else:
+                numero_pedido = generate_order_number()
+                pedido = Pedido(
+                    numero_pedido=numero_pedido,
+                    cliente_id=cliente_id,
+                    usuario_id=usuario_id,
+                    rtn=rtn,
+                    fecha=fecha_pedido,
+                    subtotal=subtotal,
+                    isv=isv,
+                    descuento=descuento_total,
+                    total=total,
+                    estado="pendiente",
+                )
+                db.session.add(pedido)
+                db.session.flush()
+            for producto, cantidad, precio, linea, descuento_unit in detalles:
+                db.session.add(
+                    DetallePedido(
+                        pedido_id=pedido.id,
+                        producto_id=producto.id,
+                        cantidad=cantidad,
+                        precio_unitario=precio,
+                        subtotal=linea,
+                        descuento=descuento_unit,
+                        isv_aplica=producto.isv_aplica,
+                    )
+                )
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            return jsonify({"error": "No se pudo guardar el pedido."}), 500
+
+        return jsonify({"pedido_id": pedido.id, "numero_pedido": numero_pedido})
+
+    @bp.get("/pedidos/<int:pedido_id>/data")
+    def obtener_pedido(pedido_id):
+        if not session.get("user"):
+            return jsonify({"error": "No autorizado."}), 401
+
+        pedido = Pedido.query.get_or_404(pedido_id)
+        if not _pedido_pertenece_al_usuario(pedido):
+            abort(403)
+        detalles = (
+            DetallePedido.query.filter_by(pedido_id=pedido.id)
+            .order_by(DetallePedido.id.asc())
+            .all()
+        )
+        items = [
+            {
+                "producto_id": detalle.producto_id,
+                "cantidad": int(detalle.cantidad),
+                "descuento": float(detalle.descuento or 0),
+            }
+            for detalle in detalles
+        ]
+        return jsonify(
+            {
+                "pedido_id": pedido.id,
+                "numero_pedido": pedido.numero_pedido,
+                "cliente_id": pedido.cliente_id,
+                "cliente_nombre": build_client_name_map([pedido.cliente_id]).get(pedido.cliente_id, ""),
+                "rtn": pedido.rtn or "",
+                "items": items,
+            }
+        )
+
+    def _pedido_pertenece_al_usuario(pedido):
+        """Vendedor solo puede actuar sobre SUS pedidos; admin/contador sobre todos."""
+        if current_user_is_vendedor():
+            return pedido.usuario_id == current_user_id()
+        return True
+
+    @bp.post("/pedidos/<int:pedido_id>/listo")
+    @login_required
+    def marcar_pedido_listo(pedido_id):
+        pedido = Pedido.query.get_or_404(pedido_id)
+        if not _pedido_pertenece_al_usuario(pedido):
+            abort(403)
+        if pedido.estado not in {"facturado", "anulado"}:
+            pedido.estado = "listo"
+            try:
+                db.session.commit()
+            except SQLAlchemyError:
+                db.session.rollback()
+        return redirect(url_for("facturacion.pedidos"))
+
+    @bp.post("/pedidos/<int:pedido_id>/anular")
+    @login_required
+    def anular_pedido(pedido_id):
+        pedido = Pedido.query.get_or_404(pedido_id)
+        if not _pedido_pertenece_al_usuario(pedido):
+            abort(403)
+        pedido.estado = "anulado"
+        try:
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+        return redirect(url_for("facturacion.pedidos"))
+
+    @bp.post("/pedidos/<int:pedido_id>/delete")
+    @login_required
+    def eliminar_pedido(pedido_id):
+        pedido = Pedido.query.get_or_404(pedido_id)
+        if not _pedido_pertenece_al_usuario(pedido):
+            abort(403)
+        if pedido.estado == "facturado":
+            return redirect(url_for("facturacion.pedidos"))
+        try:
+            db.session.delete(pedido)
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+        return redirect(url_for("facturacion.pedidos"))
+
+    @bp.get("/facturas/historial")
+    @admin_required
+    def facturas_historial():
+        try:
+            facturas_contado = FacturaContado.query.order_by(
+                FacturaContado.fecha.desc()
+            ).all()
+        except SQLAlchemyError:
+            db.session.rollback()
+            facturas_contado = []
+        detalles_historial_map = {}
+        productos_historial_map = {}
+        if facturas_contado:
+            try:
+                factura_ids = [factura.id for factura in facturas_contado]
+                detalles_historial = (
+                    DetalleFacturaContado.query
+                    .filter(DetalleFacturaContado.factura_id.in_(factura_ids))
+                    .order_by(DetalleFacturaContado.id.asc())
+                    .all()
+                )
+                producto_ids = list(
+                    {
+                        detalle.producto_id
+                        for detalle in detalles_historial
+                        if detalle.producto_id
+                    }
+                )
+                if producto_ids:
+                    productos_historial_map = {
+                        producto.id: producto
+                        for producto in Producto.query.filter(
+                            Producto.id.in_(producto_ids)
+                        ).all()
+                    }
+                for detalle in detalles_historial:
+                    detalles_historial_map.setdefault(
+                        detalle.factura_id, []
+                    ).append(detalle)
+            except SQLAlchemyError:
+                db.session.rollback()
+                detalles_historial_map = {}
+                productos_historial_map = {}
+        vendedores_map = build_user_name_map(
+            [factura.usuario_id for factura in facturas_contado if factura.usuario_id]
+        )
+        facturas = []
+        clientes_map = {
+            cliente_id: clean_conflict_artifacts(nombre, fallback="Cliente sin nombre")
+            for cliente_id, nombre in build_client_name_map(
+                [factura.cliente_id for factura in facturas_contado]
+            ).items()
+        }
+        for factura in facturas_contado:
+            fecha_label = factura.fecha.strftime("%d/%m/%Y") if factura.fecha else "-"
+            total = factura.total or Decimal("0")
+            pagado_raw = factura.pago or Decimal("0")
+            abonado = min(total, pagado_raw)
+            saldo = max(Decimal("0"), total - abonado)
+            items = []
+            for detalle in detalles_historial_map.get(factura.id, []):
+                producto = productos_historial_map.get(detalle.producto_id)
+                items.append(
+                    {
+                        "codigo": producto.codigo if producto else "-",
+                        "nombre": producto.nombre if producto else "Producto no disponible",
+                        "cantidad": detalle.cantidad or 0,
+                        "precio_unitario": detalle.precio_unitario or Decimal("0"),
+                        "descuento": detalle.descuento or Decimal("0"),
+                        "subtotal": detalle.subtotal or Decimal("0"),
+                    }
+                )
+            if factura.estado == "credito":
+                estado_label = "credito"
+            elif factura.estado == "pagada":
+                estado_label = "pagada"
+            elif factura.estado == "anulada":
+                estado_label = "anulada"
+            else:
+                estado_label = "contado"
+            facturas.append(
+                {
+                    "id": factura.id,
+                    "tipo": "credito" if estado_label == "credito" else "contado",
+                    "numero_factura": clean_conflict_artifacts(
+                        factura.numero_factura, fallback="Sin numero"
+                    ),
+                    "cliente_id": factura.cliente_id,
+                    "cliente": clientes_map.get(factura.cliente_id, "Cliente no disponible"),
+                    "fecha": factura.fecha,
+                    "fecha_label": fecha_label,
+                    "subtotal": factura.subtotal or Decimal("0"),
+                    "descuento": factura.descuento or Decimal("0"),
+                    "isv": factura.isv or Decimal("0"),
+                    "total": total,
+                    "abonado": abonado,
+                    "saldo": saldo,
+                    "items": items,
+                    "estado_label": clean_conflict_artifacts(
+                        estado_label.upper(), fallback="SIN ESTADO"
+                    ),
+                    "pdf_filename": factura.pdf_filename,
+                    "vendedor": clean_conflict_artifacts(
+                        vendedores_map.get(factura.usuario_id, "General"),
+                        fallback="General",
+                    ),
+                }
+            )
+        facturas.sort(
+            key=lambda item: item.get("fecha") or datetime.min,
+            reverse=True,
+        )
+        return render_template(
+            "facturas_historial.html",
+            user=session["user"],
+            facturas=facturas,
+        )
+
+    def print_batch_rows(*columns):
+        """Facturas a imprimir según `ids` (coma) o `desde`/`hasta` de la petición.
+
+        Devuelve (filas con id y `columns`, nombre de archivo, error); error
+        es la respuesta JSON lista para devolver, o None.
+        """
+        ids_raw = ",".join(request.args.getlist("ids"))
+        query = db.session.query(FacturaContado.id, *columns)
+        if ids_raw:
+            try:
+                factura_ids = {int(value) for value in ids_raw.split(",") if value.strip()}
+            except ValueError:
+                return None, None, (jsonify({"error": "Factura invalida."}), 400)
+            query = query.filter(FacturaContado.id.in_(factura_ids))
+            nombre = "facturas-seleccion"
+        else:
+            try:
+                desde = datetime.strptime(request.args.get("desde") or f"{datetime.now():%Y-%m-%d}", "%Y-%m-%d")
+                hasta = datetime.strptime(request.args.get("hasta") or f"{desde:%Y-%m-%d}", "%Y-%m-%d")
+            except ValueError:
+                return None, None, (jsonify({"error": "Fecha invalida."}), 400)
+            query = query.filter(
+                FacturaContado.fecha >= desde,
+                FacturaContado.fecha < hasta + timedelta(days=1),
+                FacturaContado.estado != "anulada",
+            )
+            nombre = f"facturas-{desde:%Y%m%d}-{hasta:%Y%m%d}"
+
+        limite = app.config["PRINT_BATCH_MAX"]
+        rows = query.order_by(FacturaContado.fecha, FacturaContado.id).limit(limite + 1).all()
+        if not rows:
+            return None, None, (jsonify({"error": "No hay facturas para imprimir."}), 404)
+        if len(rows) > limite:
+            return None, None, (
+                jsonify({"error": f"Maximo {limite} facturas por impresion; reduce el rango."}),
+                400,
+            )
+        return rows, nombre, None
+
+    def ticket_response(tickets, nombre):
+        """Tickets en ESC/POS (archivo de cola) o en texto, según `formato`."""
+        columns = request.args.get("columnas", type=int) or app.config["TICKET_COLUMNS"]
+        columns = min(max(columns, 24), 64)
+        if (request.args.get("formato") or "escpos").lower() == "txt":
+            body = "".join(render_text(ticket, columns) for ticket in tickets)
+            mimetype, extension = "text/plain", "txt"
+        else:
+            body = b"".join(render_escpos(ticket, columns) for ticket in tickets)
+            mimetype, extension = "application/octet-stream", "bin"
+        response = app.response_class(body, mimetype=mimetype)
+        response.headers.set("Content-Disposition", "attachment", filename=f"{nombre}.{extension}")
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+    @bp.get("/facturas/lote.pdf")
+    @admin_required
+    def imprimir_lote_facturas():
+        """Facturas de un rango de fechas (o las `ids` elegidas) en un solo PDF.
+
+        Los PDF ya generados se copian sin volver a dibujarlos; solo se
+        generan los que faltan. La respuesta sale por partes, factura por
+        factura.
+        """
+        rows, nombre, error = print_batch_rows(FacturaContado.pdf_filename)
+        if error:
+            return error
+
+        cajero_id = current_user_id()
+        factura_por_ruta = {}
+
+        def archivos():
+            for factura_id, pdf_filename in rows:
+                if not pdf_filename or not os.path.exists(invoice_pdf_path(pdf_filename)):
+                    try:
+                        pdf_filename = render_invoice_pdf(factura_id, cajero_id, force=True)
+                    except Exception:
+                        # La respuesta ya empezó: se omite esa factura en lugar de cortar el PDF.
+                        db.session.rollback()
+                        app.logger.exception("No se pudo generar el PDF de la factura %s.", factura_id)
+                        continue
+                ruta = invoice_pdf_path(pdf_filename)
+                factura_por_ruta[ruta] = factura_id
+                yield ruta
+
+        def regenerar(ruta):
+            app.logger.warning("PDF %s no se pudo copiar; se genera de nuevo.", ruta)
+            factura_id = factura_por_ruta[ruta]
+            try:
+                return invoice_pdf_path(render_invoice_pdf(factura_id, cajero_id, force=True))
+            except Exception:
+                # Igual que en archivos(): se omite la factura en lugar de cortar el PDF.
+                db.session.rollback()
+                app.logger.exception("No se pudo generar el PDF de la factura %s.", factura_id)
+                return None
+
+        return Response(
+            stream_with_context(merged_pdf_chunks(archivos(), fallback=regenerar)),
+            mimetype="application/pdf",
+            headers={
+                "Content-Disposition": f'inline; filename="{nombre}.pdf"',
+                "Cache-Control": "no-store",
+                "X-Accel-Buffering": "no",
+            },
+        )
+
+    @bp.get("/facturas/<int:factura_id>/pdf")
+    def factura_pdf(factura_id):
+        """PDF de la factura: se genera la primera vez que alguien lo abre.
+
+        Acceso con sesión de admin o con el enlace firmado y vigente que
+        devuelve `crear_factura` (el que se manda al cliente). Las siguientes
+        descargas leen el archivo guardado.
+        """
+        cajero_id = request.args.get("cajero", type=int)
+        firmado = valid_invoice_pdf_token(
+            factura_id, cajero_id, request.args.get("exp", type=int), request.args.get("t") or ""
+        )
+        if not firmado:
+            if not session.get("user"):
+                return redirect(url_for("login"))
+            if current_user_role() != "admin":
+                abort(403)
+            cajero_id = current_user_id()
+
+        factura = db.session.get(FacturaContado, factura_id)
+        if not factura:
+            abort(404)
+        pdf_filename = factura.pdf_filename
+        cache = "hit"
+        if not pdf_filename or not os.path.exists(invoice_pdf_path(pdf_filename)):
+            cache = "render"
+            try:
+                pdf_filename = render_invoice_pdf(factura_id, cajero_id, force=True)
+            except SQLAlchemyError:
+                # Otra descarga simultánea ganó: se usa su archivo.
+                db.session.rollback()
+                db.session.expire_all()
+                factura = db.session.get(FacturaContado, factura_id)
+                pdf_filename = factura.pdf_filename if factura else None
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("No se pudo generar el PDF de la factura %s.", factura_id)
+                pdf_filename = None
+            if not pdf_filename or not os.path.exists(invoice_pdf_path(pdf_filename)):
+                return jsonify({"error": "No se pudo generar el PDF."}), 500
+
+        with pdf_cache_lock:
+            pdf_cache_stats["hits" if cache == "hit" else "renders"] += 1
+            stats = dict(pdf_cache_stats)
+        app.logger.info(
+            "invoice_pdf %s",
+            json.dumps({"factura_id": factura_id, "cache": cache, **stats}),
+        )
+        response = send_protected_file(
+            app.config["INVOICE_PDF_FOLDER"],
+            pdf_filename,
+            "invoices",
+            mimetype="application/pdf",
+            download_name=f"{factura.numero_factura}.pdf",
+        )
+        response.headers["X-PDF-Cache"] = cache
+        response.cache_control.private = True
+        return response
+
+    @bp.get("/facturas/tickets")
+    @admin_required
+    def imprimir_lote_tickets():
+        """Mismas facturas que /facturas/lote.pdf, como tickets térmicos seguidos.
+
+        Con formato=escpos (por defecto) el archivo se manda tal cual a la
+        impresora y cada ticket termina con su corte.
+        """
+        rows, nombre, error = print_batch_rows()
+        if error:
+            return error
+        tickets = load_tickets([row.id for row in rows], current_user_id())
+        return ticket_response(tickets, nombre.replace("facturas-", "tickets-", 1))
+
+    @bp.get("/facturas/<int:factura_id>/ticket")
+    @admin_required
+    def factura_ticket(factura_id):
+        """Ticket térmico de la factura: formato=escpos (por defecto) o txt."""
+        tickets = load_tickets([factura_id], current_user_id())
+        if not tickets:
+            abort(404)
+        return ticket_response(tickets, tickets[0]["numero"])
+
+    @bp.get("/facturas/<int:factura_id>/detalle")
+    @admin_required
+    def factura_detalle(factura_id):
+        factura = FacturaContado.query.get_or_404(factura_id)
+        cliente = Cliente.query.get(factura.cliente_id) if factura.cliente_id else None
+        vendedor = User.query.get(factura.usuario_id) if factura.usuario_id else None
+        detalles = (
+            DetalleFacturaContado.query
+            .filter_by(factura_id=factura.id)
+            .order_by(DetalleFacturaContado.id.asc())
+            .all()
+        )
+        producto_ids = [detalle.producto_id for detalle in detalles if detalle.producto_id]
+        productos = {
+            producto.id: producto
+            for producto in Producto.query.filter(Producto.id.in_(producto_ids)).all()
+        } if producto_ids else {}
+
+        items = []
+        unidades = 0
+        total_productos = Decimal("0")
+        for detalle in detalles:
+            producto = productos.get(detalle.producto_id)
+            subtotal_linea = detalle.subtotal or Decimal("0")
+            cantidad = detalle.cantidad or 0
+            unidades += cantidad
+            total_productos += subtotal_linea
+            items.append(
+                {
+                    "codigo": producto.codigo if producto else "-",
+                    "nombre": producto.nombre if producto else "Producto no disponible",
+                    "cantidad": cantidad,
+                    "precio_unitario": detalle.precio_unitario or Decimal("0"),
+                    "descuento": detalle.descuento or Decimal("0"),
+                    "subtotal": subtotal_linea,
+                    "participacion": 0,
+                }
+            )
+        for item in items:
+            item["participacion"] = (
+                float(item["subtotal"] / total_productos * 100)
+                if total_productos > 0 else 0
+            )
+        items_analisis = sorted(
+            items, key=lambda item: item["subtotal"], reverse=True
+        )[:6]
+
+        total = factura.total or Decimal("0")
+        pagado = min(total, factura.pago or Decimal("0"))
+        saldo = max(Decimal("0"), total - pagado)
+        porcentaje_pagado = float(pagado / total * 100) if total > 0 else 0
+        estado = (factura.estado or "contado").upper()
+
+        abonos_db = (
+            AbonoFactura.query
+            .filter_by(factura_id=factura.id)
+            .order_by(AbonoFactura.fecha.asc(), AbonoFactura.id.asc())
+            .all()
+        )
+        usuarios_abono = build_user_name_map(
+            [abono.usuario_id for abono in abonos_db if abono.usuario_id]
+        )
+        receipts_folder = app.config.get("RECEIPT_PDF_FOLDER")
+        abonos = []
+        for abono in abonos_db:
+            recibo_filename = build_receipt_pdf_filename(
+                factura.numero_factura, abono.id
+            )
+            recibo_disponible = bool(
+                receipts_folder
+                and os.path.isfile(os.path.join(receipts_folder, recibo_filename))
+            )
+            abonos.append(
+                {
+                    "id": abono.id,
+                    "fecha": abono.fecha,
+                    "monto": abono.monto or Decimal("0"),
+                    "usuario": usuarios_abono.get(abono.usuario_id, "General") or "General",
+                    "recibo_url": url_for(
+                        "receipt_file", filename=recibo_filename
+                    ) if recibo_disponible else None,
+                }
+            )
+
+        vendedor_nombre = (
+            (vendedor.nombre_completo or vendedor.username) if vendedor else "General"
+        ) or "General"
+        return render_template(
+            "factura_detalle.html",
+            user=session["user"],
+            factura=factura,
+            cliente=cliente,
+            vendedor=vendedor_nombre,
+            items=items,
+            items_analisis=items_analisis,
+            unidades=unidades,
+            total=total,
+            pagado=pagado,
+            saldo=saldo,
+            porcentaje_pagado=porcentaje_pagado,
+            estado=estado,
+            abonos=abonos,
+        )
+
+    def delete_factura(factura):
+        """Elimina la factura y su detalle, devolviendo al stock lo que descontó."""
+        revert_sale(db.session, factura.id, current_user_id(), referencia=factura.numero_factura)
+        DetalleFacturaContado.query.filter_by(factura_id=factura.id).delete(
+            synchronize_session=False
+        )
+        db.session.delete(factura)
+
+    @bp.route("/facturas/<path:factura_ref>/delete", methods=["POST", "GET"])
+    def eliminar_factura(factura_ref):
+        if not session.get("user"):
+            return redirect(url_for("login"))
+
+        tipo = (request.form.get("tipo", "") or "").strip().lower()
+        ref = factura_ref.strip()
+        factura_id = None
+        numero_ref = None
+
+        if "/" in ref and not tipo:
+            factura = FacturaContado.query.filter_by(numero_factura=ref).first()
+            if factura:
+                try:
+                    delete_factura(factura)
+                    db.session.commit()
+                except SQLAlchemyError:
+                    db.session.rollback()
+                return redirect(url_for("facturacion.facturas_historial"))
+
+        parts = [part for part in ref.split("/") if part]
+        if len(parts) == 2 and parts[0] in {"contado", "credito"} and parts[1].isdigit():
+            tipo = parts[0]
+            factura_id = int(parts[1])
+        elif ref.isdigit():
+            factura_id = int(ref)
+        elif parts and parts[-1].isdigit():
+            factura_id = int(parts[-1])
+        else:
+            numero_ref = ref
+
+        try:
+            if tipo in {"contado", "credito"} and factura_id is not None:
+                factura = FacturaContado.query.get_or_404(factura_id)
+                delete_factura(factura)
+            elif factura_id is not None:
+                factura = FacturaContado.query.get(factura_id)
+                if not factura:
+                    return redirect(url_for("facturacion.facturas_historial"))
+                delete_factura(factura)
+            else:
+                factura = None
+                if numero_ref:
+                    factura = FacturaContado.query.filter_by(
+                        numero_factura=numero_ref
+                    ).first()
+                    if factura:
+                        delete_factura(factura)
+                    else:
+                        return redirect(url_for("facturacion.facturas_historial"))
+                else:
+                    return redirect(url_for("facturacion.facturas_historial"))
+
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+        return redirect(url_for("facturacion.facturas_historial"))
+
+    @bp.post("/facturas")
+    @idempotent("facturas")
+    def crear_factura():
+        if not session.get("user"):
+            return jsonify({"error": "No autorizado."}), 401
+        if current_user_role() != "admin":
+            return jsonify({"error": "Solo administradores pueden facturar."}), 403
+
+        data = request.get_json(silent=True) or {}
+        tipo = (data.get("tipo") or "").strip().lower()
+        cliente_id = data.get("cliente_id") or None
+        rtn = (data.get("rtn") or "").strip() or None
+        pago_raw = data.get("pago", 0)
+        fecha_raw = (data.get("fecha") or "").strip()
+        items = data.get("items") or []
+        pedido_id = data.get("pedido_id")
+
+        if tipo not in {"contado", "credito"}:
+            return jsonify({"error": "Tipo de factura invalido."}), 400
+        if not items:
+            return jsonify({"error": "No hay productos en la factura."}), 400
+
+        try:
+            pago = Decimal(str(pago_raw))
+        except Exception:
+            return jsonify({"error": "Pago invalido."}), 400
+        if fecha_raw:
+            try:
+                fecha_factura = datetime.strptime(fecha_raw, "%Y-%m-%d")
+            except ValueError:
+                return jsonify({"error": "Fecha invalida."}), 400
+        else:
+            fecha_factura = datetime.utcnow()
+
+        producto_ids = []
+        parsed_items = []
+        for item in items:
+            try:
+                producto_id = int(item.get("producto_id"))
+                cantidad = int(item.get("cantidad"))
+                descuento = Decimal(str(item.get("descuento", 0) or 0))
+            except (TypeError, ValueError):
+                return jsonify({"error": "Producto o cantidad invalida."}), 400
+            if cantidad <= 0:
+                return jsonify({"error": "Cantidad invalida."}), 400
+            if descuento < 0:
+                return jsonify({"error": "Descuento invalido."}), 400
+            producto_ids.append(producto_id)
+            parsed_items.append((producto_id, cantidad, descuento))
+
+        productos = Producto.query.filter(Producto.id.in_(producto_ids)).all()
+        productos_map = {producto.id: producto for producto in productos}
+        if len(productos_map) != len(set(producto_ids)):
+            return jsonify({"error": "Producto no encontrado."}), 400
+
+        subtotal, isv, descuento_total, total, detalles = price_lines(parsed_items, productos_map)
+        if pago < 0:
+            return jsonify({"error": "Pago invalido."}), 400
+        if tipo == "contado" and pago < total:
+            return jsonify({"error": "Pago insuficiente para contado."}), 400
+
+        usuario_id = current_user_id()
+        vendedor_factura_id = usuario_id
+
+        try:
+            numero_factura = generate_invoice_number()
+            pedido = None
+            if pedido_id:
+                try:
+                    pedido_ref = int(pedido_id)
+                except (TypeError, ValueError):
+                    pedido_ref = None
+                if pedido_ref:
+                    pedido = Pedido.query.get(pedido_ref)
+                    if pedido and pedido.usuario_id:
+                        vendedor_factura_id = pedido.usuario_id
+            if tipo == "contado":
+                cambio = pago - total
+                factura = FacturaContado(
+                    numero_factura=numero_factura,
+                    cliente_id=cliente_id,
+                    usuario_id=vendedor_factura_id,
+                    rtn=rtn,
+                    fecha=fecha_factura,
+                    subtotal=subtotal,
+                    isv=isv,
+                    descuento=descuento_total,
+                    total=total,
+                    pago=pago,
+                    cambio=cambio,
+                    estado="contado",
+                )
+                db.session.add(factura)
+                db.session.flush()
+                for producto, cantidad, precio, linea, descuento_unit in detalles:
+                    db.session.add(
+                        DetalleFacturaContado(
+                            factura_id=factura.id,
+                            producto_id=producto.id,
+                            cantidad=cantidad,
+                            precio_unitario=precio,
+                            subtotal=linea,
+                            descuento=descuento_unit,
+                            isv_aplica=producto.isv_aplica,
+                        )
+                    )
+            else:
+                factura = FacturaContado(
+                    numero_factura=numero_factura,
+                    cliente_id=cliente_id,
+                    usuario_id=vendedor_factura_id,
+                    rtn=rtn,
+                    fecha=fecha_factura,
+                    subtotal=subtotal,
+                    isv=isv,
+                    descuento=descuento_total,
+                    total=total,
+                    pago=pago,
+                    cambio=Decimal("0"),
+                    estado="credito",
+                )
+                db.session.add(factura)
+                db.session.flush()
+                for producto, cantidad, precio, linea, descuento_unit in detalles:
+                    db.session.add(
+                        DetalleFacturaContado(
+                            factura_id=factura.id,
+                            producto_id=producto.id,
+                            cantidad=cantidad,
+                            precio_unitario=precio,
+                            subtotal=linea,
+                            descuento=descuento_unit,
+                            isv_aplica=producto.isv_aplica,
+                        )
+                    )
+            if pedido:
+                pedido.estado = "facturado"
+            db.session.flush()
+            # Último paso antes del commit: bloquea las filas de productos lo menos posible.
+            record_sale(
+                db.session,
+                [(producto.id, cantidad) for producto, cantidad, _, _, _ in detalles],
+                factura.id,
+                usuario_id,
+                referencia=numero_factura,
+                enforce=app.config["INVENTORY_ENFORCE_STOCK"],
+            )
+            db.session.commit()
+        except StockInsuficiente as exc:
+            return jsonify({"error": str(exc)}), 409
+        except SQLAlchemyError:
+            db.session.rollback()
+            return jsonify({"error": "No se pudo guardar la factura."}), 500
+
+        # El PDF se genera cuando alguien lo abre (ver factura_pdf), no al cobrar.
+        return jsonify(
+            {
+                "numero_factura": numero_factura,
+                "total": float(total),
+                "tipo": tipo,
+                "pdf_url": invoice_pdf_url(factura.id, usuario_id),
+            }
+        )
+
+    @bp.post("/pedidos/facturar")
+    @idempotent("pedidos-facturar")
+    def facturar_pedidos():
+        """Factura varios pedidos `listo` en una sola transacción; los PDF van a la cola."""
+        if not session.get("user"):
+            return jsonify({"error": "No autorizado."}), 401
+        if current_user_role() != "admin":
+            return jsonify({"error": "Solo administradores pueden facturar."}), 403
+
+        data = request.get_json(silent=True) or {}
+        tipo = (data.get("tipo") or "").strip().lower()
+        if tipo not in {"contado", "credito"}:
+            return jsonify({"error": "Tipo de factura invalido."}), 400
+        try:
+            pedido_ids = sorted({int(value) for value in data.get("pedido_ids") or []})
+        except (TypeError, ValueError):
+            return jsonify({"error": "Pedido invalido."}), 400
+        if not pedido_ids:
+            return jsonify({"error": "No hay pedidos seleccionados."}), 400
+        limite = app.config["BATCH_INVOICE_MAX"]
+        if len(pedido_ids) > limite:
+            return jsonify({"error": f"Maximo {limite} pedidos por lote."}), 400
+
+        pedidos = Pedido.query.filter(Pedido.id.in_(pedido_ids)).order_by(Pedido.id).all()
+        if len(pedidos) != len(pedido_ids):
+            return jsonify({"error": "Pedido no encontrado."}), 404
+        no_listos = [pedido.numero_pedido for pedido in pedidos if pedido.estado != "listo"]
+        if no_listos:
+            return jsonify({"error": f"Pedidos no listos para facturar: {', '.join(no_listos)}."}), 409
+
+        items_por_pedido = {pedido.id: [] for pedido in pedidos}
+        for detalle in (
+            DetallePedido.query.filter(DetallePedido.pedido_id.in_(pedido_ids))
+            .order_by(DetallePedido.pedido_id, DetallePedido.id)
+            .all()
+        ):
+            items_por_pedido[detalle.pedido_id].append(
+                (detalle.producto_id, int(detalle.cantidad), Decimal(str(detalle.descuento or 0)))
+            )
+        vacios = [pedido.numero_pedido for pedido in pedidos if not items_por_pedido[pedido.id]]
+        if vacios:
+            return jsonify({"error": f"Pedidos sin productos: {', '.join(vacios)}."}), 409
+
+        producto_ids = {item[0] for items in items_por_pedido.values() for item in items}
+        productos_map = {
+            producto.id: producto
+            for producto in Producto.query.filter(Producto.id.in_(producto_ids)).all()
+        }
+        if len(productos_map) != len(producto_ids):
+            return jsonify({"error": "Producto no encontrado."}), 400
+        precios = {
+            pedido.id: price_lines(items_por_pedido[pedido.id], productos_map) for pedido in pedidos
+        }
+
+        usuario_id = current_user_id()
+        fecha = datetime.utcnow()
+        facturas_table = FacturaContado.__table__
+        pedidos_table = Pedido.__table__
+        try:
+            # Marca los pedidos primero: si otro admin factura el mismo lote a
+            # la vez, uno de los dos encuentra menos filas y no duplica nada.
+            marcados = db.session.execute(
+                update(pedidos_table)
+                .where(pedidos_table.c.id.in_(pedido_ids), pedidos_table.c.estado == "listo")
+                .values(estado="facturado")
+            ).rowcount
+            if marcados != len(pedido_ids):
+                db.session.rollback()
+                return jsonify({"error": "Algunos pedidos ya se estan facturando."}), 409
+
+            numeros = dict(zip(pedido_ids, generate_invoice_numbers(len(pedido_ids))))
+            rows = []
+            for pedido in pedidos:
+                subtotal, isv, descuento_total, total, _ = precios[pedido.id]
+                rows.append(
+                    {
+                        "numero_factura": numeros[pedido.id],
+                        "cliente_id": pedido.cliente_id,
+                        "usuario_id": pedido.usuario_id or usuario_id,
+                        "rtn": pedido.rtn,
+                        "fecha": fecha,
+                        "subtotal": subtotal,
+                        "isv": isv,
+                        "descuento": descuento_total,
+                        "total": total,
+                        "pago": total if tipo == "contado" else Decimal("0"),
+                        "cambio": Decimal("0"),
+                        "estado": tipo,
+                    }
+                )
+            db.session.execute(insert(facturas_table), rows)
+            factura_ids = dict(
+                db.session.execute(
+                    select(facturas_table.c.numero_factura, facturas_table.c.id).where(
+                        facturas_table.c.numero_factura.in_(list(numeros.values()))
+                    )
+                ).all()
+            )
+            db.session.execute(
+                insert(DetalleFacturaContado.__table__),
+                [
+                    {
+                        "factura_id": factura_ids[numeros[pedido.id]],
+                        "producto_id": producto.id,
+                        "cantidad": cantidad,
+                        "precio_unitario": precio,
+                        "subtotal": linea,
+                        "descuento": descuento_unit,
+                        "isv_aplica": producto.isv_aplica,
+                    }
+                    for pedido in pedidos
+                    for producto, cantidad, precio, linea, descuento_unit in precios[pedido.id][4]
+                ],
+            )
+            # Un solo UPDATE de stock para todo el lote, último paso antes del commit.
+            record_sales(
+                db.session,
+                [
+                    (
+                        factura_ids[numeros[pedido.id]],
+                        numeros[pedido.id],
+                        [(producto.id, cantidad) for producto, cantidad, _, _, _ in precios[pedido.id][4]],
+                    )
+                    for pedido in pedidos
+                ],
+                usuario_id,
+                enforce=app.config["INVENTORY_ENFORCE_STOCK"],
+            )
+            db.session.commit()
+        except StockInsuficiente as exc:
+            return jsonify({"error": str(exc)}), 409
+        except SQLAlchemyError:
+            db.session.rollback()
+            app.logger.exception("No se pudo facturar el lote de pedidos.")
+            return jsonify({"error": "No se pudieron guardar las facturas."}), 500
+
+        facturas = []
+        for pedido in pedidos:
+            factura_id = factura_ids[numeros[pedido.id]]
+            pdf_jobs.put(render_invoice_pdf, factura_id, usuario_id)
+            facturas.append(
+                {
+                    "pedido_id": pedido.id,
+                    "numero_pedido": pedido.numero_pedido,
+                    "factura_id": factura_id,
+                    "numero_factura": numeros[pedido.id],
+                    "total": float(precios[pedido.id][3]),
+                }
+            )
+        return jsonify(
+            {
+                "tipo": tipo,
+                "facturas": facturas,
+                "total": float(sum(precios[pedido.id][3] for pedido in pedidos)),
+                "pdf_pendientes": len(facturas),
+            }
+        )
+
+    return bp
@@ -0,0 +1,1045 @@
+"""
+reportes.py · Sistema Invagro
+
+Análisis: reportes de productos más vendidos, compras por cliente y
+productos por cliente (pantalla y PDF), estado de cuenta, comisiones y
+exportaciones CSV/XLSX de facturas, abonos y comisiones.
+
+Cómo se usa:
+
+    from routes.reportes import create_blueprint
+
+    app.register_blueprint(create_blueprint(app, helpers))
+
+Cada worker con este módulo mantiene su propio `ReportResultStore`
+(REPORT_RESULT_MAX_ENTRIES / REPORT_RESULT_TTL). Las exportaciones no
+pasan por ese almacén: se escriben en streaming con `export_stream`.
+"""
+
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func, select
+from flask import (
+    Blueprint,
+    jsonify,
+    render_template,
+    request,
+    session,
+    url_for,
+)
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import (
+    AbonoFactura,
+    Cliente,
+    DetalleFacturaContado,
+    FacturaContado,
+    Producto,
+    User,
+    db,
+)
+from auth_helpers import admin_required, get_user_directory, role_required
+from export_stream import EXPORT_FORMATS, export_response, stream_rows
+from pdf_layout import build_header_table, stylesheet, table_style
+from report_store import ReportResultStore
+from request_metrics import timed_section
+
+
+def create_blueprint(app, helpers):
+    bp = Blueprint("reportes", __name__)
+    build_invoice_pdf_filename = helpers.build_invoice_pdf_filename
+    build_user_name_map = helpers.build_user_name_map
+    cleanup_old_pdfs = helpers.cleanup_old_pdfs
+    get_active_vendedores = helpers.get_active_vendedores
+    get_business_settings = helpers.get_business_settings
+    get_user_display_name = helpers.get_user_display_name
+
+    report_results = ReportResultStore(
+        max_entries=app.config["REPORT_RESULT_MAX_ENTRIES"],
+        ttl_seconds=app.config["REPORT_RESULT_TTL"],
+    )
+
+    @bp.get("/reportes")
+    @admin_required
+    def reportes():
+        # Los selectores de cliente buscan con /buscar/clientes; aquí solo
+        # van los saldos de crédito del estado de cuenta.
+        try:
+            facturas_raw = (
+                FacturaContado.query.filter_by(estado="credito")
+                .order_by(FacturaContado.fecha.desc())
+                .all()
+            )
+            facturas_credito = []
+            for factura in facturas_raw:
+                total = Decimal(str(factura.total or 0))
+                abonado = Decimal(str(factura.pago or 0))
+                saldo = total - abonado
+                if saldo <= 0:
+                    continue
+                facturas_credito.append(
+                    {
+                        "id": factura.id,
+                        "numero_factura": factura.numero_factura,
+                        "cliente_id": factura.cliente_id,
+                        "fecha": factura.fecha.strftime("%d/%m/%Y")
+                        if factura.fecha
+                        else "-",
+                        "total": float(total),
+                        "abonado": float(abonado),
+                        "saldo": float(saldo),
+                    }
+                )
+        except SQLAlchemyError:
+            db.session.rollback()
+            facturas_credito = []
+
+        return render_template(
+            "reportes.html",
+            user=session["user"],
+            facturas_credito=facturas_credito,
+        )
+
+    def parse_report_date_range(start_raw, end_raw):
+        today = datetime.utcnow()
+        if start_raw:
+            start_date = datetime.strptime(start_raw, "%Y-%m-%d")
+        else:
+            start_date = datetime(today.year, today.month, 1)
+        if end_raw:
+            end_date = datetime.strptime(end_raw, "%Y-%m-%d")
+        else:
+            end_date = today
+        if end_date < start_date:
+            raise ValueError("Rango de fechas invalido.")
+        end_exclusive = end_date + timedelta(days=1)
+        return start_date, end_exclusive
+
+    def report_params(cliente_id, start_date, end_exclusive):
+        return (cliente_id, start_date.isoformat(), end_exclusive.isoformat())
+
+    def query_top_productos(start_date, end_exclusive):
+        rows = (
+            db.session.query(
+                Producto.codigo,
+                Producto.nombre,
+                func.sum(DetalleFacturaContado.cantidad).label("cantidad"),
+                func.sum(DetalleFacturaContado.subtotal).label("total"),
+            )
+            .join(
+                DetalleFacturaContado,
+                DetalleFacturaContado.producto_id == Producto.id,
+            )
+            .join(
+                FacturaContado,
+                FacturaContado.id == DetalleFacturaContado.factura_id,
+            )
+            .filter(FacturaContado.estado != "anulada")
+            .filter(FacturaContado.fecha >= start_date)
+            .filter(FacturaContado.fecha < end_exclusive)
+            .group_by(Producto.codigo, Producto.nombre)
+            .order_by(func.sum(DetalleFacturaContado.cantidad).desc())
+            .limit(50)
+            .all()
+        )
+        return [
+            {
+                "codigo": row.codigo,
+                "nombre": row.nombre,
+                "cantidad": int(row.cantidad or 0),
+                "total": float(row.total or 0),
+            }
+            for row in rows
+        ]
+
+    def query_compras_cliente(cliente_id, start_date, end_exclusive):
+        facturas = (
+            FacturaContado.query.filter_by(cliente_id=cliente_id)
+            .filter(FacturaContado.estado != "anulada")
+            .filter(FacturaContado.fecha >= start_date)
+            .filter(FacturaContado.fecha < end_exclusive)
+            .order_by(FacturaContado.fecha.desc())
+            .all()
+        )
+        return [
+            {
+                "numero_factura": factura.numero_factura,
+                "fecha": factura.fecha.strftime("%d/%m/%Y") if factura.fecha else "-",
+                "estado": factura.estado or "-",
+                "total": float(factura.total or 0),
+            }
+            for factura in facturas
+        ]
+
+    @bp.post("/reportes/productos-top")
+    def reportes_productos_top():
+        if not session.get("user"):
+            return jsonify({"error": "No autorizado"}), 401
+
+        data = request.get_json(silent=True) or {}
+        start_raw = (data.get("start_date") or "").strip()
+        end_raw = (data.get("end_date") or "").strip()
+        try:
+            start_date, end_exclusive = parse_report_date_range(start_raw, end_raw)
+        except ValueError:
+            return jsonify({"error": "Rango de fechas invalido."}), 400
+
+        productos = query_top_productos(start_date, end_exclusive)
+        total_vendido = sum(item["total"] for item in productos)
+        result_id = report_results.put(
+            "productos-top",
+            session.get("user"),
+            report_params(None, start_date, end_exclusive),
+            {"productos": productos, "total": total_vendido},
+        )
+        return jsonify({"productos": productos, "total": total_vendido, "result_id": result_id})
+
+    @bp.post("/reportes/productos-top/pdf")
+    def reportes_productos_top_pdf():
+        if not session.get("user"):
+            return jsonify({"error": "No autorizado"}), 401
+
+        data = request.get_json(silent=True) or {}
+        start_raw = (data.get("start_date") or "").strip()
+        end_raw = (data.get("end_date") or "").strip()
+        try:
+            start_date, end_exclusive = parse_report_date_range(start_raw, end_raw)
+        except ValueError:
+            return jsonify({"error": "Rango de fechas invalido."}), 400
+
+        stored = report_results.get(
+            data.get("result_id"),
+            "productos-top",
+            session.get("user"),
+            report_params(None, start_date, end_exclusive),
+        )
+        if stored:
+            productos_data = stored["productos"]
+            total_vendido = stored["total"]
+        else:
+            productos_data = query_top_productos(start_date, end_exclusive)
+            total_vendido = sum(item["total"] for item in productos_data)
+        settings = get_business_settings()
+        safe_base = f"top-productos-{datetime.utcnow():%Y%m%d%H%M%S}"
+        filename = build_invoice_pdf_filename(safe_base)
+        file_path = os.path.join(app.config["REPORT_PDF_FOLDER"], filename)
+        cleanup_old_pdfs(app.config["REPORT_PDF_FOLDER"], prefix="top-productos-")
+        create_top_products_pdf(
+            file_path, settings, productos_data, total_vendido, start_date, end_exclusive
+        )
+        pdf_url = url_for("static", filename=f"reports/{filename}", _external=True)
+        return jsonify({"pdf_url": pdf_url})
+
+    @bp.post("/reportes/compras-cliente")
+    def reportes_compras_cliente():
+        if not session.get("user"):
+            return jsonify({"error": "No autorizado"}), 401
+
+        data = request.get_json(silent=True) or {}
+        cliente_id = data.get("cliente_id")
+        if not cliente_id:
+            return jsonify({"error": "Cliente requerido"}), 400
+        try:
+            cliente_id = int(cliente_id)
+        except (TypeError, ValueError):
+            return jsonify({"error": "Cliente invalido"}), 400
+
+        start_raw = (data.get("start_date") or "").strip()
+        end_raw = (data.get("end_date") or "").strip()
+        try:
+            start_date, end_exclusive = parse_report_date_range(start_raw, end_raw)
+        except ValueError:
+            return jsonify({"error": "Rango de fechas invalido."}), 400
+
+        items = query_compras_cliente(cliente_id, start_date, end_exclusive)
+        total_compras = sum(item["total"] for item in items)
+        result_id = report_results.put(
+            "compras-cliente",
+            session.get("user"),
+            report_params(cliente_id, start_date, end_exclusive),
+            {"facturas": items, "total": total_compras},
+        )
+        return jsonify({"facturas": items, "total": total_compras, "result_id": result_id})
+
+    @bp.post("/reportes/compras-cliente/pdf")
+    def reportes_compras_cliente_pdf():
+        if not session.get("user"):
+            return jsonify({"error": "No autorizado"}), 401
+
+        data = request.get_json(silent=True) or {}
+        cliente_id = data.get("cliente_id")
+        if not cliente_id:
+            return jsonify({"error": "Cliente requerido"}), 400
+        try:
+            cliente_id = int(cliente_id)
+        except (TypeError, ValueError):
+            return jsonify({"error": "Cliente invalido"}), 400
+
+        start_raw = (data.get("start_date") or "").strip()
+        end_raw = (data.get("end_date") or "").strip()
+        try:
+            start_date, end_exclusive = parse_report_date_range(start_raw, end_raw)
+        except ValueError:
+            return jsonify({"error": "Rango de fechas invalido."}), 400
+
+        cliente = Cliente.query.get(cliente_id)
+        if not cliente:
+            return jsonify({"error": "Cliente no encontrado"}), 404
+
+        stored = report_results.get(
+            data.get("result_id"),
+            "compras-cliente",
+            session.get("user"),
+            report_params(cliente_id, start_date, end_exclusive),
+        )
+        if stored:
+            facturas_data = stored["facturas"]
+            total_compras = stored["total"]
+        else:
+            facturas_data = query_compras_cliente(cliente_id, start_date, end_exclusive)
+            total_compras = sum(item["total"] for item in facturas_data)
+        settings = get_business_settings()
+        safe_base = f"compras-cliente-{cliente_id}-{datetime.utcnow():%Y%m%d%H%M%S}"
+        filename = build_invoice_pdf_filename(safe_base)
+        file_path = os.path.join(app.config["REPORT_PDF_FOLDER"], filename)
+        cleanup_old_pdfs(app.config["REPORT_PDF_FOLDER"], prefix="compras-cliente-")
+        create_client_purchases_pdf(
+            file_path,
+            settings,
+            cliente,
+            facturas_data,
+            total_compras,
+            start_date,
+            end_exclusive,
+        )
+        pdf_url = url_for("static", filename=f"reports/{filename}", _external=True)
+        return jsonify({"pdf_url": pdf_url})
+
+    def query_productos_por_cliente(cliente_id, start_date, end_exclusive):
+        rows = (
+            db.session.query(
+                Producto.codigo,
+                Producto.nombre,
+                func.sum(DetalleFacturaContado.cantidad).label("cantidad"),
+                func.sum(DetalleFacturaContado.subtotal).label("total"),
+            )
+            .join(
+                DetalleFacturaContado,
+                DetalleFacturaContado.producto_id == Producto.id,
+            )
+            .join(
+                FacturaContado,
+                FacturaContado.id == DetalleFacturaContado.factura_id,
+            )
+            .filter(FacturaContado.estado != "anulada")
+            .filter(FacturaContado.cliente_id == cliente_id)
+            .filter(FacturaContado.fecha >= start_date)
+            .filter(FacturaContado.fecha < end_exclusive)
+            .group_by(Producto.codigo, Producto.nombre)
+            .order_by(func.sum(DetalleFacturaContado.cantidad).desc())
+            .all()
+        )
+        return [
+            {
+                "codigo": row.codigo,
+                "nombre": row.nombre,
+                "cantidad": int(row.cantidad or 0),
+                "total": float(row.total or 0),
+            }
+            for row in rows
+        ]
+
+    @bp.post("/reportes/productos-cliente")
+    def reportes_productos_cliente():
+        if not session.get("user"):
+            return jsonify({"error": "No autorizado"}), 401
+
+        data = request.get_json(silent=True) or {}
+        cliente_id = data.get("cliente_id")
+        if not cliente_id:
+            return jsonify({"error": "Cliente requerido"}), 400
+        try:
+            cliente_id = int(cliente_id)
+        except (TypeError, ValueError):
+            return jsonify({"error": "Cliente invalido"}), 400
+
+        start_raw = (data.get("start_date") or "").strip()
+        end_raw = (data.get("end_date") or "").strip()
+        try:
+            start_date, end_exclusive = parse_report_date_range(start_raw, end_raw)
+        except ValueError:
+            return jsonify({"error": "Rango de fechas invalido."}), 400
+
+        productos = query_productos_por_cliente(cliente_id, start_date, end_exclusive)
+        total_compras = sum(item["total"] for item in productos)
+        result_id = report_results.put(
+            "productos-cliente",
+            session.get("user"),
+            report_params(cliente_id, start_date, end_exclusive),
+            {"productos": productos, "total": total_compras},
+        )
+        return jsonify({"productos": productos, "total": total_compras, "result_id": result_id})
+
+    @bp.post("/reportes/productos-cliente/pdf")
+    def reportes_productos_cliente_pdf():
+        if not session.get("user"):
+            return jsonify({"error": "No autorizado"}), 401
+
+        data = request.get_json(silent=True) or {}
+        cliente_id = data.get("cliente_id")
+        if not cliente_id:
+            return jsonify({"error": "Cliente requerido"}), 400
+        try:
+            cliente_id = int(cliente_id)
+        except (TypeError, ValueError):
+            return jsonify({"error": "Cliente invalido"}), 400
+
+        start_raw = (data.get("start_date") or "").strip()
+        end_raw = (data.get("end_date") or "").strip()
+        try:
+            start_date, end_exclusive = parse_report_date_range(start_raw, end_raw)
+        except ValueError:
+            return jsonify({"error": "Rango de fechas invalido."}), 400
+
+        cliente = Cliente.query.get(cliente_id)
+        if not cliente:
+            return jsonify({"error": "Cliente no encontrado"}), 404
+
+        stored = report_results.get(
+            data.get("result_id"),
+            "productos-cliente",
+            session.get("user"),
+            report_params(cliente_id, start_date, end_exclusive),
+        )
+        if stored:
+            productos = stored["productos"]
+            total_compras = stored["total"]
+        else:
+            productos = query_productos_por_cliente(cliente_id, start_date, end_exclusive)
+            total_compras = sum(item["total"] for item in productos)
+        settings = get_business_settings()
+        safe_base = f"productos-cliente-{cliente_id}-{datetime.utcnow():%Y%m%d%H%M%S}"
+        filename = build_invoice_pdf_filename(safe_base)
+        file_path = os.path.join(app.config["REPORT_PDF_FOLDER"], filename)
+        cleanup_old_pdfs(app.config["REPORT_PDF_FOLDER"], prefix="productos-cliente-")
+        create_products_by_client_pdf(
+            file_path, settings, cliente, productos, total_compras, start_date, end_exclusive
+        )
+        pdf_url = url_for("static", filename=f"reports/{filename}", _external=True)
+        return jsonify({"pdf_url": pdf_url})
+
+    @timed_section("pdf")
+    def create_account_statement_pdf(file_path, settings, cliente, facturas, total_saldo):
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table
+
+        styles = stylesheet()
+        doc = SimpleDocTemplate(
+            file_path,
+            pagesize=letter,
+            leftMargin=22,
+            rightMargin=22,
+            topMargin=22,
+            bottomMargin=22,
+        )
+        story = []
+
+        header_center = (
+            f"<b>{settings.nombre}</b><br/>"
+            f"{settings.direccion or ''}<br/>"
+            f"RTN: {settings.rtn or '-'} &nbsp;&nbsp; TEL: {settings.telefono or '-'}<br/>"
+            f"{settings.email or ''}"
+        )
+        header_right = f"<b>ESTADO DE CUENTA</b><br/>FECHA: {datetime.utcnow():%d/%m/%Y}"
+        story.append(build_header_table(app.static_folder, header_center, header_right))
+        story.append(Spacer(1, 10))
+
+        cliente_line = (
+            f"<b>CLIENTE:</b> {cliente.nombre} &nbsp;&nbsp; "
+            f"<b>RTN:</b> {cliente.ruc_dni or '-'} &nbsp;&nbsp; "
+            f"<b>TEL:</b> {cliente.telefono or '-'}"
+        )
+        story.append(Paragraph(cliente_line, styles["Normal"]))
+        story.append(Spacer(1, 8))
+
+        table_data = [["FACTURA", "FECHA", "TOTAL", "ABONADO", "SALDO"]]
+        for factura in facturas:
+            table_data.append(
+                [
+                    factura["numero_factura"],
+                    factura["fecha"],
+                    f"L {factura['total']:.2f}",
+                    f"L {factura['abonado']:.2f}",
+                    f"L {factura['saldo']:.2f}",
+                ]
+            )
+        table = Table(table_data, colWidths=[120, 90, 90, 90, 90])
+        table.setStyle(table_style("report"))
+        story.append(table)
+        story.append(Spacer(1, 10))
+
+        total_table = Table(
+            [["TOTAL PENDIENTE", f"L {total_saldo:.2f}"]],
+            colWidths=[150, 120],
+        )
+        total_table.setStyle(table_style("report_total"))
+        story.append(total_table)
+        doc.build(story)
+
+    @timed_section("pdf")
+    def create_products_by_client_pdf(
+        file_path, settings, cliente, productos, total_compras, start_date, end_exclusive
+    ):
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table
+
+        styles = stylesheet()
+        doc = SimpleDocTemplate(
+            file_path,
+            pagesize=letter,
+            leftMargin=22,
+            rightMargin=22,
+            topMargin=22,
+            bottomMargin=22,
+        )
+        story = []
+
+        header_center = (
+            f"<b>{settings.nombre}</b><br/>"
+            f"{settings.direccion or ''}<br/>"
+            f"RTN: {settings.rtn or '-'} &nbsp;&nbsp; TEL: {settings.telefono or '-'}<br/>"
+            f"{settings.email or ''}"
+        )
+        rango_texto = (
+            f"{start_date:%d/%m/%Y} - {(end_exclusive - timedelta(days=1)):%d/%m/%Y}"
+        )
+        header_right = f"<b>PRODUCTOS POR CLIENTE</b><br/>RANGO: {rango_texto}"
+        story.append(build_header_table(app.static_folder, header_center, header_right))
+        story.append(Spacer(1, 10))
+
+        cliente_line = (
+            f"<b>CLIENTE:</b> {cliente.nombre} &nbsp;&nbsp; "
+            f"<b>RTN:</b> {cliente.ruc_dni or '-'} &nbsp;&nbsp; "
+            f"<b>TEL:</b> {cliente.telefono or '-'}"
+        )
+        story.append(Paragraph(cliente_line, styles["Normal"]))
+        story.append(Spacer(1, 8))
+
+        table_data = [["CODIGO", "PRODUCTO", "UNIDADES", "TOTAL"]]
+        for producto in productos:
+            table_data.append(
+                [
+                    producto["codigo"],
+                    producto["nombre"],
+                    str(producto["cantidad"]),
+                    f"L {producto['total']:.2f}",
+                ]
+            )
+        table = Table(table_data, colWidths=[90, 230, 90, 90])
+        table.setStyle(table_style("report"))
+        story.append(table)
+        story.append(Spacer(1, 10))
+
+        total_table = Table(
+            [["TOTAL COMPRADO", f"L {total_compras:.2f}"]],
+            colWidths=[150, 120],
+        )
+        total_table.setStyle(table_style("report_total"))
+        story.append(total_table)
+        doc.build(story)
+
+    @timed_section("pdf")
+    def create_top_products_pdf(
+        file_path, settings, productos, total_vendido, start_date, end_exclusive
+    ):
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import SimpleDocTemplate, Spacer, Table
+
+        doc = SimpleDocTemplate(
+            file_path,
+            pagesize=letter,
+            leftMargin=22,
+            rightMargin=22,
+            topMargin=22,
+            bottomMargin=22,
+        )
+        story = []
+
+        header_center = (
+            f"<b>{settings.nombre}</b><br/>"
+            f"{settings.direccion or ''}<br/>"
+            f"RTN: {settings.rtn or '-'} &nbsp;&nbsp; TEL: {settings.telefono or '-'}<br/>"
+            f"{settings.email or ''}"
+        )
+        rango_texto = (
+            f"{start_date:%d/%m/%Y} - {(end_exclusive - timedelta(days=1)):%d/%m/%Y}"
+        )
+        header_right = f"<b>TOP PRODUCTOS</b><br/>RANGO: {rango_texto}"
+        story.append(build_header_table(app.static_folder, header_center, header_right))
+        story.append(Spacer(1, 10))
+
+        table_data = [["CODIGO", "PRODUCTO", "UNIDADES", "TOTAL"]]
+        for producto in productos:
+            table_data.append(
+                [
+                    producto["codigo"],
+                    producto["nombre"],
+                    str(producto["cantidad"]),
+                    f"L {producto['total']:.2f}",
+                ]
+            )
+        table = Table(table_data, colWidths=[90, 230, 90, 90])
+        table.setStyle(table_style("report"))
+        story.append(table)
+        story.append(Spacer(1, 10))
+
+        total_table = Table(
+            [["TOTAL VENDIDO", f"L {total_vendido:.2f}"]],
+            colWidths=[150, 120],
+        )
+        total_table.setStyle(table_style("report_total"))
+        story.append(total_table)
+        doc.build(story)
+
+    @timed_section("pdf")
+    def create_client_purchases_pdf(
+        file_path, settings, cliente, facturas, total_compras, start_date, end_exclusive
+    ):
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table
+
+        styles = stylesheet()
+        doc = SimpleDocTemplate(
+            file_path,
+            pagesize=letter,
+            leftMargin=22,
+            rightMargin=22,
+            topMargin=22,
+            bottomMargin=22,
+        )
+        story = []
+
+        header_center = (
+            f"<b>{settings.nombre}</b><br/>"
+            f"{settings.direccion or ''}<br/>"
+            f"RTN: {settings.rtn or '-'} &nbsp;&nbsp; TEL: {settings.telefono or '-'}<br/>"
+            f"{settings.email or ''}"
+        )
+        rango_texto = (
+            f"{start_date:%d/%m/%Y} - {(end_exclusive - timedelta(days=1)):%d/%m/%Y}"
+        )
+        header_right = f"<b>COMPRAS POR CLIENTE</b><br/>RANGO: {rango_texto}"
+        story.append(build_header_table(app.static_folder, header_center, header_right))
+        story.append(Spacer(1, 10))
+
+        cliente_line = (
+            f"<b>CLIENTE:</b> {cliente.nombre} &nbsp;&nbsp; "
+            f"<b>RTN:</b> {cliente.ruc_dni or '-'} &nbsp;&nbsp; "
+            f"<b>TEL:</b> {cliente.telefono or '-'}"
+        )
+        story.append(Paragraph(cliente_line, styles["Normal"]))
+        story.append(Spacer(1, 8))
+
+        table_data = [["FACTURA", "FECHA", "ESTADO", "TOTAL"]]
+        for factura in facturas:
+            table_data.append(
+                [
+                    factura["numero_factura"],
+                    factura["fecha"],
+                    factura["estado"],
+                    f"L {factura['total']:.2f}",
+                ]
+            )
+        table = Table(table_data, colWidths=[130, 90, 90, 90])
+        table.setStyle(table_style("report", align_from=3))
+        story.append(table)
+        story.append(Spacer(1, 10))
+
+        total_table = Table(
+            [["TOTAL COMPRADO", f"L {total_compras:.2f}"]],
+            colWidths=[150, 120],
+        )
+        total_table.setStyle(table_style("report_total"))
+        story.append(total_table)
+        doc.build(story)
+
+    @bp.post("/reportes/estado-cuenta/pdf")
+    def reportes_estado_cuenta_pdf():
+        if not session.get("user"):
+            return jsonify({"error": "No autorizado"}), 401
+
+        data = request.get_json(silent=True) or {}
+        cliente_id = data.get("cliente_id")
+        if not cliente_id:
+            return jsonify({"error": "Cliente requerido"}), 400
+        try:
+            cliente_id = int(cliente_id)
+        except (TypeError, ValueError):
+            return jsonify({"error": "Cliente invalido"}), 400
+
+        cliente = Cliente.query.get(cliente_id)
+        if not cliente:
+            return jsonify({"error": "Cliente no encontrado"}), 404
+
+        facturas_raw = (
+            FacturaContado.query.filter_by(estado="credito", cliente_id=cliente_id)
+            .order_by(FacturaContado.fecha.asc())
+            .all()
+        )
+        facturas_credito = []
+        total_saldo = Decimal("0")
+        for factura in facturas_raw:
+            total = Decimal(str(factura.total or 0))
+            abonado = Decimal(str(factura.pago or 0))
+            saldo = total - abonado
+            if saldo <= 0:
+                continue
+            total_saldo += saldo
+            facturas_credito.append(
+                {
+                    "numero_factura": factura.numero_factura,
+                    "fecha": factura.fecha.strftime("%d/%m/%Y")
+                    if factura.fecha
+                    else "-",
+                    "total": float(total),
+                    "abonado": float(abonado),
+                    "saldo": float(saldo),
+                }
+            )
+        settings = get_business_settings()
+        safe_base = f"estado-cuenta-{cliente_id}-{datetime.utcnow():%Y%m%d%H%M%S}"
+        filename = build_invoice_pdf_filename(safe_base)
+        file_path = os.path.join(app.config["REPORT_PDF_FOLDER"], filename)
+        cleanup_old_pdfs(app.config["REPORT_PDF_FOLDER"], prefix="estado-cuenta-")
+        create_account_statement_pdf(
+            file_path, settings, cliente, facturas_credito, total_saldo
+        )
+        pdf_url = url_for("static", filename=f"reports/{filename}")
+        return jsonify({"pdf_url": pdf_url})
+
+    def parse_commission_filters():
+        """Filtros de /comisiones y su exportación (mes en curso y 5% por defecto)."""
+        today = datetime.utcnow().date()
+        first_day = today.replace(day=1)
+
+        fecha_inicio_raw = (request.args.get("fecha_inicio") or first_day.isoformat()).strip()
+        fecha_fin_raw = (request.args.get("fecha_fin") or today.isoformat()).strip()
+        vendedor_id_raw = (request.args.get("vendedor_id") or "").strip()
+        porcentaje_raw = (request.args.get("porcentaje") or "5").strip()
+
+        try:
+            fecha_inicio = datetime.strptime(fecha_inicio_raw, "%Y-%m-%d")
+        except ValueError:
+            fecha_inicio = datetime.combine(first_day, datetime.min.time())
+            fecha_inicio_raw = first_day.isoformat()
+        try:
+            fecha_fin_date = datetime.strptime(fecha_fin_raw, "%Y-%m-%d")
+        except ValueError:
+            fecha_fin_date = datetime.combine(today, datetime.min.time())
+            fecha_fin_raw = today.isoformat()
+        fecha_fin = fecha_fin_date.replace(hour=23, minute=59, second=59, microsecond=999999)
+
+        try:
+            porcentaje = Decimal(porcentaje_raw)
+        except Exception:
+            porcentaje = Decimal("5")
+        porcentaje = max(Decimal("0"), min(Decimal("100"), porcentaje))
+
+        vendedores = get_active_vendedores()
+        vendedores_map = {vendedor.id: get_user_display_name(vendedor) for vendedor in vendedores}
+        vendedor_id = None
+        if vendedor_id_raw.isdigit():
+            posible_id = int(vendedor_id_raw)
+            if posible_id in vendedores_map:
+                vendedor_id = posible_id
+
+        return {
+            "fecha_inicio": fecha_inicio,
+            "fecha_fin": fecha_fin,
+            "fecha_inicio_raw": fecha_inicio_raw,
+            "fecha_fin_raw": fecha_fin_raw,
+            "porcentaje": porcentaje,
+            "vendedores": vendedores,
+            "vendedor_id": vendedor_id,
+        }
+
+    @bp.get("/comisiones")
+    @admin_required
+    def comisiones():
+        filtros = parse_commission_filters()
+        fecha_inicio = filtros["fecha_inicio"]
+        fecha_fin = filtros["fecha_fin"]
+        fecha_inicio_raw = filtros["fecha_inicio_raw"]
+        fecha_fin_raw = filtros["fecha_fin_raw"]
+        porcentaje = filtros["porcentaje"]
+        vendedores = filtros["vendedores"]
+        vendedor_id = filtros["vendedor_id"]
+
+        try:
+            pagos_raw = (
+                db.session.query(AbonoFactura, FacturaContado, Cliente, User)
+                .join(FacturaContado, AbonoFactura.factura_id == FacturaContado.id)
+                .outerjoin(Cliente, FacturaContado.cliente_id == Cliente.id)
+                .join(User, AbonoFactura.usuario_id == User.id)
+                .filter(
+                    User.rol == "vendedor",
+                    AbonoFactura.fecha >= fecha_inicio,
+                    AbonoFactura.fecha <= fecha_fin,
+                )
+                .order_by(AbonoFactura.fecha.desc())
+            )
+            if vendedor_id:
+                pagos_raw = pagos_raw.filter(AbonoFactura.usuario_id == vendedor_id)
+            pagos_raw = pagos_raw.all()
+        except SQLAlchemyError:
+            db.session.rollback()
+            pagos_raw = []
+
+        vendedores_venta_map = build_user_name_map(
+            [
+                factura.usuario_id
+                for _, factura, _, _ in pagos_raw
+                if factura and factura.usuario_id
+            ]
+        )
+        porcentaje_factor = porcentaje / Decimal("100")
+        total_cobrado = Decimal("0")
+        total_comision = Decimal("0")
+        breakdown = {}
+        commission_rows = []
+
+        for abono, factura, cliente, cobrador in pagos_raw:
+            monto = abono.monto or Decimal("0")
+            comision = (monto * porcentaje_factor).quantize(Decimal("0.01"))
+            cobrador_nombre = get_user_display_name(cobrador, fallback="N/A")
+            vendedor_venta = (
+                vendedores_venta_map.get(factura.usuario_id, "General")
+                if factura
+                else "General"
+            )
+            total_cobrado += monto
+            total_comision += comision
+            bucket = breakdown.setdefault(
+                cobrador_nombre,
+                {"vendedor": cobrador_nombre, "cobrado": Decimal("0"), "comision": Decimal("0"), "cantidad": 0},
+            )
+            bucket["cobrado"] += monto
+            bucket["comision"] += comision
+            bucket["cantidad"] += 1
+            commission_rows.append(
+                {
+                    "fecha_label": abono.fecha.strftime("%d/%m/%Y") if abono.fecha else "-",
+                    "numero_factura": factura.numero_factura if factura else "-",
+                    "cliente": cliente.nombre if cliente else "N/A",
+                    "vendedor_venta": vendedor_venta,
+                    "cobrador": cobrador_nombre,
+                    "monto": monto,
+                    "comision": comision,
+                }
+            )
+
+        breakdown_rows = sorted(
+            breakdown.values(),
+            key=lambda item: (item["cobrado"], item["cantidad"]),
+            reverse=True,
+        )
+
+        return render_template(
+            "comisiones.html",
+            user=session["user"],
+            vendedores=vendedores,
+            vendedor_id=vendedor_id,
+            porcentaje=porcentaje,
+            fecha_inicio=fecha_inicio_raw,
+            fecha_fin=fecha_fin_raw,
+            commission_rows=commission_rows,
+            breakdown_rows=breakdown_rows,
+            total_cobrado=total_cobrado,
+            total_comision=total_comision,
+            total_cobros=len(commission_rows),
+        )
+
+    # --------------- Exportaciones CSV / XLSX en streaming ---------------
+
+    def export_request_params():
+        """(formato, inicio, fin exclusivo) de la query string; ValueError si no son válidos."""
+        export_format = (request.args.get("formato") or "csv").strip().lower()
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError("Formato no soportado (csv o xlsx).")
+        start_date, end_exclusive = parse_report_date_range(
+            (request.args.get("fecha_inicio") or "").strip(),
+            (request.args.get("fecha_fin") or "").strip(),
+        )
+        return export_format, start_date, end_exclusive
+
+    def export_filename(prefix, start_date, end_exclusive):
+        last_day = end_exclusive - timedelta(days=1)
+        return f"{prefix}-{start_date:%Y%m%d}-{last_day:%Y%m%d}"
+
+    @bp.get("/reportes/exportar/facturas")
+    @role_required("admin", "contador")
+    def exportar_facturas():
+        try:
+            export_format, start_date, end_exclusive = export_request_params()
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+        statement = (
+            select(
+                FacturaContado.numero_factura,
+                FacturaContado.fecha,
+                FacturaContado.estado,
+                Cliente.nombre,
+                FacturaContado.rtn,
+                FacturaContado.usuario_id,
+                FacturaContado.subtotal,
+                FacturaContado.isv,
+                FacturaContado.descuento,
+                FacturaContado.total,
+                Producto.codigo,
+                Producto.nombre,
+                DetalleFacturaContado.cantidad,
+                DetalleFacturaContado.precio_unitario,
+                DetalleFacturaContado.descuento,
+                DetalleFacturaContado.subtotal,
+                DetalleFacturaContado.isv_aplica,
+            )
+            .select_from(FacturaContado)
+            .outerjoin(Cliente, FacturaContado.cliente_id == Cliente.id)
+            .outerjoin(DetalleFacturaContado, DetalleFacturaContado.factura_id == FacturaContado.id)
+            .outerjoin(Producto, DetalleFacturaContado.producto_id == Producto.id)
+            .where(FacturaContado.fecha >= start_date, FacturaContado.fecha < end_exclusive)
+            .order_by(FacturaContado.fecha.asc(), FacturaContado.id.asc(), DetalleFacturaContado.id.asc())
+        )
+        directory = get_user_directory()
+
+        def rows():
+            for row in stream_rows(db.session, statement):
+                vendedor = directory.get(row[5])
+                yield (
+                    *row[:5],
+                    vendedor.display_name if vendedor else "General",
+                    *row[6:],
+                )
+
+        header = [
+            "Factura", "Fecha", "Estado", "Cliente", "RTN", "Vendedor",
+            "Subtotal factura", "ISV factura", "Descuento factura", "Total factura",
+            "Codigo", "Producto", "Cantidad", "Precio unitario",
+            "Descuento linea", "Subtotal linea", "ISV aplica",
+        ]
+        return export_response(
+            export_filename("facturas", start_date, end_exclusive),
+            export_format,
+            header,
+            rows(),
+            sheet_name="Facturas",
+        )
+
+    @bp.get("/reportes/exportar/abonos")
+    @role_required("admin", "contador")
+    def exportar_abonos():
+        try:
+            export_format, start_date, end_exclusive = export_request_params()
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+        statement = (
+            select(
+                AbonoFactura.fecha,
+                FacturaContado.numero_factura,
+                Cliente.nombre,
+                AbonoFactura.usuario_id,
+                AbonoFactura.monto,
+                FacturaContado.total,
+                FacturaContado.estado,
+            )
+            .join(FacturaContado, AbonoFactura.factura_id == FacturaContado.id)
+            .outerjoin(Cliente, FacturaContado.cliente_id == Cliente.id)
+            .where(AbonoFactura.fecha >= start_date, AbonoFactura.fecha < end_exclusive)
+            .order_by(AbonoFactura.fecha.asc(), AbonoFactura.id.asc())
+        )
+        directory = get_user_directory()
+
+        def rows():
+            for fecha, numero, cliente, usuario_id, monto, total, estado in stream_rows(
+                db.session, statement
+            ):
+                cobrador = directory.get(usuario_id)
+                yield (
+                    fecha,
+                    numero,
+                    cliente or "N/A",
+                    cobrador.display_name if cobrador else "N/A",
+                    monto,
+                    total,
+                    estado,
+                )
+
+        header = ["Fecha", "Factura", "Cliente", "Cobrador", "Monto", "Total factura", "Estado factura"]
+        return export_response(
+            export_filename("abonos", start_date, end_exclusive),
+            export_format,
+            header,
+            rows(),
+            sheet_name="Abonos",
+        )
+
+    @bp.get("/reportes/exportar/comisiones")
+    @admin_required
+    def exportar_comisiones():
+        export_format = (request.args.get("formato") or "csv").strip().lower()
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": "Formato no soportado (csv o xlsx)."}), 400
+        filtros = parse_commission_filters()
+        porcentaje_factor = filtros["porcentaje"] / Decimal("100")
+
+        statement = (
+            select(
+                AbonoFactura.fecha,
+                FacturaContado.numero_factura,
+                Cliente.nombre,
+                FacturaContado.usuario_id,
+                AbonoFactura.usuario_id,
+                AbonoFactura.monto,
+            )
+            .join(FacturaContado, AbonoFactura.factura_id == FacturaContado.id)
+            .outerjoin(Cliente, FacturaContado.cliente_id == Cliente.id)
+            .join(User, AbonoFactura.usuario_id == User.id)
+            .where(
+                User.rol == "vendedor",
+                AbonoFactura.fecha >= filtros["fecha_inicio"],
+                AbonoFactura.fecha <= filtros["fecha_fin"],
+            )
+            .order_by(AbonoFactura.fecha.asc(), AbonoFactura.id.asc())
+        )
+        if filtros["vendedor_id"]:
+            statement = statement.where(AbonoFactura.usuario_id == filtros["vendedor_id"])
+        directory = get_user_directory()
+
+        def rows():
+            for fecha, numero, cliente, vendedor_id, cobrador_id, monto in stream_rows(
+                db.session, statement
+            ):
+                monto = monto or Decimal("0")
+                vendedor = directory.get(vendedor_id)
+                cobrador = directory.get(cobrador_id)
+                yield (
+                    fecha,
+                    numero,
+                    cliente or "N/A",
+                    (vendedor.display_name or "General") if vendedor else "General",
+                    cobrador.display_name if cobrador else "N/A",
+                    monto,
+                    (monto * porcentaje_factor).quantize(Decimal("0.01")),
+                )
+
+        header = ["Fecha", "Factura", "Cliente", "Vendedor venta", "Cobrador", "Monto", "Comision"]
+        filename = (
+            f"comisiones-{filtros['fecha_inicio']:%Y%m%d}-{filtros['fecha_fin']:%Y%m%d}"
+        )
+        return export_response(filename, export_format, header, rows(), sheet_name="Comisiones")
+
+    return bp
@@ -0,0 +1,704 @@
+const taxRate = 0.15;
+const productCards = Array.from(document.querySelectorAll(".pos-product"));
+const invoiceTable = document.getElementById("invoice-table");
+const emptyRow = invoiceTable.querySelector(".empty-row");
+const subtotalEl = document.getElementById("subtotal");
+const discountTotalEl = document.getElementById("discount-total");
+const isvEl = document.getElementById("isv");
+const totalEl = document.getElementById("total");
+const searchInput = document.getElementById("product-search");
+const clearSearch = document.getElementById("clear-search");
+const tabs = document.querySelectorAll(".pos-tabs .tab");
+const clientSelect = document.getElementById("cliente-select");
+const clientDropdown = document.getElementById("cliente-dropdown");
+const clientToggle = document.getElementById("cliente-toggle");
+const clientPanel = document.getElementById("cliente-panel");
+const clientOptionsContainer = document.getElementById("cliente-options");
+const clientSearch = document.getElementById("cliente-search");
+const clientRtnInput = document.getElementById("cliente-rtn");
+const savedSalesDropdown = document.getElementById("saved-sales-dropdown");
+const savedSalesToggle = document.getElementById("saved-sales-toggle");
+const savedSalesPanel = document.getElementById("saved-sales-panel");
+const savedSaleOptions = document.querySelectorAll("[data-saved-sale-id]");
+const saveOrderButton = document.getElementById("save-order");
+const emitButton = document.getElementById("emit-invoice");
+const invoiceModal = document.getElementById("invoice-modal");
+const invoiceCloseButtons = invoiceModal
+  ? invoiceModal.querySelectorAll("[data-invoice-close]")
+  : [];
+const invoiceItems = document.getElementById("invoice-items");
+const invoiceSubtotal = document.getElementById("invoice-subtotal");
+const invoiceExento = document.getElementById("invoice-exento");
+const invoiceGravado = document.getElementById("invoice-gravado");
+const invoiceIsv = document.getElementById("invoice-isv");
+const invoiceDiscount = document.getElementById("invoice-discount");
+const invoiceTotal = document.getElementById("invoice-total");
+const invoicePaid = document.getElementById("invoice-paid");
+const invoiceChange = document.getElementById("invoice-change");
+const invoiceClient = document.getElementById("invoice-client");
+const invoiceRtn = document.getElementById("invoice-rtn");
+const invoiceType = document.getElementById("invoice-type");
+const invoiceBalanceRow = document.getElementById("invoice-balance-row");
+const invoiceBalance = document.getElementById("invoice-balance");
+const invoiceDateInput = document.getElementById("invoice-date");
+const confirmInvoice = document.getElementById("confirm-invoice");
+const invoicePdfLink = document.getElementById("invoice-pdf-link");
+const invoiceWhatsappLink = document.getElementById("invoice-whatsapp-link");
+const productMap = new Map(productCards.map((card) => [card.dataset.id, card]));
+let clientSearchController = null;
+let clientSearchTimer = null;
+let modalTotalValue = 0;
+let modalInvoiceType = "contado";
+let currentPedidoId = null;
+let isLoadingPedido = false;
+
+const formatCurrency = (value) => `L ${value.toFixed(2)}`;
+const toDateInputValue = (date) => {
+  const offset = date.getTimezoneOffset() * 60000;
+  return new Date(date.getTime() - offset).toISOString().slice(0, 10);
+};
+
+const newIdempotencyKey = () =>
+  window.crypto && window.crypto.randomUUID
+    ? window.crypto.randomUUID()
+    : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+const wait = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Cada guardado conserva su Idempotency-Key hasta recibir respuesta: si el
+// Wi-Fi corta, el reintento (automatico o con otro clic) devuelve la misma
+// factura o pedido en lugar de crear otro.
+const pendingSubmissions = new Map();
+const postIdempotent = async (url, payload, attempts = 3) => {
+  const body = JSON.stringify(payload);
+  const pending = pendingSubmissions.get(url);
+  const key = pending && pending.body === body ? pending.key : newIdempotencyKey();
+  pendingSubmissions.set(url, { key, body });
+  for (let attempt = 1; ; attempt += 1) {
+    let response;
+    try {
+      response = await fetch(url, {
+        method: "POST",
+        headers: { "Content-Type": "application/json", "Idempotency-Key": key },
+        body,
+      });
+    } catch (error) {
+      if (attempt >= attempts) throw error;
+      await wait(500 * attempt);
+      continue;
+    }
+    // 409 con Retry-After: la primera peticion con esta clave sigue en proceso.
+    if (response.status === 409 && response.headers.get("Retry-After") && attempt < attempts) {
+      await wait(1000 * attempt);
+      continue;
+    }
+    if (response.status < 500) {
+      pendingSubmissions.delete(url);
+    }
+    return response;
+  }
+};
+
+const updateClientSelection = () => {
+  if (!clientSelect) {
+    return;
+  }
+  const option = clientSelect.options[clientSelect.selectedIndex];
+  const label = option && option.value ? option.textContent.trim() : "Selecciona un cliente";
+  if (clientToggle) {
+    clientToggle.textContent = label;
+  }
+  if (clientRtnInput) {
+    clientRtnInput.value = option ? option.dataset.rtn || "" : "";
+  }
+};
+
+// Deja el cliente como opcion del select (las opciones no vienen en la pagina).
+const ensureClientOption = (client) => {
+  if (!clientSelect || !client.id) {
+    return;
+  }
+  if (!clientSelect.querySelector(`option[value="${client.id}"]`)) {
+    clientSelect.appendChild(window.InvagroTypeahead.optionFor(client));
+  }
+  clientSelect.value = String(client.id);
+};
+
+const renderClientResults = (results) => {
+  clientOptionsContainer.innerHTML = "";
+  results.forEach((client) => {
+    const item = document.createElement("button");
+    item.type = "button";
+    item.className = "cliente-option";
+    item.dataset.value = client.id;
+    item.dataset.rtn = client.rtn || "";
+    item.textContent = client.nombre;
+    if (clientSelect && clientSelect.value === String(client.id)) {
+      item.classList.add("active");
+    }
+    item.addEventListener("click", () => {
+      ensureClientOption(client);
+      updateClientSelection();
+      if (clientPanel) {
+        clientPanel.classList.remove("open");
+      }
+    });
+    clientOptionsContainer.appendChild(item);
+  });
+  if (results.length === 0) {
+    const empty = document.createElement("div");
+    empty.className = "cliente-option-empty";
+    empty.textContent = "No hay resultados";
+    clientOptionsContainer.appendChild(empty);
+  }
+};
+
+const renderClientOptions = async (query) => {
+  if (!clientOptionsContainer) {
+    return;
+  }
+  if (clientSearchController) {
+    clientSearchController.abort();
+  }
+  clientSearchController = new AbortController();
+  try {
+    const results = await window.InvagroTypeahead.search("/buscar/clientes", (query || "").trim(), {
+      signal: clientSearchController.signal,
+    });
+    renderClientResults(results);
+  } catch (error) {
+    if (error.name !== "AbortError") {
+      console.error("clientes", error);
+    }
+  }
+};
+
+const closeClientDropdown = () => {
+  if (clientPanel) {
+    clientPanel.classList.remove("open");
+  }
+};
+
+if (clientToggle && clientPanel) {
+  clientToggle.addEventListener("click", () => {
+    clientPanel.classList.toggle("open");
+    if (clientPanel.classList.contains("open")) {
+      renderClientOptions(clientSearch ? clientSearch.value : "");
+    }
+    if (clientPanel.classList.contains("open") && clientSearch) {
+      clientSearch.focus();
+    }
+  });
+}
+
+if (clientSearch) {
+  clientSearch.addEventListener("input", (event) => {
+    clearTimeout(clientSearchTimer);
+    clientSearchTimer = setTimeout(() => renderClientOptions(event.target.value), 150);
+  });
+}
+
+if (clientDropdown) {
+  document.addEventListener("click", (event) => {
+    if (!clientDropdown.contains(event.target)) {
+      closeClientDropdown();
+    }
+  });
+}
+
+updateClientSelection();
+
+const updateTotals = () => {
+  const rows = invoiceTable.querySelectorAll(".invoice-row");
+  let grossSubtotal = 0;
+  let isv = 0;
+  let discountTotal = 0;
+
+  rows.forEach((row) => {
+    const qty = Number(row.querySelector(".qty-input").value || 0);
+    const price = Number(row.dataset.price || 0);
+    const line = qty * price;
+    const discountUnit = Number(row.querySelector(".discount-input").value || 0);
+    const safeDiscountUnit = Math.max(0, Math.min(discountUnit, price));
+    const lineNet = Math.max(0, (price - safeDiscountUnit) * qty);
+    const applyTax = row.dataset.isv === "1";
+    grossSubtotal += line;
+    discountTotal += safeDiscountUnit * qty;
+    if (applyTax) {
+      isv += lineNet * taxRate;
+    }
+    row.querySelector(".line-total").textContent = formatCurrency(lineNet);
+  });
+
+  const netSubtotal = Math.max(0, grossSubtotal - discountTotal);
+  subtotalEl.textContent = formatCurrency(grossSubtotal);
+  if (discountTotalEl) {
+    discountTotalEl.textContent = formatCurrency(discountTotal);
+  }
+  isvEl.textContent = formatCurrency(isv);
+  totalEl.textContent = formatCurrency(Math.max(0, netSubtotal + isv));
+  if (invoiceModal && invoiceModal.classList.contains("open")) {
+    openInvoiceModal();
+  }
+};
+
+const ensureEmptyState = () => {
+  const rows = invoiceTable.querySelectorAll(".invoice-row");
+  if (rows.length === 0) {
+    emptyRow.style.display = "grid";
+  } else {
+    emptyRow.style.display = "none";
+  }
+};
+
+const clearPedidoContext = () => {
+  if (currentPedidoId) {
+    currentPedidoId = null;
+  }
+};
+
+const clearInvoiceRows = () => {
+  invoiceTable.querySelectorAll(".invoice-row").forEach((row) => row.remove());
+  ensureEmptyState();
+  updateTotals();
+};
+
+const addRow = (card, options = {}) => {
+  const { quantity = 1, discount = 0, replace = false } = options;
+  const id = card.dataset.id;
+  const existing = invoiceTable.querySelector(`.invoice-row[data-id="${id}"]`);
+  if (existing) {
+    const qtyInput = existing.querySelector(".qty-input");
+    const nextQty = replace ? quantity : Number(qtyInput.value || 0) + 1;
+    qtyInput.value = nextQty;
+    if (replace) {
+      existing.querySelector(".discount-input").value = discount;
+    }
+    updateTotals();
+    return;
+  }
+
+  const row = document.createElement("div");
+  row.className = "table-row table-six invoice-row";
+  row.dataset.id = id;
+  row.dataset.price = card.dataset.price;
+  row.dataset.isv = card.dataset.isv;
+  row.innerHTML = `
+    <span>${card.dataset.name}</span>
+    <input class="qty-input" type="number" min="1" value="${quantity}" />
+    <span>${formatCurrency(Number(card.dataset.price))}</span>
+    <input class="discount-input" type="number" min="0" step="0.01" value="${discount}" />
+    <span class="line-total">${formatCurrency(Number(card.dataset.price))}</span>
+    <button class="remove-button" type="button">×</button>
+  `;
+
+  invoiceTable.appendChild(row);
+  row.querySelector(".qty-input").addEventListener("input", () => {
+    clearPedidoContext();
+    updateTotals();
+  });
+  row.querySelector(".discount-input").addEventListener("input", () => {
+    clearPedidoContext();
+    updateTotals();
+  });
+  row.querySelector(".remove-button").addEventListener("click", () => {
+    row.remove();
+    clearPedidoContext();
+    ensureEmptyState();
+    updateTotals();
+  });
+
+  if (!isLoadingPedido) {
+    clearPedidoContext();
+  }
+  ensureEmptyState();
+  updateTotals();
+};
+
+productCards.forEach((card) => {
+  card.querySelector(".add-product").addEventListener("click", () => addRow(card));
+});
+
+const applyFilters = () => {
+  const query = searchInput.value.trim().toLowerCase();
+  const activeTab = document.querySelector(".pos-tabs .tab.active");
+  const filter = activeTab ? activeTab.dataset.filter : "todos";
+
+  productCards.forEach((card) => {
+    const name = card.dataset.name.toLowerCase();
+    const category = card.dataset.category.toLowerCase();
+    const matchesSearch = !query || name.includes(query);
+    const matchesCategory = filter === "todos" || category === filter;
+    card.style.display = matchesSearch && matchesCategory ? "grid" : "none";
+  });
+};
+
+searchInput.addEventListener("input", applyFilters);
+clearSearch.addEventListener("click", () => {
+  searchInput.value = "";
+  applyFilters();
+});
+
+tabs.forEach((tab) => {
+  tab.addEventListener("click", () => {
+    tabs.forEach((item) => item.classList.remove("active"));
+    tab.classList.add("active");
+    applyFilters();
+  });
+});
+
+if (clientSelect && clientRtnInput) {
+  clientSelect.addEventListener("change", () => {
+    updateClientSelection();
+    if (clientSearch) {
+      renderClientOptions(clientSearch.value);
+    }
+  });
+}
+
+const applyPedidoData = (pedidoData) => {
+  if (!pedidoData || !pedidoData.items) {
+    return;
+  }
+  isLoadingPedido = true;
+  clearInvoiceRows();
+  pedidoData.items.forEach((item) => {
+    const card = productMap.get(String(item.producto_id));
+    if (!card) {
+      return;
+    }
+    addRow(card, {
+      quantity: Number(item.cantidad || 0),
+      discount: Number(item.descuento || 0),
+      replace: true,
+    });
+  });
+  isLoadingPedido = false;
+  currentPedidoId = pedidoData.pedido_id;
+  if (clientSelect) {
+    if (pedidoData.cliente_id) {
+      ensureClientOption({
+        id: pedidoData.cliente_id,
+        nombre: pedidoData.cliente_nombre || `Cliente ${pedidoData.cliente_id}`,
+        rtn: pedidoData.rtn || "",
+      });
+      updateClientSelection();
+      if (clientRtnInput && pedidoData.rtn) {
+        clientRtnInput.value = pedidoData.rtn;
+      }
+    } else if (clientRtnInput) {
+      clientRtnInput.value = pedidoData.rtn || "";
+    }
+  }
+  updateTotals();
+};
+
+const closeSavedSales = () => {
+  if (!savedSalesPanel || !savedSalesToggle) return;
+  savedSalesPanel.hidden = true;
+  savedSalesToggle.setAttribute("aria-expanded", "false");
+};
+
+const loadSavedSale = async (pedidoId) => {
+  if (!pedidoId) return;
+  try {
+    const response = await fetch(`/pedidos/${pedidoId}/data`);
+    const result = await response.json();
+    if (!response.ok) {
+      alert(result.error || "No se pudo abrir la factura guardada.");
+      return;
+    }
+    applyPedidoData(result);
+    closeSavedSales();
+  } catch (error) {
+    alert("No se pudo abrir la factura guardada.");
+  }
+};
+
+if (savedSalesToggle && savedSalesPanel) {
+  savedSalesToggle.addEventListener("click", (event) => {
+    event.stopPropagation();
+    const willOpen = savedSalesPanel.hidden;
+    savedSalesPanel.hidden = !willOpen;
+    savedSalesToggle.setAttribute("aria-expanded", String(willOpen));
+  });
+  document.addEventListener("click", (event) => {
+    if (savedSalesDropdown && !savedSalesDropdown.contains(event.target)) {
+      closeSavedSales();
+    }
+  });
+  document.addEventListener("keydown", (event) => {
+    if (event.key === "Escape") closeSavedSales();
+  });
+}
+
+savedSaleOptions.forEach((option) => {
+  option.addEventListener("click", () => loadSavedSale(option.dataset.savedSaleId));
+});
+
+const getInvoiceType = () => {
+  const selected = document.querySelector('input[name="tipo"]:checked');
+  return selected ? selected.value : "contado";
+};
+
+const openInvoiceModal = () => {
+  const rows = invoiceTable.querySelectorAll(".invoice-row");
+  if (!rows.length) {
+    alert("Agrega productos antes de emitir la factura.");
+    return;
+  }
+
+  const selectedOption = clientSelect ? clientSelect.options[clientSelect.selectedIndex] : null;
+  const clientName = selectedOption && selectedOption.value ? selectedOption.textContent.trim() : "-";
+  const rtnValue = clientRtnInput ? clientRtnInput.value.trim() : "";
+  if (invoiceClient) {
+    invoiceClient.textContent = `Cliente: ${clientName || "-"}`;
+  }
+  if (invoiceRtn) {
+    invoiceRtn.textContent = `RTN: ${rtnValue || "-"}`;
+  }
+  modalInvoiceType = getInvoiceType();
+  if (invoiceType) {
+    invoiceType.textContent = `Tipo: ${modalInvoiceType === "credito" ? "Credito" : "Contado"}`;
+  }
+
+  let subtotal = 0;
+  let isv = 0;
+  let exento = 0;
+  let gravado = 0;
+  let descuento = 0;
+  const itemsHtml = Array.from(rows)
+    .map((row) => {
+      const qty = Number(row.querySelector(".qty-input").value || 0);
+      const price = Number(row.dataset.price || 0);
+      const line = qty * price;
+      const discountUnit = Number(row.querySelector(".discount-input").value || 0);
+      const safeDiscountUnit = Math.max(0, Math.min(discountUnit, price));
+      const lineNet = Math.max(0, (price - safeDiscountUnit) * qty);
+      const applyTax = row.dataset.isv === "1";
+      if (applyTax) {
+        isv += lineNet * taxRate;
+        gravado += lineNet;
+      } else {
+        exento += lineNet;
+      }
+      subtotal += line;
+      descuento += safeDiscountUnit * qty;
+      return `
+        <div class="invoice-item">
+          <span>${row.querySelector("span").textContent}</span>
+          <span>${qty} x ${formatCurrency(price)}</span>
+          <strong>${formatCurrency(lineNet)}</strong>
+        </div>
+      `;
+    })
+    .join("");
+
+  modalTotalValue = Math.max(0, subtotal - descuento) + isv;
+  if (invoiceItems) {
+    invoiceItems.innerHTML = itemsHtml;
+  }
+  if (invoiceSubtotal) {
+    invoiceSubtotal.textContent = formatCurrency(subtotal);
+  }
+  if (invoiceExento) {
+    invoiceExento.textContent = formatCurrency(exento);
+  }
+  if (invoiceGravado) {
+    invoiceGravado.textContent = formatCurrency(gravado);
+  }
+  if (invoiceIsv) {
+    invoiceIsv.textContent = formatCurrency(isv);
+  }
+  if (invoiceDiscount) {
+    invoiceDiscount.textContent = formatCurrency(descuento);
+  }
+  if (invoiceTotal) {
+    invoiceTotal.textContent = formatCurrency(modalTotalValue);
+  }
+  if (invoicePaid) {
+    invoicePaid.value = modalInvoiceType === "credito" ? "0.00" : modalTotalValue.toFixed(2);
+  }
+  if (invoiceChange) {
+    invoiceChange.textContent = formatCurrency(0);
+  }
+  if (invoiceBalanceRow && invoiceBalance) {
+    invoiceBalanceRow.style.display = modalInvoiceType === "credito" ? "flex" : "none";
+    invoiceBalance.textContent = formatCurrency(
+      modalInvoiceType === "credito" ? modalTotalValue : 0
+    );
+  }
+  if (invoiceDateInput && !invoiceDateInput.value) {
+    invoiceDateInput.value = toDateInputValue(new Date());
+  }
+
+  if (invoiceModal) {
+    invoiceModal.classList.add("open");
+  }
+  if (invoicePdfLink) {
+    invoicePdfLink.style.display = "none";
+    invoicePdfLink.href = "#";
+  }
+  if (invoiceWhatsappLink) {
+    invoiceWhatsappLink.style.display = "none";
+    invoiceWhatsappLink.href = "#";
+  }
+  if (confirmInvoice) {
+    confirmInvoice.style.display = "inline-flex";
+  }
+};
+
+const updateChange = () => {
+  if (!invoicePaid || !invoiceChange) {
+    return;
+  }
+  const paid = Number(invoicePaid.value || 0);
+  const change = Math.max(0, paid - modalTotalValue);
+  if (modalInvoiceType === "credito") {
+    invoiceChange.textContent = formatCurrency(0);
+    if (invoiceBalance) {
+      const balance = Math.max(0, modalTotalValue - paid);
+      invoiceBalance.textContent = formatCurrency(balance);
+    }
+  } else {
+    invoiceChange.textContent = formatCurrency(change);
+    if (invoiceBalance) {
+      invoiceBalance.textContent = formatCurrency(0);
+    }
+  }
+};
+
+if (emitButton) {
+  emitButton.addEventListener("click", openInvoiceModal);
+}
+
+invoiceCloseButtons.forEach((button) => {
+  button.addEventListener("click", () => {
+    if (invoiceModal) {
+      invoiceModal.classList.remove("open");
+    }
+  });
+});
+
+if (invoiceModal) {
+  invoiceModal.addEventListener("click", (event) => {
+    if (event.target === invoiceModal) {
+      invoiceModal.classList.remove("open");
+    }
+  });
+}
+
+if (invoicePaid) {
+  invoicePaid.addEventListener("input", updateChange);
+}
+if (confirmInvoice) {
+  confirmInvoice.addEventListener("click", async () => {
+    const rows = invoiceTable.querySelectorAll(".invoice-row");
+    if (!rows.length) {
+      alert("Agrega productos antes de emitir la factura.");
+      return;
+    }
+    const selectedOption = clientSelect ? clientSelect.options[clientSelect.selectedIndex] : null;
+    const clienteId = selectedOption && selectedOption.value ? Number(selectedOption.value) : null;
+    const rtnValue = clientRtnInput ? clientRtnInput.value.trim() : "";
+    const paid = Number(invoicePaid ? invoicePaid.value : 0);
+    const tipo = modalInvoiceType;
+    const fecha = invoiceDateInput ? invoiceDateInput.value : "";
+    if (tipo === "contado" && paid < modalTotalValue) {
+      alert("En contado, el pago debe ser igual o mayor al total.");
+      return;
+    }
+    const items = Array.from(rows).map((row) => ({
+      producto_id: Number(row.dataset.id),
+      cantidad: Number(row.querySelector(".qty-input").value || 0),
+      descuento: Number(row.querySelector(".discount-input").value || 0),
+    }));
+
+    try {
+      const response = await postIdempotent("/facturas", {
+        tipo,
+        cliente_id: clienteId,
+        rtn: rtnValue,
+        pago: paid,
+        fecha,
+        items,
+        pedido_id: currentPedidoId,
+      });
+      const result = await response.json();
+      if (!response.ok) {
+        alert(result.error || "No se pudo guardar la factura.");
+        return;
+      }
+      alert(`Factura guardada: ${result.numero_factura}`);
+      if (confirmInvoice) {
+        confirmInvoice.style.display = "none";
+      }
+      if (result.pdf_url && invoicePdfLink) {
+        invoicePdfLink.href = result.pdf_url;
+        invoicePdfLink.style.display = "inline-flex";
+      }
+      if (invoiceWhatsappLink && result.pdf_url) {
+        const pdfUrl = new URL(result.pdf_url, window.location.origin).toString();
+        const clientName = clientSelect ? clientSelect.options[clientSelect.selectedIndex]?.textContent.trim() : "";
+        const greeting = clientName ? `Hola ${clientName},` : "Hola,";
+        const tipoText = tipo === "credito" ? "credito" : "contado";
+        const message = encodeURIComponent(
+          `${greeting}\nSe genero una factura ${tipoText} por L ${modalTotalValue.toFixed(2)}.\nNo. ${result.numero_factura}\nPDF: ${pdfUrl}`
+        );
+        invoiceWhatsappLink.href = `https://wa.me/?text=${message}`;
+        invoiceWhatsappLink.style.display = "inline-flex";
+      }
+      // Mantener modal abierto para que pueda ver PDF/WhatsApp.
+    } catch (error) {
+      alert("No se pudo guardar la factura.");
+    }
+  });
+}
+
+if (saveOrderButton) {
+  saveOrderButton.addEventListener("click", async () => {
+    const rows = invoiceTable.querySelectorAll(".invoice-row");
+    if (!rows.length) {
+      alert("Agrega productos antes de guardar la factura.");
+      return;
+    }
+    const selectedOption = clientSelect ? clientSelect.options[clientSelect.selectedIndex] : null;
+    const clienteId = selectedOption && selectedOption.value ? Number(selectedOption.value) : null;
+    const rtnValue = clientRtnInput ? clientRtnInput.value.trim() : "";
+    const items = Array.from(rows).map((row) => ({
+      producto_id: Number(row.dataset.id),
+      cantidad: Number(row.querySelector(".qty-input").value || 0),
+      descuento: Number(row.querySelector(".discount-input").value || 0),
+    }));
+
+    try {
+      const response = await postIdempotent("/pedidos", {
+        cliente_id: clienteId,
+        rtn: rtnValue,
+        items,
+        pedido_id: currentPedidoId,
+      });
+      const result = await response.json();
+      if (!response.ok) {
+        alert(result.error || "No se pudo guardar la factura.");
+        return;
+      }
+      alert(`Factura guardada: ${result.numero_pedido}`);
+      clearInvoiceRows();
+      if (clientSelect) {
+        clientSelect.value = "";
+      }
+      if (clientRtnInput) {
+        clientRtnInput.value = "";
+      }
+      clearPedidoContext();
+    } catch (error) {
+      alert("No se pudo guardar la factura.");
+    }
+  });
+}
+
+const urlParams = new URLSearchParams(window.location.search);
+const initialPedidoId = urlParams.get("pedido_id");
+if (initialPedidoId) {
+  loadSavedSale(initialPedidoId);
+}
@@ -0,0 +1,58 @@
+const batchInvoiceButton = document.getElementById("batch-invoice");
+const batchInvoiceType = document.getElementById("batch-invoice-type");
+const batchInvoiceChecks = Array.from(document.querySelectorAll(".batch-invoice-check"));
+// Una clave por seleccion: repetir el clic tras un corte no factura dos veces.
+let batchInvoiceKey = null;
+
+const selectedPedidoIds = () =>
+  batchInvoiceChecks.filter((check) => check.checked).map((check) => Number(check.value));
+
+const updateBatchInvoiceButton = () => {
+  if (!batchInvoiceButton) return;
+  const count = selectedPedidoIds().length;
+  batchInvoiceButton.disabled = count === 0;
+  batchInvoiceButton.textContent = count ? `Facturar seleccionados (${count})` : "Facturar seleccionados";
+  batchInvoiceKey = null;
+};
+
+batchInvoiceChecks.forEach((check) => check.addEventListener("change", updateBatchInvoiceButton));
+if (batchInvoiceType) {
+  batchInvoiceType.addEventListener("change", () => {
+    batchInvoiceKey = null;
+  });
+}
+
+if (batchInvoiceButton) {
+  batchInvoiceButton.addEventListener("click", async () => {
+    const pedidoIds = selectedPedidoIds();
+    const tipo = batchInvoiceType ? batchInvoiceType.value : "credito";
+    if (!pedidoIds.length) return;
+    if (!confirm(`¿Emitir ${pedidoIds.length} facturas de ${tipo}?`)) return;
+    if (!batchInvoiceKey) {
+      batchInvoiceKey =
+        window.crypto && window.crypto.randomUUID
+          ? window.crypto.randomUUID()
+          : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    }
+    batchInvoiceButton.disabled = true;
+    try {
+      const response = await fetch("/pedidos/facturar", {
+        method: "POST",
+        headers: { "Content-Type": "application/json", "Idempotency-Key": batchInvoiceKey },
+        body: JSON.stringify({ tipo, pedido_ids: pedidoIds }),
+      });
+      const result = await response.json();
+      if (!response.ok) {
+        alert(result.error || "No se pudieron emitir las facturas.");
+        batchInvoiceButton.disabled = false;
+        return;
+      }
+      const numeros = result.facturas.map((factura) => factura.numero_factura).join(", ");
+      alert(`Facturas emitidas: ${numeros}\nTotal: L ${result.total.toFixed(2)}\nLos PDF se generan en segundo plano.`);
+      window.location.reload();
+    } catch (error) {
+      alert("No se pudieron emitir las facturas. Intenta de nuevo.");
+      batchInvoiceButton.disabled = false;
+    }
+  });
+}
@@ -0,0 +1,681 @@
+const accountModal = document.getElementById("account-modal");
+const accountOpenButtons = document.querySelectorAll("[data-account-open]");
+const accountCloseButtons = document.querySelectorAll("[data-account-close]");
+const accountClientSelect = document.getElementById("account-client-select");
+const accountRtnInput = document.getElementById("account-rtn");
+const accountPhoneInput = document.getElementById("account-phone");
+const accountClientLabel = document.getElementById("account-client-label");
+const accountTotalLabel = document.getElementById("account-total-label");
+const accountCountLabel = document.getElementById("account-count-label");
+const accountInvoiceBody = document.getElementById("account-invoice-body");
+const accountPrintButton = document.getElementById("account-print");
+const accountWhatsappButton = document.getElementById("account-whatsapp");
+const pdfClient = document.getElementById("pdf-client");
+const pdfRtn = document.getElementById("pdf-rtn");
+const pdfPhone = document.getElementById("pdf-phone");
+const pdfTotal = document.getElementById("pdf-total");
+const pdfCount = document.getElementById("pdf-count");
+const pdfDate = document.getElementById("pdf-date");
+const accountPdfBody = document.getElementById("account-pdf-body");
+const reportesData = JSON.parse(document.getElementById("reportes-data").textContent);
+// Los clientes no vienen en la pagina: cada select los busca con
+// /buscar/clientes (typeahead.js) y guarda rtn/telefono en data-*.
+const selectedClient = (select) => {
+  const option = select.options[select.selectedIndex];
+  return option && option.value ? { id: option.value, ...option.dataset } : null;
+};
+const facturasCredito = reportesData.facturas_credito;
+let currentPdfUrl = "";
+const topModal = document.getElementById("top-modal");
+const topOpenButtons = document.querySelectorAll("[data-top-open]");
+const topCloseButtons = document.querySelectorAll("[data-top-close]");
+const topStartInput = document.getElementById("top-start");
+const topEndInput = document.getElementById("top-end");
+const topSearchButton = document.getElementById("top-search");
+const topTableBody = document.getElementById("top-table-body");
+const topTotalLabel = document.getElementById("top-total-label");
+const topCountLabel = document.getElementById("top-count-label");
+const topRangeLabel = document.getElementById("top-range-label");
+const topPdfButton = document.getElementById("top-pdf");
+const topWhatsappButton = document.getElementById("top-whatsapp");
+const clientModal = document.getElementById("client-modal");
+const clientOpenButtons = document.querySelectorAll("[data-client-open]");
+const clientCloseButtons = document.querySelectorAll("[data-client-close]");
+const clientSelect = document.getElementById("client-select");
+const clientStartInput = document.getElementById("client-start");
+const clientEndInput = document.getElementById("client-end");
+const clientPhoneInput = document.getElementById("client-phone");
+const clientSearchButton = document.getElementById("client-search");
+const clientPdfButton = document.getElementById("client-pdf");
+const clientWhatsappButton = document.getElementById("client-whatsapp");
+const clientTableBody = document.getElementById("client-table-body");
+const clientTotalLabel = document.getElementById("client-total-label");
+const clientCountLabel = document.getElementById("client-count-label");
+const clientRangeLabel = document.getElementById("client-range-label");
+const productModal = document.getElementById("product-modal");
+const productOpenButtons = document.querySelectorAll("[data-product-open]");
+const productCloseButtons = document.querySelectorAll("[data-product-close]");
+const productClientSelect = document.getElementById("product-client-select");
+const productStartInput = document.getElementById("product-start");
+const productEndInput = document.getElementById("product-end");
+const productPhoneInput = document.getElementById("product-phone");
+const productSearchButton = document.getElementById("product-search");
+const productPdfButton = document.getElementById("product-pdf");
+const productWhatsappButton = document.getElementById("product-whatsapp");
+const productTableBody = document.getElementById("product-table-body");
+const productTotalLabel = document.getElementById("product-total-label");
+const productCountLabel = document.getElementById("product-count-label");
+const productRangeLabel = document.getElementById("product-range-label");
+let currentProductPdfUrl = "";
+let currentTopPdfUrl = "";
+let currentClientPdfUrl = "";
+let currentProductResultId = "";
+let currentTopResultId = "";
+let currentClientResultId = "";
+
+const currencyFormatter = new Intl.NumberFormat("es-HN", {
+  minimumFractionDigits: 2,
+  maximumFractionDigits: 2,
+});
+
+const formatCurrency = (value) => `L ${currencyFormatter.format(value || 0)}`;
+const toDateInputValue = (date) => {
+  const offset = date.getTimezoneOffset() * 60000;
+  return new Date(date.getTime() - offset).toISOString().slice(0, 10);
+};
+const formatRangeLabel = (startValue, endValue) => {
+  if (!startValue || !endValue) {
+    return "-";
+  }
+  return `${startValue} a ${endValue}`;
+};
+
+const renderEmptyInvoices = (message) => {
+  accountInvoiceBody.innerHTML = "";
+  accountPdfBody.innerHTML = "";
+  const row = document.createElement("div");
+  row.className = "account-invoice-row is-empty";
+  row.textContent = message;
+  accountInvoiceBody.appendChild(row);
+};
+
+const updatePdfMeta = (client, totalSaldo, invoiceCount) => {
+  const formattedTotal = formatCurrency(totalSaldo);
+  const today = new Date();
+  const formattedDate = today.toLocaleDateString("es-HN", {
+    day: "2-digit",
+    month: "long",
+    year: "numeric",
+  });
+
+  pdfClient.textContent = client?.nombre || "-";
+  pdfRtn.textContent = client?.rtn || "-";
+  pdfPhone.textContent = client?.telefono || "-";
+  pdfTotal.textContent = formattedTotal;
+  pdfCount.textContent = `${invoiceCount}`;
+  pdfDate.textContent = `Fecha: ${formattedDate}`;
+};
+
+const renderInvoicesForClient = (clientId) => {
+  const client = clientId ? selectedClient(accountClientSelect) : null;
+  accountRtnInput.value = client?.rtn || "";
+  accountPhoneInput.value = client?.telefono || "";
+  accountClientLabel.textContent = `Cliente: ${client?.nombre || "-"}`;
+  currentPdfUrl = "";
+
+  if (!clientId) {
+    accountTotalLabel.textContent = formatCurrency(0);
+    accountCountLabel.textContent = "0";
+    updatePdfMeta(null, 0, 0);
+    renderEmptyInvoices("Selecciona un cliente para ver facturas pendientes.");
+    return;
+  }
+
+  const invoices = facturasCredito.filter(
+    (factura) => String(factura.cliente_id) === String(clientId)
+  );
+  let totalSaldo = 0;
+  accountInvoiceBody.innerHTML = "";
+  accountPdfBody.innerHTML = "";
+
+  if (!invoices.length) {
+    accountTotalLabel.textContent = formatCurrency(0);
+    accountCountLabel.textContent = "0";
+    updatePdfMeta(client, 0, 0);
+    renderEmptyInvoices("No hay facturas pendientes para este cliente.");
+    return;
+  }
+
+  invoices.forEach((factura) => {
+    totalSaldo += factura.saldo || 0;
+    const row = document.createElement("div");
+    row.className = "account-invoice-row";
+    row.innerHTML = `
+      <span>${factura.numero_factura}</span>
+      <span>${factura.fecha}</span>
+      <span>${formatCurrency(factura.total)}</span>
+      <span>${formatCurrency(factura.saldo)}</span>
+    `;
+    accountInvoiceBody.appendChild(row);
+
+    const pdfRow = document.createElement("div");
+    pdfRow.className = "account-pdf-row";
+    pdfRow.innerHTML = `
+      <span>${factura.numero_factura}</span>
+      <span>${factura.fecha}</span>
+      <span>${formatCurrency(factura.total)}</span>
+      <span>${formatCurrency(factura.saldo)}</span>
+    `;
+    accountPdfBody.appendChild(pdfRow);
+  });
+
+  accountTotalLabel.textContent = formatCurrency(totalSaldo);
+  accountCountLabel.textContent = `${invoices.length}`;
+  updatePdfMeta(client, totalSaldo, invoices.length);
+};
+
+const openAccountModal = () => {
+  accountClientSelect.value = "";
+  renderInvoicesForClient("");
+  accountModal.classList.add("open");
+};
+
+accountOpenButtons.forEach((button) => {
+  button.addEventListener("click", () => openAccountModal());
+});
+
+accountCloseButtons.forEach((button) => {
+  button.addEventListener("click", () => accountModal.classList.remove("open"));
+});
+
+accountClientSelect.addEventListener("change", (event) => {
+  renderInvoicesForClient(event.target.value);
+});
+
+accountPhoneInput.addEventListener("input", () => {
+  pdfPhone.textContent = accountPhoneInput.value.trim() || "-";
+});
+
+accountPrintButton.addEventListener("click", async () => {
+  const clientId = accountClientSelect.value;
+  if (!clientId) {
+    alert("Selecciona un cliente para generar el PDF.");
+    return;
+  }
+  try {
+    const response = await fetch("/reportes/estado-cuenta/pdf", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ cliente_id: clientId }),
+    });
+    if (!response.ok) {
+      throw new Error("No se pudo generar el PDF.");
+    }
+    const result = await response.json();
+    currentPdfUrl = result.pdf_url || "";
+    if (currentPdfUrl) {
+      window.open(currentPdfUrl, "_blank");
+    }
+  } catch (error) {
+    alert("No se pudo generar el PDF.");
+  }
+});
+
+accountWhatsappButton.addEventListener("click", () => {
+  const phone = accountPhoneInput.value.replace(/\\D/g, "");
+  if (!phone) {
+    alert("Ingresa un telefono de WhatsApp para continuar.");
+    return;
+  }
+  if (!currentPdfUrl) {
+    alert("Primero genera el PDF para poder enviarlo.");
+    return;
+  }
+  const client = accountClientSelect.options[accountClientSelect.selectedIndex]?.text || "";
+  const message = encodeURIComponent(
+    `Hola ${client}. Te envio el estado de cuenta. PDF: ${currentPdfUrl}`
+  );
+  window.open(`https://wa.me/${phone}?text=${message}`, "_blank");
+});
+
+const renderTopEmpty = (message) => {
+  topTableBody.innerHTML = "";
+  const row = document.createElement("div");
+  row.className = "report-table-row is-empty";
+  row.textContent = message;
+  topTableBody.appendChild(row);
+};
+
+const renderClientEmpty = (message) => {
+  clientTableBody.innerHTML = "";
+  const row = document.createElement("div");
+  row.className = "report-table-row is-empty";
+  row.textContent = message;
+  clientTableBody.appendChild(row);
+};
+
+const renderProductEmpty = (message) => {
+  productTableBody.innerHTML = "";
+  const row = document.createElement("div");
+  row.className = "report-table-row is-empty";
+  row.textContent = message;
+  productTableBody.appendChild(row);
+};
+
+const openTopModal = () => {
+  const today = new Date();
+  const startOfMonth = new Date(today.getFullYear(), today.getMonth(), 1);
+  topStartInput.value = toDateInputValue(startOfMonth);
+  topEndInput.value = toDateInputValue(today);
+  topRangeLabel.textContent = `Rango: ${formatRangeLabel(topStartInput.value, topEndInput.value)}`;
+  currentTopPdfUrl = "";
+  renderTopEmpty("Selecciona un rango de fechas.");
+  topTotalLabel.textContent = formatCurrency(0);
+  topCountLabel.textContent = "0";
+  topModal.classList.add("open");
+};
+
+topOpenButtons.forEach((button) => {
+  button.addEventListener("click", openTopModal);
+});
+topCloseButtons.forEach((button) => {
+  button.addEventListener("click", () => topModal.classList.remove("open"));
+});
+if (topModal) {
+  topModal.addEventListener("click", (event) => {
+    if (event.target === topModal) {
+      topModal.classList.remove("open");
+    }
+  });
+}
+if (topSearchButton) {
+  topSearchButton.addEventListener("click", async () => {
+    const startValue = topStartInput.value;
+    const endValue = topEndInput.value;
+    if (!startValue || !endValue) {
+      renderTopEmpty("Selecciona un rango de fechas.");
+      return;
+    }
+    topRangeLabel.textContent = `Rango: ${formatRangeLabel(startValue, endValue)}`;
+    currentTopPdfUrl = "";
+    currentTopResultId = "";
+    try {
+      const response = await fetch("/reportes/productos-top", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ start_date: startValue, end_date: endValue }),
+      });
+      const result = await response.json();
+      if (!response.ok) {
+        throw new Error(result.error || "No se pudo cargar.");
+      }
+      currentTopResultId = result.result_id || "";
+      const productos = result.productos || [];
+      topTableBody.innerHTML = "";
+      if (!productos.length) {
+        renderTopEmpty("No hay ventas en el rango seleccionado.");
+        topTotalLabel.textContent = formatCurrency(0);
+        topCountLabel.textContent = "0";
+        return;
+      }
+      productos.forEach((producto) => {
+        const row = document.createElement("div");
+        row.className = "report-table-row";
+        row.innerHTML = `
+          <span>${producto.nombre}</span>
+          <span>${producto.cantidad}</span>
+          <span>${formatCurrency(producto.total)}</span>
+        `;
+        topTableBody.appendChild(row);
+      });
+      topTotalLabel.textContent = formatCurrency(result.total || 0);
+      topCountLabel.textContent = `${productos.length}`;
+    } catch (error) {
+      renderTopEmpty("No se pudo cargar el reporte.");
+    }
+  });
+}
+if (topPdfButton) {
+  topPdfButton.addEventListener("click", async () => {
+    const startValue = topStartInput.value;
+    const endValue = topEndInput.value;
+    if (!startValue || !endValue) {
+      alert("Selecciona un rango de fechas.");
+      return;
+    }
+    try {
+      const response = await fetch("/reportes/productos-top/pdf", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+          start_date: startValue,
+          end_date: endValue,
+          result_id: currentTopResultId,
+        }),
+      });
+      const result = await response.json();
+      if (!response.ok) {
+        throw new Error(result.error || "No se pudo generar el PDF.");
+      }
+      currentTopPdfUrl = result.pdf_url || "";
+      if (currentTopPdfUrl) {
+        window.open(currentTopPdfUrl, "_blank");
+      }
+    } catch (error) {
+      alert("No se pudo generar el PDF.");
+    }
+  });
+}
+if (topWhatsappButton) {
+  topWhatsappButton.addEventListener("click", () => {
+    if (!currentTopPdfUrl) {
+      alert("Primero genera el PDF para poder enviarlo.");
+      return;
+    }
+    const message = encodeURIComponent(
+      `Hola, te envio el reporte de top productos. PDF: ${currentTopPdfUrl}`
+    );
+    window.open(`https://wa.me/?text=${message}`, "_blank");
+  });
+}
+
+const openClientModal = () => {
+  const today = new Date();
+  const startOfMonth = new Date(today.getFullYear(), today.getMonth(), 1);
+  clientStartInput.value = toDateInputValue(startOfMonth);
+  clientEndInput.value = toDateInputValue(today);
+  clientSelect.value = "";
+  clientPhoneInput.value = "";
+  clientRangeLabel.textContent = "Cliente: -";
+  currentClientPdfUrl = "";
+  renderClientEmpty("Selecciona un cliente para iniciar.");
+  clientTotalLabel.textContent = formatCurrency(0);
+  clientCountLabel.textContent = "0";
+  clientModal.classList.add("open");
+};
+
+clientOpenButtons.forEach((button) => {
+  button.addEventListener("click", openClientModal);
+});
+clientCloseButtons.forEach((button) => {
+  button.addEventListener("click", () => clientModal.classList.remove("open"));
+});
+if (clientModal) {
+  clientModal.addEventListener("click", (event) => {
+    if (event.target === clientModal) {
+      clientModal.classList.remove("open");
+    }
+  });
+}
+if (clientSelect) {
+  clientSelect.addEventListener("change", () => {
+    const selectedText =
+      clientSelect.options[clientSelect.selectedIndex]?.textContent || "-";
+    clientRangeLabel.textContent = `Cliente: ${selectedText}`;
+    clientPhoneInput.value = selectedClient(clientSelect)?.telefono || "";
+  });
+}
+if (clientSearchButton) {
+  clientSearchButton.addEventListener("click", async () => {
+    const clienteId = clientSelect.value;
+    if (!clienteId) {
+      renderClientEmpty("Selecciona un cliente para iniciar.");
+      return;
+    }
+    const startValue = clientStartInput.value;
+    const endValue = clientEndInput.value;
+    if (!startValue || !endValue) {
+      renderClientEmpty("Selecciona un rango de fechas.");
+      return;
+    }
+    const selectedText =
+      clientSelect.options[clientSelect.selectedIndex]?.textContent || "-";
+    clientRangeLabel.textContent = `Cliente: ${selectedText}`;
+    currentClientPdfUrl = "";
+    currentClientResultId = "";
+    try {
+      const response = await fetch("/reportes/compras-cliente", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+          cliente_id: clienteId,
+          start_date: startValue,
+          end_date: endValue,
+        }),
+      });
+      const result = await response.json();
+      if (!response.ok) {
+        throw new Error(result.error || "No se pudo cargar.");
+      }
+      currentClientResultId = result.result_id || "";
+      const facturas = result.facturas || [];
+      clientTableBody.innerHTML = "";
+      if (!facturas.length) {
+        renderClientEmpty("No hay compras en el rango seleccionado.");
+        clientTotalLabel.textContent = formatCurrency(0);
+        clientCountLabel.textContent = "0";
+        return;
+      }
+      facturas.forEach((factura) => {
+        const row = document.createElement("div");
+        row.className = "report-table-row report-table-row-wide";
+        row.innerHTML = `
+          <span>${factura.numero_factura}</span>
+          <span>${factura.fecha}</span>
+          <span>${factura.estado}</span>
+          <span>${formatCurrency(factura.total)}</span>
+        `;
+        clientTableBody.appendChild(row);
+      });
+      clientTotalLabel.textContent = formatCurrency(result.total || 0);
+      clientCountLabel.textContent = `${facturas.length}`;
+    } catch (error) {
+      renderClientEmpty("No se pudo cargar el reporte.");
+    }
+  });
+}
+if (clientPdfButton) {
+  clientPdfButton.addEventListener("click", async () => {
+    const clienteId = clientSelect.value;
+    if (!clienteId) {
+      alert("Selecciona un cliente para generar el PDF.");
+      return;
+    }
+    const startValue = clientStartInput.value;
+    const endValue = clientEndInput.value;
+    if (!startValue || !endValue) {
+      alert("Selecciona un rango de fechas.");
+      return;
+    }
+    try {
+      const response = await fetch("/reportes/compras-cliente/pdf", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+          cliente_id: clienteId,
+          start_date: startValue,
+          end_date: endValue,
+          result_id: currentClientResultId,
+        }),
+      });
+      const result = await response.json();
+      if (!response.ok) {
+        throw new Error(result.error || "No se pudo generar el PDF.");
+      }
+      currentClientPdfUrl = result.pdf_url || "";
+      if (currentClientPdfUrl) {
+        window.open(currentClientPdfUrl, "_blank");
+      }
+    } catch (error) {
+      alert("No se pudo generar el PDF.");
+    }
+  });
+}
+if (clientWhatsappButton) {
+  clientWhatsappButton.addEventListener("click", () => {
+    const phone = clientPhoneInput.value.replace(/\\D/g, "");
+    if (!phone) {
+      alert("Ingresa un telefono de WhatsApp para continuar.");
+      return;
+    }
+    if (!currentClientPdfUrl) {
+      alert("Primero genera el PDF para poder enviarlo.");
+      return;
+    }
+    const client = clientSelect.options[clientSelect.selectedIndex]?.text || "";
+    const message = encodeURIComponent(
+      `Hola ${client}. Te envio el reporte de compras. PDF: ${currentClientPdfUrl}`
+    );
+    window.open(`https://wa.me/${phone}?text=${message}`, "_blank");
+  });
+}
+
+const openProductModal = () => {
+  const today = new Date();
+  const startOfMonth = new Date(today.getFullYear(), today.getMonth(), 1);
+  productStartInput.value = toDateInputValue(startOfMonth);
+  productEndInput.value = toDateInputValue(today);
+  productClientSelect.value = "";
+  productRangeLabel.textContent = "Cliente: -";
+  productPhoneInput.value = "";
+  currentProductPdfUrl = "";
+  renderProductEmpty("Selecciona un cliente para iniciar.");
+  productTotalLabel.textContent = formatCurrency(0);
+  productCountLabel.textContent = "0";
+  productModal.classList.add("open");
+};
+
+productOpenButtons.forEach((button) => {
+  button.addEventListener("click", openProductModal);
+});
+productCloseButtons.forEach((button) => {
+  button.addEventListener("click", () => productModal.classList.remove("open"));
+});
+if (productModal) {
+  productModal.addEventListener("click", (event) => {
+    if (event.target === productModal) {
+      productModal.classList.remove("open");
+    }
+  });
+}
+if (productClientSelect) {
+  productClientSelect.addEventListener("change", () => {
+    const selectedText =
+      productClientSelect.options[productClientSelect.selectedIndex]?.textContent || "-";
+    productRangeLabel.textContent = `Cliente: ${selectedText}`;
+    productPhoneInput.value = selectedClient(productClientSelect)?.telefono || "";
+  });
+}
+if (productSearchButton) {
+  productSearchButton.addEventListener("click", async () => {
+    const clienteId = productClientSelect.value;
+    if (!clienteId) {
+      renderProductEmpty("Selecciona un cliente para iniciar.");
+      return;
+    }
+    const startValue = productStartInput.value;
+    const endValue = productEndInput.value;
+    if (!startValue || !endValue) {
+      renderProductEmpty("Selecciona un rango de fechas.");
+      return;
+    }
+    const selectedText =
+      productClientSelect.options[productClientSelect.selectedIndex]?.textContent || "-";
+    productRangeLabel.textContent = `Cliente: ${selectedText}`;
+    currentProductPdfUrl = "";
+    currentProductResultId = "";
+    try {
+      const response = await fetch("/reportes/productos-cliente", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+          cliente_id: clienteId,
+          start_date: startValue,
+          end_date: endValue,
+        }),
+      });
+      const result = await response.json();
+      if (!response.ok) {
+        throw new Error(result.error || "No se pudo cargar.");
+      }
+      currentProductResultId = result.result_id || "";
+      const productos = result.productos || [];
+      productTableBody.innerHTML = "";
+      if (!productos.length) {
+        renderProductEmpty("No hay compras en el rango seleccionado.");
+        productTotalLabel.textContent = formatCurrency(0);
+        productCountLabel.textContent = "0";
+        return;
+      }
+      productos.forEach((producto) => {
+        const row = document.createElement("div");
+        row.className = "report-table-row";
+        row.innerHTML = `
+          <span>${producto.nombre}</span>
+          <span>${producto.cantidad}</span>
+          <span>${formatCurrency(producto.total)}</span>
+        `;
+        productTableBody.appendChild(row);
+      });
+      productTotalLabel.textContent = formatCurrency(result.total || 0);
+      productCountLabel.textContent = `${productos.length}`;
+    } catch (error) {
+      renderProductEmpty("No se pudo cargar el reporte.");
+    }
+  });
+}
+if (productPdfButton) {
+  productPdfButton.addEventListener("click", async () => {
+    const clienteId = productClientSelect.value;
+    if (!clienteId) {
+      alert("Selecciona un cliente para generar el PDF.");
+      return;
+    }
+    const startValue = productStartInput.value;
+    const endValue = productEndInput.value;
+    if (!startValue || !endValue) {
+      alert("Selecciona un rango de fechas.");
+      return;
+    }
+    try {
+      const response = await fetch("/reportes/productos-cliente/pdf", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+          cliente_id: clienteId,
+          start_date: startValue,
+          end_date: endValue,
+          result_id: currentProductResultId,
+        }),
+      });
+      const result = await response.json();
+      if (!response.ok) {
+        throw new Error(result.error || "No se pudo generar el PDF.");
+      }
+      currentProductPdfUrl = result.pdf_url || "";
+      if (currentProductPdfUrl) {
+        window.open(currentProductPdfUrl, "_blank");
+      }
+    } catch (error) {
+      alert("No se pudo generar el PDF.");
+    }
+  });
+}
+if (productWhatsappButton) {
+  productWhatsappButton.addEventListener("click", () => {
+    const phone = productPhoneInput.value.replace(/\\D/g, "");
+    if (!phone) {
+      alert("Ingresa un telefono de WhatsApp para continuar.");
+      return;
+    }
+    if (!currentProductPdfUrl) {
+      alert("Primero genera el PDF para poder enviarlo.");
+      return;
+    }
+    const client = productClientSelect.options[productClientSelect.selectedIndex]?.text || "";
+    const message = encodeURIComponent(
+      `Hola ${client}. Te envio el reporte de productos comprados. PDF: ${currentProductPdfUrl}`
+    );
+    window.open(`https://wa.me/${phone}?text=${message}`, "_blank");
+  });
+}
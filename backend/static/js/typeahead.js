@@ -0,0 +1,89 @@
+// Busqueda de clientes y productos mientras se escribe (/buscar/clientes,
+// /buscar/productos). Un <select data-typeahead="/buscar/clientes"> recibe un
+// campo de busqueda encima y sus opciones pasan a ser las mejores
+// coincidencias; el select sigue siendo el que lee el formulario o el JS de
+// la pagina. Cada opcion lleva los datos del resultado en data-* (data-rtn,
+// data-telefono, ...). Enter en el campo elige la primera coincidencia.
+(() => {
+  const CACHE_MS = 30000;
+  const cache = new Map();
+
+  const search = async (url, query, { limit = 20, signal } = {}) => {
+    const key = `${url}|${limit}|${query.toLowerCase()}`;
+    const cached = cache.get(key);
+    if (cached && Date.now() - cached.at < CACHE_MS) return cached.results;
+    const params = new URLSearchParams({ q: query, limit: String(limit) });
+    const response = await fetch(`${url}?${params}`, {
+      signal,
+      headers: { Accept: "application/json" },
+    });
+    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+    const { results } = await response.json();
+    cache.set(key, { at: Date.now(), results });
+    if (cache.size > 100) cache.delete(cache.keys().next().value);
+    return results;
+  };
+
+  const optionFor = (item) => {
+    const option = document.createElement("option");
+    option.value = String(item.id);
+    option.textContent = item.nombre;
+    Object.entries(item).forEach(([field, value]) => {
+      if (field !== "id") option.dataset[field] = value == null ? "" : String(value);
+    });
+    return option;
+  };
+
+  // Deja el "Selecciona..." (value vacio) y la opcion elegida; el resto se
+  // cambia por los resultados.
+  const fillSelect = (select, results) => {
+    Array.from(select.options).forEach((option) => {
+      if (option.value && !option.selected) option.remove();
+    });
+    results.forEach((item) => {
+      if (String(item.id) !== select.value) select.appendChild(optionFor(item));
+    });
+  };
+
+  const attach = (select) => {
+    const url = select.dataset.typeahead;
+    const input = document.createElement("input");
+    input.type = "search";
+    input.autocomplete = "off";
+    input.className = "typeahead-input";
+    input.placeholder = select.dataset.typeaheadPlaceholder || "Buscar...";
+    select.before(input);
+
+    let controller = null;
+    let timer = null;
+    let lastResults = [];
+    const refresh = async () => {
+      if (controller) controller.abort();
+      controller = new AbortController();
+      try {
+        lastResults = await search(url, input.value.trim(), { signal: controller.signal });
+        fillSelect(select, lastResults);
+      } catch (error) {
+        if (error.name !== "AbortError") console.error("typeahead", error);
+      }
+    };
+    input.addEventListener("input", () => {
+      clearTimeout(timer);
+      timer = setTimeout(refresh, 150);
+    });
+    input.addEventListener("focus", refresh, { once: true });
+    select.addEventListener("focus", refresh, { once: true });
+    input.addEventListener("keydown", async (event) => {
+      if (event.key !== "Enter") return;
+      event.preventDefault();
+      clearTimeout(timer);
+      await refresh();
+      if (!lastResults.length) return;
+      select.value = String(lastResults[0].id);
+      select.dispatchEvent(new Event("change", { bubbles: true }));
+    });
+  };
+
+  document.querySelectorAll("select[data-typeahead]").forEach(attach);
+  window.InvagroTypeahead = { search, fillSelect, optionFor };
+})();
@@ -0,0 +1,241 @@
+"""
+static_assets.py · Sistema Invagro
+
+Build de los CSS y JS propios: se minifican, se les agrega un hash del
+contenido al nombre y se guardan ya comprimidos (gzip y, si está el módulo
+`brotli`, también br) en `static/dist/`:
+
+    css/styles.css  ->  dist/css/styles.3f9a1c0b7d2e.css
+                        dist/css/styles.3f9a1c0b7d2e.css.gz
+                        dist/css/styles.3f9a1c0b7d2e.css.br
+
+`dist/manifest.json` relaciona cada nombre lógico con su versión con hash.
+Como el nombre cambia cuando cambia el contenido, esas URLs se sirven con
+`Cache-Control: immutable` por un año y el navegador no vuelve a pedirlas.
+
+Cómo se usa:
+
+    flask --app wsgi build-assets           # en cada deploy
+
+    <link rel="stylesheet" href="{{ asset_url('css/styles.css') }}" />
+
+Sin build (desarrollo), `asset_url` devuelve la URL normal de /static con
+`?v=<mtime>`, así que los cambios se ven sin correr nada.
+
+El minificador de CSS es conservador (comentarios y espacios) y asume que
+los `url()` son absolutos (`/static/...`), porque el archivo final vive en
+otra carpeta. Los JS se minifican con `rjsmin` (requirements.txt); si no
+está instalado se publican tal cual y `flask build-assets` lo avisa.
+Las versiones anteriores no se borran: una página cacheada que todavía
+pide el hash viejo lo sigue encontrando durante el deploy.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+
+
+ASSET_SOURCES = ("css", "js")
+ASSET_EXTENSIONS = {".css", ".js"}
+DIST_DIRNAME = "dist"
+MANIFEST_NAME = "manifest.json"
+HASH_LENGTH = 12
+# Bajo este tamaño comprimir no ahorra nada que valga la pena.
+COMPRESS_MIN_BYTES = 512
+
+_HASHED_NAME = re.compile(r"\.[0-9a-f]{%d}\.(?:css|js)$" % HASH_LENGTH)
+
+_CSS_TOKENS = re.compile(
+    r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|(/\*.*?\*/)|(\s+)""",
+    re.S,
+)
+# Sin espacio antes/después de estos caracteres. `:` solo después: antes
+# separa un selector descendiente (`a :hover`). `(` y `)` se dejan por las
+# media queries (`and (max-width: ...)`).
+_CSS_NO_SPACE_BEFORE = set("{};,>")
+_CSS_NO_SPACE_AFTER = set("{};,>:")
+_CSS_LAST_SEMICOLON = re.compile(r";+}")
+
+
+def minify_css(text):
+    """Quita comentarios (salvo `/*! ... */`) y espacios sobrantes, sin tocar strings."""
+    pieces = []
+    position = 0
+    for match in _CSS_TOKENS.finditer(text):
+        if match.start() > position:
+            pieces.append((False, text[position:match.start()]))
+        position = match.end()
+        string, comment, _ = match.groups()
+        if string:
+            pieces.append((True, string))
+        elif comment:
+            if comment.startswith("/*!"):
+                pieces.append((True, comment))
+        elif not pieces or pieces[-1][1] != " ":
+            pieces.append((False, " "))
+    if position < len(text):
+        pieces.append((False, text[position:]))
+
+    output = []
+    for index, (literal, piece) in enumerate(pieces):
+        if literal or piece != " ":
+            if output and not literal and not output[-1][0]:
+                output[-1] = (False, output[-1][1] + piece)
+            else:
+                output.append((literal, piece))
+            continue
+        previous = output[-1][1][-1] if output else ""
+        following = pieces[index + 1][1][0] if index + 1 < len(pieces) else ""
+        if not previous or not following:
+            continue
+        if previous in _CSS_NO_SPACE_AFTER or following in _CSS_NO_SPACE_BEFORE:
+            continue
+        if output[-1][0]:
+            output.append((False, " "))
+        else:
+            output[-1] = (False, output[-1][1] + " ")
+    css = "".join(piece if literal else _CSS_LAST_SEMICOLON.sub("}", piece) for literal, piece in output)
+    return css.strip() + "\n"
+
+
+def js_minifier_available():
+    try:
+        import rjsmin  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def minify_js(text):
+    try:
+        from rjsmin import jsmin
+    except ImportError:
+        return text
+    return jsmin(text, keep_bang_comments=True) + "\n"
+
+
+MINIFIERS = {".css": minify_css, ".js": minify_js}
+
+
+def hashed_name(path, content):
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    stem, extension = os.path.splitext(path)
+    return f"{stem}.{digest}{extension}"
+
+
+def is_hashed_asset(filename):
+    """Solo los archivos versionados se sirven desde dist/ (no el manifiesto ni los .gz)."""
+    return bool(_HASHED_NAME.search(filename))
+
+
+def _write_if_missing(path, data):
+    if os.path.isfile(path):
+        return
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as handle:
+        handle.write(data)
+    os.replace(temp_path, path)
+
+
+def _brotli_compress(data):
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=11)
+
+
+def iter_sources(static_folder):
+    """Nombres lógicos (`css/styles.css`) de los archivos a publicar."""
+    for directory in ASSET_SOURCES:
+        root = os.path.join(static_folder, directory)
+        for current, _, files in os.walk(root):
+            for name in sorted(files):
+                if os.path.splitext(name)[1] in ASSET_EXTENSIONS:
+                    full_path = os.path.join(current, name)
+                    yield os.path.relpath(full_path, static_folder).replace(os.sep, "/")
+
+
+def build_assets(static_folder, echo=None):
+    """Genera `dist/` y el manifiesto. Devuelve una fila de tamaños por archivo."""
+    dist_folder = os.path.join(static_folder, DIST_DIRNAME)
+    manifest = {}
+    report = []
+    for logical in iter_sources(static_folder):
+        source_path = os.path.join(static_folder, logical)
+        with open(source_path, encoding="utf-8") as handle:
+            original = handle.read()
+        extension = os.path.splitext(logical)[1]
+        content = MINIFIERS[extension](original).encode("utf-8")
+        target = hashed_name(logical, content)
+        target_path = os.path.join(dist_folder, target)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        _write_if_missing(target_path, content)
+
+        row = {
+            "asset": logical,
+            "file": target,
+            "original": len(original.encode("utf-8")),
+            "minified": len(content),
+            "gzip": None,
+            "br": None,
+        }
+        if len(content) >= COMPRESS_MIN_BYTES:
+            # mtime=0: el .gz sale idéntico en cada build y en cada servidor.
+            gzipped = gzip.compress(content, compresslevel=9, mtime=0)
+            _write_if_missing(f"{target_path}.gz", gzipped)
+            row["gzip"] = len(gzipped)
+            brotli_data = _brotli_compress(content)
+            if brotli_data is not None:
+                _write_if_missing(f"{target_path}.br", brotli_data)
+                row["br"] = len(brotli_data)
+        manifest[logical] = target
+        report.append(row)
+        if echo:
+            echo(row)
+
+    manifest_path = os.path.join(dist_folder, MANIFEST_NAME)
+    os.makedirs(dist_folder, exist_ok=True)
+    temp_path = f"{manifest_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, indent=2, sort_keys=True)
+    os.replace(temp_path, manifest_path)
+    return report
+
+
+class AssetManifest:
+    """Lee `dist/manifest.json` y lo vuelve a leer solo si el archivo cambió."""
+
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self.path = os.path.join(static_folder, DIST_DIRNAME, MANIFEST_NAME)
+        self._mtime = None
+        self._entries = {}
+
+    def entries(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            self._mtime = None
+            self._entries = {}
+            return self._entries
+        if mtime != self._mtime:
+            try:
+                with open(self.path, encoding="utf-8") as handle:
+                    self._entries = json.load(handle)
+            except (OSError, ValueError):
+                self._entries = {}
+            self._mtime = mtime
+        return self._entries
+
+    def lookup(self, logical):
+        """Nombre con hash dentro de dist/, o None si no hay build para ese archivo."""
+        return self.entries().get(logical)
+
+    def source_version(self, logical):
+        try:
+            return int(os.stat(os.path.join(self.static_folder, logical)).st_mtime)
+        except OSError:
+            return None
@@ -0,0 +1,496 @@
+"""
+synthetic_data.py · Sistema Invagro
+
+Generador de datos sintéticos para medir el sistema con volumen real.
+
+Carga clientes, productos, facturas (contado, crédito, pagadas y anuladas)
+con su detalle, abonos, pedidos, cobros personales y lotes de aves con
+planes y actividades realizadas. Con la misma semilla y la misma base
+inicial produce exactamente los mismos datos.
+
+Cómo se usa (CLI registrado en create_app):
+
+    flask --app wsgi seed-synthetic --invoices 100000 --seed 42
+
+Todos los registros generados llevan el prefijo SYN en sus códigos
+(numero_factura, codigo, ruc_dni, numero_pedido, numero_cobro, plan_nombre)
+para poder identificarlos o borrarlos después.
+"""
+
+import random
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func
+from werkzeug.security import generate_password_hash
+
+from models import (
+    AbonoCobroPersonal,
+    AbonoFactura,
+    AvesLote,
+    AvesLoteActividad,
+    AvesPlan,
+    Cliente,
+    CobroPersonal,
+    CobroPersonalDetalle,
+    DetalleFacturaContado,
+    DetallePedido,
+    FacturaContado,
+    Pedido,
+    Producto,
+    User,
+    db,
+)
+
+
+CENT = Decimal("0.01")
+ISV_RATE = Decimal("0.15")
+
+NOMBRES = (
+    "Juan", "Maria", "Carlos", "Ana", "Luis", "Rosa", "Jose", "Carmen", "Pedro", "Lucia",
+    "Miguel", "Sofia", "Jorge", "Elena", "Ramon", "Marta", "Oscar", "Gloria", "Mario", "Teresa",
+)
+APELLIDOS = (
+    "Lopez", "Martinez", "Hernandez", "Garcia", "Rodriguez", "Flores", "Mejia", "Reyes",
+    "Castillo", "Zelaya", "Aguilar", "Cruz", "Rivera", "Ortiz", "Pineda", "Banegas",
+)
+CATEGORIAS = ("Alimentos", "Medicamentos", "Vacunas", "Accesorios", "Semillas", "Fertilizantes")
+PRODUCTOS_BASE = (
+    "Concentrado", "Vitamina", "Desparasitante", "Antibiotico", "Vacuna", "Comedero",
+    "Bebedero", "Semilla", "Abono", "Sal mineral", "Melaza", "Suplemento",
+)
+PLAN_ACTIVIDADES = (
+    ("Marek", "vacunacion", 1),
+    ("Newcastle B1", "vacunacion", 7),
+    ("Gumboro", "vacunacion", 14),
+    ("Despique", "despique", 10),
+    ("Bronquitis", "vacunacion", 21),
+    ("Desparasitacion", "desparasitacion", 35),
+    ("Newcastle refuerzo", "vacunacion", 42),
+    ("Viruela", "vacunacion", 56),
+)
+FACTURA_ESTADOS = (("contado", 70), ("credito", 18), ("pagada", 7), ("anulada", 5))
+PEDIDO_ESTADOS = (("pendiente", 30), ("listo", 20), ("facturado", 45), ("anulado", 5))
+COBRO_ESTADOS = (("pendiente", 60), ("pagado", 35), ("anulado", 5))
+
+
+def money(value):
+    return Decimal(value).quantize(CENT)
+
+
+def weighted_choice(rng, options):
+    total = sum(weight for _, weight in options)
+    pick = rng.uniform(0, total)
+    for value, weight in options:
+        pick -= weight
+        if pick <= 0:
+            return value
+    return options[-1][0]
+
+
+def next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+class SyntheticLoader:
+    """Inserta filas por lotes con executemany y ids asignados de antemano.
+
+    Al llenarse un lote se vacían todas las tablas pendientes en el orden en
+    que se usaron por primera vez (padres antes que hijos), así las llaves
+    foráneas siempre apuntan a filas ya insertadas.
+    """
+
+    def __init__(self, batch_size=5000):
+        self.batch_size = max(1, int(batch_size))
+        self.pending = {}
+        self.counts = {}
+
+    def add(self, model, row):
+        rows = self.pending.setdefault(model, [])
+        rows.append(row)
+        if len(rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self, model=None):
+        models = [model] if model is not None else list(self.pending)
+        for item in models:
+            rows = self.pending.get(item)
+            if not rows:
+                continue
+            db.session.execute(item.__table__.insert(), rows)
+            db.session.commit()
+            self.counts[item.__tablename__] = self.counts.get(item.__tablename__, 0) + len(rows)
+            self.pending[item] = []
+
+
+def seed_synthetic(
+    invoices=10000,
+    clients=None,
+    products=None,
+    vendedores=5,
+    pedidos=None,
+    cobros=None,
+    lotes=None,
+    days=365,
+    seed=42,
+    batch_size=5000,
+    echo=None,
+):
+    """Genera el volumen pedido y devuelve {tabla: filas insertadas}."""
+    rng = random.Random(seed)
+    clients = clients if clients is not None else max(50, invoices // 20)
+    products = products if products is not None else max(30, min(2000, invoices // 100))
+    pedidos = pedidos if pedidos is not None else invoices // 10
+    cobros = cobros if cobros is not None else invoices // 20
+    lotes = lotes if lotes is not None else max(10, invoices // 500)
+    now = datetime.utcnow().replace(microsecond=0)
+    start = now - timedelta(days=days)
+    span_seconds = max(1, int((now - start).total_seconds()))
+    loader = SyntheticLoader(batch_size=batch_size)
+    started = time.perf_counter()
+
+    def log(message):
+        if echo:
+            echo(f"[{time.perf_counter() - started:7.1f}s] {message}")
+
+    def random_datetime():
+        return start + timedelta(seconds=rng.randrange(span_seconds))
+
+    # ---------- Vendedores ----------
+    password_hash = generate_password_hash(f"synthetic-{seed}")
+    vendedor_ids = []
+    for index in range(vendedores):
+        username = f"syn_vendedor_{index + 1}"
+        user = User.query.filter_by(username=username).first()
+        if not user:
+            user = User(
+                username=username,
+                password=password_hash,
+                nombre_completo=f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}",
+                rol="vendedor",
+                activo=True,
+                fecha_creacion=now,
+            )
+            db.session.add(user)
+            db.session.flush()
+        vendedor_ids.append(user.id)
+    db.session.commit()
+    log(f"{len(vendedor_ids)} vendedores")
+
+    # ---------- Clientes ----------
+    first_client = next_id(Cliente)
+    client_ids = list(range(first_client, first_client + clients))
+    client_rtn = {}
+    for client_id in client_ids:
+        rtn = f"SYN{client_id:011d}"
+        client_rtn[client_id] = rtn
+        loader.add(
+            Cliente,
+            {
+                "id": client_id,
+                "nombre": f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}",
+                "ruc_dni": rtn,
+                "direccion": f"Colonia {rng.choice(APELLIDOS)}, casa {rng.randint(1, 900)}",
+                "telefono": f"9{rng.randint(1000000, 9999999)}",
+                "email": None,
+                "fecha_registro": random_datetime(),
+            },
+        )
+    loader.flush(Cliente)
+    log(f"{clients} clientes")
+
+    # ---------- Productos ----------
+    first_product = next_id(Producto)
+    product_rows = []
+    for product_id in range(first_product, first_product + products):
+        row = {
+            "id": product_id,
+            "codigo": f"SYN-P{product_id:06d}",
+            "nombre": f"{rng.choice(PRODUCTOS_BASE)} {rng.choice(APELLIDOS)} {product_id}",
+            "categoria": rng.choice(CATEGORIAS),
+            "precio": money(rng.uniform(15, 2500)),
+            "stock": rng.randint(0, 5000),
+            "descripcion": None,
+            "activo": rng.random() > 0.05,
+            "isv_aplica": rng.random() < 0.35,
+            "foto": None,
+        }
+        product_rows.append(row)
+        loader.add(Producto, row)
+    loader.flush(Producto)
+    log(f"{products} productos")
+
+    def build_lines(max_lines):
+        lines = []
+        subtotal = Decimal("0")
+        isv = Decimal("0")
+        for product in rng.sample(product_rows, k=min(len(product_rows), rng.randint(1, max_lines))):
+            cantidad = rng.randint(1, 20)
+            line_subtotal = money(product["precio"] * cantidad)
+            subtotal += line_subtotal
+            if product["isv_aplica"]:
+                isv += money(line_subtotal * ISV_RATE)
+            lines.append((product, cantidad, line_subtotal))
+        return lines, money(subtotal), money(isv)
+
+    # ---------- Facturas, detalle y abonos ----------
+    first_invoice = next_id(FacturaContado)
+    detail_id = next_id(DetalleFacturaContado)
+    abono_id = next_id(AbonoFactura)
+    for invoice_id in range(first_invoice, first_invoice + invoices):
+        client_id = rng.choice(client_ids) if rng.random() > 0.1 else None
+        estado = weighted_choice(rng, FACTURA_ESTADOS)
+        fecha = random_datetime()
+        lines, subtotal, isv = build_lines(8)
+        total = subtotal + isv
+        if estado == "contado":
+            pago = money(total + rng.choice((0, 0, 5, 20, 50)))
+        elif estado == "credito":
+            pago = money(total * Decimal(rng.choice((0, 0, 25, 50, 75))) / 100)
+        elif estado == "pagada":
+            pago = total
+        else:
+            pago = Decimal("0")
+        loader.add(
+            FacturaContado,
+            {
+                "id": invoice_id,
+                "numero_factura": f"SYN-F{invoice_id:010d}",
+                "cliente_id": client_id,
+                "usuario_id": rng.choice(vendedor_ids) if vendedor_ids else None,
+                "rtn": client_rtn.get(client_id),
+                "fecha": fecha,
+                "subtotal": subtotal,
+                "isv": isv,
+                "descuento": Decimal("0"),
+                "total": total,
+                "pago": pago,
+                "cambio": money(pago - total) if estado == "contado" else Decimal("0"),
+                "estado": estado,
+                "pdf_filename": None,
+            },
+        )
+        for product, cantidad, line_subtotal in lines:
+            loader.add(
+                DetalleFacturaContado,
+                {
+                    "id": detail_id,
+                    "factura_id": invoice_id,
+                    "producto_id": product["id"],
+                    "cantidad": cantidad,
+                    "precio_unitario": product["precio"],
+                    "subtotal": line_subtotal,
+                    "descuento": Decimal("0"),
+                    "isv_aplica": product["isv_aplica"],
+                },
+            )
+            detail_id += 1
+        if estado in {"credito", "pagada"} and pago > 0:
+            parts = rng.randint(1, 3)
+            remaining = pago
+            for part in range(parts):
+                monto = remaining if part == parts - 1 else money(remaining / (parts - part))
+                remaining -= monto
+                loader.add(
+                    AbonoFactura,
+                    {
+                        "id": abono_id,
+                        "factura_id": invoice_id,
+                        "usuario_id": rng.choice(vendedor_ids) if vendedor_ids else None,
+                        "monto": monto,
+                        "fecha": min(now, fecha + timedelta(days=rng.randint(1, 60) * (part + 1))),
+                    },
+                )
+                abono_id += 1
+        if (invoice_id - first_invoice + 1) % 50000 == 0:
+            log(f"{invoice_id - first_invoice + 1} facturas")
+    loader.flush(FacturaContado)
+    loader.flush(DetalleFacturaContado)
+    loader.flush(AbonoFactura)
+    log(f"{invoices} facturas")
+
+    # ---------- Pedidos ----------
+    first_pedido = next_id(Pedido)
+    pedido_detail_id = next_id(DetallePedido)
+    for pedido_id in range(first_pedido, first_pedido + pedidos):
+        client_id = rng.choice(client_ids)
+        lines, subtotal, isv = build_lines(5)
+        loader.add(
+            Pedido,
+            {
+                "id": pedido_id,
+                "numero_pedido": f"SYN-PED{pedido_id:09d}",
+                "cliente_id": client_id,
+                "usuario_id": rng.choice(vendedor_ids) if vendedor_ids else None,
+                "rtn": client_rtn.get(client_id),
+                "fecha": random_datetime(),
+                "subtotal": subtotal,
+                "isv": isv,
+                "descuento": Decimal("0"),
+                "total": subtotal + isv,
+                "estado": weighted_choice(rng, PEDIDO_ESTADOS),
+            },
+        )
+        for product, cantidad, line_subtotal in lines:
+            loader.add(
+                DetallePedido,
+                {
+                    "id": pedido_detail_id,
+                    "pedido_id": pedido_id,
+                    "producto_id": product["id"],
+                    "cantidad": cantidad,
+                    "precio_unitario": product["precio"],
+                    "subtotal": line_subtotal,
+                    "descuento": Decimal("0"),
+                    "isv_aplica": product["isv_aplica"],
+                },
+            )
+            pedido_detail_id += 1
+    loader.flush(Pedido)
+    loader.flush(DetallePedido)
+    log(f"{pedidos} pedidos")
+
+    # ---------- Cobros personales ----------
+    first_cobro = next_id(CobroPersonal)
+    cobro_detail_id = next_id(CobroPersonalDetalle)
+    cobro_abono_id = next_id(AbonoCobroPersonal)
+    for cobro_id in range(first_cobro, first_cobro + cobros):
+        client_id = rng.choice(client_ids)
+        fecha = random_datetime()
+        estado = weighted_choice(rng, COBRO_ESTADOS)
+        details = []
+        total = Decimal("0")
+        for _ in range(rng.randint(1, 3)):
+            cantidad = money(rng.randint(1, 5))
+            precio = money(rng.uniform(50, 1500))
+            details.append((cantidad, precio, money(cantidad * precio)))
+            total += money(cantidad * precio)
+        abonado = total if estado == "pagado" else (
+            money(total * Decimal(rng.choice((0, 0, 30, 60))) / 100) if estado == "pendiente" else Decimal("0")
+        )
+        loader.add(
+            CobroPersonal,
+            {
+                "id": cobro_id,
+                "numero_cobro": f"SYN-CP{cobro_id:09d}",
+                "cliente_id": client_id,
+                "nombre": f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}",
+                "concepto": f"Servicio {rng.choice(PRODUCTOS_BASE).lower()}",
+                "telefono": f"9{rng.randint(1000000, 9999999)}",
+                "fecha": fecha,
+                "fecha_vencimiento": (fecha + timedelta(days=rng.choice((15, 30, 45)))).date(),
+                "total": total,
+                "saldo": total - abonado,
+                "observaciones": None,
+                "usuario_id": rng.choice(vendedor_ids) if vendedor_ids else None,
+                "estado": estado,
+            },
+        )
+        for cantidad, precio, subtotal in details:
+            loader.add(
+                CobroPersonalDetalle,
+                {
+                    "id": cobro_detail_id,
+                    "cobro_id": cobro_id,
+                    "descripcion": f"{rng.choice(PRODUCTOS_BASE)} a domicilio",
+                    "cantidad": cantidad,
+                    "precio_unitario": precio,
+                    "subtotal": subtotal,
+                },
+            )
+            cobro_detail_id += 1
+        if abonado > 0:
+            loader.add(
+                AbonoCobroPersonal,
+                {
+                    "id": cobro_abono_id,
+                    "cobro_id": cobro_id,
+                    "usuario_id": rng.choice(vendedor_ids) if vendedor_ids else None,
+                    "monto": abonado,
+                    "comentario": None,
+                    "fecha": min(now, fecha + timedelta(days=rng.randint(1, 30))),
+                },
+            )
+            cobro_abono_id += 1
+    loader.flush(CobroPersonal)
+    loader.flush(CobroPersonalDetalle)
+    loader.flush(AbonoCobroPersonal)
+    log(f"{cobros} cobros personales")
+
+    # ---------- Aves: planes, lotes y actividades realizadas ----------
+    plan_rows = []
+    plan_id = next_id(AvesPlan)
+    plan_names = [f"SYN Plan {seed}-{index + 1}" for index in range(3)]
+    existing_plans = {
+        name
+        for (name,) in db.session.query(AvesPlan.plan_nombre)
+        .filter(AvesPlan.plan_nombre.in_(plan_names))
+        .distinct()
+    }
+    for plan_nombre in plan_names:
+        if plan_nombre in existing_plans:
+            continue
+        for nombre, tipo, edad_dias in PLAN_ACTIVIDADES:
+            row = {
+                "id": plan_id,
+                "plan_nombre": plan_nombre,
+                "nombre": nombre,
+                "tipo": tipo,
+                "edad_dias": edad_dias + rng.randint(0, 3),
+                "descripcion": None,
+                "activo": True,
+                "fecha_creacion": now,
+            }
+            plan_rows.append(row)
+            loader.add(AvesPlan, row)
+            plan_id += 1
+    loader.flush(AvesPlan)
+    plans_by_name = {}
+    for plan in AvesPlan.query.filter(AvesPlan.plan_nombre.in_(plan_names)).all():
+        plans_by_name.setdefault(plan.plan_nombre, []).append(plan)
+
+    today = date.today()
+    first_lote = next_id(AvesLote)
+    actividad_id = next_id(AvesLoteActividad)
+    for lote_id in range(first_lote, first_lote + lotes):
+        plan_nombre = rng.choice(plan_names)
+        fecha_nacimiento = today - timedelta(days=rng.randint(0, 70))
+        loader.add(
+            AvesLote,
+            {
+                "id": lote_id,
+                "nombre": f"Lote SYN {lote_id}",
+                "encargado": f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}",
+                "telefono": f"9{rng.randint(1000000, 9999999)}",
+                "fecha_nacimiento": fecha_nacimiento,
+                "plan_nombre": plan_nombre,
+                "cantidad_aves": rng.randint(200, 20000),
+                "observaciones": None,
+                "activo": True,
+                "fecha_registro": now,
+            },
+        )
+        for plan in plans_by_name.get(plan_nombre, []):
+            fecha_programada = fecha_nacimiento + timedelta(days=plan.edad_dias)
+            if fecha_programada > today or rng.random() > 0.8:
+                continue
+            loader.add(
+                AvesLoteActividad,
+                {
+                    "id": actividad_id,
+                    "lote_id": lote_id,
+                    "plan_id": plan.id,
+                    "actividad_nombre": plan.nombre,
+                    "tipo": plan.tipo,
+                    "edad_dias": plan.edad_dias,
+                    "fecha_programada": fecha_programada,
+                    "fecha_realizacion": min(today, fecha_programada + timedelta(days=rng.randint(0, 2))),
+                    "comentarios": None,
+                    "fecha_registro": now,
+                },
+            )
+            actividad_id += 1
+    loader.flush()
+    log(f"{lotes} lotes de aves")
+    return loader.counts
@@ -0,0 +1,153 @@
+"""
+typeahead.py · Sistema Invagro
+
+Búsqueda mientras se escribe (clientes, productos) sobre un índice en
+memoria por worker. El índice guarda solo lo necesario para mostrar la
+sugerencia (id, nombre, un par de datos) con el texto ya normalizado por
+`normalize_text`: "pena" encuentra "Peña" y "AVICOLA" encuentra "Avícola",
+igual en MySQL que en SQLite.
+
+Orden de los resultados:
+
+    0  nombre, código o RTN idéntico a lo escrito
+    1  el nombre empieza con lo escrito
+    2  cada palabra escrita es el inicio de una palabra del nombre
+    3  cada palabra escrita aparece en cualquier parte (nombre, código, RTN)
+
+y dentro de cada grupo, alfabético. El índice se vuelve a cargar cuando
+vence `ttl_seconds` o al llamar `invalidate()` (los guardados de este
+worker); las últimas búsquedas se recuerdan hasta la siguiente recarga.
+
+Cómo se usa:
+
+    clientes = TypeaheadIndex(
+        lambda: [(c.id, c.nombre, (c.ruc_dni,), {"id": c.id, "nombre": c.nombre})
+                 for c in Cliente.query.all()],
+        ttl_seconds=30,
+    )
+
+    clientes.search("avic", limit=10)   # [{"id": .., "nombre": ..}, ...]
+    clientes.invalidate()               # después de crear/editar/borrar
+"""
+
+import bisect
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from chat_router import normalize_text
+
+# Listas paralelas ordenadas por nombre normalizado; by_code: texto -> posiciones.
+_Snapshot = namedtuple("_Snapshot", ["names", "haystacks", "payloads", "by_code"])
+
+
+class TypeaheadIndex:
+    def __init__(self, loader, ttl_seconds=30, max_cached_queries=256):
+        """`loader()` devuelve [(id, nombre, (otros textos buscables), payload)]."""
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        self.max_cached_queries = max(1, int(max_cached_queries))
+        self._snapshot = None
+        self._loaded_at = 0.0
+        self._results = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+            self._generation += 1
+            self._results.clear()
+
+    def _load(self):
+        rows = []
+        for entry_id, nombre, extras, payload in self.loader():
+            name = normalize_text(nombre or "")
+            codes = tuple(normalize_text(str(extra)) for extra in extras if extra)
+            rows.append((name, entry_id, codes, payload))
+        rows.sort(key=lambda row: (row[0], row[1]))
+        by_code = {}
+        for position, (_, _, codes, _) in enumerate(rows):
+            for code in codes:
+                by_code.setdefault(code, []).append(position)
+        return _Snapshot(
+            names=[row[0] for row in rows],
+            haystacks=["\n".join((row[0],) + row[2]) for row in rows],
+            payloads=[row[3] for row in rows],
+            by_code=by_code,
+        )
+
+    def _current_snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._snapshot is not None and now - self._loaded_at <= self.ttl_seconds:
+                return self._snapshot
+            generation = self._generation
+        snapshot = self._load()
+        with self._lock:
+            # Si hubo un invalidate() mientras se cargaba, esta carga ya es vieja.
+            if generation == self._generation:
+                self._snapshot = snapshot
+                self._loaded_at = now
+                self._results.clear()
+        return snapshot
+
+    @staticmethod
+    def _positions(snapshot, query, limit):
+        """Posiciones de los `limit` mejores resultados, en orden."""
+        names = snapshot.names
+        # Grupos 0 y 1: los nombres que empiezan con `query` son un bloque
+        # contiguo de la lista ordenada (el idéntico, si hay, va primero).
+        start = bisect.bisect_left(names, query)
+        end = bisect.bisect_left(names, query + "\uffff", start)
+        exact = [position for position in range(start, end) if names[position] == query]
+        exact += [position for position in snapshot.by_code.get(query, ()) if position not in exact]
+        chosen = exact + [position for position in range(start, end) if position not in exact]
+        if len(chosen) >= limit:
+            return chosen[:limit]
+
+        # Grupos 2 y 3: recorrido de todo el índice, solo si faltan resultados.
+        taken = set(chosen)
+        tokens = sorted(query.split(), key=len, reverse=True)
+        candidates = [
+            position
+            for position, haystack in enumerate(snapshot.haystacks)
+            if tokens[0] in haystack
+        ]
+        for token in tokens[1:]:
+            haystacks = snapshot.haystacks
+            candidates = [position for position in candidates if token in haystacks[position]]
+        word_prefix, infix = [], []
+        for position in candidates:
+            if position in taken:
+                continue
+            padded = " " + names[position]
+            if all(" " + token in padded for token in tokens):
+                word_prefix.append(position)
+            else:
+                infix.append(position)
+        return (chosen + word_prefix + infix)[:limit]
+
+    def search(self, query, limit=10):
+        """Los `limit` mejores payloads para `query` (sin texto: los primeros por nombre)."""
+        query = normalize_text(query or "")
+        snapshot = self._current_snapshot()
+        key = (query, limit)
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+
+        if query:
+            positions = self._positions(snapshot, query, limit)
+        else:
+            positions = range(min(limit, len(snapshot.names)))
+        results = [snapshot.payloads[position] for position in positions]
+
+        with self._lock:
+            if snapshot is not self._snapshot:
+                return results
+            self._results[key] = results
+            while len(self._results) > self.max_cached_queries:
+                self._results.popitem(last=False)
+        return results
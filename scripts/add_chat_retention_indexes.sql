@@ -0,0 +1,12 @@
+-- Indices para lectura por sesion y para la retencion del chat
+ALTER TABLE `inva-chat_messages`
+  ADD INDEX `idx_chat_messages_session_id` (`session_id`, `id`);
+
+ALTER TABLE `inva-chat_summaries`
+  ADD INDEX `idx_chat_summaries_session_id` (`session_id`, `id`);
+
+ALTER TABLE `inva-chat_sessions`
+  ADD INDEX `idx_chat_sessions_updated` (`updated_at`);
+
+ALTER TABLE `inva-chat_audit`
+  ADD INDEX `idx_chat_audit_created` (`created_at`);
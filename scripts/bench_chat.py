@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Benchmark de /api/chat con concurrencia.
+
+Envia mensajes al chat de un backend en ejecucion (gunicorn o `python app.py`)
+con N clientes simultaneos y reporta latencia p50/p95/p99, throughput y
+ocupacion de workers. Pensado para usarse junto a scripts/llm_stub_server.py,
+de modo que la latencia del LLM sea controlada y reproducible.
+
+Ejemplo:
+
+    # 1) Stub del LLM (o usar --start-stub)
+    python scripts/llm_stub_server.py --port 8808 --latency-ms 400
+
+    # 2) Backend apuntando al stub
+    CHAT_LLM_BASE_URL=http://127.0.0.1:8808/v1 CHAT_LLM_API_KEY=stub \\
+    CHAT_LLM_MODEL=stub-model gunicorn --workers 3 --bind 127.0.0.1:8000 wsgi:app
+
+    # 3) Benchmark
+    python scripts/bench_chat.py --url http://127.0.0.1:8000 --username admin \\
+        --password secreto --concurrency 12 --requests 240 --workers 3 \\
+        --stub-url http://127.0.0.1:8808
+
+La ocupacion se calcula como tiempo total atendiendo requests dividido entre
+(tiempo de pared x workers): 1.0 significa que todos los workers estuvieron
+ocupados todo el tiempo.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MESSAGES = [
+    "Hola, que tal va el mes?",
+    "Que indicadores deberia revisar hoy?",
+    "Dame un consejo para mejorar la cobranza.",
+    "Como interpreto una caida en el ticket promedio?",
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def login(base_url, username, password):
+    http = requests.Session()
+    response = http.post(
+        f"{base_url}/login",
+        data={"username": username, "password": password},
+        allow_redirects=False,
+        timeout=10,
+    )
+    if response.status_code not in {302, 303} or "session" not in http.cookies:
+        raise RuntimeError(f"No se pudo iniciar sesion como {username} ({response.status_code}).")
+    return http
+
+
+def run_worker(options, messages, counter, lock, results):
+    http = login(options.url, options.username, options.password)
+    while True:
+        with lock:
+            if counter[0] >= options.requests:
+                return
+            index = counter[0]
+            counter[0] += 1
+        message = messages[index % len(messages)]
+        start = time.perf_counter()
+        try:
+            response = http.post(
+                f"{options.url}/api/chat",
+                json={"message": message},
+                timeout=options.timeout,
+            )
+            status = response.status_code
+            ok = status == 200 and "reply" in (response.json() or {})
+        except (requests.RequestException, ValueError):
+            status = 0
+            ok = False
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with lock:
+            results.append({"elapsed_ms": elapsed_ms, "status": status, "ok": ok})
+
+
+def fetch_stub_stats(stub_url, reset=False):
+    if not stub_url:
+        return None
+    try:
+        if reset:
+            requests.post(f"{stub_url}/stats/reset", timeout=5)
+            return None
+        return requests.get(f"{stub_url}/stats", timeout=5).json()
+    except requests.RequestException:
+        return None
+
+
+def build_report(options, results, wall_s, stub_stats):
+    latencies = [item["elapsed_ms"] for item in results]
+    busy_s = sum(latencies) / 1000
+    ok_count = sum(1 for item in results if item["ok"])
+    statuses = {}
+    for item in results:
+        statuses[str(item["status"])] = statuses.get(str(item["status"]), 0) + 1
+    return {
+        "url": options.url,
+        "concurrency": options.concurrency,
+        "workers": options.workers,
+        "requests": len(results),
+        "ok": ok_count,
+        "errors": len(results) - ok_count,
+        "status_codes": statuses,
+        "wall_s": round(wall_s, 3),
+        "throughput_rps": round(len(results) / wall_s, 2) if wall_s else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 1),
+            "p95": round(percentile(latencies, 95), 1),
+            "p99": round(percentile(latencies, 99), 1),
+            "max": round(max(latencies), 1) if latencies else 0.0,
+            "mean": round(sum(latencies) / len(latencies), 1) if latencies else 0.0,
+        },
+        "worker_occupancy": (
+            round(min(1.0, busy_s / (wall_s * options.workers)), 3)
+            if wall_s and options.workers
+            else None
+        ),
+        "stub": stub_stats,
+    }
+
+
+def print_report(report):
+    lat = report["latency_ms"]
+    print(f"Requests: {report['requests']} (ok {report['ok']}, errores {report['errors']})")
+    print(f"Codigos:  {report['status_codes']}")
+    print(f"Tiempo:   {report['wall_s']} s  |  {report['throughput_rps']} req/s")
+    print(
+        f"Latencia: p50 {lat['p50']} ms  p95 {lat['p95']} ms  p99 {lat['p99']} ms  "
+        f"max {lat['max']} ms"
+    )
+    if report["worker_occupancy"] is not None:
+        print(
+            f"Ocupacion de workers: {report['worker_occupancy'] * 100:.1f}% "
+            f"({report['workers']} workers)"
+        )
+    if report["stub"]:
+        print(f"Stub LLM: {report['stub']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark concurrente de /api/chat.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument(
+        "--workers", type=int, default=3, help="Workers x threads del servidor (para la ocupacion)."
+    )
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--messages-file", help="Archivo con un mensaje por linea.")
+    parser.add_argument("--stub-url", help="URL base del stub para leer /stats.")
+    parser.add_argument(
+        "--start-stub", action="store_true", help="Levanta el stub en este proceso."
+    )
+    parser.add_argument("--stub-port", type=int, default=8808)
+    parser.add_argument("--stub-latency-ms", type=float, default=300.0)
+    parser.add_argument("--stub-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--json", dest="json_path", help="Guardar el reporte en JSON.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    options.url = options.url.rstrip("/")
+    messages = DEFAULT_MESSAGES
+    if options.messages_file:
+        with open(options.messages_file, encoding="utf-8") as handle:
+            messages = [line.strip() for line in handle if line.strip()] or DEFAULT_MESSAGES
+
+    stub_server = None
+    if options.start_stub:
+        import llm_stub_server
+
+        stub_server = llm_stub_server.make_server(
+            llm_stub_server.parse_args(
+                [
+                    "--port", str(options.stub_port),
+                    "--latency-ms", str(options.stub_latency_ms),
+                    "--jitter-ms", str(options.stub_jitter_ms),
+                    "--error-rate", str(options.stub_error_rate),
+                ]
+            )
+        )
+        threading.Thread(target=stub_server.serve_forever, daemon=True).start()
+        options.stub_url = options.stub_url or f"http://127.0.0.1:{options.stub_port}"
+
+    fetch_stub_stats(options.stub_url, reset=True)
+    results = []
+    counter = [0]
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=run_worker, args=(options, messages, counter, lock, results))
+        for _ in range(max(1, options.concurrency))
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_s = time.perf_counter() - start
+
+    report = build_report(options, results, wall_s, fetch_stub_stats(options.stub_url))
+    print_report(report)
+    if options.json_path:
+        with open(options.json_path, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    if stub_server:
+        stub_server.shutdown()
+    return 0 if report["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Verificacion y micro-benchmark del enrutador de /api/chat.
+
+Compara `backend/chat_router.py` contra las reglas lineales que usaba
+`app.py` (detect_intent, pick_tool_fallback y reject_if_mutation_request,
+cada una normalizando el texto por separado) sobre un corpus tabulado, y
+mide el costo por mensaje de ambos caminos.
+
+Uso:
+
+    python scripts/bench_chat_router.py
+    python scripts/bench_chat_router.py --iterations 20000 --json router.json
+
+Sale con codigo 1 si algun caso del corpus no coincide con lo esperado o
+con la implementacion anterior.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from chat_router import ChatRouter, normalize_text  # noqa: E402
+
+
+# (mensaje, intent, tool, is_mutation)
+CORPUS = [
+    ("lista de clientes", "clientes", None, False),
+    ("Top clientes del mes", "clientes", None, False),
+    ("Clientes inactivos hace 60 días", "clientes", "clientes_inactivos", False),
+    ("¿Qué compras hizo el cliente \"Agro Sur\"?", "clientes", "compras_por_cliente", False),
+    ("productos que compra el cliente Juan", "clientes", "productos_por_cliente", False),
+    ("Productos con compra disminuida... no: disminuido", "productos", "productos_disminuidos", False),
+    ("Cuál es el producto más vendido", "productos", "top_productos", False),
+    ("top productos 2024", "productos", "top_productos", False),
+    ("Inventario de concentrado", "productos", None, False),
+    ("ventas de hoy", "facturas", None, False),
+    ("FACTURA 000123", "facturas", None, False),
+    ("Hola, que tal va el mes?", None, None, False),
+    ("", None, None, False),
+    ("   ", None, None, False),
+    ("Elimina el cliente 5", "clientes", None, True),
+    ("borrar facturas anuladas", "facturas", None, True),
+    ("UPDATE productos SET precio = 0", "productos", None, True),
+    ("Agrega un producto nuevo", "productos", None, True),
+    ("Actualizá el inventario", "productos", None, True),
+    ("drop table", None, None, True),
+    ("alternativas de pago", None, None, True),
+    ("compras\tdel   cliente\n Pérez", "clientes", "compras_por_cliente", False),
+    ("productos disminuidos en compras", "productos", "productos_disminuidos", False),
+]
+
+
+def legacy_detect_intent(text):
+    normalized = normalize_text(text)
+    if any(word in normalized for word in ["cliente", "clientes", "lista de clientes", "top clientes"]):
+        return "clientes"
+    if any(word in normalized for word in ["producto", "productos", "inventario"]):
+        return "productos"
+    if any(word in normalized for word in ["factura", "facturas", "venta", "ventas"]):
+        return "facturas"
+    return None
+
+
+def legacy_pick_tool_fallback(message):
+    normalized = normalize_text(message)
+    if "disminuido" in normalized and "compra" in normalized:
+        return "productos_disminuidos"
+    if "producto mas vendido" in normalized or "top productos" in normalized:
+        return "top_productos"
+    if "productos" in normalized and "compra" in normalized:
+        return "productos_por_cliente"
+    if "clientes" in normalized and "inact" in normalized:
+        return "clientes_inactivos"
+    if "compras" in normalized and "cliente" in normalized:
+        return "compras_por_cliente"
+    return None
+
+
+def legacy_reject_if_mutation_request(text_value):
+    normalized = normalize_text(text_value)
+    blocked = [
+        "insert",
+        "update",
+        "delete",
+        "drop",
+        "alter",
+        "elimina",
+        "borra",
+        "borrar",
+        "modifica",
+        "modificar",
+        "actualiza",
+        "actualizar",
+        "agrega",
+        "agregar",
+    ]
+    return any(word in normalized for word in blocked)
+
+
+def legacy_route(message):
+    return (
+        legacy_detect_intent(message),
+        legacy_pick_tool_fallback(message),
+        legacy_reject_if_mutation_request(message),
+    )
+
+
+def check_corpus(router):
+    failures = []
+    for message, intent, tool, is_mutation in CORPUS:
+        route = router.route(message)
+        got = (route.intent, route.tool, route.is_mutation)
+        expected = (intent, tool, is_mutation)
+        legacy = legacy_route(message)
+        if got != expected or got != legacy:
+            failures.append(
+                {"message": message, "expected": expected, "router": got, "legacy": legacy}
+            )
+    return failures
+
+
+def time_per_call(func, messages, iterations):
+    start = time.perf_counter()
+    for index in range(iterations):
+        func(messages[index % len(messages)])
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Corpus y micro-benchmark del enrutador de chat.")
+    parser.add_argument("--iterations", type=int, default=50000)
+    parser.add_argument(
+        "--long-factor",
+        type=int,
+        default=20,
+        help="Repeticiones del corpus para el caso de mensajes largos.",
+    )
+    parser.add_argument("--json", dest="json_path", help="Guardar el reporte en JSON.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    router = ChatRouter()
+
+    failures = check_corpus(router)
+    for failure in failures:
+        print(f"FALLA: {failure}")
+    print(f"Corpus: {len(CORPUS) - len(failures)}/{len(CORPUS)} casos OK")
+
+    short_messages = [item[0] for item in CORPUS]
+    long_messages = [" ".join(short_messages * options.long_factor)]
+    report = {"corpus_cases": len(CORPUS), "failures": len(failures), "us_per_message": {}}
+    for label, messages in (("corto", short_messages), ("largo", long_messages)):
+        iterations = options.iterations if label == "corto" else max(1, options.iterations // 100)
+        legacy_us = time_per_call(legacy_route, messages, iterations)
+        router_us = time_per_call(router.route, messages, iterations)
+        report["us_per_message"][label] = {
+            "legacy": round(legacy_us, 2),
+            "router": round(router_us, 2),
+            "speedup": round(legacy_us / router_us, 2) if router_us else None,
+        }
+        print(
+            f"Mensajes {label}: legacy {legacy_us:.2f} us  router {router_us:.2f} us  "
+            f"(x{legacy_us / router_us:.2f})"
+        )
+
+    if options.json_path:
+        with open(options.json_path, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
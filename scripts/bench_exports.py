@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark de las exportaciones CSV/XLSX en streaming.
+
+Descarga cada exportacion con el test client sin bufferizar la respuesta y
+registra: tiempo hasta el primer bloque (TTFB), tiempo total, bytes
+enviados, filas y, en una segunda descarga, el pico de memoria Python
+asignada (tracemalloc). Con el streaming el pico debe quedar casi igual al
+pasar de 10k a 100k facturas; si crece con las filas, algo volvio a cargar
+todo el resultado en memoria.
+
+Ejemplo (SQLite desechable):
+
+    cd backend
+    DB_ENGINE=sqlite SQLITE_PATH=/tmp/export-50k.sqlite3 \\
+    python ../scripts/bench_exports.py --seed-invoices 50000 --ensure-user \\
+        --password bench123 --fecha-inicio 2020-01-01
+
+Sale con codigo 1 si alguna exportacion no responde 200, si el primer
+bloque tarda mas de --ttfb-budget-ms o si el pico supera --memory-budget-mb.
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_routes import ensure_user  # noqa: E402
+
+EXPORTS = ("facturas", "abonos", "comisiones")
+
+
+def download(client, path, trace_memory=False):
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(path, buffered=False)
+    first_chunk_ms = None
+    size = 0
+    lines = 0
+    for chunk in response.response:
+        if first_chunk_ms is None:
+            first_chunk_ms = (time.perf_counter() - start) * 1000
+        size += len(chunk)
+        lines += chunk.count(b"\n")
+    response.close()
+    total_ms = (time.perf_counter() - start) * 1000
+    peak = 0
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        "status": response.status_code,
+        "ttfb_ms": round(first_chunk_ms or total_ms, 1),
+        "total_ms": round(total_ms, 1),
+        "bytes": size,
+        "lines": lines,
+        "peak_mb": round(peak / (1024 * 1024), 2),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de exportaciones en streaming.")
+    parser.add_argument("--username", default="bench_admin")
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--ensure-user", action="store_true", help="Crea el usuario admin si no existe.")
+    parser.add_argument("--seed-invoices", type=int, default=0, help="Generar datos antes de medir.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--fecha-inicio", default="2000-01-01")
+    parser.add_argument("--fecha-fin", default=date.today().isoformat())
+    parser.add_argument("--formatos", nargs="*", default=["csv", "xlsx"])
+    parser.add_argument("--ttfb-budget-ms", type=float, default=1000.0)
+    parser.add_argument("--memory-budget-mb", type=float, default=64.0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    os.environ.setdefault("PERF_INSTRUMENTATION", "0")
+
+    from app import create_app
+    from migrations import apply_migrations
+    from models import FacturaContado, db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        apply_migrations(db.engine)
+        if options.seed_invoices:
+            from synthetic_data import seed_synthetic
+
+            seed_synthetic(invoices=options.seed_invoices, seed=options.seed, echo=print)
+        invoices = db.session.query(FacturaContado.id).count()
+    if options.ensure_user:
+        ensure_user(app, options.username, options.password)
+
+    client = app.test_client()
+    response = client.post("/login", data={"username": options.username, "password": options.password})
+    if response.status_code not in {302, 303}:
+        print(f"No se pudo iniciar sesion como {options.username}.", file=sys.stderr)
+        return 1
+
+    print(f"Exportaciones sobre {invoices} facturas")
+    print(f"{'exportacion':22} {'estado':>6} {'ttfb ms':>9} {'total ms':>9} {'MB':>8} {'lineas':>9} {'pico MB':>8}")
+    problems = []
+    for name in EXPORTS:
+        for export_format in options.formatos:
+            path = (
+                f"/reportes/exportar/{name}?formato={export_format}"
+                f"&fecha_inicio={options.fecha_inicio}&fecha_fin={options.fecha_fin}"
+            )
+            result = download(client, path)
+            # tracemalloc hace mucho mas lenta la descarga: la memoria se mide en otra pasada.
+            result["peak_mb"] = download(client, path, trace_memory=True)["peak_mb"]
+            label = f"{name}.{export_format}"
+            print(
+                f"{label:22} {result['status']:>6} {result['ttfb_ms']:>9} {result['total_ms']:>9} "
+                f"{result['bytes'] / (1024 * 1024):>8.2f} "
+                f"{result['lines'] if export_format == 'csv' else '-':>9} {result['peak_mb']:>8}"
+            )
+            if result["status"] != 200:
+                problems.append(f"{label} respondio {result['status']}")
+            if result["ttfb_ms"] > options.ttfb_budget_ms:
+                problems.append(f"{label} tardo {result['ttfb_ms']} ms en enviar el primer bloque")
+            if result["peak_mb"] > options.memory_budget_mb:
+                problems.append(f"{label} uso {result['peak_mb']} MB de memoria")
+    for problem in problems:
+        print(f"FALLA: {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Benchmark de contención del inventario: muchas cajas vendiendo los mismos
+productos al mismo tiempo.
+
+Cada sesión de POS es un hilo con su propia conexión que registra ventas de
+1 a 3 productos "calientes" hasta agotarlos. Se comparan dos estrategias:
+
+    atomic   inventory.record_sale (UPDATE condicional, uno por venta)
+    naive    lee el stock, lo valida en Python y escribe el valor nuevo
+
+Por estrategia se registra: ventas aceptadas y rechazadas por stock, errores
+de base (lock/deadlock), ventas por segundo, latencia p50/p95/max y la
+verificación final: stock negativo (sobreventa) y diferencia entre el stock
+y el libro de movimientos (ventas perdidas por escrituras pisadas).
+
+Ejemplo (SQLite desechable; con MySQL basta el entorno de producción):
+
+    cd backend
+    DB_ENGINE=sqlite SQLITE_PATH=/tmp/inventario.sqlite3 \\
+    python ../scripts/bench_inventory.py --sessions 16 --stock 500 --strategy both
+
+Sale con código 1 si la estrategia atomic vende de más o pierde ventas.
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+BENCH_PREFIX = "BENCH-INV-"
+BENCH_REFERENCE = "bench-inventario"
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def prepare_products(session, count, stock):
+    """Crea (o reinicia) los productos calientes y borra sus movimientos anteriores."""
+    from sqlalchemy import delete, select, update
+
+    from models import MovimientoInventario, Producto
+
+    ids = []
+    for index in range(count):
+        codigo = f"{BENCH_PREFIX}{index + 1:02d}"
+        producto_id = session.execute(select(Producto.id).where(Producto.codigo == codigo)).scalar()
+        if producto_id is None:
+            producto = Producto(
+                codigo=codigo,
+                nombre=f"Producto benchmark {index + 1}",
+                categoria="Benchmark",
+                precio=10,
+                stock=stock,
+                activo=False,
+            )
+            session.add(producto)
+            session.flush()
+            producto_id = producto.id
+        ids.append(producto_id)
+    session.execute(delete(MovimientoInventario).where(MovimientoInventario.producto_id.in_(ids)))
+    session.execute(update(Producto).where(Producto.id.in_(ids)).values(stock=stock))
+    session.commit()
+    return ids
+
+
+def naive_sale(session, items):
+    """Lectura, validación en Python y escritura del valor: lo que el libro evita."""
+    from inventory import StockInsuficiente, Faltante, _record, aggregate_items
+    from models import Producto
+
+    quantities = aggregate_items(items)
+    productos = session.query(Producto).filter(Producto.id.in_(list(quantities))).all()
+    faltantes = [
+        Faltante(producto.id, producto.nombre, quantities[producto.id], producto.stock)
+        for producto in productos
+        if producto.stock < quantities[producto.id]
+    ]
+    if faltantes:
+        session.rollback()
+        raise StockInsuficiente(faltantes)
+    _record(
+        session,
+        {producto_id: -cantidad for producto_id, cantidad in quantities.items()},
+        "venta",
+        None,
+        referencia=BENCH_REFERENCE,
+    )
+    for producto in productos:
+        producto.stock = producto.stock - quantities[producto.id]
+
+
+def atomic_sale(session, items):
+    from inventory import record_sale
+
+    record_sale(session, items, None, None, referencia=BENCH_REFERENCE)
+
+
+STRATEGIES = {"atomic": atomic_sale, "naive": naive_sale}
+
+
+def run_strategy(engine, strategy, product_ids, options):
+    from sqlalchemy.exc import DBAPIError
+    from sqlalchemy.orm import Session
+
+    from inventory import StockInsuficiente
+
+    sale = STRATEGIES[strategy]
+    stats = {"accepted": 0, "rejected": 0, "errors": 0, "latencies": []}
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(options.sessions)
+
+    def pos_session(number):
+        rng = random.Random(options.seed + number)
+        local = {"accepted": 0, "rejected": 0, "errors": 0, "latencies": []}
+        consecutive_rejections = 0
+        with Session(engine) as session:
+            start_barrier.wait()
+            for _ in range(options.sales_per_session):
+                picked = rng.sample(product_ids, rng.randint(1, min(3, len(product_ids))))
+                items = [(producto_id, rng.randint(1, options.max_qty)) for producto_id in picked]
+                started = time.perf_counter()
+                try:
+                    sale(session, items)
+                    session.commit()
+                    local["accepted"] += 1
+                    consecutive_rejections = 0
+                except StockInsuficiente:
+                    local["rejected"] += 1
+                    consecutive_rejections += 1
+                except DBAPIError:
+                    session.rollback()
+                    local["errors"] += 1
+                local["latencies"].append((time.perf_counter() - started) * 1000)
+                # Con todo agotado ya no queda contención que medir.
+                if consecutive_rejections >= 20:
+                    break
+        with lock:
+            for key in ("accepted", "rejected", "errors"):
+                stats[key] += local[key]
+            stats["latencies"].extend(local["latencies"])
+
+    threads = [threading.Thread(target=pos_session, args=(number,)) for number in range(options.sessions)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+def verify(session, product_ids, stock):
+    """(unidades vendidas según el libro, stock negativo, diferencias libro/stock)."""
+    from sqlalchemy import func, select
+
+    from models import MovimientoInventario, Producto
+
+    ledger = dict(
+        session.execute(
+            select(MovimientoInventario.producto_id, func.sum(MovimientoInventario.cantidad))
+            .where(MovimientoInventario.producto_id.in_(product_ids))
+            .group_by(MovimientoInventario.producto_id)
+        ).all()
+    )
+    current = dict(session.execute(select(Producto.id, Producto.stock).where(Producto.id.in_(product_ids))).all())
+    sold = -sum(int(value or 0) for value in ledger.values())
+    negative = sum(1 for value in current.values() if value < 0)
+    drift = sum(abs(current[producto_id] - (stock + int(ledger.get(producto_id) or 0))) for producto_id in product_ids)
+    return sold, negative, drift
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Contención de ventas concurrentes sobre el inventario.")
+    parser.add_argument("--sessions", type=int, default=16, help="Cajas (hilos) vendiendo a la vez.")
+    parser.add_argument("--sales-per-session", type=int, default=200)
+    parser.add_argument("--products", type=int, default=3, help="Productos calientes compartidos.")
+    parser.add_argument("--stock", type=int, default=500, help="Stock inicial de cada producto.")
+    parser.add_argument("--max-qty", type=int, default=3)
+    parser.add_argument("--strategy", choices=["atomic", "naive", "both"], default="atomic")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    os.environ.setdefault("PERF_INSTRUMENTATION", "0")
+
+    from sqlalchemy import create_engine
+
+    from app import create_app
+    from migrations import apply_migrations
+    from models import db
+
+    app = create_app()
+    strategies = ["atomic", "naive"] if options.strategy == "both" else [options.strategy]
+    problems = []
+    with app.app_context():
+        db.create_all()
+        apply_migrations(db.engine)
+        # Motor propio con una conexión por caja: el pool por defecto (5 + 10)
+        # haría esperar a las cajas por conexión en lugar de por el stock.
+        engine = create_engine(
+            app.config["SQLALCHEMY_DATABASE_URI"], pool_size=options.sessions, max_overflow=0
+        )
+        print(
+            f"{options.sessions} cajas x {options.sales_per_session} ventas sobre {options.products} productos "
+            f"con stock {options.stock} ({engine.dialect.name})"
+        )
+        print(
+            f"{'estrategia':10} {'aceptadas':>9} {'rechazo':>8} {'errores':>8} {'vent/s':>8} "
+            f"{'p50 ms':>7} {'p95 ms':>7} {'max ms':>7} {'vendido':>8} {'negat.':>6} {'perdidas':>8}"
+        )
+        for strategy in strategies:
+            product_ids = prepare_products(db.session, options.products, options.stock)
+            stats = run_strategy(engine, strategy, product_ids, options)
+            sold, negative, drift = verify(db.session, product_ids, options.stock)
+            db.session.rollback()
+            latencies = stats["latencies"]
+            print(
+                f"{strategy:10} {stats['accepted']:>9} {stats['rejected']:>8} {stats['errors']:>8} "
+                f"{stats['accepted'] / stats['seconds'] if stats['seconds'] else 0:>8.0f} "
+                f"{percentile(latencies, 0.5):>7.1f} {percentile(latencies, 0.95):>7.1f} "
+                f"{max(latencies, default=0):>7.1f} {sold:>8} {negative:>6} {drift:>8}"
+            )
+            if strategy == "atomic" and (negative or drift or sold > options.stock * options.products):
+                problems.append("atomic vendio de mas o perdio ventas")
+        engine.dispose()
+    for problem in problems:
+        print(f"FALLA: {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark del PDF de factura con 5, 50 y 500 lineas.
+
+Crea una factura de prueba por tamano (productos y numeros BENCH-PDF-*),
+y la genera una y otra vez pidiendo /facturas/lote.pdf?ids=<id> con el
+test client despues de borrar su pdf_filename: cada pedido dibuja el PDF
+completo con ReportLab (la union de un solo archivo es despreciable). Por
+tamano y modo registra ms por documento (p50/p95), paginas y, en una pasada
+aparte, el pico de memoria Python asignada (tracemalloc).
+
+    fast   estilos, logo y TableStyle de pdf_layout en cache (lo normal)
+    cold   pdf_layout.clear_caches() antes de cada documento
+
+Ejemplo (SQLite desechable):
+
+    cd backend
+    DB_ENGINE=sqlite SQLITE_PATH=/tmp/bench-pdf.sqlite3 \\
+    python ../scripts/bench_pdf.py --ensure-user --password bench123 --docs 20
+
+Al terminar borra la factura, los productos y los PDF de prueba. Sale con
+codigo 1 si algun documento no responde 200.
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_routes import ensure_user, percentile  # noqa: E402
+
+BENCH_PREFIX = "BENCH-PDF-"
+
+
+def seed_invoice(session, lines):
+    """Factura de contado con `lines` detalles sobre productos de prueba."""
+    from models import DetalleFacturaContado, FacturaContado, Producto
+
+    productos = []
+    for index in range(lines):
+        codigo = f"{BENCH_PREFIX}{index + 1:03d}"
+        producto = session.query(Producto).filter_by(codigo=codigo).first()
+        if producto is None:
+            producto = Producto(
+                codigo=codigo,
+                nombre=f"Producto de prueba para PDF numero {index + 1}",
+                categoria="Benchmark",
+                precio=Decimal("12.50"),
+                stock=0,
+                isv_aplica=index % 3 == 0,
+            )
+            session.add(producto)
+        productos.append(producto)
+    session.flush()
+
+    subtotal = Decimal("12.50") * 2 * lines
+    factura = FacturaContado(
+        numero_factura=f"{BENCH_PREFIX}{lines}-{datetime.utcnow():%H%M%S%f}",
+        fecha=datetime.utcnow(),
+        subtotal=subtotal,
+        isv=Decimal("0"),
+        descuento=Decimal("0"),
+        total=subtotal,
+        pago=subtotal,
+        cambio=Decimal("0"),
+        estado="contado",
+    )
+    session.add(factura)
+    session.flush()
+    for producto in productos:
+        session.add(
+            DetalleFacturaContado(
+                factura_id=factura.id,
+                producto_id=producto.id,
+                cantidad=2,
+                precio_unitario=Decimal("12.50"),
+                subtotal=Decimal("25.00"),
+                descuento=Decimal("0"),
+                isv_aplica=producto.isv_aplica,
+            )
+        )
+    session.commit()
+    return factura.id
+
+
+def cleanup(app):
+    from models import DetalleFacturaContado, FacturaContado, Producto, db
+
+    with app.app_context():
+        facturas = FacturaContado.query.filter(FacturaContado.numero_factura.like(f"{BENCH_PREFIX}%")).all()
+        for factura in facturas:
+            remove_pdf(app, factura.pdf_filename)
+        ids = [factura.id for factura in facturas]
+        if ids:
+            DetalleFacturaContado.query.filter(DetalleFacturaContado.factura_id.in_(ids)).delete(
+                synchronize_session=False
+            )
+            FacturaContado.query.filter(FacturaContado.id.in_(ids)).delete(synchronize_session=False)
+        Producto.query.filter(Producto.codigo.like(f"{BENCH_PREFIX}%")).delete(synchronize_session=False)
+        db.session.commit()
+
+
+def remove_pdf(app, pdf_filename):
+    if pdf_filename:
+        path = os.path.join(app.config["INVOICE_PDF_FOLDER"], pdf_filename)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def render_once(app, client, factura_id, cold, trace_memory=False):
+    """Genera el PDF de la factura desde cero. Devuelve (status, ms, bytes, pico MB)."""
+    import pdf_layout
+    from models import FacturaContado, db
+
+    with app.app_context():
+        factura = db.session.get(FacturaContado, factura_id)
+        remove_pdf(app, factura.pdf_filename)
+        factura.pdf_filename = None
+        db.session.commit()
+    if cold:
+        pdf_layout.clear_caches()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(f"/facturas/lote.pdf?ids={factura_id}")
+    body = response.get_data()
+    elapsed = (time.perf_counter() - start) * 1000
+    peak = 0
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return response.status_code, elapsed, body, peak / (1024 * 1024)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del PDF de factura.")
+    parser.add_argument("--username", default="bench_admin")
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--ensure-user", action="store_true", help="Crea el usuario admin si no existe.")
+    parser.add_argument("--lines", type=int, nargs="*", default=[5, 50, 500])
+    parser.add_argument("--docs", type=int, default=20, help="Documentos medidos por tamano y modo.")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--mode", choices=["fast", "cold", "both"], default="both")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    os.environ.setdefault("PERF_INSTRUMENTATION", "0")
+
+    from app import create_app
+    from migrations import apply_migrations
+    from models import db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        apply_migrations(db.engine)
+    if options.ensure_user:
+        ensure_user(app, options.username, options.password)
+
+    client = app.test_client()
+    response = client.post("/login", data={"username": options.username, "password": options.password})
+    if response.status_code not in {302, 303}:
+        print(f"No se pudo iniciar sesion como {options.username}.", file=sys.stderr)
+        return 1
+
+    modes = ["fast", "cold"] if options.mode == "both" else [options.mode]
+    problems = []
+    try:
+        with app.app_context():
+            invoices = {lines: seed_invoice(db.session, lines) for lines in options.lines}
+        print(f"{'lineas':>6} {'modo':>5} {'paginas':>7} {'p50 ms':>8} {'p95 ms':>8} {'KB':>7} {'pico MB':>8}")
+        for lines, factura_id in invoices.items():
+            for mode in modes:
+                cold = mode == "cold"
+                for _ in range(options.warmup):
+                    render_once(app, client, factura_id, cold)
+                timings = []
+                status = size = pages = None
+                for _ in range(options.docs):
+                    status, elapsed, body, _ = render_once(app, client, factura_id, cold)
+                    timings.append(elapsed)
+                    size = len(body)
+                    pages = body.count(b"/Type /Page\n") or body.count(b"/Type /Page ")
+                    if status != 200:
+                        problems.append(f"{lines} lineas ({mode}) respondio {status}")
+                        break
+                # tracemalloc hace mas lento el render: la memoria se mide en otra pasada.
+                peak_mb = render_once(app, client, factura_id, cold, trace_memory=True)[3]
+                print(
+                    f"{lines:>6} {mode:>5} {pages:>7} {percentile(timings, 50):>8.1f} "
+                    f"{percentile(timings, 95):>8.1f} {size / 1024:>7.1f} {peak_mb:>8.2f}"
+                )
+    finally:
+        cleanup(app)
+
+    for problem in problems:
+        print(f"FALLA: {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
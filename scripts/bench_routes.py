@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Benchmark de rutas del backend con el test client de Flask.
+
+Recorre las pantallas pesadas (historial, credito, pagos, dashboard,
+comisiones, aves) contra la base configurada en el entorno y registra por
+ruta: latencia (p50/p95/max), numero de consultas SQL, tiempo en base de
+datos y RSS maximo del proceso. El reporte JSON sirve para comparar
+escalas o cambios (`--baseline`).
+
+Ejemplo (base SQLite desechable, sin MySQL):
+
+    cd backend
+    DB_ENGINE=sqlite SQLITE_PATH=/tmp/bench-100k.sqlite3 \\
+    python ../scripts/bench_routes.py --seed-invoices 100000 --ensure-user \\
+        --password bench123 --label 100k --json ../bench-100k.json
+
+    # Comparar contra una corrida anterior
+    DB_ENGINE=sqlite SQLITE_PATH=/tmp/bench-100k.sqlite3 \\
+    python ../scripts/bench_routes.py --password bench123 \\
+        --baseline ../bench-100k.json --json ../bench-100k-b.json
+
+Los datos sinteticos se generan con `synthetic_data.seed_synthetic` (el
+mismo codigo de `flask seed-synthetic`).
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+DEFAULT_ROUTES = [
+    "/dashboard",
+    "/facturas/historial",
+    "/facturas/credito",
+    "/pagos",
+    "/comisiones",
+    "/dashboard-aves",
+    "/aves/lotes",
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS reporta bytes.
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.db_ms = 0.0
+        self._starts = []
+
+    def before(self, conn, cursor, statement, parameters, context, executemany):
+        self._starts.append(time.perf_counter())
+
+    def after(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        if self._starts:
+            self.db_ms += (time.perf_counter() - self._starts.pop()) * 1000
+
+    def reset(self):
+        self.count = 0
+        self.db_ms = 0.0
+        self._starts = []
+
+
+def ensure_user(app, username, password):
+    from werkzeug.security import generate_password_hash
+
+    from models import User, db
+
+    with app.app_context():
+        user = User.query.filter_by(username=username).first()
+        if not user:
+            db.session.add(
+                User(
+                    username=username,
+                    password=generate_password_hash(password),
+                    nombre_completo="Benchmark",
+                    rol="admin",
+                    activo=True,
+                    fecha_creacion=datetime.utcnow(),
+                )
+            )
+            db.session.commit()
+
+
+def run_route(client, counter, path, repeat, warmup):
+    for _ in range(warmup):
+        client.get(path)
+    latencies = []
+    queries = []
+    db_times = []
+    status = None
+    for _ in range(repeat):
+        counter.reset()
+        start = time.perf_counter()
+        response = client.get(path)
+        latencies.append((time.perf_counter() - start) * 1000)
+        status = response.status_code
+        queries.append(counter.count)
+        db_times.append(counter.db_ms)
+    return {
+        "status": status,
+        "runs": repeat,
+        "latency_ms": {
+            "min": round(min(latencies), 1),
+            "p50": round(percentile(latencies, 50), 1),
+            "p95": round(percentile(latencies, 95), 1),
+            "max": round(max(latencies), 1),
+            "mean": round(sum(latencies) / len(latencies), 1),
+        },
+        "queries": max(queries),
+        "db_ms_p50": round(percentile(db_times, 50), 1),
+        "rss_peak_mb": peak_rss_mb(),
+    }
+
+
+def print_report(report, baseline=None):
+    base_routes = (baseline or {}).get("routes", {})
+    print(f"Benchmark {report['label'] or ''} ({report['database']})")
+    print(f"{'ruta':28} {'estado':>6} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8} {'db ms':>8} {'rss MB':>8}")
+    for path, item in report["routes"].items():
+        line = (
+            f"{path:28} {item['status']:>6} {item['latency_ms']['p50']:>9} "
+            f"{item['latency_ms']['p95']:>9} {item['queries']:>8} {item['db_ms_p50']:>8} "
+            f"{item['rss_peak_mb']:>8}"
+        )
+        previous = base_routes.get(path)
+        if previous and previous["latency_ms"]["p50"]:
+            ratio = item["latency_ms"]["p50"] / previous["latency_ms"]["p50"]
+            line += f"   x{ratio:.2f} p50, {item['queries'] - previous['queries']:+d} queries"
+        print(line)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de rutas con el test client.")
+    parser.add_argument("--username", default="bench_admin")
+    parser.add_argument("--password", required=True)
+    parser.add_argument(
+        "--ensure-user", action="store_true", help="Crea el usuario admin si no existe."
+    )
+    parser.add_argument("--routes", nargs="*", default=DEFAULT_ROUTES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed-invoices", type=int, default=0, help="Generar datos antes de medir.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label", default="")
+    parser.add_argument("--baseline", help="Reporte JSON previo para comparar.")
+    parser.add_argument("--json", dest="json_path", help="Guardar el reporte en JSON.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    os.environ.setdefault("PERF_INSTRUMENTATION", "0")
+
+    from sqlalchemy import event
+
+    from app import create_app
+    from models import FacturaContado, db
+
+    app = create_app()
+    with app.app_context():
+        # create_app ya no crea tablas; en una base nueva equivale a `flask init-db`.
+        from migrations import apply_migrations
+
+        db.create_all()
+        apply_migrations(db.engine)
+
+    if options.seed_invoices:
+        from synthetic_data import seed_synthetic
+
+        with app.app_context():
+            seed_synthetic(invoices=options.seed_invoices, seed=options.seed, echo=print)
+    if options.ensure_user:
+        ensure_user(app, options.username, options.password)
+
+    counter = QueryCounter()
+    with app.app_context():
+        engine = db.engine
+        invoices = db.session.query(FacturaContado.id).count()
+    event.listen(engine, "before_cursor_execute", counter.before)
+    event.listen(engine, "after_cursor_execute", counter.after)
+
+    client = app.test_client()
+    response = client.post(
+        "/login", data={"username": options.username, "password": options.password}
+    )
+    if response.status_code not in {302, 303}:
+        print(f"No se pudo iniciar sesion como {options.username}.", file=sys.stderr)
+        return 1
+
+    report = {
+        "label": options.label,
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "database": engine.dialect.name,
+        "invoices": invoices,
+        "repeat": options.repeat,
+        "routes": {},
+    }
+    for path in options.routes:
+        report["routes"][path] = run_route(client, counter, path, options.repeat, options.warmup)
+    report["rss_peak_mb"] = peak_rss_mb()
+
+    baseline = None
+    if options.baseline:
+        with open(options.baseline, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+    print_report(report, baseline)
+    if options.json_path:
+        with open(options.json_path, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    failed = [path for path, item in report["routes"].items() if item["status"] != 200]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
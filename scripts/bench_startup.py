@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark de arranque de worker: `import app` + `create_app()`.
+
+Cada corrida es un proceso Python nuevo (como un worker de gunicorn recien
+creado o reciclado por --max-requests). Se mide el tiempo de importar el
+modulo y el de crear la app, las consultas SQL que se ejecutan durante el
+arranque y si se cargaron modulos pesados que deberian importarse recien al
+usarse (ReportLab, requests).
+
+Ejemplo:
+
+    cd backend
+    DB_ENGINE=sqlite SQLITE_PATH=/tmp/invagro.sqlite3 \\
+    python ../scripts/bench_startup.py --runs 10 --budget-ms 800
+
+Sale con codigo 1 si la mediana supera --budget-ms, si el arranque toca la
+base de datos o si se importa alguno de los modulos pesados.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+LAZY_MODULES = ("reportlab", "requests")
+
+CHILD_CODE = r"""
+import json, sys, time
+started = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+queries = []
+event.listen(Engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+import_start = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+application = app_module.create_app()
+created = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - import_start) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "total_ms": (created - started) * 1000,
+    "queries": queries,
+    "modules": sorted({name.split(".")[0] for name in sys.modules}),
+}))
+"""
+
+
+def run_child():
+    env = dict(os.environ)
+    env.setdefault("PERF_INSTRUMENTATION", "0")
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD_CODE],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or "El proceso hijo fallo.")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def median(values):
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Tiempo de arranque de un worker.")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=1000.0, help="Mediana maxima permitida.")
+    parser.add_argument("--json", dest="json_path", help="Guardar el reporte en JSON.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    # La primera corrida calienta el cache de bytecode y del sistema de archivos.
+    run_child()
+    samples = [run_child() for _ in range(max(1, options.runs))]
+
+    report = {
+        "runs": len(samples),
+        "import_ms_p50": round(median([item["import_ms"] for item in samples]), 1),
+        "create_app_ms_p50": round(median([item["create_app_ms"] for item in samples]), 1),
+        "total_ms_p50": round(median([item["total_ms"] for item in samples]), 1),
+        "total_ms_max": round(max(item["total_ms"] for item in samples), 1),
+        "startup_queries": samples[-1]["queries"],
+        "lazy_modules_loaded": [name for name in LAZY_MODULES if name in samples[-1]["modules"]],
+        "budget_ms": options.budget_ms,
+    }
+
+    print(f"import app      p50 {report['import_ms_p50']:>8} ms")
+    print(f"create_app()    p50 {report['create_app_ms_p50']:>8} ms")
+    print(f"total           p50 {report['total_ms_p50']:>8} ms (max {report['total_ms_max']} ms)")
+    print(f"consultas SQL al arrancar: {len(report['startup_queries'])}")
+    print(f"modulos pesados cargados: {', '.join(report['lazy_modules_loaded']) or 'ninguno'}")
+
+    if options.json_path:
+        with open(options.json_path, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+    problems = []
+    if report["total_ms_p50"] > options.budget_ms:
+        problems.append(f"la mediana supera el presupuesto de {options.budget_ms:.0f} ms")
+    if report["startup_queries"]:
+        problems.append("create_app ejecuta consultas SQL")
+    if report["lazy_modules_loaded"]:
+        problems.append("se importan modulos pesados al arrancar")
+    for problem in problems:
+        print(f"FALLA: {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Ticket termico (ESC/POS y texto) contra el PDF de la misma factura.
+
+Usa las facturas de prueba de bench_pdf.py (5, 50 y 500 lineas) y mide,
+por documento:
+
+    escpos   GET /facturas/<id>/ticket            (consulta + render)
+    txt      GET /facturas/<id>/ticket?formato=txt
+    puro     escpos.render_escpos del ticket de ejemplo con las mismas lineas
+             (sin Flask ni base de datos)
+    pdf      GET /facturas/lote.pdf?ids=<id> con el PDF borrado antes
+
+Con --golden compara el sha256 del ticket de ejemplo fijo (sin base de
+datos) con GOLDEN_SHA256 y sale con codigo 1 si alguno no coincide: cambio
+algun byte de lo que recibe la impresora. Si el cambio es a proposito,
+revisar el ticket impreso y copiar los sha256 nuevos en GOLDEN_SHA256.
+
+    cd backend
+    DB_ENGINE=sqlite SQLITE_PATH=/tmp/bench-ticket.sqlite3 \\
+    python ../scripts/bench_ticket.py --ensure-user --password bench123 --docs 20
+
+    python ../scripts/bench_ticket.py --golden
+
+Al terminar borra las facturas y productos de prueba. Sale con codigo 1
+si algun pedido no responde 200.
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_pdf import cleanup, render_once, seed_invoice  # noqa: E402
+from bench_routes import ensure_user, percentile  # noqa: E402
+
+SAMPLE_TICKET = {
+    "negocio": {
+        "nombre": "Agroveterinaria Invagro",
+        "direccion": "Barrio El Centro, Comayagua",
+        "rtn": "08019999999999",
+        "telefono": "2772-0000",
+        "email": "ventas@invagro.hn",
+        "cai": "ABCDEF-123456-789012-345678-901234-56",
+        "rango": "000-001-01-00000001 - 000-001-01-00005000",
+        "fecha_limite": "31/12/2026",
+        "mensaje": "Gracias por su compra",
+    },
+    "numero": "000-001-01-00000042",
+    "fecha": datetime(2026, 3, 14, 15, 9, 26),
+    "tipo": "contado",
+    "estado": "contado",
+    "cliente": "Granja Avícola Peña",
+    "rtn": "05011990001234",
+    "cajero": "Ana López",
+    "vendedor": "José Núñez",
+    "lineas": [
+        {"descripcion": "Concentrado iniciador pollo 50 lb", "cantidad": 4,
+         "precio": Decimal("612.50"), "descuento": Decimal("0"),
+         "subtotal": Decimal("2450.00"), "isv_aplica": False},
+        {"descripcion": "Vacuna Newcastle + Bronquitis 1000 dosis", "cantidad": 2,
+         "precio": Decimal("385.00"), "descuento": Decimal("15.00"),
+         "subtotal": Decimal("740.00"), "isv_aplica": True},
+        {"descripcion": "Bebedero", "cantidad": 10,
+         "precio": Decimal("45.00"), "descuento": Decimal("0"),
+         "subtotal": Decimal("450.00"), "isv_aplica": True},
+    ],
+    "descuento": Decimal("30.00"),
+    "subtotal": Decimal("3670.00"),
+    "total": Decimal("3814.00"),
+    "pago": Decimal("4000.00"),
+    "cambio": Decimal("186.00"),
+    "total_en_letras": "TRES MIL OCHOCIENTOS CATORCE LEMPIRAS CON 00/100",
+}
+
+
+# sha256 de SAMPLE_TICKET renderizado: (formato, columnas) -> hash.
+GOLDEN_SHA256 = {
+    ("escpos", 48): "b482b9a38efc3605fe3af874f31c288a66a487834bdbcb6b3ea8c516405debc4",
+    ("txt", 48): "e2843d5227b8f24762e423c9bbd96a3d1230de46e41cec336797aa98465ec0e6",
+    ("escpos", 32): "38dfb4dd1e18c9d7b2997d6d5dbb8fc1e3b01f594fbbf5038312cd20875bb86e",
+    ("txt", 32): "63b2ea851a69eed152bf1683d8517d266a360052821b3bdf9c54b5a5c124fc9b",
+}
+
+
+def sample_ticket(lines):
+    """El ticket de ejemplo con `lines` lineas (para medir solo el render)."""
+    base = SAMPLE_TICKET["lineas"]
+    return {**SAMPLE_TICKET, "lineas": [base[index % len(base)] for index in range(lines)]}
+
+
+def golden():
+    """Compara los bytes del ticket de ejemplo con GOLDEN_SHA256; 1 si alguno cambio."""
+    from escpos import render_escpos, render_text
+
+    mismatches = []
+    for (formato, columns), expected in GOLDEN_SHA256.items():
+        if formato == "escpos":
+            data = render_escpos(SAMPLE_TICKET, columns)
+        else:
+            data = render_text(SAMPLE_TICKET, columns).encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        ok = digest == expected
+        if not ok:
+            mismatches.append((formato, columns))
+        print(f"{formato:6} {columns} col  {len(data):>5} B  sha256 {digest}  {'ok' if ok else 'CAMBIO'}")
+    if not mismatches:
+        return 0
+    print()
+    for formato, columns in mismatches:
+        print(f"FALLA: {formato} {columns} col no coincide con GOLDEN_SHA256", file=sys.stderr)
+    print(render_text(SAMPLE_TICKET, 48), end="")
+    return 1
+
+
+def timed_get(client, url):
+    start = time.perf_counter()
+    response = client.get(url)
+    body = response.get_data()
+    return response.status_code, (time.perf_counter() - start) * 1000, body
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del ticket termico contra el PDF.")
+    parser.add_argument("--username", default="bench_admin")
+    parser.add_argument("--password")
+    parser.add_argument("--ensure-user", action="store_true", help="Crea el usuario admin si no existe.")
+    parser.add_argument("--lines", type=int, nargs="*", default=[5, 50, 500])
+    parser.add_argument("--docs", type=int, default=20, help="Documentos medidos por tamano y formato.")
+    parser.add_argument("--golden", action="store_true", help="Solo verifica el sha256 del ticket de ejemplo.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    if options.golden:
+        return golden()
+    if not options.password:
+        print("--password es obligatorio salvo con --golden.", file=sys.stderr)
+        return 2
+    os.environ.setdefault("PERF_INSTRUMENTATION", "0")
+
+    from app import create_app
+    from escpos import render_escpos
+    from migrations import apply_migrations
+    from models import db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        apply_migrations(db.engine)
+    if options.ensure_user:
+        ensure_user(app, options.username, options.password)
+
+    client = app.test_client()
+    response = client.post("/login", data={"username": options.username, "password": options.password})
+    if response.status_code not in {302, 303}:
+        print(f"No se pudo iniciar sesion como {options.username}.", file=sys.stderr)
+        return 1
+
+    problems = []
+    try:
+        with app.app_context():
+            invoices = {lines: seed_invoice(db.session, lines) for lines in options.lines}
+        print(f"{'lineas':>6} {'formato':>7} {'p50 ms':>8} {'p95 ms':>8} {'KB':>7} {'vs pdf':>7}")
+        for lines, factura_id in invoices.items():
+            results = {}
+            for formato, url in (
+                ("escpos", f"/facturas/{factura_id}/ticket"),
+                ("txt", f"/facturas/{factura_id}/ticket?formato=txt"),
+            ):
+                timings, size = [], 0
+                for _ in range(options.docs + 2):
+                    status, elapsed, body = timed_get(client, url)
+                    if status != 200:
+                        problems.append(f"{lines} lineas ({formato}) respondio {status}")
+                        break
+                    timings.append(elapsed)
+                    size = len(body)
+                results[formato] = (timings[2:] or timings, size)
+
+            ticket = sample_ticket(lines)
+            timings = []
+            for _ in range(options.docs):
+                start = time.perf_counter()
+                data = render_escpos(ticket, app.config["TICKET_COLUMNS"])
+                timings.append((time.perf_counter() - start) * 1000)
+            results["puro"] = (timings, len(data))
+
+            timings, size = [], 0
+            for _ in range(options.docs):
+                status, elapsed, body, _ = render_once(app, client, factura_id, cold=False)
+                if status != 200:
+                    problems.append(f"{lines} lineas (pdf) respondio {status}")
+                    break
+                timings.append(elapsed)
+                size = len(body)
+            results["pdf"] = (timings, size)
+
+            pdf_p50 = percentile(results["pdf"][0], 50) or 1
+            for formato, (timings, size) in results.items():
+                p50 = percentile(timings, 50)
+                print(
+                    f"{lines:>6} {formato:>7} {p50:>8.3f} {percentile(timings, 95):>8.3f} "
+                    f"{size / 1024:>7.1f} {pdf_p50 / p50 if p50 else 0:>6.0f}x"
+                )
+    finally:
+        cleanup(app)
+
+    for problem in problems:
+        print(f"FALLA: {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
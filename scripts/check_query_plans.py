@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Regresion de planes de consulta (EXPLAIN) para las rutas calientes.
+
+Compila las consultas que usan historial, credito, pagos, cobros, pedidos,
+comisiones y aves tal como las arma el ORM, ejecuta EXPLAIN (MySQL) o
+EXPLAIN QUERY PLAN (SQLite) y falla si la tabla principal de alguna se lee
+completa en vez de usar un indice. Sirve para detectar que un cambio de
+consulta o de esquema dejo de aprovechar el paquete de indices de
+`migrations.py`.
+
+Ejemplo (SQLite desechable con datos sinteticos):
+
+    cd backend
+    DB_ENGINE=sqlite SQLITE_PATH=/tmp/plans.sqlite3 \\
+    python ../scripts/check_query_plans.py --seed-invoices 5000
+
+Contra MySQL conviene correrlo sobre una base con volumen real (o sembrada
+con `flask seed-synthetic`): con tablas casi vacias el optimizador de MySQL
+prefiere el full scan aunque exista el indice.
+
+Sale con codigo 1 si alguna consulta hace full scan de su tabla principal.
+"""
+
+import argparse
+import os
+import sys
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+
+def hot_queries():
+    """(nombre, tabla principal, select) de las consultas que deben usar indice."""
+    from sqlalchemy import or_, select
+
+    from models import (
+        AbonoFactura,
+        AvesLoteActividad,
+        ChatMessage,
+        CobroPersonal,
+        FacturaContado,
+        Pedido,
+    )
+
+    month_start = datetime(2024, 1, 1)
+    month_end = datetime(2024, 2, 1)
+    return [
+        (
+            "facturas_credito",
+            FacturaContado.__tablename__,
+            select(FacturaContado)
+            .where(FacturaContado.estado == "credito")
+            .order_by(FacturaContado.fecha.desc()),
+        ),
+        (
+            "creditos_por_antiguedad",
+            FacturaContado.__tablename__,
+            select(FacturaContado.id)
+            .where(FacturaContado.estado == "credito", FacturaContado.fecha < month_start),
+        ),
+        (
+            "historial_por_fecha",
+            FacturaContado.__tablename__,
+            select(FacturaContado)
+            .where(FacturaContado.fecha >= month_start, FacturaContado.fecha < month_end)
+            .order_by(FacturaContado.fecha.desc()),
+        ),
+        (
+            "compras_cliente",
+            FacturaContado.__tablename__,
+            select(FacturaContado)
+            .where(
+                FacturaContado.cliente_id == 1,
+                FacturaContado.estado != "anulada",
+                FacturaContado.fecha >= month_start,
+                FacturaContado.fecha < month_end,
+            )
+            .order_by(FacturaContado.fecha.desc()),
+        ),
+        (
+            "ventas_vendedor",
+            FacturaContado.__tablename__,
+            select(FacturaContado.id)
+            .where(FacturaContado.usuario_id == 1, FacturaContado.fecha >= month_start),
+        ),
+        (
+            "abonos_factura",
+            AbonoFactura.__tablename__,
+            select(AbonoFactura)
+            .where(AbonoFactura.factura_id == 1)
+            .order_by(AbonoFactura.fecha.asc(), AbonoFactura.id.asc()),
+        ),
+        (
+            "pagos_por_rango",
+            AbonoFactura.__tablename__,
+            select(AbonoFactura)
+            .where(AbonoFactura.fecha >= month_start, AbonoFactura.fecha <= month_end)
+            .order_by(AbonoFactura.fecha.desc()),
+        ),
+        (
+            "pagos_vendedor",
+            AbonoFactura.__tablename__,
+            select(AbonoFactura)
+            .where(AbonoFactura.usuario_id == 1, AbonoFactura.fecha >= month_start),
+        ),
+        (
+            "cobros_pendientes",
+            CobroPersonal.__tablename__,
+            select(CobroPersonal)
+            .where(CobroPersonal.estado == "pendiente")
+            .order_by(CobroPersonal.fecha_vencimiento.asc()),
+        ),
+        (
+            "cobros_vendedor",
+            CobroPersonal.__tablename__,
+            select(CobroPersonal.id)
+            .where(CobroPersonal.usuario_id == 1, CobroPersonal.estado == "pendiente"),
+        ),
+        (
+            "pedidos_vendedor_mes",
+            Pedido.__tablename__,
+            select(Pedido.id).where(Pedido.usuario_id == 1, Pedido.fecha >= month_start),
+        ),
+        (
+            "pedidos_por_facturar",
+            Pedido.__tablename__,
+            select(Pedido)
+            .where(Pedido.estado.in_(("pendiente", "listo")))
+            .order_by(Pedido.fecha.desc()),
+        ),
+        (
+            "pedidos_pendientes_vendedor",
+            Pedido.__tablename__,
+            select(Pedido.id).where(
+                Pedido.usuario_id == 1,
+                or_(Pedido.estado.is_(None), Pedido.estado == "pendiente"),
+            ),
+        ),
+        (
+            "aves_actividad_programada",
+            AvesLoteActividad.__tablename__,
+            select(AvesLoteActividad).where(
+                AvesLoteActividad.lote_id == 1,
+                AvesLoteActividad.plan_id == 1,
+                AvesLoteActividad.fecha_programada == date(2024, 1, 15),
+            ),
+        ),
+        (
+            "chat_mensajes_sesion",
+            ChatMessage.__tablename__,
+            select(ChatMessage)
+            .where(ChatMessage.session_id == 1)
+            .order_by(ChatMessage.id.asc()),
+        ),
+    ]
+
+
+def explain(conn, statement):
+    """Devuelve [(tabla, acceso, detalle)] del plan de la consulta."""
+    dialect = conn.dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "sqlite":
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        plan = []
+        for row in rows:
+            detail = row[-1]
+            # "SCAN <tabla>" sin "USING ... INDEX" es lectura completa.
+            words = detail.split()
+            table = words[1] if len(words) > 1 and words[0] in {"SCAN", "SEARCH"} else ""
+            full_scan = words[:1] == ["SCAN"] and "INDEX" not in detail
+            plan.append((table, "ALL" if full_scan else words[0] if words else "", detail))
+        return plan
+    rows = conn.exec_driver_sql(f"EXPLAIN {sql}").mappings().fetchall()
+    return [
+        (row.get("table") or "", row.get("type") or "", f"key={row.get('key')} rows={row.get('rows')}")
+        for row in rows
+    ]
+
+
+def check_plans(conn, queries, verbose=False):
+    failures = []
+    for name, table, statement in queries:
+        plan = explain(conn, statement)
+        scans = [item for item in plan if item[0] == table and item[1] == "ALL"]
+        status = "FULL SCAN" if scans else "ok"
+        print(f"{name:30} {status}")
+        if verbose or scans:
+            for item in plan:
+                print(f"    {item[0]:28} {item[1]:8} {item[2]}")
+        if scans:
+            failures.append(name)
+    return failures
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="EXPLAIN de las consultas calientes.")
+    parser.add_argument("--seed-invoices", type=int, default=0, help="Generar datos antes de revisar.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-upgrade", action="store_true", help="No aplicar migraciones pendientes.")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar el plan completo.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    os.environ.setdefault("PERF_INSTRUMENTATION", "0")
+
+    from app import create_app
+    from migrations import apply_migrations
+    from models import db
+
+    app = create_app()
+    with app.app_context():
+        if not options.no_upgrade:
+            db.create_all()
+            apply_migrations(db.engine, echo=print)
+        if options.seed_invoices:
+            from synthetic_data import seed_synthetic
+
+            seed_synthetic(invoices=options.seed_invoices, seed=options.seed, echo=print)
+        if db.engine.dialect.name == "sqlite":
+            with db.engine.begin() as conn:
+                conn.exec_driver_sql("ANALYZE")
+        with db.engine.connect() as conn:
+            failures = check_plans(conn, hot_queries(), verbose=options.verbose)
+
+    if failures:
+        print(f"\n{len(failures)} consulta(s) sin indice: {', '.join(failures)}", file=sys.stderr)
+        return 1
+    print("\nPlanes revisados: todos usan indice.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,7 +4,8 @@ CREATE TABLE IF NOT EXISTS `inva-chat_sessions` (
   username VARCHAR(50),
   created_at TIMESTAMP NULL,
   updated_at TIMESTAMP NULL,
-  INDEX idx_chat_sessions_username (username)
+  INDEX idx_chat_sessions_username (username),
+  INDEX idx_chat_sessions_updated (updated_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 CREATE TABLE IF NOT EXISTS `inva-chat_messages` (
@@ -13,7 +14,7 @@ CREATE TABLE IF NOT EXISTS `inva-chat_messages` (
   role VARCHAR(20) NOT NULL,
   content TEXT,
   created_at TIMESTAMP NULL,
-  INDEX idx_chat_messages_session (session_id),
+  INDEX idx_chat_messages_session_id (session_id, id),
   CONSTRAINT fk_chat_messages_session FOREIGN KEY (session_id) REFERENCES `inva-chat_sessions`(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -22,7 +23,7 @@ CREATE TABLE IF NOT EXISTS `inva-chat_summaries` (
   session_id VARCHAR(36) NOT NULL,
   summary TEXT,
   updated_at TIMESTAMP NULL,
-  INDEX idx_chat_summaries_session (session_id),
+  INDEX idx_chat_summaries_session_id (session_id, id),
   CONSTRAINT fk_chat_summaries_session FOREIGN KEY (session_id) REFERENCES `inva-chat_sessions`(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -37,5 +38,6 @@ CREATE TABLE IF NOT EXISTS `inva-chat_audit` (
   rows_returned INT,
   created_at TIMESTAMP NULL,
   INDEX idx_chat_audit_session (session_id),
-  INDEX idx_chat_audit_username (username)
+  INDEX idx_chat_audit_username (username),
+  INDEX idx_chat_audit_created (created_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
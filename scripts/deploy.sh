@@ -46,7 +46,9 @@ if [ ! -f .env ]; then
 fi
 
 echo -e "\n${YELLOW}🗄️  Paso 7: Inicializando base de datos...${NC}"
-python scripts/init_db.py
+(cd backend && flask --app wsgi init-db)
+# CSS/JS minificados, con hash en el nombre y precomprimidos en backend/static/dist
+(cd backend && flask --app wsgi build-assets)
 
 echo -e "\n${YELLOW}🌐 Paso 8: Configurando Nginx...${NC}"
 sudo tee /etc/nginx/sites-available/invagro > /dev/null <<EOF
@@ -67,6 +69,31 @@ server {
         expires 30d;
     }
 
+    # Assets versionados por hash: nginx envía el .gz ya generado y el
+    # navegador no los vuelve a pedir.
+    location /dist/ {
+        alias $APP_DIR/backend/static/dist/;
+        gzip_static on;
+        add_header Cache-Control "public, max-age=31536000, immutable";
+        add_header Vary "Accept-Encoding";
+        location ~ \.json\$ { return 404; }
+    }
+
+    # Recibos y PDF de facturas con FILE_SERVING=x-accel: Flask revisa la
+    # sesion y responde X-Accel-Redirect; nginx envia el archivo. Solo se
+    # llega aqui por esa redireccion, nunca desde el navegador.
+    location /_protected/invoices/ {
+        internal;
+        alias $APP_DIR/backend/instance/invoices/;
+        add_header X-Content-Type-Options nosniff;
+    }
+
+    location /_protected/receipts/ {
+        internal;
+        alias $APP_DIR/backend/instance/receipts/;
+        add_header X-Content-Type-Options nosniff;
+    }
+
     client_max_body_size 10M;
 }
 EOF
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita el endpoint /v1/responses de OpenAI.
+
+Sirve para ejercitar `call_llm` y `extract_response_text_and_calls` sin
+salir a internet: responde con el mismo formato (mensajes `output_text` y
+llamadas `function_call`), con latencia configurable e inyeccion de errores.
+
+Uso:
+
+    python scripts/llm_stub_server.py --port 8808 --latency-ms 400 --jitter-ms 150
+
+    # En el entorno del backend:
+    CHAT_LLM_BASE_URL=http://127.0.0.1:8808/v1
+    CHAT_LLM_API_KEY=stub
+    CHAT_LLM_MODEL=stub-model
+
+Endpoints:
+    POST /v1/responses   (tambien /responses)
+    GET  /stats          contadores y concurrencia maxima observada
+    POST /stats/reset    reinicia los contadores
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from uuid import uuid4
+
+
+SAMPLE_VALUES = {
+    "string": "2024-01-01",
+    "integer": 1,
+    "number": 1,
+    "boolean": False,
+}
+
+
+class StubStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.errors = 0
+        self.tool_calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def enter(self):
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "tool_calls": self.tool_calls,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+            }
+
+
+def sample_arguments(tool):
+    """Construye argumentos validos a partir del JSON schema de la tool."""
+    parameters = tool.get("parameters") or {}
+    properties = parameters.get("properties") or {}
+    arguments = {}
+    for name in parameters.get("required") or list(properties):
+        prop_type = (properties.get(name) or {}).get("type", "string")
+        if isinstance(prop_type, list):
+            prop_type = next((t for t in prop_type if t != "null"), "string")
+        if name.startswith("year"):
+            arguments[name] = 2024
+        elif name == "dias":
+            arguments[name] = 30
+        else:
+            arguments[name] = SAMPLE_VALUES.get(prop_type, "")
+    return arguments
+
+
+def last_user_text(input_items):
+    for item in reversed(input_items or []):
+        if item.get("role") != "user":
+            continue
+        for part in item.get("content") or []:
+            if part.get("type") == "input_text":
+                return part.get("text", "")
+    return ""
+
+
+def build_response(payload, options, rng, stats):
+    input_items = payload.get("input") or []
+    tools = payload.get("tools") or []
+    has_tool_output = any(
+        item.get("type") == "function_call_output" for item in input_items
+    )
+    output = []
+    if tools and not has_tool_output and payload.get("tool_choice") != "none":
+        user_text = last_user_text(input_items).lower()
+        forced = [tool for tool in tools if tool.get("name", "") in user_text]
+        if forced or rng.random() < options.tool_rate:
+            tool = forced[0] if forced else rng.choice(tools)
+            stats_lock_increment(stats, "tool_calls")
+            output.append(
+                {
+                    "type": "function_call",
+                    "id": f"fc_{uuid4().hex[:12]}",
+                    "call_id": f"call_{uuid4().hex[:12]}",
+                    "name": tool.get("name"),
+                    "arguments": json.dumps(sample_arguments(tool)),
+                    "status": "completed",
+                }
+            )
+    if not output:
+        user_text = last_user_text(input_items)
+        output.append(
+            {
+                "type": "message",
+                "id": f"msg_{uuid4().hex[:12]}",
+                "role": "assistant",
+                "status": "completed",
+                "content": [
+                    {
+                        "type": "output_text",
+                        "text": options.reply.format(message=user_text[:200]),
+                        "annotations": [],
+                    }
+                ],
+            }
+        )
+    return {
+        "id": f"resp_{uuid4().hex}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": "completed",
+        "model": payload.get("model") or "stub-model",
+        "output": output,
+        "usage": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0},
+    }
+
+
+def stats_lock_increment(stats, field):
+    with stats.lock:
+        setattr(stats, field, getattr(stats, field) + 1)
+
+
+def make_handler(options, stats):
+    rng = random.Random(options.seed)
+    rng_lock = threading.Lock()
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            if options.verbose:
+                super().log_message(fmt, *args)
+
+        def send_json(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/stats":
+                return self.send_json(200, stats.as_dict())
+            return self.send_json(404, {"error": {"message": "Not found"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            path = self.path.rstrip("/")
+            if path == "/stats/reset":
+                stats.reset()
+                return self.send_json(200, stats.as_dict())
+            if path not in {"/v1/responses", "/responses"}:
+                return self.send_json(404, {"error": {"message": "Not found"}})
+
+            stats.enter()
+            try:
+                with rng_lock:
+                    delay_ms = options.latency_ms + rng.uniform(
+                        -options.jitter_ms, options.jitter_ms
+                    )
+                    fail = rng.random() < options.error_rate
+                time.sleep(max(0.0, delay_ms) / 1000)
+
+                if not (self.headers.get("Authorization") or "").startswith("Bearer "):
+                    stats_lock_increment(stats, "errors")
+                    return self.send_json(
+                        401, {"error": {"message": "Missing bearer token", "type": "invalid_request_error"}}
+                    )
+                try:
+                    payload = json.loads(raw or b"{}")
+                except ValueError:
+                    stats_lock_increment(stats, "errors")
+                    return self.send_json(
+                        400, {"error": {"message": "Invalid JSON", "type": "invalid_request_error"}}
+                    )
+                if fail:
+                    stats_lock_increment(stats, "errors")
+                    if options.error_status == 429:
+                        return self.send_json(
+                            429,
+                            {"error": {"message": "quota", "type": "insufficient_quota", "code": "insufficient_quota"}},
+                        )
+                    return self.send_json(
+                        options.error_status,
+                        {"error": {"message": "Injected failure", "type": "server_error"}},
+                    )
+                with rng_lock:
+                    body = build_response(payload, options, rng, stats)
+                return self.send_json(200, body)
+            finally:
+                stats.leave()
+
+    return StubHandler
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Stub local de /v1/responses.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Fraccion de respuestas con error (0-1)."
+    )
+    parser.add_argument(
+        "--error-status", type=int, default=503, help="Codigo HTTP para errores inyectados."
+    )
+    parser.add_argument(
+        "--tool-rate",
+        type=float,
+        default=0.0,
+        help="Probabilidad de responder con function_call cuando se envian tools.",
+    )
+    parser.add_argument(
+        "--reply",
+        default="Respuesta simulada para: {message}",
+        help="Plantilla del texto de respuesta; admite {message}.",
+    )
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def make_server(options):
+    stats = StubStats()
+    server = ThreadingHTTPServer((options.host, options.port), make_handler(options, stats))
+    server.daemon_threads = True
+    server.stats = stats
+    return server
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    server = make_server(options)
+    host, port = server.server_address[:2]
+    print(f"Stub LLM escuchando en http://{host}:{port}/v1 (latencia {options.latency_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
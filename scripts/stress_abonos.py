@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Stress test de abonos en paralelo sobre la misma factura de crédito y el
+mismo cobro personal.
+
+Varias cajas (hilos, cada una con su sesión iniciada) envían abonos por las
+rutas reales (`POST /facturas/credito/<id>/abonos` y
+`POST /cobros-personales/<id>/abonos`) al mismo tiempo. El total de la
+factura y del cobro alcanza solo para una parte de los abonos (--capacity),
+así se ejercitan también los rechazos por saldo.
+
+Al final verifica que no se perdió ningún abono:
+
+    factura.pago == suma de sus AbonoFactura      y  pago <= total
+    cobro.saldo  == total - suma de sus abonos    y  saldo >= 0
+
+y muestra cuántos conflictos optimistas hubo (reintentos) y cuántos se
+agotaron. Sale con código 1 si alguna verificación falla.
+
+Ejemplo (SQLite desechable):
+
+    cd backend
+    DB_ENGINE=sqlite SQLITE_PATH=/tmp/abonos.sqlite3 \\
+    python ../scripts/stress_abonos.py --cashiers 12 --abonos 25 --ensure-user --password bench123
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_routes import ensure_user  # noqa: E402
+
+
+class ConflictCounter(logging.Handler):
+    """Cuenta los conflictos que registra optimistic.retry_on_conflict."""
+
+    def __init__(self):
+        super().__init__(level=logging.INFO)
+        self.count = 0
+        self.exhausted = 0
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        attempt, attempts = record.args
+        with self._lock:
+            self.count += 1
+            if attempt == attempts:
+                self.exhausted += 1
+
+
+def create_targets(total):
+    from models import CobroPersonal, FacturaContado, db
+
+    stamp = datetime.utcnow()
+    factura = FacturaContado(
+        numero_factura=f"STRESS-{stamp:%Y%m%d%H%M%S%f}",
+        fecha=stamp,
+        subtotal=total,
+        isv=Decimal("0"),
+        descuento=Decimal("0"),
+        total=total,
+        pago=Decimal("0"),
+        cambio=Decimal("0"),
+        estado="credito",
+    )
+    cobro = CobroPersonal(
+        numero_cobro=f"STRESS-{stamp:%Y%m%d%H%M%S%f}",
+        nombre="Stress test",
+        concepto="Abonos en paralelo",
+        fecha=stamp,
+        total=total,
+        saldo=total,
+        estado="pendiente",
+    )
+    db.session.add_all([factura, cobro])
+    db.session.commit()
+    return factura.id, cobro.id
+
+
+def check_targets(factura_id, cobro_id, total):
+    from sqlalchemy import func
+
+    from models import AbonoCobroPersonal, AbonoFactura, CobroPersonal, FacturaContado, db
+
+    factura = db.session.get(FacturaContado, factura_id)
+    cobro = db.session.get(CobroPersonal, cobro_id)
+    abonos_factura = db.session.query(func.coalesce(func.sum(AbonoFactura.monto), 0)).filter(
+        AbonoFactura.factura_id == factura_id
+    ).scalar()
+    abonos_cobro = db.session.query(func.coalesce(func.sum(AbonoCobroPersonal.monto), 0)).filter(
+        AbonoCobroPersonal.cobro_id == cobro_id
+    ).scalar()
+    count_factura = AbonoFactura.query.filter_by(factura_id=factura_id).count()
+    count_cobro = AbonoCobroPersonal.query.filter_by(cobro_id=cobro_id).count()
+    return {
+        "factura": {
+            "abonos": count_factura,
+            "registrado": Decimal(factura.pago),
+            "suma_abonos": Decimal(abonos_factura),
+            "ok": Decimal(factura.pago) == Decimal(abonos_factura) and Decimal(factura.pago) <= total,
+            "estado": factura.estado,
+        },
+        "cobro": {
+            "abonos": count_cobro,
+            "registrado": total - Decimal(cobro.saldo),
+            "suma_abonos": Decimal(abonos_cobro),
+            "ok": total - Decimal(cobro.saldo) == Decimal(abonos_cobro) and Decimal(cobro.saldo) >= 0,
+            "estado": cobro.estado,
+        },
+    }
+
+
+def remove_targets(factura_id, cobro_id):
+    from models import AbonoCobroPersonal, AbonoFactura, CobroPersonal, FacturaContado, db
+
+    AbonoFactura.query.filter_by(factura_id=factura_id).delete(synchronize_session=False)
+    AbonoCobroPersonal.query.filter_by(cobro_id=cobro_id).delete(synchronize_session=False)
+    FacturaContado.query.filter_by(id=factura_id).delete(synchronize_session=False)
+    CobroPersonal.query.filter_by(id=cobro_id).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Abonos concurrentes sobre la misma factura y cobro.")
+    parser.add_argument("--username", default="bench_admin")
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--ensure-user", action="store_true", help="Crea el usuario admin si no existe.")
+    parser.add_argument("--cashiers", type=int, default=12, help="Cajas enviando abonos a la vez.")
+    parser.add_argument("--abonos", type=int, default=25, help="Abonos por caja y por destino.")
+    parser.add_argument("--monto", default="10.00")
+    parser.add_argument("--capacity", type=float, default=0.75, help="Fraccion de los abonos que cabe en el total.")
+    parser.add_argument("--keep", action="store_true", help="No borrar la factura y el cobro de prueba.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    os.environ.setdefault("PERF_INSTRUMENTATION", "0")
+
+    from app import create_app
+    from migrations import apply_migrations
+    from models import db
+
+    app = create_app()
+    counter = ConflictCounter()
+    optimistic_logger = logging.getLogger("optimistic")
+    optimistic_logger.addHandler(counter)
+    optimistic_logger.setLevel(logging.INFO)
+    optimistic_logger.propagate = False
+
+    monto = Decimal(options.monto)
+    attempts = options.cashiers * options.abonos
+    total = (monto * int(attempts * options.capacity)).quantize(Decimal("0.01"))
+    with app.app_context():
+        db.create_all()
+        apply_migrations(db.engine)
+        factura_id, cobro_id = create_targets(total)
+    if options.ensure_user:
+        ensure_user(app, options.username, options.password)
+
+    receipt_folder = app.config.get("RECEIPT_PDF_FOLDER")
+    receipts_before = set(os.listdir(receipt_folder)) if receipt_folder else set()
+    errors = []
+    rejected = []
+    start_barrier = threading.Barrier(options.cashiers)
+
+    def cashier():
+        client = app.test_client()
+        response = client.post("/login", data={"username": options.username, "password": options.password})
+        if response.status_code not in {302, 303}:
+            errors.append("login")
+            return
+        start_barrier.wait()
+        for _ in range(options.abonos):
+            for path in (
+                f"/facturas/credito/{factura_id}/abonos",
+                f"/cobros-personales/{cobro_id}/abonos",
+            ):
+                response = client.post(path, data={"monto": options.monto})
+                if response.status_code >= 500:
+                    errors.append(f"{path} -> {response.status_code}")
+                elif "status=payment_conflict" in response.headers.get("Location", ""):
+                    rejected.append(path)
+
+    threads = [threading.Thread(target=cashier) for _ in range(options.cashiers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+
+    with app.app_context():
+        results = check_targets(factura_id, cobro_id, total)
+        if not options.keep:
+            remove_targets(factura_id, cobro_id)
+    if receipt_folder:
+        for name in set(os.listdir(receipt_folder)) - receipts_before:
+            os.remove(os.path.join(receipt_folder, name))
+
+    capacity = int(total / monto)
+    print(
+        f"{options.cashiers} cajas x {options.abonos} abonos de L {monto} por destino; "
+        f"el total admite {capacity} ({seconds:.1f} s, {2 * attempts / seconds:.0f} req/s)"
+    )
+    print(f"{'destino':8} {'abonos':>7} {'registrado':>11} {'suma abonos':>12} {'estado':>10} {'ok':>4}")
+    for name, result in results.items():
+        print(
+            f"{name:8} {result['abonos']:>7} {result['registrado']:>11} {result['suma_abonos']:>12} "
+            f"{result['estado']:>10} {'si' if result['ok'] else 'NO':>4}"
+        )
+    print(f"conflictos optimistas: {counter.count} (agotaron los reintentos: {counter.exhausted})")
+    print(f"abonos rechazados con aviso de conflicto al cajero: {len(rejected)}")
+    problems = [f"{name}: abonos perdidos o sobrepago" for name, result in results.items() if not result["ok"]]
+    problems += [f"error HTTP: {error}" for error in errors[:5]]
+    for problem in problems:
+        print(f"FALLA: {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())